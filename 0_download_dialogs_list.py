@@ -4,11 +4,14 @@ from Telegram.
 """
 
 import argparse
+from pathlib import Path
 
+from telegram_data_downloader import settings
 from telegram_data_downloader.factory import (
     create_dialog_downloader,
     create_telegram_client,
 )
+from telegram_data_downloader.tracing import TRACER
 
 
 def init_args() -> argparse.Namespace:
@@ -42,13 +45,20 @@ if __name__ == "__main__":
 
     print(f"Downloading dialogs list with {DIALOGS_LIMIT=} and {SESSION_NAME=}")
 
+    if settings.TRACE_OUTPUT_FILE:
+        TRACER.enable()
+
     telegram_client = create_telegram_client(SESSION_NAME)
     dialog_downloader = create_dialog_downloader(telegram_client)
 
     # save dialogs
     with telegram_client:
-        telegram_client.loop.run_until_complete(
-            dialog_downloader.save_dialogs(DIALOGS_LIMIT)
-        )
+        try:
+            telegram_client.loop.run_until_complete(
+                dialog_downloader.save_dialogs(DIALOGS_LIMIT)
+            )
+        finally:
+            if TRACER.enabled:
+                TRACER.export(Path(settings.TRACE_OUTPUT_FILE))
 
     print("Dialogs list downloaded successfully")
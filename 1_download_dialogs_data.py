@@ -4,17 +4,41 @@ from Telegram dialogs.
 """
 
 import argparse
-from typing import Callable
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 import telethon
 
 from telegram_data_downloader import settings
-from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.cli import (
+    add_dialog_query_arguments,
+    add_message_filter_arguments,
+    build_dialog_query,
+    build_message_filter,
+)
 from telegram_data_downloader.factory import (
-    create_json_dialog_reader_writer,
+    create_dialog_selector,
+    create_download_planner,
     create_message_downloader,
+    create_queue_worker,
+    create_reaction_refresher,
     create_telegram_client,
+    create_work_queue,
+)
+from telegram_data_downloader.processor.download_planner import (
+    check_plan_limits,
+    format_plan,
 )
+from telegram_data_downloader.progress import ProgressTracker, ProgressView
+from telegram_data_downloader.takeout import reusable_takeout
+from telegram_data_downloader.tracing import TRACER
 
 
 class UninitializedTakeoutSessionException(Exception):
@@ -29,55 +53,66 @@ def init_args() -> argparse.Namespace:
     """
     parser = argparse.ArgumentParser(description="Step #2. Download dialogs")
 
-    parser.add_argument(
-        "--dialog-ids",
-        nargs="+",
-        type=str,
-        help="id(s) of dialog(s) to download, -1 for all",
-        required=True,
-    )
+    add_dialog_query_arguments(parser)
     parser.add_argument(
         "--dialog-msg-limit",
         type=int,
         help="amount of messages to download from a dialog, -1 for all",
         default=10000,
     )
+    add_message_filter_arguments(parser)
+    parser.add_argument(
+        "--refresh-reactions",
+        type=int,
+        metavar="DAYS",
+        help="instead of downloading the messages, update the reactions "
+        "of the downloaded messages, that were sent in the last DAYS days",
+    )
+    queue_mode = parser.add_mutually_exclusive_group()
+    queue_mode.add_argument(
+        "--publish-queue",
+        action="store_true",
+        help="instead of downloading the dialogs, add them to the work queue "
+        "in WORK_QUEUE_FILE, for the workers started with --from-queue",
+    )
+    queue_mode.add_argument(
+        "--from-queue",
+        action="store_true",
+        help="download the dialogs from the work queue, together with the other "
+        "workers, instead of the selected dialogs",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="instead of downloading the dialogs, count their messages and print "
+        "the estimated requests, time and disk space of the download",
+    )
+    parser.add_argument(
+        "--plan-output",
+        type=Path,
+        metavar="FILE",
+        help="save the estimates to a JSON file, for scheduling the download",
+    )
+    parser.add_argument(
+        "--max-hours",
+        type=float,
+        help="don't start the download, if it's estimated to take longer",
+    )
+    parser.add_argument(
+        "--max-gb",
+        type=float,
+        help="don't start the download, if it's estimated to take more disk space",
+    )
     parser.add_argument("--session-name", type=str, help="session name", default="tmp")
-    parser.add_argument("--skip-private", action="store_true")
-    parser.add_argument("--skip-groups", action="store_true")
-    parser.add_argument("--skip-channels", action="store_true")
-
-    return parser.parse_args()
-
-
-def filter_input_dialogs(
-    input_id_lst: list[str],
-    is_dialog_type_accepted: dict[DialogType, bool],
-    dialog_list: list[DialogMetadata],
-) -> list[DialogMetadata]:
-    """
-    Filter the dialogs from `dialog_list` based on two conditions:
-    1. The dialog type is accepted by the `is_dialog_type_accepted` dict.
-    2. The dialog id is in the `input_id_lst`.
-
-    As a parameter to `input_id_lst`, you can provide ["-1"] to download all dialogs.
-    """
-    is_dialog_included: Callable[[DialogMetadata], bool] = lambda dialog: True  # noqa: E731
-
-    if input_id_lst[0] == "-1":
-        pass  # special case to exit early
-    elif len(input_id_lst) == 1:
-        provided_ids = [int(dialog_id) for dialog_id in input_id_lst[0].split(",")]
-        is_dialog_included = lambda dialog: dialog["id"] in provided_ids  # pylint: disable=C3001  # noqa: E731
-    elif len(input_id_lst) > 1:
-        provided_ids = [int(dialog_id.replace(",", "")) for dialog_id in input_id_lst]
-        is_dialog_included = lambda dialog: dialog["id"] in provided_ids  # pylint: disable=C3001  # noqa: E731
 
-    return [
-        dialog
-        for dialog in dialog_list
-        if is_dialog_type_accepted[dialog["type"]] and is_dialog_included(dialog)
-    ]
+    args = parser.parse_args()
+    planned = args.plan or args.plan_output or args.max_hours or args.max_gb
+    if planned and (args.from_queue or args.refresh_reactions is not None):
+        parser.error(
+            "the download of the selected dialogs can be planned, "
+            "not --from-queue or --refresh-reactions"
+        )
+    return args
 
 
 if __name__ == "__main__":
@@ -88,38 +123,108 @@ if __name__ == "__main__":
     MSG_LIMIT = 100_000_000 if args.dialog_msg_limit == -1 else args.dialog_msg_limit
     SESSION_NAME = args.session_name
 
-    dialog_type_to_accepted = {
-        DialogType.PRIVATE: not args.skip_private,
-        DialogType.GROUP: not args.skip_groups,
-        DialogType.CHANNEL: not args.skip_channels,
-    }
-    print(f"dialog types to download: {dialog_type_to_accepted}")
-
-    dialog_reader = create_json_dialog_reader_writer()
-    dialogs = dialog_reader.read_all_dialogs()
-    print(f"total dialogs: {len(dialogs)}")
-    filtered_dialogs = filter_input_dialogs(
-        args.dialog_ids, dialog_type_to_accepted, dialogs
-    )
+    message_filter = build_message_filter(args)
+    print(f"message filter: {message_filter}")
+
+    dialog_query = build_dialog_query(args)
+    print(f"dialog query: {dialog_query}")
+
+    filtered_dialogs = create_dialog_selector().select_dialogs(dialog_query)
     print(f"total filtered dialogs: {len(filtered_dialogs)}")
 
+    if args.plan or args.plan_output or args.max_hours or args.max_gb:
+        # * counting is cheap, so it's done outside of the takeout
+        planner = create_download_planner(
+            create_telegram_client(SESSION_NAME), message_filter=message_filter
+        )
+        with planner.client:
+            plan = planner.client.loop.run_until_complete(
+                planner.plan(filtered_dialogs, MSG_LIMIT)
+            )
+        print(format_plan(plan))
+        if args.plan_output:
+            args.plan_output.write_text(
+                json.dumps(plan, default=lambda value: value.value, indent=2)
+            )
+            print(f"plan saved to {args.plan_output}")
+        exceeded = check_plan_limits(
+            plan,
+            max_seconds=args.max_hours * 3600 if args.max_hours else None,
+            max_bytes=int(args.max_gb * 2**30) if args.max_gb else None,
+        )
+        if exceeded:
+            print(f"download is over budget: {'; '.join(exceeded)}")
+            sys.exit(2)
+        if args.plan:
+            sys.exit(0)
+
+    if args.publish_queue:
+        work_queue = create_work_queue()
+        work_queue.publish([dialog["id"] for dialog in filtered_dialogs], MSG_LIMIT)
+        counts = work_queue.count_states()
+        print(
+            "work queue: "
+            + ", ".join(f"{state.value} {count}" for state, count in counts.items())
+        )
+        sys.exit(0)
+
+    if settings.TRACE_OUTPUT_FILE:
+        TRACER.enable()
+
     client = create_telegram_client(SESSION_NAME)
+
+    async def download_in_takeout() -> None:
+        # * the takeout is kept open for the next run, unless the download completes
+        async with reusable_takeout(
+            client,
+            finalize=settings.CLIENT_TAKEOUT_FINALIZE,
+            contacts=settings.CLIENT_TAKEOUT_FETCH_CONTACTS,
+            users=settings.CLIENT_TAKEOUT_FETCH_USERS,
+            chats=settings.CLIENT_TAKEOUT_FETCH_GROUPS,
+            megagroups=settings.CLIENT_TAKEOUT_FETCH_MEGAGROUPS,
+            channels=settings.CLIENT_TAKEOUT_FETCH_CHANNELS,
+            files=settings.CLIENT_TAKEOUT_FETCH_FILES,
+        ) as takeout:
+            if args.refresh_reactions is not None:
+                since = datetime.now(timezone.utc) - timedelta(
+                    days=args.refresh_reactions
+                )
+                await create_reaction_refresher(takeout).refresh_dialogs(
+                    filtered_dialogs, since
+                )
+                return
+            if args.from_queue:
+                # * the workers share the files of the dialogs and the checkpoints
+                worker_id = f"{socket.gethostname()}:{os.getpid()}"
+                await create_queue_worker(
+                    takeout, worker_id, message_filter=message_filter
+                ).run()
+                return
+            progress = ProgressTracker()
+            message_downloader = create_message_downloader(
+                takeout, message_filter=message_filter, progress=progress
+            )
+            async with ProgressView(
+                progress, log_interval=settings.PROGRESS_LOG_INTERVAL
+            ).running():
+                await message_downloader.download_dialogs(filtered_dialogs, MSG_LIMIT)
+
     print("downloading dialogs...")
     with client:
         try:
-            with client.takeout(
-                finalize=settings.CLIENT_TAKEOUT_FINALIZE,
-                contacts=settings.CLIENT_TAKEOUT_FETCH_CONTACTS,
-                users=settings.CLIENT_TAKEOUT_FETCH_USERS,
-                chats=settings.CLIENT_TAKEOUT_FETCH_GROUPS,
-                megagroups=settings.CLIENT_TAKEOUT_FETCH_MEGAGROUPS,
-                channels=settings.CLIENT_TAKEOUT_FETCH_CHANNELS,
-                files=settings.CLIENT_TAKEOUT_FETCH_FILES,
-            ) as takeout:
-                message_downloader = create_message_downloader(takeout)
-                takeout.loop.run_until_complete(
-                    message_downloader.download_dialogs(filtered_dialogs, MSG_LIMIT)
+            download = client.loop.create_task(download_in_takeout())
+            # * on Ctrl+C or `kill`, dialogs save their progress before exiting
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                with contextlib.suppress(NotImplementedError):
+                    client.loop.add_signal_handler(signum, download.cancel)
+            try:
+                client.loop.run_until_complete(download)
+            except asyncio.CancelledError:
+                print(
+                    "download interrupted, progress is saved to checkpoints, "
+                    "run the script again to resume"
                 )
+                sys.exit(1)
         except telethon.errors.TakeoutInitDelayError as e:
             raise UninitializedTakeoutSessionException(
                 "\nWhen initiating a `takeout` session, Telegram requires a cooling period "
@@ -129,4 +234,7 @@ if __name__ == "__main__":
                 "1. Opening Telegram service notifications (where you retrieved the login code)\n"
                 '2. Click allow on "Data export request"\n'
             ) from e
+        finally:
+            if TRACER.enabled:
+                TRACER.export(Path(settings.TRACE_OUTPUT_FILE))
     print("dialogs downloaded")
@@ -0,0 +1,65 @@
+"""
+This script is a Shell entrypoint, used for re-exporting messages from the raw archive,
+without downloading them from Telegram again.
+
+The archive is filled by `1_download_dialogs_data.py` when `RAW_ARCHIVE_ENABLED` is set.
+"""
+
+import argparse
+import os
+
+from telegram_data_downloader.factory import create_archive_replayer
+
+
+def init_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script and return them.
+    """
+    parser = argparse.ArgumentParser(
+        description="Re-export archived dialogs without the network"
+    )
+
+    parser.add_argument(
+        "--dialog-ids",
+        nargs="+",
+        type=str,
+        help="id(s) of dialog(s) to replay, -1 for all archived dialogs",
+        default=["-1"],
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes, one per CPU core by default",
+        default=os.cpu_count(),
+    )
+
+    return parser.parse_args()
+
+
+def parse_dialog_ids(input_id_lst: list[str]) -> list[int] | None:
+    """
+    Parse dialog ids, provided either as separate values or as a comma-separated list.
+    Returns `None` if all dialogs were requested with "-1".
+    """
+    if input_id_lst[0] == "-1":
+        return None
+    return [
+        int(dialog_id)
+        for value in input_id_lst
+        for dialog_id in value.split(",")
+        if dialog_id.strip()
+    ]
+
+
+if __name__ == "__main__":
+    args = init_args()
+
+    DIALOG_IDS = parse_dialog_ids(args.dialog_ids)
+    WORKERS = args.workers
+
+    print(f"replaying archived dialogs with {DIALOG_IDS=} and {WORKERS=}")
+
+    replayer = create_archive_replayer()
+    total = replayer.replay_dialogs(DIALOG_IDS, WORKERS)
+
+    print(f"{total} messages replayed")
@@ -0,0 +1,66 @@
+"""
+This script is a Shell entrypoint, used for saving new messages of Telegram dialogs
+as they arrive, instead of downloading the dialogs again on a schedule.
+
+Messages are saved to `LIVE_DATA_FOLDER`. Messages, that were sent while the script
+wasn't running, are fetched when it starts again.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import signal
+from pathlib import Path
+
+from telegram_data_downloader import settings
+from telegram_data_downloader.cli import add_dialog_query_arguments, build_dialog_query
+from telegram_data_downloader.factory import (
+    create_dialog_selector,
+    create_live_ingester,
+    create_telegram_client,
+)
+from telegram_data_downloader.tracing import TRACER
+
+
+def init_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script and return them.
+    """
+    parser = argparse.ArgumentParser(description="Save new messages of dialogs")
+
+    add_dialog_query_arguments(parser)
+    parser.add_argument("--session-name", type=str, help="session name", default="tmp")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = init_args()
+
+    SESSION_NAME = args.session_name
+
+    dialog_query = build_dialog_query(args)
+    print(f"dialog query: {dialog_query}")
+
+    dialogs = create_dialog_selector().select_dialogs(dialog_query)
+    print(f"total watched dialogs: {len(dialogs)}")
+
+    if settings.TRACE_OUTPUT_FILE:
+        TRACER.enable()
+
+    client = create_telegram_client(SESSION_NAME)
+    print("watching dialogs, press Ctrl+C to stop...")
+    with client:
+        try:
+            ingester = create_live_ingester(client)
+            watch = client.loop.create_task(ingester.run(dialogs))
+            # * on Ctrl+C or `kill`, the received messages are saved before exiting
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                with contextlib.suppress(NotImplementedError):
+                    client.loop.add_signal_handler(signum, watch.cancel)
+            with contextlib.suppress(asyncio.CancelledError):
+                client.loop.run_until_complete(watch)
+        finally:
+            if TRACER.enabled:
+                TRACER.export(Path(settings.TRACE_OUTPUT_FILE))
+    print("stopped watching dialogs")
@@ -0,0 +1,81 @@
+"""
+This script is a Shell entrypoint, used for finding the messages, that contain a text,
+in all dialogs at once with the global search of Telegram, instead of downloading
+every dialog and searching the files.
+
+Messages are saved to a subfolder of `SWEEP_DATA_FOLDER`, named after the searched text,
+with a file per dialog in the same format as the downloaded messages.
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+from telegram_data_downloader import settings
+from telegram_data_downloader.cli import (
+    add_message_filter_arguments,
+    build_message_filter,
+)
+from telegram_data_downloader.factory import (
+    create_keyword_sweeper,
+    create_telegram_client,
+)
+from telegram_data_downloader.tracing import TRACER
+
+
+def init_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script and return them.
+    """
+    parser = argparse.ArgumentParser(description="Find messages in all dialogs")
+
+    add_message_filter_arguments(parser)
+    parser.add_argument(
+        "--msg-limit",
+        type=int,
+        help="amount of messages to find, -1 for all",
+        default=10000,
+    )
+    parser.add_argument("--session-name", type=str, help="session name", default="tmp")
+
+    args = parser.parse_args()
+    if not args.search:
+        parser.error("--search is required")
+    if args.from_user is not None:
+        parser.error("--from-user is not supported by the global search")
+    return args
+
+
+if __name__ == "__main__":
+    args = init_args()
+
+    MSG_LIMIT = 100_000_000 if args.msg_limit == -1 else args.msg_limit
+    SESSION_NAME = args.session_name
+
+    message_filter = build_message_filter(args)
+    print(f"message filter: {message_filter}")
+    output_folder = settings.SWEEP_DATA_FOLDER / (
+        re.sub(r"\W+", "_", args.search).strip("_") or "sweep"
+    )
+
+    if settings.TRACE_OUTPUT_FILE:
+        TRACER.enable()
+
+    client = create_telegram_client(SESSION_NAME)
+    sweeper = create_keyword_sweeper(
+        client, output_folder, message_filter=message_filter
+    )
+    print("searching messages...")
+    with client:
+        try:
+            found = client.loop.run_until_complete(
+                sweeper.sweep(args.search, MSG_LIMIT)
+            )
+        finally:
+            if TRACER.enabled:
+                TRACER.export(Path(settings.TRACE_OUTPUT_FILE))
+
+    print(
+        f"found {sum(found.values())} messages in {len(found)} dialogs, "
+        f"saved to {output_folder}"
+    )
@@ -0,0 +1,37 @@
+"""
+This script is a Shell entrypoint, used for packing the files of the tiny dialogs
+together, when the messages are saved with the "partitioned" `OUTPUT_LAYOUT`.
+"""
+
+import argparse
+
+from telegram_data_downloader.factory import create_partitioned_message_writer
+
+
+def init_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script and return them.
+    """
+    parser = argparse.ArgumentParser(
+        description="Pack the partitions of the tiny dialogs to shared files"
+    )
+
+    parser.add_argument(
+        "--max-dialog-bytes",
+        type=int,
+        help="size of the files of a dialog, up to which the dialog is packed",
+        default=1024 * 1024,
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = init_args()
+
+    writer = create_partitioned_message_writer()
+    print(f"packing dialogs up to {args.max_dialog_bytes} bytes in {writer.output_dir}")
+
+    total = writer.compact(args.max_dialog_bytes)
+
+    print(f"{total} dialogs packed")
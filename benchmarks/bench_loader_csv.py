@@ -0,0 +1,38 @@
+import pytest
+
+from telegram_data_downloader.loader.compression import Compression
+from telegram_data_downloader.loader.csv import CSVMessageWriter
+
+from .synthetic import (
+    REACTION_EMOTICONS,
+    make_dialog,
+    make_message_attributes,
+    make_reaction_columns,
+)
+
+
+def test_write_messages(run_benchmark, scale, tmp_path):
+    writer = CSVMessageWriter(tmp_path)
+    dialog = make_dialog(1, members_count=0)
+    messages = make_message_attributes(scale)
+
+    run_benchmark(writer.write_messages, dialog, messages)
+
+
+@pytest.mark.parametrize("compression", [Compression.GZIP, Compression.ZSTD])
+def test_write_messages_compressed(run_benchmark, scale, tmp_path, compression):
+    if compression is Compression.ZSTD:
+        pytest.importorskip("zstandard")
+    writer = CSVMessageWriter(tmp_path, compression=compression, compression_level=3)
+    dialog = make_dialog(1, members_count=0)
+    messages = make_message_attributes(scale)
+
+    run_benchmark(writer.write_messages, dialog, messages)
+
+
+def test_write_reactions(run_benchmark, scale, tmp_path):
+    writer = CSVMessageWriter(tmp_path)
+    dialog = make_dialog(1, members_count=0)
+    reactions = make_reaction_columns(scale)
+
+    run_benchmark(writer.write_reactions, dialog, reactions, REACTION_EMOTICONS)
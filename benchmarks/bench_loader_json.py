@@ -0,0 +1,36 @@
+from telegram_data_downloader.loader.json import JSONDialogReaderWriter
+
+from .synthetic import make_dialog
+
+MEMBERS_PER_DIALOG = 50
+
+
+def test_read_all_dialogs(run_benchmark, scale, tmp_path):
+    # * 100 files at the smallest scale, 100k files at the largest one
+    reader_writer = JSONDialogReaderWriter(tmp_path)
+    for dialog_id in range(1, scale // 100 + 1):
+        reader_writer.write_dialog(make_dialog(dialog_id, MEMBERS_PER_DIALOG))
+
+    run_benchmark(reader_writer.read_all_dialogs)
+
+
+def test_write_dialog_many_files(run_benchmark, scale, tmp_path):
+    reader_writer = JSONDialogReaderWriter(tmp_path)
+    dialogs = [
+        make_dialog(dialog_id, MEMBERS_PER_DIALOG)
+        for dialog_id in range(1, scale // 100 + 1)
+    ]
+
+    def write_all():
+        for dialog in dialogs:
+            reader_writer.write_dialog(dialog)
+
+    run_benchmark(write_all)
+
+
+def test_write_dialog_large_member_list(run_benchmark, scale, tmp_path):
+    # * 1k members at the smallest scale, 1M members at the largest one
+    reader_writer = JSONDialogReaderWriter(tmp_path)
+    dialog = make_dialog(1, members_count=scale // 10)
+
+    run_benchmark(reader_writer.write_dialog, dialog)
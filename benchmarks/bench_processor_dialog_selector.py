@@ -0,0 +1,62 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from telegram_data_downloader.dict_types.dialog import (
+    DialogIndexEntry,
+    DialogQuery,
+    DialogType,
+)
+from telegram_data_downloader.processor.dialog_selector import DialogSelector
+
+from .synthetic import BASE_DATE
+
+
+class InMemoryDialogIndex:
+    def __init__(self, entries: list[DialogIndexEntry]) -> None:
+        self.index = {entry["id"]: entry for entry in entries}
+
+    def read_index(self) -> dict[int, DialogIndexEntry]:
+        return self.index
+
+
+@pytest.fixture
+def selector(scale) -> DialogSelector:
+    rng = random.Random(0)
+    return DialogSelector(
+        InMemoryDialogIndex(
+            [
+                DialogIndexEntry(
+                    id=-dialog_id,
+                    name=f"dialog {dialog_id}",
+                    type=rng.choice(list(DialogType)),
+                    member_count=rng.randint(1, 10_000),
+                    last_message_date=BASE_DATE + timedelta(days=rng.randint(0, 365)),
+                )
+                for dialog_id in range(1, scale // 10 + 1)
+            ]
+        )
+    )
+
+
+def test_select_all_dialogs(run_benchmark, selector):
+    run_benchmark(selector.select, DialogQuery())
+
+
+def test_select_by_dialog_ids(run_benchmark, selector):
+    # * select every tenth dialog
+    ids = {-dialog_id for dialog_id in range(1, len(selector.dialog_index.index), 10)}
+
+    run_benchmark(selector.select, DialogQuery(ids=ids))
+
+
+def test_select_by_all_conditions(run_benchmark, selector):
+    query = DialogQuery(
+        types={DialogType.GROUP, DialogType.CHANNEL},
+        min_members=500,
+        name_pattern=r"dialog \d*7$",
+        active_since=BASE_DATE + timedelta(days=180),
+    )
+
+    run_benchmark(selector.select, query)
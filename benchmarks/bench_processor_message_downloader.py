@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+
+from telegram_data_downloader.processor.message_downloader import (
+    MESSAGE_PAGE_SIZE,
+    MessageDownloader,
+)
+from telegram_data_downloader.processor.message_reformatter import (
+    MessageReformatter,
+    new_message_columns,
+)
+
+from .synthetic import make_messages
+
+
+def test_reformat_message(run_benchmark, scale):
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=MagicMock(),
+        reactions_limit_per_message=10,
+    )
+    messages = list(make_messages(scale))
+
+    def reformat_all():
+        for message in messages:
+            downloader._reformat_message(message)  # pylint: disable=protected-access
+
+    run_benchmark(reformat_all)
+
+
+def test_reformat_page(run_benchmark, scale):
+    messages = list(make_messages(scale))
+    pages = [
+        messages[i : i + MESSAGE_PAGE_SIZE]
+        for i in range(0, len(messages), MESSAGE_PAGE_SIZE)
+    ]
+
+    def reformat_all():
+        # * a new reformatter per run, as the downloader uses one per dialog
+        reformatter = MessageReformatter()
+        columns = new_message_columns()
+        for page in pages:
+            reformatter.reformat_page(page, columns)
+
+    run_benchmark(reformat_all)
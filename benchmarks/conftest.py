@@ -0,0 +1,33 @@
+import pytest
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--bench-scale",
+        action="append",
+        choices=list(SCALES),
+        help="number of synthetic records per benchmark, can be repeated. default: 10k",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = metafunc.config.getoption("--bench-scale") or ["10k"]
+        metafunc.parametrize("scale", [SCALES[s] for s in scales], ids=scales)
+
+
+@pytest.fixture
+def run_benchmark(benchmark, scale):
+    """
+    Run the benchmark with the number of rounds suitable for the `scale`,
+    as millions of records take too long to be measured repeatedly.
+    """
+    benchmark.extra_info["scale"] = scale
+
+    def run(func, *args):
+        rounds = 5 if scale <= 10_000 else 1
+        return benchmark.pedantic(func, args=args, rounds=rounds)
+
+    return run
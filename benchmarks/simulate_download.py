@@ -0,0 +1,267 @@
+"""
+Shell entrypoint, running the real dialog and message downloaders against the offline
+Telegram simulator and reporting throughput for a sweep of concurrency settings.
+
+Run with `python -m benchmarks.simulate_download -h` to see the available options.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from telegram_data_downloader import settings
+from telegram_data_downloader.cli import (
+    add_message_filter_arguments,
+    build_message_filter,
+)
+from telegram_data_downloader.dict_types.message import MessageType, ReactionsMode
+from telegram_data_downloader.loader.csv import CSVMessageWriter
+from telegram_data_downloader.loader.json import JSONDialogReaderWriter
+from telegram_data_downloader.loader.media import FileMediaStore
+from telegram_data_downloader.memory import MemoryBudget
+from telegram_data_downloader.processor.dialog_downloader import DialogDownloader
+from telegram_data_downloader.processor.keyword_sweeper import KeywordSweeper
+from telegram_data_downloader.processor.media_downloader import MediaDownloader
+from telegram_data_downloader.processor.message_downloader import MessageDownloader
+from telegram_data_downloader.retry import RetryPolicy
+
+from .simulator import (
+    SimulatedTelegramClient,
+    lognormal_latency,
+    make_dialog_specs,
+)
+
+
+def init_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script and return them.
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure download throughput against a simulated Telegram. "
+        "Simulated messages are sent one per second since 2024-01-01."
+    )
+    parser.add_argument("--dialogs", type=int, default=50, help="number of dialogs")
+    parser.add_argument(
+        "--messages-per-dialog",
+        type=int,
+        default=2000,
+        help="mean number of messages per dialog",
+    )
+    parser.add_argument(
+        "--members-per-dialog", type=int, default=50, help="members per group dialog"
+    )
+    parser.add_argument(
+        "--dialog-msg-limit",
+        type=int,
+        default=10000,
+        help="amount of messages to download from a dialog",
+    )
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 2, 5, 10, 20],
+        help="values of concurrent dialog downloads to sweep over",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=100.0, help="median request latency"
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.5,
+        help="sigma of the log-normal request latency distribution",
+    )
+    parser.add_argument(
+        "--flood-wait-rate",
+        type=float,
+        default=0.001,
+        help="probability of a request receiving a flood wait",
+    )
+    parser.add_argument(
+        "--flood-wait-seconds", type=int, default=10, help="length of a flood wait"
+    )
+    parser.add_argument(
+        "--invalid-buffer-rate",
+        type=float,
+        default=0.001,
+        help="probability of a reaction request failing with InvalidBufferError",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=0.01,
+        help="multiplier of all simulated delays, to compress long runs",
+    )
+    parser.add_argument(
+        "--reactions-mode",
+        choices=[mode.value for mode in ReactionsMode],
+        default=settings.REACTIONS_MODE,
+        help="which reaction data to collect",
+    )
+    parser.add_argument(
+        "--download-media",
+        action="store_true",
+        help="download the media of the messages with the default size limits",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=settings.MEMORY_BUDGET_BYTES,
+        help="limit of the data buffered by all the dialogs in bytes, 0 for no limit",
+    )
+    add_message_filter_arguments(parser)
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="find the messages containing --search with the global search, "
+        "instead of downloading every dialog, concurrency doesn't apply",
+    )
+    parser.add_argument(
+        "--json-output", type=Path, help="file to save the results to as JSON"
+    )
+    parser.add_argument("--verbose", action="store_true", help="show downloader logs")
+
+    args = parser.parse_args()
+    if args.sweep and not args.search:
+        parser.error("--sweep requires --search")
+    return args
+
+
+async def run_simulation(
+    args: argparse.Namespace, concurrency: int, output_dir: Path
+) -> dict:
+    """
+    Download all simulated dialogs with the given `concurrency` and measure the run.
+    """
+    specs = make_dialog_specs(
+        args.dialogs, args.messages_per_dialog, args.members_per_dialog
+    )
+    client = SimulatedTelegramClient(
+        specs,
+        latency=lognormal_latency(args.latency_ms / 1000, args.latency_sigma),
+        flood_wait_rate=args.flood_wait_rate,
+        flood_wait_seconds=args.flood_wait_seconds,
+        invalid_buffer_rate=args.invalid_buffer_rate,
+        time_scale=args.time_scale,
+    )
+    dialog_reader_writer = JSONDialogReaderWriter(output_dir / "dialogs_meta")
+    message_writer = CSVMessageWriter(output_dir / "dialogs_data")
+
+    # * retry sleeps are compressed like the simulated delays
+    retry_policy = RetryPolicy(
+        base_sleep_time=settings.RETRY_BASE_SLEEP_TIME * args.time_scale,
+        max_sleep_time=settings.RETRY_MAX_SLEEP_TIME * args.time_scale,
+        max_tries=settings.RETRY_MAX_TRIES,
+    )
+    await DialogDownloader(
+        client, dialog_reader_writer, retry_policy=retry_policy
+    ).save_dialogs(None)
+    dialogs = dialog_reader_writer.read_all_dialogs()
+
+    if args.sweep:
+        sweeper = KeywordSweeper(
+            client,  # type: ignore
+            dialog_reader_writer,
+            message_writer,
+            message_filter=build_message_filter(args),
+            retry_policy=retry_policy,
+        )
+        start = time.perf_counter()
+        await sweeper.sweep(args.search, args.dialogs * args.dialog_msg_limit)
+        return _report(args, client, concurrency, time.perf_counter() - start)
+
+    memory_budget = MemoryBudget(args.memory_budget or None)
+    downloader = MessageDownloader(
+        client,  # type: ignore
+        dialog_reader_writer,
+        message_writer,
+        reactions_limit_per_message=settings.REACTIONS_LIMIT_PER_MESSAGE,
+        reactions_mode=ReactionsMode(args.reactions_mode),
+        retry_policy=retry_policy,
+        media_downloader=(
+            MediaDownloader(
+                client,  # type: ignore
+                FileMediaStore(output_dir / "media"),
+                max_sizes={
+                    MessageType.PHOTO: settings.MEDIA_MAX_SIZE_PHOTO,
+                    MessageType.VOICE: settings.MEDIA_MAX_SIZE_VOICE,
+                    MessageType.VIDEO: settings.MEDIA_MAX_SIZE_VIDEO,
+                },
+                concurrency=settings.MEDIA_CONCURRENT_DOWNLOADS,
+                retry_policy=retry_policy,
+            )
+            if args.download_media
+            else None
+        ),
+        message_filter=build_message_filter(args),
+        memory_budget=memory_budget,
+    )
+    downloader.concurrent_dialog_downloads = concurrency
+
+    start = time.perf_counter()
+    await downloader.download_dialogs(dialogs, args.dialog_msg_limit)
+    elapsed = time.perf_counter() - start
+
+    return _report(
+        args, client, concurrency, elapsed, peak_buffered_bytes=memory_budget.peak_bytes
+    )
+
+
+def _report(
+    args: argparse.Namespace,
+    client: SimulatedTelegramClient,
+    concurrency: int,
+    elapsed: float,
+    *,
+    peak_buffered_bytes: int | None = None,
+) -> dict:
+    messages = client.messages_served
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": elapsed,
+        "simulated_seconds": elapsed / args.time_scale,
+        "messages": messages,
+        "simulated_messages_per_second": messages / (elapsed / args.time_scale),
+        "requests": sum(client.request_counts.values()),
+        "request_counts": dict(client.request_counts),
+        "flood_wait_seconds": client.flood_wait_total,
+        "peak_buffered_bytes": peak_buffered_bytes,
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    print(
+        f"{'concurrency':>11} | {'simulated s':>11} | {'messages':>9} | "
+        f"{'msg/s':>9} | {'requests':>9} | {'flood wait s':>12}"
+    )
+    for result in results:
+        print(
+            f"{result['concurrency']:>11} | {result['simulated_seconds']:>11.1f} | "
+            f"{result['messages']:>9} | "
+            f"{result['simulated_messages_per_second']:>9.1f} | "
+            f"{result['requests']:>9} | {result['flood_wait_seconds']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    args = init_args()
+    if not args.verbose:
+        logging.getLogger("telegram_data_downloader").setLevel(logging.WARNING)
+
+    results = []
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"simulating download with {concurrency=}...")
+            results.append(
+                asyncio.run(run_simulation(args, concurrency, Path(tmp_dir)))
+            )
+
+    print_report(results)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
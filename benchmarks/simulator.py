@@ -0,0 +1,424 @@
+"""
+Offline stand-in for `telethon.TelegramClient`, used for end-to-end load testing.
+
+`SimulatedTelegramClient` implements the subset of the client API used by the downloaders
+and serves synthetic dialogs with configurable latency, flood waits and transient errors,
+so the real `DialogDownloader` and `MessageDownloader` can be measured without a network.
+"""
+
+import asyncio
+import collections
+import contextlib
+import heapq
+import math
+import random
+import typing
+from collections.abc import AsyncIterator, Callable, Iterator
+from datetime import datetime, timedelta
+
+import telethon
+from telethon.helpers import TotalList
+from telethon.tl import functions as tl_functions
+from telethon.tl import types as tl_types
+from telethon.tl.tlobject import TLObject, TLRequest
+
+from telegram_data_downloader.dict_types.dialog import DialogType
+from telegram_data_downloader.dict_types.message import MessageType
+from telegram_data_downloader.processor.media_downloader import media_size
+
+from .synthetic import BASE_DATE, REACTION_EMOTICONS, make_message
+
+# Telegram returns at most this many messages per `messages.getHistory` request.
+MESSAGES_PAGE_SIZE = 100
+
+# Telethon downloads files in chunks of this size, one `upload.getFile` request each.
+FILE_CHUNK_SIZE = 512 * 1024
+
+# Telethon silently sleeps through flood waits shorter than this threshold.
+FLOOD_SLEEP_THRESHOLD = 60
+
+LatencyDistribution = Callable[[random.Random], float]
+
+
+def message_id_before(date: datetime) -> int:
+    """
+    Id of the newest simulated message sent before `date`, as messages are sent
+    one per second since `BASE_DATE`.
+    """
+    return max(0, math.ceil((date - BASE_DATE).total_seconds()) - 1)
+
+
+# Message types, that are matched by the Telegram message filters.
+_FILTER_TYPES: dict[type[tl_types.TypeMessagesFilter], set[MessageType]] = {
+    tl_types.InputMessagesFilterPhotos: {MessageType.PHOTO},
+    tl_types.InputMessagesFilterVideo: {MessageType.VIDEO},
+    tl_types.InputMessagesFilterVoice: {MessageType.VOICE},
+    tl_types.InputMessagesFilterPhotoVideo: {MessageType.PHOTO, MessageType.VIDEO},
+}
+
+
+def _media_type(message: tl_types.Message) -> MessageType | None:
+    media = message.media
+    if isinstance(media, tl_types.MessageMediaPhoto):
+        return MessageType.PHOTO
+    if isinstance(media, tl_types.MessageMediaDocument):
+        for attribute in media.document.attributes:
+            if isinstance(attribute, tl_types.DocumentAttributeVideo):
+                return MessageType.VIDEO
+            if isinstance(attribute, tl_types.DocumentAttributeAudio):
+                return MessageType.VOICE
+    return None
+
+
+def _message_conditions(
+    messages_filter: type[tl_types.TypeMessagesFilter] | None,
+    search: str | None,
+    from_user: int | None,
+) -> list[Callable[[tl_types.Message], bool]]:
+    """
+    Conditions, that Telegram checks for a filtered history request.
+    """
+    matches: list[Callable[[tl_types.Message], bool]] = []
+    if messages_filter is not None:
+        types = _FILTER_TYPES[messages_filter]
+        matches.append(lambda message: _media_type(message) in types)
+    if search:
+        matches.append(lambda message: search.lower() in message.message.lower())
+    if from_user is not None:
+        matches.append(lambda message: message.from_id.user_id == from_user)
+    return matches
+
+
+def constant_latency(seconds: float) -> LatencyDistribution:
+    return lambda rng: seconds
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> LatencyDistribution:
+    """
+    Long-tailed latency, close to the one observed for real Telegram requests.
+    """
+    return lambda rng: rng.lognormvariate(0, sigma) * median
+
+
+class SimulatedDialogSpec(typing.TypedDict):
+    id: int
+    name: str
+    type: DialogType
+    messages_count: int
+    members_count: int
+    broadcast: bool
+
+
+class SimulatedDialog:
+    """
+    Minimal equivalent of `telethon.tl.custom.Dialog`.
+    """
+
+    def __init__(self, spec: SimulatedDialogSpec, entity: TLObject) -> None:
+        self.id = spec["id"]
+        self.name = spec["name"]
+        self.entity = entity
+        self.date = BASE_DATE + timedelta(seconds=spec["messages_count"])
+        self.is_user = spec["type"] == DialogType.PRIVATE
+        self.is_group = spec["type"] == DialogType.GROUP
+        self.is_channel = spec["type"] == DialogType.CHANNEL
+
+
+def make_dialog_specs(
+    count: int,
+    messages_count: int,
+    members_count: int = 50,
+    seed: int = 0,
+) -> list[SimulatedDialogSpec]:
+    """
+    Create `count` dialogs of mixed types, with sizes spread around `messages_count`.
+    """
+    rng = random.Random(seed)
+    specs = []
+    for index in range(1, count + 1):
+        dialog_type = rng.choice(
+            [DialogType.PRIVATE, DialogType.GROUP, DialogType.CHANNEL]
+        )
+        if dialog_type == DialogType.PRIVATE:
+            dialog_id = index
+        else:
+            dialog_id = telethon.utils.get_peer_id(tl_types.PeerChannel(index))
+        specs.append(
+            SimulatedDialogSpec(
+                id=dialog_id,
+                name=f"dialog {index}",
+                type=dialog_type,
+                messages_count=max(1, int(rng.expovariate(1 / messages_count))),
+                members_count=2 if dialog_type == DialogType.PRIVATE else members_count,
+                broadcast=dialog_type == DialogType.CHANNEL and rng.random() < 0.5,
+            )
+        )
+    return specs
+
+
+class SimulatedTelegramClient:
+    """
+    Fake Telegram client, serving the dialogs described by `dialog_specs`.
+
+    Every simulated request sleeps for a time drawn from `latency`, multiplied by
+    `time_scale`, so that long runs can be compressed. With probability
+    `flood_wait_rate` a request receives a flood wait of `flood_wait_seconds`, which is
+    slept through like Telethon does, or raised if it is above the threshold.
+    Reaction requests fail with `InvalidBufferError` with `invalid_buffer_rate`.
+
+    Attributes:
+        request_counts (collections.Counter): number of simulated requests by type
+        flood_wait_total (float): total simulated flood wait time, in seconds
+        messages_served (int): number of messages returned by `iter_messages`
+    """
+
+    def __init__(
+        self,
+        dialog_specs: list[SimulatedDialogSpec],
+        *,
+        latency: LatencyDistribution = constant_latency(0.1),
+        flood_wait_rate: float = 0.0,
+        flood_wait_seconds: int = 5,
+        invalid_buffer_rate: float = 0.0,
+        time_scale: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        self.dialog_specs = {spec["id"]: spec for spec in dialog_specs}
+        self.latency = latency
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.invalid_buffer_rate = invalid_buffer_rate
+        self.time_scale = time_scale
+        self.flood_sleep_threshold = FLOOD_SLEEP_THRESHOLD
+        self.request_counts: collections.Counter[str] = collections.Counter()
+        self.flood_wait_total = 0.0
+        self.messages_served = 0
+        self._rng = random.Random(seed)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return asyncio.get_event_loop()
+
+    def __enter__(self) -> "SimulatedTelegramClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        return None
+
+    @contextlib.contextmanager
+    def takeout(self, **kwargs) -> Iterator["SimulatedTelegramClient"]:
+        self.request_counts["InitTakeoutSessionRequest"] += 1
+        yield self
+
+    async def _simulate_request(self, name: str) -> None:
+        self.request_counts[name] += 1
+        if self._rng.random() < self.flood_wait_rate:
+            self.request_counts["FloodWait"] += 1
+            self.flood_wait_total += self.flood_wait_seconds
+            if self.flood_wait_seconds > self.flood_sleep_threshold:
+                raise telethon.errors.FloodWaitError(
+                    request=None, capture=self.flood_wait_seconds
+                )
+            await asyncio.sleep(self.flood_wait_seconds * self.time_scale)
+        await asyncio.sleep(self.latency(self._rng) * self.time_scale)
+
+    def _spec(self, entity: typing.Any) -> SimulatedDialogSpec:
+        if isinstance(entity, SimulatedDialog):
+            entity = entity.id
+        elif not isinstance(entity, int):
+            entity = telethon.utils.get_peer_id(entity)
+        if entity not in self.dialog_specs:
+            raise ValueError(f"Could not find the input entity for {entity}")
+        return self.dialog_specs[entity]
+
+    def _entity(self, spec: SimulatedDialogSpec) -> TLObject:
+        real_id, _ = telethon.utils.resolve_id(spec["id"])
+        if spec["type"] == DialogType.PRIVATE:
+            return tl_types.User(
+                id=real_id, access_hash=real_id, username=f"user_{real_id}"
+            )
+        return tl_types.Channel(
+            id=real_id,
+            title=spec["name"],
+            photo=tl_types.ChatPhotoEmpty(),
+            date=BASE_DATE,
+            access_hash=real_id,
+            broadcast=spec["broadcast"],
+            megagroup=not spec["broadcast"],
+        )
+
+    async def get_dialogs(self, limit: int | None = None) -> list[SimulatedDialog]:
+        specs = list(self.dialog_specs.values())[:limit]
+        for _ in range(0, max(len(specs), 1), MESSAGES_PAGE_SIZE):
+            await self._simulate_request("GetDialogsRequest")
+        return [SimulatedDialog(spec, self._entity(spec)) for spec in specs]
+
+    async def get_participants(self, entity: typing.Any) -> list[tl_types.User]:
+        spec = self._spec(entity)
+        for _ in range(0, spec["members_count"], 200):
+            await self._simulate_request("GetParticipantsRequest")
+        return [
+            tl_types.User(
+                id=user_id,
+                first_name=f"first {user_id}",
+                last_name=f"last {user_id}",
+                username=f"user_{user_id}",
+            )
+            for user_id in range(1, spec["members_count"] + 1)
+        ]
+
+    async def get_entity(self, entity: typing.Any) -> TLObject:
+        spec = self._spec(entity)
+        await self._simulate_request("GetEntityRequest")
+        return self._entity(spec)
+
+    async def get_input_entity(self, entity: typing.Any) -> TLObject:
+        return await self.get_entity(entity)
+
+    async def iter_messages(
+        self,
+        entity: typing.Any,
+        limit: int | None = None,
+        offset_id: int = 0,
+        offset_date: datetime | None = None,
+        min_id: int = 0,
+        filter: type[tl_types.TypeMessagesFilter] | None = None,  # pylint: disable=redefined-builtin
+        search: str | None = None,
+        from_user: int | None = None,
+        **kwargs,
+    ) -> AsyncIterator[tl_types.Message]:
+        # * like Telegram, a filtered history is served by `messages.search`,
+        # * with full pages of the matching messages
+        matches = _message_conditions(filter, search, from_user)
+        if entity is None:
+            # * the global search merges the dialogs from the newest message
+            request = "SearchGlobalRequest"
+            messages = heapq.merge(
+                *(
+                    self._history(spec, offset_id, offset_date)
+                    for spec in self.dialog_specs.values()
+                ),
+                key=lambda message: message.date,
+                reverse=True,
+            )
+        else:
+            request = "SearchRequest" if matches else "GetHistoryRequest"
+            messages = self._history(self._spec(entity), offset_id, offset_date)
+        remaining = math.inf if limit is None else limit
+        page_remaining = 0
+        for message in messages:
+            if remaining <= 0 or message.id <= min_id:
+                break
+            if not all(match(message) for match in matches):
+                continue
+            if not page_remaining:
+                await self._simulate_request(request)
+                page_remaining = MESSAGES_PAGE_SIZE
+            self.messages_served += 1
+            yield message
+            page_remaining -= 1
+            remaining -= 1
+
+    def _history(
+        self,
+        spec: SimulatedDialogSpec,
+        offset_id: int,
+        offset_date: datetime | None,
+    ) -> Iterator[tl_types.Message]:
+        """
+        Generate the messages of a dialog from the newest to the oldest.
+        """
+        peer = telethon.utils.get_peer(spec["id"])
+        rng = random.Random(spec["id"])
+        message_id = spec["messages_count"]
+        newest_id = message_id
+        if offset_id:
+            newest_id = min(newest_id, offset_id - 1)
+        if offset_date is not None:
+            newest_id = min(newest_id, message_id_before(offset_date))
+        # * newer messages are generated and dropped, so the resumed history
+        # * is the same as the history of an uninterrupted download
+        while message_id > newest_id:
+            make_message(message_id, rng, peer=peer)
+            message_id -= 1
+        while message_id > 0:
+            yield make_message(message_id, rng, peer=peer)
+            message_id -= 1
+
+    async def get_messages(
+        self,
+        entity: typing.Any,
+        limit: int = 1,
+        offset_date: datetime | None = None,
+        filter: type[tl_types.TypeMessagesFilter] | None = None,  # pylint: disable=redefined-builtin
+        search: str | None = None,
+        from_user: int | None = None,
+    ) -> TotalList:
+        spec = self._spec(entity)
+        matches = _message_conditions(filter, search, from_user)
+        await self._simulate_request(
+            "SearchRequest" if matches else "GetHistoryRequest"
+        )
+        # * like Telegram, the total counts the whole dialog, regardless of the offset
+        if matches:
+            history = self._history(spec, 0, None)
+            found = [
+                message
+                for message in history
+                if all(match(message) for match in matches)
+            ]
+            result = TotalList(
+                message
+                for message in found
+                if offset_date is None or message.date < offset_date
+            )
+            result.total = len(found)
+            del result[limit:]
+            return result
+        message_id = spec["messages_count"]
+        if offset_date is not None:
+            message_id = min(message_id, message_id_before(offset_date))
+        peer = telethon.utils.get_peer(spec["id"])
+        result = TotalList(
+            make_message(newer_id, random.Random(spec["id"]), peer=peer)
+            for newer_id in range(message_id, max(0, message_id - limit), -1)
+        )
+        result.total = spec["messages_count"]
+        return result
+
+    async def iter_download(self, media: typing.Any, **kwargs) -> AsyncIterator[bytes]:
+        remaining = media_size(media)
+        while remaining > 0:
+            await self._simulate_request("GetFileRequest")
+            chunk_size = min(FILE_CHUNK_SIZE, remaining)
+            yield bytes(chunk_size)
+            remaining -= chunk_size
+
+    async def __call__(self, request: TLRequest) -> TLObject:
+        if isinstance(request, tl_functions.messages.GetMessageReactionsListRequest):
+            return await self._get_message_reactions_list(request)
+        raise NotImplementedError(f"{request.__class__.__name__} is not simulated")
+
+    async def _get_message_reactions_list(
+        self, request: tl_functions.messages.GetMessageReactionsListRequest
+    ) -> tl_types.messages.MessageReactionsList:
+        spec = self._spec(request.peer)
+        await self._simulate_request("GetMessageReactionsListRequest")
+        if spec["broadcast"]:
+            raise telethon.errors.BroadcastForbiddenError(request=request)
+        if self._rng.random() < self.invalid_buffer_rate:
+            raise telethon.errors.common.InvalidBufferError(b"l\xfe\xff\xff")
+
+        reactions = [
+            tl_types.MessagePeerReaction(
+                peer_id=tl_types.PeerUser(self._rng.randint(1, spec["members_count"])),
+                date=BASE_DATE,
+                reaction=tl_types.ReactionEmoji(
+                    emoticon=self._rng.choice(REACTION_EMOTICONS)
+                ),
+            )
+            for _ in range(min(self._rng.randint(0, 3), request.limit))
+        ]
+        return tl_types.messages.MessageReactionsList(
+            count=len(reactions), reactions=reactions, chats=[], users=[]
+        )
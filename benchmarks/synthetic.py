@@ -0,0 +1,188 @@
+"""
+Factories of synthetic Telegram data used by the benchmarks.
+
+Objects are real Telethon TL types, so the benchmarked code follows exactly the same
+paths as during a download from Telegram.
+"""
+
+import itertools
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.dialog import (
+    DialogMemberData,
+    DialogMetadata,
+    DialogType,
+)
+from telegram_data_downloader.dict_types.message import (
+    MessageAttributes,
+    MessageType,
+    PeerID,
+    ReactionColumns,
+)
+
+# Number of distinct objects generated per benchmark. Larger scales reuse the pool, as
+# millions of unique Telethon objects would not fit into memory.
+POOL_SIZE = 10_000
+
+REACTION_EMOTICONS = ["👍", "❤", "🔥", "😁", "😢", "🤔", "👎"]
+
+BASE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _document_media(attribute: tl_types.TypeDocumentAttribute, doc_id: int):
+    return tl_types.MessageMediaDocument(
+        document=tl_types.Document(
+            id=doc_id,
+            access_hash=doc_id,
+            file_reference=b"",
+            date=BASE_DATE,
+            mime_type="application/octet-stream",
+            size=1024,
+            dc_id=2,
+            attributes=[attribute],
+        )
+    )
+
+
+def make_message(
+    message_id: int, rng: random.Random, peer: tl_types.TypePeer | None = None
+) -> tl_types.Message:
+    """
+    Create a single message with the type distribution close to a real group chat.
+    """
+    kind = rng.choices(
+        ["text", "photo", "voice", "video", "sticker"],
+        weights=[70, 12, 8, 5, 5],
+    )[0]
+
+    media = None
+    if kind == "photo":
+        media = tl_types.MessageMediaPhoto(
+            photo=tl_types.Photo(
+                id=message_id,
+                access_hash=message_id,
+                file_reference=b"",
+                date=BASE_DATE,
+                sizes=[tl_types.PhotoSize(type="y", w=1280, h=720, size=200_000)],
+                dc_id=2,
+            )
+        )
+    elif kind == "voice":
+        media = _document_media(
+            tl_types.DocumentAttributeAudio(duration=rng.randint(1, 300), voice=True),
+            message_id,
+        )
+    elif kind == "video":
+        media = _document_media(
+            tl_types.DocumentAttributeVideo(
+                duration=rng.uniform(1, 600), w=1280, h=720
+            ),
+            message_id,
+        )
+    elif kind == "sticker":
+        media = _document_media(
+            tl_types.DocumentAttributeSticker(
+                alt="👍", stickerset=tl_types.InputStickerSetEmpty()
+            ),
+            message_id,
+        )
+
+    fwd_from = None
+    if rng.random() < 0.1:
+        fwd_from = tl_types.MessageFwdHeader(
+            date=BASE_DATE, from_id=tl_types.PeerUser(rng.randint(1, 100_000))
+        )
+
+    reactions = None
+    if rng.random() < 0.3:
+        reactions = tl_types.MessageReactions(
+            results=[
+                tl_types.ReactionCount(
+                    reaction=tl_types.ReactionEmoji(emoticon=emoticon),
+                    count=rng.randint(1, 20),
+                )
+                for emoticon in rng.sample(REACTION_EMOTICONS, rng.randint(1, 3))
+            ]
+        )
+
+    return tl_types.Message(
+        id=message_id,
+        peer_id=peer or tl_types.PeerChannel(channel_id=1_000_000),
+        date=BASE_DATE + timedelta(seconds=message_id),
+        message="" if media else "lorem ipsum dolor sit amet " * rng.randint(1, 8),
+        from_id=tl_types.PeerUser(rng.randint(1, 100_000)),
+        fwd_from=fwd_from,
+        media=media,
+        reactions=reactions,
+    )
+
+
+def make_messages(count: int, seed: int = 0) -> Iterator[tl_types.Message]:
+    """
+    Yield `count` messages, cycling over a pool of at most `POOL_SIZE` distinct objects.
+    """
+    rng = random.Random(seed)
+    pool = [make_message(i + 1, rng) for i in range(min(count, POOL_SIZE))]
+    return itertools.islice(itertools.cycle(pool), count)
+
+
+def make_message_attributes(count: int, seed: int = 0) -> list[MessageAttributes]:
+    """
+    Create `count` already reformatted messages, sharing at most `POOL_SIZE` objects.
+    """
+    rng = random.Random(seed)
+    pool = [
+        MessageAttributes(
+            id=i + 1,
+            date=BASE_DATE + timedelta(seconds=i),
+            message="lorem ipsum dolor sit amet " * rng.randint(0, 8),
+            type=rng.choice(list(MessageType)),
+            duration=rng.choice([None, rng.uniform(1, 600)]),
+            from_id=PeerID(rng.randint(1, 100_000)),
+            to_id=PeerID(1_000_000),
+            fwd_from=None,
+            media_ref=None,
+        )
+        for i in range(min(count, POOL_SIZE))
+    ]
+    return list(itertools.islice(itertools.cycle(pool), count))
+
+
+def make_reaction_columns(count: int, seed: int = 0) -> ReactionColumns:
+    """
+    Create `count` reaction rows, about three per message, encoded against
+    `REACTION_EMOTICONS` as the emoji dictionary.
+    """
+    rng = random.Random(seed)
+    return ReactionColumns(
+        dialog_id=[1] * count,
+        message_id=[i // 3 + 1 for i in range(count)],
+        peer_id=[PeerID(rng.randint(1, 100_000)) for _ in range(count)],
+        emoji_code=[rng.randrange(len(REACTION_EMOTICONS)) for _ in range(count)],
+    )
+
+
+def make_dialog(dialog_id: int, members_count: int, seed: int = 0) -> DialogMetadata:
+    """
+    Create dialog metadata with `members_count` members.
+    """
+    rng = random.Random(seed + dialog_id)
+    return DialogMetadata(
+        id=dialog_id,
+        name=f"dialog {dialog_id}",
+        type=rng.choice([DialogType.PRIVATE, DialogType.GROUP, DialogType.CHANNEL]),
+        users=[
+            DialogMemberData(
+                user_id=user_id,
+                first_name=f"first {user_id}",
+                last_name=f"last {user_id}",
+                username=f"user_{user_id}",
+                phone=None,
+            )
+            for user_id in range(1, members_count + 1)
+        ],
+    )
@@ -0,0 +1,154 @@
+"""
+Command line arguments, that are shared by the scripts.
+"""
+
+import argparse
+from datetime import datetime, timezone
+
+from .dict_types.dialog import DialogQuery, DialogType
+from .dict_types.message import MessageFilter, MessageType
+
+
+def parse_dialog_ids(input_id_lst: list[str]) -> set[int] | None:
+    """
+    Parse the dialog ids, provided either as separate values or as a single
+    comma-separated value.
+
+    Returns `None` for ["-1"], which means all dialogs.
+    """
+    if input_id_lst[0] == "-1":
+        return None
+    return {
+        int(dialog_id)
+        for value in input_id_lst
+        for dialog_id in value.split(",")
+        if dialog_id.strip()
+    }
+
+
+def parse_date(value: str) -> datetime:
+    """
+    Parse an ISO date, dates without a timezone are in UTC, like the message dates.
+    """
+    date = datetime.fromisoformat(value)
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def parse_peer(value: str) -> int | str:
+    """
+    Parse a peer, given either by its id or by its username.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def add_dialog_query_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments for selecting dialogs, see `build_dialog_query`.
+    """
+    parser.add_argument(
+        "--dialog-ids",
+        nargs="+",
+        type=str,
+        help="id(s) of dialog(s), -1 for all",
+        required=True,
+    )
+    parser.add_argument("--skip-private", action="store_true")
+    parser.add_argument("--skip-groups", action="store_true")
+    parser.add_argument("--skip-channels", action="store_true")
+    parser.add_argument(
+        "--min-members",
+        type=int,
+        help="select only the dialogs with at least this many members",
+    )
+    parser.add_argument(
+        "--name-regex",
+        type=str,
+        help="select only the dialogs, whose name matches the regular expression",
+    )
+    parser.add_argument(
+        "--active-since",
+        type=parse_date,
+        help="select only the dialogs with messages since the date, e.g. 2024-01-31",
+    )
+
+
+def build_dialog_query(args: argparse.Namespace) -> DialogQuery:
+    """
+    Build the query for selecting dialogs from the arguments.
+    """
+    skipped_types = {
+        DialogType.PRIVATE: args.skip_private,
+        DialogType.GROUP: args.skip_groups,
+        DialogType.CHANNEL: args.skip_channels,
+    }
+    query = DialogQuery(
+        types={
+            dialog_type
+            for dialog_type in DialogType
+            if not skipped_types.get(dialog_type, False)
+        }
+    )
+    if (dialog_ids := parse_dialog_ids(args.dialog_ids)) is not None:
+        query["ids"] = dialog_ids
+    if args.min_members is not None:
+        query["min_members"] = args.min_members
+    if args.name_regex is not None:
+        query["name_pattern"] = args.name_regex
+    if args.active_since is not None:
+        query["active_since"] = args.active_since
+    return query
+
+
+def add_message_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments for filtering the downloaded messages, see `build_message_filter`.
+    """
+    parser.add_argument(
+        "--since",
+        type=parse_date,
+        help="download only the messages sent at or after the date, e.g. 2024-01-31",
+    )
+    parser.add_argument(
+        "--until",
+        type=parse_date,
+        help="download only the messages sent before the date, e.g. 2024-02-29",
+    )
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        choices=[
+            msg_type.value
+            for msg_type in (MessageType.PHOTO, MessageType.VIDEO, MessageType.VOICE)
+        ],
+        help="download only the messages of the types, "
+        "either a single type or photo and video together",
+    )
+    parser.add_argument(
+        "--search", type=str, help="download only the messages containing the text"
+    )
+    parser.add_argument(
+        "--from-user",
+        type=parse_peer,
+        help="download only the messages sent by the user, given by id or username",
+    )
+
+
+def build_message_filter(args: argparse.Namespace) -> MessageFilter:
+    """
+    Build the filter of the downloaded messages from the arguments.
+    """
+    message_filter = MessageFilter()
+    if args.since is not None:
+        message_filter["since"] = args.since
+    if args.until is not None:
+        message_filter["until"] = args.until
+    if args.types is not None:
+        message_filter["types"] = {MessageType(value) for value in args.types}
+    if args.search is not None:
+        message_filter["search"] = args.search
+    if args.from_user is not None:
+        message_filter["from_user"] = args.from_user
+    return message_filter
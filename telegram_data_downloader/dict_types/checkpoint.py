@@ -0,0 +1,30 @@
+from typing import TypedDict
+
+
+class DialogCheckpoint(TypedDict):
+    """
+    Progress of an unfinished dialog download, saved to resume it after a restart.
+    """
+
+    dialog_id: int
+    # id of the last saved message, older messages are downloaded next
+    offset_id: int
+    msg_count: int
+    # size of each partially written file, data past it wasn't checkpointed
+    part_sizes: dict[str, int]
+    # emoji dictionary of the reactions, that were saved so far
+    emojis: list[str]
+    # conditions of the downloaded messages, see `serialize_message_filter`,
+    # the checkpoint doesn't apply to a download with other conditions
+    message_filter: str
+
+
+class LiveCheckpoint(TypedDict):
+    """
+    Progress of the live ingestion of dialogs, saved to catch up after a restart.
+    """
+
+    # newest received message of each dialog, that was saved
+    last_message_ids: dict[int, int]
+    # size of the CSV file of each dialog, data past it wasn't checkpointed
+    file_sizes: dict[int, int]
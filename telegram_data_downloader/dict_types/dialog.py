@@ -1,5 +1,6 @@
+from datetime import datetime
 from enum import Enum
-from typing import TypedDict, Optional
+from typing import NotRequired, TypedDict, Optional
 
 
 class DialogType(Enum):
@@ -13,12 +14,54 @@ class DialogMemberData(TypedDict):
     user_id: int
     first_name: Optional[str]
     last_name: Optional[str]
-    username: str
+    # * the members of the dialogs have a username, senders may have none
+    username: Optional[str]
     phone: Optional[str]
 
 
+class ChatData(TypedDict):
+    """
+    Group or channel, that is referenced by the messages, e.g. as a forward source.
+    """
+
+    # marked id, as the peer ids of the messages
+    chat_id: int
+    title: str
+    username: Optional[str]
+    type: DialogType
+
+
 class DialogMetadata(TypedDict):
     id: int
     name: str
     type: DialogType
     users: list[DialogMemberData]
+    # * missing in the metadata saved by the older versions
+    member_count: NotRequired[int]
+    last_message_date: NotRequired[Optional[datetime]]
+
+
+class DialogIndexEntry(TypedDict):
+    """
+    Summary of a dialog, that is enough to select the dialogs to download,
+    without loading their member lists.
+    """
+
+    id: int
+    name: str
+    type: DialogType
+    member_count: int
+    last_message_date: Optional[datetime]
+
+
+class DialogQuery(TypedDict, total=False):
+    """
+    Conditions for selecting dialogs, a dialog is selected if it matches all of them.
+    Missing keys don't restrict the selection.
+    """
+
+    ids: set[int]
+    types: set[DialogType]
+    min_members: int
+    name_pattern: str
+    active_since: datetime
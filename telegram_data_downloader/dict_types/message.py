@@ -13,6 +13,15 @@ class MessageType(Enum):
     PHOTO = "photo"
 
 
+class ReactionsMode(Enum):
+    # reactions are not collected
+    NONE = "none"
+    # number of reactions per emoji, as shown under the message
+    SUMMARY = "summary"
+    # every reaction with the reacting peer, requires a request per message
+    FULL = "full"
+
+
 class MessageAttributes(TypedDict):
     id: int
     date: Optional[datetime]
@@ -22,4 +31,66 @@ class MessageAttributes(TypedDict):
     from_id: Optional[PeerID]
     to_id: Optional[PeerID]
     fwd_from: Optional[PeerID]
-    reactions: dict[PeerID, str]
+    # name of the media file in the media store, for downloadable media
+    media_ref: Optional[str]
+
+
+class MessageColumns(TypedDict):
+    """
+    Columnar buffer of messages: one list per `MessageAttributes` field,
+    where the values at the same index belong to the same message.
+    """
+
+    id: list[int]
+    date: list[Optional[datetime]]
+    from_id: list[Optional[PeerID]]
+    fwd_from: list[Optional[PeerID]]
+    message: list[str]
+    type: list[MessageType]
+    duration: list[Optional[float]]
+    to_id: list[Optional[PeerID]]
+    media_ref: list[Optional[str]]
+
+
+class ReactionColumns(TypedDict):
+    """
+    Columnar buffer of reactions, one row per reaction of a peer to a message.
+    Emoji are dictionary-encoded: `emoji_code` is an index in the list of emoji,
+    that is kept alongside the buffer.
+    """
+
+    dialog_id: list[int]
+    message_id: list[int]
+    peer_id: list[PeerID]
+    emoji_code: list[int]
+
+
+class ReactionCountColumns(TypedDict):
+    """
+    Columnar buffer of reaction counts, one row per emoji under a message.
+    Emoji are dictionary-encoded the same way as in `ReactionColumns`.
+    """
+
+    dialog_id: list[int]
+    message_id: list[int]
+    emoji_code: list[int]
+    count: list[int]
+
+
+class MessageFilter(TypedDict, total=False):
+    """
+    Conditions for the messages to download, that are applied by Telegram.
+    Missing keys don't restrict the messages.
+    """
+
+    # messages sent at or after this date
+    since: datetime
+    # messages sent before this date
+    until: datetime
+    # messages of these types, only the sets matching a single Telegram filter
+    # are supported, see `message_downloader.get_messages_filter`
+    types: set[MessageType]
+    # messages containing the text
+    search: str
+    # messages sent by the peer, given by its id or username
+    from_user: int | str
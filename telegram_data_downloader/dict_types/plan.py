@@ -0,0 +1,37 @@
+from typing import Optional, TypedDict
+
+from .dialog import DialogType
+
+
+class DialogPlan(TypedDict):
+    """
+    Estimated cost of downloading the messages of a dialog.
+    """
+
+    dialog_id: int
+    name: str
+    type: DialogType
+    member_count: Optional[int]
+    # messages left to download, `None` if they couldn't be counted
+    messages: Optional[int]
+    requests: int
+    seconds: float
+    bytes: int
+
+
+class DownloadPlan(TypedDict):
+    """
+    Estimated cost of downloading the messages of all the selected dialogs.
+    """
+
+    dialogs: list[DialogPlan]
+    messages: int
+    requests: int
+    # wall time with the dialogs downloaded concurrently
+    seconds: float
+    bytes: int
+    # number of the dialogs, which messages couldn't be counted
+    uncounted_dialogs: int
+    # latency of a request, that the estimates are based on
+    seconds_per_request: float
+    concurrency: int
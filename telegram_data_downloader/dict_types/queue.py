@@ -0,0 +1,23 @@
+from enum import Enum
+from typing import TypedDict
+
+
+class WorkState(Enum):
+    # waiting for a worker, including the units released after a failure
+    PENDING = "pending"
+    # downloaded by a worker, until its lease expires
+    LEASED = "leased"
+    DONE = "done"
+    # failed by every allowed attempt
+    FAILED = "failed"
+
+
+class WorkUnit(TypedDict):
+    """
+    Download of a dialog, that is leased by a worker from the work queue.
+    """
+
+    dialog_id: int
+    msg_limit: int
+    # number of the leases so far, including this one
+    attempts: int
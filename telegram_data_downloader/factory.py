@@ -1,12 +1,38 @@
+import functools
 import logging
+from pathlib import Path
 
 import telethon
 
 from . import settings
+from .dict_types.message import MessageFilter, MessageType, ReactionsMode
+from .loader.archive import RawMessageArchive
+from .loader.checkpoint import JSONCheckpointStore, JSONLiveCheckpointStore
 from .loader.json import JSONDialogReaderWriter
-from .loader.csv import CSVMessageWriter
+from .loader.compression import Compression
+from .loader.csv import CSVMessageReader, CSVMessageWriter
+from .loader.directory import JSONPeerDirectory
+from .loader.media import FileMediaStore
+from .loader.partitioned import (
+    OutputLayout,
+    PartitionedMessageReader,
+    PartitionedMessageWriter,
+)
+from .loader.queue import SQLiteWorkQueue
+from .memory import MemoryBudget
+from .progress import ProgressTracker
+from .processor.archive_replayer import ArchiveReplayer
 from .processor.dialog_downloader import DialogDownloader
+from .processor.dialog_selector import DialogSelector
+from .processor.download_planner import DownloadPlanner
+from .processor.keyword_sweeper import KeywordSweeper
+from .processor.live_ingester import LiveIngester
+from .processor.media_downloader import MediaDownloader
 from .processor.message_downloader import MessageDownloader
+from .processor.queue_worker import QueueWorker
+from .processor.reaction_refresher import ReactionRefresher
+from .retry import RetryPolicy
+from .watchdog import StallWatchdog
 
 
 logger = logging.getLogger(__name__)
@@ -22,23 +48,113 @@ def create_telegram_client(session_name: str) -> telethon.TelegramClient:
     )
 
 
+@functools.cache
+def create_peer_directory() -> JSONPeerDirectory:
+    # * shared, so the dialogs read after an update see the new users
+    return JSONPeerDirectory(settings.PEER_DIRECTORY_FOLDER)
+
+
 def create_json_dialog_reader_writer() -> JSONDialogReaderWriter:
-    return JSONDialogReaderWriter(settings.DIALOGS_LIST_FOLDER)
+    return JSONDialogReaderWriter(
+        settings.DIALOGS_LIST_FOLDER, user_directory=create_peer_directory()
+    )
+
+
+def create_csv_message_saver() -> CSVMessageWriter | PartitionedMessageWriter:
+    if OutputLayout(settings.OUTPUT_LAYOUT) is OutputLayout.PARTITIONED:
+        return create_partitioned_message_writer()
+    return CSVMessageWriter(
+        settings.DIALOGS_DATA_FOLDER,
+        compression=Compression(settings.OUTPUT_COMPRESSION),
+        compression_level=settings.OUTPUT_COMPRESSION_LEVEL,
+    )
+
+
+def create_partitioned_message_writer() -> PartitionedMessageWriter:
+    return PartitionedMessageWriter(
+        settings.DIALOGS_DATA_FOLDER / "partitioned",
+        compression=Compression(settings.OUTPUT_COMPRESSION),
+        compression_level=settings.OUTPUT_COMPRESSION_LEVEL,
+        max_part_rows=settings.OUTPUT_PART_MAX_ROWS,
+        max_part_bytes=settings.OUTPUT_PART_MAX_BYTES,
+    )
+
+
+def create_csv_message_reader() -> CSVMessageReader | PartitionedMessageReader:
+    if OutputLayout(settings.OUTPUT_LAYOUT) is OutputLayout.PARTITIONED:
+        return PartitionedMessageReader(settings.DIALOGS_DATA_FOLDER / "partitioned")
+    return CSVMessageReader(settings.DIALOGS_DATA_FOLDER)
+
+
+def create_raw_message_archive() -> RawMessageArchive:
+    return RawMessageArchive(
+        settings.RAW_ARCHIVE_FOLDER,
+        segment_max_bytes=settings.RAW_ARCHIVE_SEGMENT_MAX_BYTES,
+        compression_level=settings.RAW_ARCHIVE_COMPRESSION_LEVEL,
+    )
+
+
+def create_checkpoint_store() -> JSONCheckpointStore:
+    return JSONCheckpointStore(settings.CHECKPOINTS_FOLDER)
 
 
-def create_csv_message_saver() -> CSVMessageWriter:
-    return CSVMessageWriter(settings.DIALOGS_DATA_FOLDER)
+def create_retry_policy(*, bounded_calls: bool = True) -> RetryPolicy:
+    return RetryPolicy(
+        base_sleep_time=settings.RETRY_BASE_SLEEP_TIME,
+        max_sleep_time=settings.RETRY_MAX_SLEEP_TIME,
+        max_tries=settings.RETRY_MAX_TRIES,
+        call_timeout=settings.RETRY_CALL_TIMEOUT if bounded_calls else None,
+        flood_wait_max=settings.FLOOD_WAIT_MAX_SECONDS,
+        breaker_failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        breaker_reset_time=settings.CIRCUIT_BREAKER_RESET_TIME,
+    )
+
+
+def create_media_store() -> FileMediaStore:
+    return FileMediaStore(settings.MEDIA_FOLDER)
+
+
+def create_media_downloader(
+    telegram_client: telethon.TelegramClient,
+) -> MediaDownloader:
+    logger.debug("creating media downloader...")
+    max_sizes = {
+        MessageType.PHOTO: settings.MEDIA_MAX_SIZE_PHOTO,
+        MessageType.VOICE: settings.MEDIA_MAX_SIZE_VOICE,
+        MessageType.VIDEO: settings.MEDIA_MAX_SIZE_VIDEO,
+    }
+    return MediaDownloader(
+        telegram_client,
+        create_media_store(),
+        max_sizes={msg_type: size for msg_type, size in max_sizes.items() if size},
+        concurrency=settings.MEDIA_CONCURRENT_DOWNLOADS,
+        bandwidth_limit=settings.MEDIA_BANDWIDTH_LIMIT,
+        # * large files can take long to download, especially with a bandwidth limit
+        retry_policy=create_retry_policy(bounded_calls=False),
+    )
+
+
+def create_dialog_selector() -> DialogSelector:
+    return DialogSelector(create_json_dialog_reader_writer())
 
 
 def create_dialog_downloader(
     telegram_client: telethon.TelegramClient,
 ) -> DialogDownloader:
     logger.debug("creating dialog downloader...")
-    return DialogDownloader(telegram_client, create_json_dialog_reader_writer())
+    return DialogDownloader(
+        telegram_client,
+        create_json_dialog_reader_writer(),
+        # * the member lists of large groups take long to page through
+        retry_policy=create_retry_policy(bounded_calls=False),
+    )
 
 
 def create_message_downloader(
     telegram_client: telethon.TelegramClient,
+    *,
+    message_filter: MessageFilter | None = None,
+    progress: ProgressTracker | None = None,
 ) -> MessageDownloader:
     logger.debug("creating message downloader...")
     downloader = MessageDownloader(
@@ -46,6 +162,146 @@ def create_message_downloader(
         create_json_dialog_reader_writer(),
         create_csv_message_saver(),
         reactions_limit_per_message=settings.REACTIONS_LIMIT_PER_MESSAGE,
+        raw_archive=(
+            create_raw_message_archive() if settings.RAW_ARCHIVE_ENABLED else None
+        ),
+        reactions_mode=ReactionsMode(settings.REACTIONS_MODE),
+        checkpoint_store=create_checkpoint_store(),
+        checkpoint_interval=settings.CHECKPOINT_INTERVAL_MESSAGES,
+        retry_policy=create_retry_policy(),
+        dialog_timeout=settings.DIALOG_TIMEOUT or None,
+        media_downloader=(
+            create_media_downloader(telegram_client)
+            if settings.MEDIA_DOWNLOAD_ENABLED
+            else None
+        ),
+        message_filter=message_filter,
+        peer_directory=create_peer_directory(),
+        memory_budget=MemoryBudget(
+            settings.MEMORY_BUDGET_BYTES or None,
+            tracemalloc_report=settings.MEMORY_TRACEMALLOC_REPORT,
+        ),
+        progress=progress,
+        watchdog=(
+            StallWatchdog(
+                settings.STALL_TIMEOUT, max_restarts=settings.STALL_MAX_RESTARTS
+            )
+            if settings.STALL_TIMEOUT
+            else None
+        ),
     )
     downloader.concurrent_dialog_downloads = settings.CONCURRENT_DIALOG_DOWNLOADS
     return downloader
+
+
+def create_download_planner(
+    telegram_client: telethon.TelegramClient,
+    *,
+    message_filter: MessageFilter | None = None,
+) -> DownloadPlanner:
+    logger.debug("creating download planner...")
+    return DownloadPlanner(
+        telegram_client,
+        reactions_mode=ReactionsMode(settings.REACTIONS_MODE),
+        concurrency=settings.CONCURRENT_DIALOG_DOWNLOADS,
+        message_filter=message_filter,
+        retry_policy=create_retry_policy(),
+        bytes_per_message=settings.PLAN_BYTES_PER_MESSAGE,
+        checkpoint_store=create_checkpoint_store(),
+        seconds_per_request=settings.PLAN_SECONDS_PER_REQUEST or None,
+    )
+
+
+def create_work_queue() -> SQLiteWorkQueue:
+    return SQLiteWorkQueue(
+        settings.WORK_QUEUE_FILE,
+        lease_duration=settings.WORK_QUEUE_LEASE_SECONDS,
+        max_attempts=settings.WORK_QUEUE_MAX_ATTEMPTS,
+    )
+
+
+def create_queue_worker(
+    telegram_client: telethon.TelegramClient,
+    worker_id: str,
+    *,
+    message_filter: MessageFilter | None = None,
+) -> QueueWorker:
+    logger.debug("creating queue worker...")
+    return QueueWorker(
+        create_work_queue(),
+        create_json_dialog_reader_writer(),
+        create_message_downloader(telegram_client, message_filter=message_filter),
+        worker_id=worker_id,
+        concurrency=settings.CONCURRENT_DIALOG_DOWNLOADS,
+        # * a few heartbeats can fail before the lease expires
+        heartbeat_interval=settings.WORK_QUEUE_LEASE_SECONDS / 5,
+        poll_interval=settings.WORK_QUEUE_LEASE_SECONDS / 5,
+    )
+
+
+def create_reaction_refresher(
+    telegram_client: telethon.TelegramClient,
+) -> ReactionRefresher:
+    logger.debug("creating reaction refresher...")
+    return ReactionRefresher(
+        telegram_client,
+        create_csv_message_reader(),
+        create_csv_message_saver(),
+        reactions_mode=ReactionsMode(settings.REACTIONS_MODE),
+        reactions_limit_per_message=settings.REACTIONS_LIMIT_PER_MESSAGE,
+        retry_policy=create_retry_policy(),
+        concurrency=settings.CONCURRENT_DIALOG_DOWNLOADS,
+    )
+
+
+def create_archive_replayer() -> ArchiveReplayer:
+    logger.debug("creating archive replayer...")
+    return ArchiveReplayer(
+        create_raw_message_archive(),
+        create_json_dialog_reader_writer(),
+        create_csv_message_saver(),
+        reactions_mode=ReactionsMode(settings.REACTIONS_MODE),
+        media_store=create_media_store() if settings.MEDIA_DOWNLOAD_ENABLED else None,
+    )
+
+
+def create_live_ingester(telegram_client: telethon.TelegramClient) -> LiveIngester:
+    logger.debug("creating live ingester...")
+    return LiveIngester(
+        telegram_client,
+        CSVMessageWriter(
+            settings.LIVE_DATA_FOLDER,
+            compression=Compression(settings.OUTPUT_COMPRESSION),
+            compression_level=settings.OUTPUT_COMPRESSION_LEVEL,
+        ),
+        JSONLiveCheckpointStore(settings.CHECKPOINTS_FOLDER / "live.json"),
+        flush_interval=settings.LIVE_FLUSH_INTERVAL,
+        flush_size=settings.LIVE_FLUSH_MESSAGES,
+        retry_policy=create_retry_policy(),
+        media_downloader=(
+            create_media_downloader(telegram_client)
+            if settings.MEDIA_DOWNLOAD_ENABLED
+            else None
+        ),
+    )
+
+
+def create_keyword_sweeper(
+    telegram_client: telethon.TelegramClient,
+    output_folder: Path,
+    *,
+    message_filter: MessageFilter | None = None,
+) -> KeywordSweeper:
+    logger.debug("creating keyword sweeper...")
+    return KeywordSweeper(
+        telegram_client,
+        create_json_dialog_reader_writer(),
+        CSVMessageWriter(
+            output_folder,
+            compression=Compression(settings.OUTPUT_COMPRESSION),
+            compression_level=settings.OUTPUT_COMPRESSION_LEVEL,
+        ),
+        message_filter=message_filter,
+        retry_policy=create_retry_policy(),
+        media_store=create_media_store() if settings.MEDIA_DOWNLOAD_ENABLED else None,
+    )
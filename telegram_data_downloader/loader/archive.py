@@ -0,0 +1,145 @@
+import gzip
+import logging
+import shutil
+import struct
+import typing
+from pathlib import Path
+
+from telethon.extensions import BinaryReader
+from telethon.tl import types as tl_types
+from telethon.tl.custom.message import Message as TLMessage
+
+logger = logging.getLogger(__name__)
+
+# record header: record kind, message id, payload length
+_RECORD_HEADER = struct.Struct("<BqI")
+_MESSAGE_RECORD = 1
+_REACTIONS_RECORD = 2
+
+_SEGMENT_GLOB = "segment-*.tl.gz"
+
+
+class RawMessageArchive:
+    """
+    Class for storing raw TL-serialized messages and their reactions, as they were
+    received from Telegram, so that the data can be re-exported without the network.
+
+    Each dialog is stored in its own directory as a sequence of append-only gzip
+    segments. Every `append` call writes a single gzip member, so a crash can only
+    lose the batch that was being written.
+
+    Attributes:
+        archive_dir (Path): directory with the per-dialog archives
+        segment_max_bytes (int): size after which a new segment is started
+        compression_level (int): gzip compression level, from 1 to 9
+    """
+
+    def __init__(
+        self,
+        archive_dir: Path,
+        *,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        compression_level: int = 6,
+    ) -> None:
+        self.archive_dir = archive_dir
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.compression_level = compression_level
+
+    def _dialog_dir(self, dialog_id: int) -> Path:
+        return self.archive_dir / str(dialog_id)
+
+    def _segments(self, dialog_id: int) -> list[Path]:
+        return sorted(self._dialog_dir(dialog_id).glob(_SEGMENT_GLOB))
+
+    def dialog_ids(self) -> list[int]:
+        """
+        Ids of all dialogs, that have archived messages.
+        """
+        return [
+            int(path.name)
+            for path in self.archive_dir.iterdir()
+            if path.is_dir() and any(path.glob(_SEGMENT_GLOB))
+        ]
+
+    def start_dialog(self, dialog_id: int) -> None:
+        """
+        Remove previously archived data of the dialog before it is downloaded anew.
+        """
+        dialog_dir = self._dialog_dir(dialog_id)
+        if dialog_dir.exists():
+            shutil.rmtree(dialog_dir)
+        dialog_dir.mkdir(parents=True)
+        logger.debug("dialog #%d: archive reset", dialog_id)
+
+    def append(
+        self,
+        dialog_id: int,
+        messages: list[TLMessage],
+        reactions: dict[int, tl_types.messages.MessageReactionsList],
+    ) -> None:
+        """
+        Append a batch of `messages` and their `reactions`, keyed by message id.
+        """
+        if not messages:
+            return
+
+        records = bytearray()
+        for message in messages:
+            # * reactions precede their message, so the message can be yielded at once
+            if (message_reactions := reactions.get(message.id)) is not None:
+                payload = bytes(message_reactions)
+                records += _RECORD_HEADER.pack(
+                    _REACTIONS_RECORD, message.id, len(payload)
+                )
+                records += payload
+            payload = bytes(message)
+            records += _RECORD_HEADER.pack(_MESSAGE_RECORD, message.id, len(payload))
+            records += payload
+
+        segments = self._segments(dialog_id)
+        if not segments or segments[-1].stat().st_size >= self.segment_max_bytes:
+            segment_path = self._dialog_dir(dialog_id) / (
+                f"segment-{len(segments) + 1:06d}.tl.gz"
+            )
+            segment_path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            segment_path = segments[-1]
+
+        with open(segment_path, "ab") as f:
+            f.write(gzip.compress(bytes(records), self.compression_level))
+        logger.debug(
+            "dialog #%d: archived %d messages to %s",
+            dialog_id,
+            len(messages),
+            segment_path,
+        )
+
+    def iter_dialog(
+        self, dialog_id: int
+    ) -> typing.Iterator[
+        tuple[TLMessage, tl_types.messages.MessageReactionsList | None]
+    ]:
+        """
+        Iterate over archived messages of the dialog in the order they were appended,
+        together with their reactions, if those were fetched.
+        """
+        for segment_path in self._segments(dialog_id):
+            pending_reactions: dict[int, tl_types.messages.MessageReactionsList] = {}
+            try:
+                with gzip.open(segment_path, "rb") as f:
+                    while header := f.read(_RECORD_HEADER.size):
+                        kind, message_id, length = _RECORD_HEADER.unpack(header)
+                        tl_object = BinaryReader(f.read(length)).tgread_object()
+                        if kind == _REACTIONS_RECORD:
+                            pending_reactions[message_id] = tl_object
+                        else:
+                            yield tl_object, pending_reactions.pop(message_id, None)
+            except (EOFError, BufferError, gzip.BadGzipFile, struct.error) as e:
+                # * the last batch was not fully written, e.g. due to a crash
+                logger.warning(
+                    "dialog #%d: truncated archive segment %s: %s",
+                    dialog_id,
+                    segment_path,
+                    e,
+                )
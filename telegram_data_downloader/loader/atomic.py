@@ -0,0 +1,51 @@
+import contextlib
+import os
+import typing
+from pathlib import Path
+
+
+def fsync_file(path: Path) -> None:
+    """
+    Flush the contents of the file at `path` to the disk.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path: Path) -> None:
+    """
+    Flush the directory entries at `path` to the disk, so that renames survive a crash.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # * directories can't be opened on some platforms, e.g. Windows
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_path(path: Path, *, sync_dir: bool = True) -> typing.Iterator[Path]:
+    """
+    Yield a temporary path next to `path` to write the data to. Once the block
+    succeeds, the temporary file is flushed to the disk and atomically renamed
+    to `path`, so `path` either keeps the old data or gets the complete new data.
+
+    Set `sync_dir` to `False` when many files are written to the same directory,
+    and call `fsync_dir` once after all of them.
+    """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        yield tmp_path
+        fsync_file(tmp_path)
+        os.replace(tmp_path, path)
+        if sync_dir:
+            fsync_dir(path.parent)
+    finally:
+        tmp_path.unlink(missing_ok=True)
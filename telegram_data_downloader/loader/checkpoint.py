@@ -0,0 +1,98 @@
+import json
+import logging
+from pathlib import Path
+
+from ..dict_types.checkpoint import DialogCheckpoint, LiveCheckpoint
+from .atomic import atomic_path
+
+logger = logging.getLogger(__name__)
+
+
+class JSONCheckpointStore:
+    """
+    Class for storing checkpoints of unfinished dialog downloads in JSON files.
+    Checkpoints are replaced atomically, so a crash leaves either the previous
+    or the new checkpoint.
+    """
+
+    def __init__(self, checkpoint_dir: Path) -> None:
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def _checkpoint_path(self, dialog_id: int) -> Path:
+        return self.checkpoint_dir / f"{dialog_id}.json"
+
+    def read(self, dialog_id: int) -> DialogCheckpoint | None:
+        """
+        Read the checkpoint of a dialog.
+        Returns `None` if the dialog has no unfinished download.
+        """
+        checkpoint_path = self._checkpoint_path(dialog_id)
+        if not checkpoint_path.exists():
+            return None
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # * checkpoints of the older versions were saved without a filter
+        data.setdefault("message_filter", "{}")
+        return DialogCheckpoint(**data)
+
+    def write(self, checkpoint: DialogCheckpoint) -> None:
+        """
+        Save the checkpoint, replacing the previous one of the dialog.
+        """
+        checkpoint_path = self._checkpoint_path(checkpoint["dialog_id"])
+        with atomic_path(checkpoint_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+        logger.debug(
+            "dialog #%d: checkpoint saved at message %d",
+            checkpoint["dialog_id"],
+            checkpoint["offset_id"],
+        )
+
+    def remove(self, dialog_id: int) -> None:
+        """
+        Remove the checkpoint of a dialog, once its download is finished.
+        """
+        self._checkpoint_path(dialog_id).unlink(missing_ok=True)
+
+
+class JSONLiveCheckpointStore:
+    """
+    Class for storing the checkpoint of the live ingestion in a JSON file.
+    The checkpoint is replaced atomically, like the checkpoints of `JSONCheckpointStore`.
+    """
+
+    def __init__(self, checkpoint_path: Path) -> None:
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def read(self) -> LiveCheckpoint:
+        """
+        Read the checkpoint, an empty one if the ingestion never ran.
+        """
+        if not self.checkpoint_path.exists():
+            return LiveCheckpoint(last_message_ids={}, file_sizes={})
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # * JSON object keys are strings
+        return LiveCheckpoint(
+            last_message_ids={
+                int(dialog_id): message_id
+                for dialog_id, message_id in data["last_message_ids"].items()
+            },
+            file_sizes={
+                int(dialog_id): size for dialog_id, size in data["file_sizes"].items()
+            },
+        )
+
+    def write(self, checkpoint: LiveCheckpoint) -> None:
+        """
+        Save the checkpoint, replacing the previous one.
+        """
+        with atomic_path(self.checkpoint_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f)
+        logger.debug(
+            "live checkpoint saved for %d dialogs", len(checkpoint["last_message_ids"])
+        )
@@ -0,0 +1,94 @@
+import gzip
+import io
+import typing
+from enum import Enum
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the installed extras
+    zstandard = None
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class Compression(Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    # requires `zstandard` package, install with `poetry install --extras zstd`
+    ZSTD = "zstd"
+
+    @property
+    def suffix(self) -> str:
+        """
+        File name suffix, that is appended to the names of compressed files.
+        """
+        return _SUFFIXES[self]
+
+
+_SUFFIXES = {Compression.NONE: "", Compression.GZIP: ".gz", Compression.ZSTD: ".zst"}
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError(
+            "zstd compression requires `zstandard` package, "
+            "install it with `poetry install --extras zstd`"
+        )
+
+
+def open_compressed_text(
+    path: Path, compression: Compression, level: int, *, append: bool = False
+) -> typing.TextIO:
+    """
+    Open a text stream for writing to `path`, compressing the data on the fly.
+
+    With `append`, the data is added to the end of the file. Compressed data is then
+    written as a separate gzip member or zstd frame, which are read back as one stream.
+    """
+    mode = "a" if append else "w"
+    if compression is Compression.GZIP:
+        return gzip.open(
+            path, f"{mode}t", compresslevel=level, encoding="utf-8", newline=""
+        )
+    if compression is Compression.ZSTD:
+        _require_zstandard()
+        writer = zstandard.ZstdCompressor(level=level).stream_writer(
+            open(path, f"{mode}b")  # pylint: disable=consider-using-with
+        )
+        return io.TextIOWrapper(writer, encoding="utf-8", newline="")
+    # pylint: disable-next=consider-using-with
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def detect_compression(path: Path) -> Compression:
+    """
+    Detect compression of the file at `path` by its magic bytes.
+    """
+    with open(path, "rb") as f:
+        header = f.read(len(_ZSTD_MAGIC))
+    if header.startswith(_GZIP_MAGIC):
+        return Compression.GZIP
+    if header.startswith(_ZSTD_MAGIC):
+        return Compression.ZSTD
+    return Compression.NONE
+
+
+def open_text(path: Path) -> typing.TextIO:
+    """
+    Open a text stream for reading from `path`, that was written either with or
+    without compression.
+    """
+    compression = detect_compression(path)
+    if compression is Compression.GZIP:
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if compression is Compression.ZSTD:
+        _require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"),  # pylint: disable=consider-using-with
+            read_across_frames=True,
+        )
+        return io.TextIOWrapper(reader, encoding="utf-8", newline="")
+    # pylint: disable-next=consider-using-with
+    return open(path, "r", encoding="utf-8", newline="")
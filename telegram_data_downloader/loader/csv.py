@@ -1,32 +1,427 @@
 import logging
+import os
+import typing
+from datetime import datetime
 from pathlib import Path
 from typing import get_type_hints
 
 import pandas as pd
 
 from ..dict_types.dialog import DialogMetadata
-from ..dict_types.message import MessageAttributes
+from ..dict_types.message import (
+    MessageAttributes,
+    MessageColumns,
+    ReactionColumns,
+    ReactionCountColumns,
+)
+from .atomic import atomic_path, fsync_dir, fsync_file
+from .compression import Compression, open_compressed_text, open_text
 
 logger = logging.getLogger(__name__)
 
+T = typing.TypeVar("T", ReactionColumns, ReactionCountColumns)
+
+_PART_SUFFIX = ".part"
+
+
+def _part_path(path: Path) -> Path:
+    return path.with_name(path.name + _PART_SUFFIX)
+
+
+def _read_csv(directory: Path, name: str) -> pd.DataFrame:
+    """
+    Read `<directory>/<name>.csv`, detecting its compression.
+    """
+    for compression in Compression:
+        read_path = directory / f"{name}.csv{compression.suffix}"
+        if read_path.exists():
+            with open_text(read_path) as f:
+                return pd.read_csv(f)
+    raise FileNotFoundError(f"{name}.csv not found in {directory}")
+
+
+def df_to_columns(df: pd.DataFrame | None, columns_type: type[T]) -> T:
+    """
+    Convert a table to a columnar buffer, empty if the table is `None`.
+    """
+    if df is None:
+        return columns_type(**{key: [] for key in get_type_hints(columns_type)})
+    return columns_type(
+        **{key: df[key].tolist() for key in get_type_hints(columns_type)}
+    )
+
+
+def _read_columns(directory: Path, name: str, columns_type: type[T]) -> T:
+    """
+    Read `<directory>/<name>.csv` as a columnar buffer, empty if the file is missing.
+    """
+    try:
+        df = _read_csv(directory, name)
+    except FileNotFoundError:
+        df = None
+    return df_to_columns(df, columns_type)
+
+
+def messages_to_df(
+    messages: list[MessageAttributes] | MessageColumns,
+) -> pd.DataFrame:
+    """
+    Convert messages, provided either as a list of rows or as columns, to a table.
+    """
+    if isinstance(messages, dict):
+        return pd.DataFrame(
+            {**messages, "type": [msg_type.value for msg_type in messages["type"]]}
+        )
+    if messages:
+        df = pd.DataFrame(messages)
+        df["type"] = df["type"].apply(lambda x: x.value)
+        return df
+    return pd.DataFrame(columns=list(get_type_hints(MessageAttributes).keys()))
+
 
 class CSVMessageWriter:
-    def __init__(self, output_dir: Path) -> None:
+    """
+    Class for writing messages of each dialog to a separate CSV file.
+
+    Reactions are stored as side tables in the `reactions` subdirectory: either one row
+    per reaction, or one row per emoji count under a message, and a dictionary of
+    the emoji, that are referenced by their codes.
+
+    Files can be compressed while they are written, in which case the compression suffix
+    is appended to their names (e.g. `<dialog id>.csv.gz`).
+
+    Attributes:
+        output_dir (Path): directory to write the files to
+        compression (Compression): compression of the written files
+        compression_level (int): compression level, its range depends on `compression`
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        *,
+        compression: Compression = Compression.NONE,
+        compression_level: int = 3,
+    ) -> None:
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.reactions_dir = output_dir / "reactions"
+        self.reactions_dir.mkdir(exist_ok=True)
+        self.compression = compression
+        self.compression_level = compression_level
+
+    def _table_path(self, directory: Path, name: str) -> Path:
+        return directory / f"{name}.csv{self.compression.suffix}"
+
+    def _part_paths(self, dialog_id: int) -> list[Path]:
+        """
+        Paths of the partially written tables of a dialog, see `append_messages`.
+        """
+        return [
+            _part_path(self._table_path(directory, name))
+            for directory, name in (
+                (self.output_dir, str(dialog_id)),
+                (self.reactions_dir, str(dialog_id)),
+                (self.reactions_dir, f"{dialog_id}_counts"),
+            )
+        ]
+
+    def _remove_stale(self, path: Path) -> None:
+        """
+        Remove the files with the same name as `path`, that were written earlier
+        with another compression.
+        """
+        name = path.name.removesuffix(self.compression.suffix)
+        for compression in Compression:
+            if compression is not self.compression:
+                (path.parent / f"{name}{compression.suffix}").unlink(missing_ok=True)
+
+    def _write_csv(
+        self, df: pd.DataFrame, directory: Path, name: str, *, sync_dir: bool = True
+    ) -> Path:
+        """
+        Atomically write `df` to `<directory>/<name>.csv`.
+        """
+        write_path = self._table_path(directory, name)
+        with atomic_path(write_path, sync_dir=sync_dir) as tmp_path:
+            with open_compressed_text(
+                tmp_path, self.compression, self.compression_level
+            ) as f:
+                df.to_csv(f, index=False)
+        self._remove_stale(write_path)
+        return write_path
+
+    def _append_csv(self, df: pd.DataFrame, path: Path) -> None:
+        """
+        Append `df` to the CSV file at `path`, writing the header to a new file.
+        """
+        is_empty = not path.exists() or path.stat().st_size == 0
+        with open_compressed_text(
+            path, self.compression, self.compression_level, append=True
+        ) as f:
+            df.to_csv(f, index=False, header=is_empty)
+
+    def _append_part(self, df: pd.DataFrame, directory: Path, name: str) -> None:
+        """
+        Append `df` to the partially written `<directory>/<name>.csv`.
+        """
+        self._append_csv(df, _part_path(self._table_path(directory, name)))
 
     def write_messages(
-        self, dialog: DialogMetadata, messages: list[MessageAttributes]
+        self,
+        dialog: DialogMetadata,
+        messages: list[MessageAttributes] | MessageColumns,
     ) -> None:
         """
         Write messages for a dialog to a CSV file.
+
+        Messages can be provided either as a list of rows or as columns.
         """
-        if messages:
-            df = pd.DataFrame(messages)
-        else:
-            columns = list(get_type_hints(MessageAttributes).keys())
-            df = pd.DataFrame(columns=columns)
-        df["type"] = df["type"].apply(lambda x: x.value)
-        write_path = self.output_dir / f"{dialog['id']}.csv"
-        df.to_csv(write_path, index=False)
+        write_path = self._write_csv(
+            messages_to_df(messages), self.output_dir, str(dialog["id"])
+        )
         logger.debug("saved messages for %d to %s", dialog["id"], write_path)
+
+    def write_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns, emojis: list[str]
+    ) -> None:
+        """
+        Write reactions for a dialog and the dictionary of their `emojis`
+        to CSV files.
+        """
+        write_path = self._write_csv(
+            pd.DataFrame(reactions), self.reactions_dir, str(dialog["id"])
+        )
+        self._write_emojis(dialog, emojis)
+        logger.debug("saved reactions for %d to %s", dialog["id"], write_path)
+
+    def write_reaction_counts(
+        self,
+        dialog: DialogMetadata,
+        reaction_counts: ReactionCountColumns,
+        emojis: list[str],
+    ) -> None:
+        """
+        Write reaction counts for a dialog and the dictionary of their `emojis`
+        to CSV files.
+        """
+        write_path = self._write_csv(
+            pd.DataFrame(reaction_counts), self.reactions_dir, f"{dialog['id']}_counts"
+        )
+        self._write_emojis(dialog, emojis)
+        logger.debug("saved reaction counts for %d to %s", dialog["id"], write_path)
+
+    def _write_emojis(
+        self, dialog: DialogMetadata, emojis: list[str], *, sync_dir: bool = True
+    ) -> None:
+        self._write_csv(
+            pd.DataFrame({"emoji_code": range(len(emojis)), "emoji": emojis}),
+            self.reactions_dir,
+            f"{dialog['id']}_emojis",
+            sync_dir=sync_dir,
+        )
+
+    def patch_reactions(
+        self,
+        dialog: DialogMetadata,
+        message_ids: list[int],
+        emojis: list[str],
+        *,
+        reactions: ReactionColumns | None = None,
+        reaction_counts: ReactionCountColumns | None = None,
+    ) -> None:
+        """
+        Replace the reactions and the reaction counts of the messages with `message_ids`
+        in the written CSV files, and write the dictionary of reaction `emojis`,
+        that extends the written one. Tables, that are `None`, are left as is.
+        """
+        # * the extended dictionary is valid for the old tables as well
+        self._write_emojis(dialog, emojis)
+        for table, name in (
+            (reactions, str(dialog["id"])),
+            (reaction_counts, f"{dialog['id']}_counts"),
+        ):
+            if table is None:
+                continue
+            df = pd.DataFrame(table)
+            try:
+                written = _read_csv(self.reactions_dir, name)
+            except FileNotFoundError:
+                pass
+            else:
+                df = pd.concat([written[~written["message_id"].isin(message_ids)], df])
+                # * the newest messages first, like in the downloaded tables
+                df = df.sort_values("message_id", ascending=False, kind="stable")
+            write_path = self._write_csv(df, self.reactions_dir, name)
+            logger.debug("patched reactions for %d in %s", dialog["id"], write_path)
+
+    def append_messages(self, dialog: DialogMetadata, messages: MessageColumns) -> None:
+        """
+        Append messages of a dialog to its partially written file, which replaces
+        the CSV file on `commit`. Appended data isn't flushed to the disk until
+        `sync_parts` is called, so a number of appends share a single fsync.
+        """
+        self._append_part(messages_to_df(messages), self.output_dir, str(dialog["id"]))
+
+    def append_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns
+    ) -> None:
+        """
+        Append reactions of a dialog to its partially written file,
+        see `append_messages`.
+        """
+        self._append_part(
+            pd.DataFrame(reactions), self.reactions_dir, str(dialog["id"])
+        )
+
+    def append_reaction_counts(
+        self, dialog: DialogMetadata, reaction_counts: ReactionCountColumns
+    ) -> None:
+        """
+        Append reaction counts of a dialog to its partially written file,
+        see `append_messages`.
+        """
+        self._append_part(
+            pd.DataFrame(reaction_counts), self.reactions_dir, f"{dialog['id']}_counts"
+        )
+
+    def extend_messages(self, dialog: DialogMetadata, messages: MessageColumns) -> int:
+        """
+        Append messages of a dialog directly to its CSV file and flush them to the disk.
+        Unlike `append_messages`, the messages are visible to the readers at once,
+        which suits the continuous ingestion of new messages.
+
+        Returns:
+            int: size of the CSV file, to cut it back to with `truncate_messages`
+        """
+        write_path = self._table_path(self.output_dir, str(dialog["id"]))
+        self._append_csv(messages_to_df(messages), write_path)
+        fsync_file(write_path)
+        return write_path.stat().st_size
+
+    def truncate_messages(self, dialog: DialogMetadata, size: int) -> None:
+        """
+        Cut the CSV file of a dialog to the size, that was returned by
+        `extend_messages`, dropping the messages appended after it.
+        """
+        write_path = self._table_path(self.output_dir, str(dialog["id"]))
+        if write_path.exists() and write_path.stat().st_size > size:
+            os.truncate(write_path, size)
+            logger.debug("truncated messages of %d to %d bytes", dialog["id"], size)
+
+    def _part_key(self, part_path: Path) -> str:
+        return part_path.relative_to(self.output_dir).as_posix()
+
+    def sync_parts(self, dialog: DialogMetadata) -> dict[str, int]:
+        """
+        Flush the partially written files of a dialog to the disk.
+
+        Returns:
+            dict[str, int]: size of each partially written file, by its path
+                relative to the output directory
+        """
+        part_sizes = {}
+        for part_path in self._part_paths(dialog["id"]):
+            if part_path.exists():
+                fsync_file(part_path)
+                part_sizes[self._part_key(part_path)] = part_path.stat().st_size
+        return part_sizes
+
+    def truncate_parts(
+        self, dialog: DialogMetadata, part_sizes: dict[str, int]
+    ) -> None:
+        """
+        Cut the partially written files of a dialog to the sizes, that were returned
+        by `sync_parts`, dropping the data appended after it. Files missing from
+        `part_sizes` are removed.
+        """
+        for part_path in self._part_paths(dialog["id"]):
+            part_key = self._part_key(part_path)
+            if part_key in part_sizes:
+                os.truncate(part_path, part_sizes[part_key])
+            else:
+                part_path.unlink(missing_ok=True)
+
+    def commit(self, dialog: DialogMetadata, emojis: list[str]) -> None:
+        """
+        Replace the CSV files of a dialog with its partially written files,
+        and write the dictionary of reaction `emojis`.
+        """
+        has_reactions = False
+        for part_path in self._part_paths(dialog["id"]):
+            if not part_path.exists():
+                continue
+            has_reactions |= part_path.parent == self.reactions_dir
+            write_path = part_path.with_name(part_path.name.removesuffix(_PART_SUFFIX))
+            fsync_file(part_path)
+            os.replace(part_path, write_path)
+            self._remove_stale(write_path)
+        if has_reactions:
+            self._write_emojis(dialog, emojis, sync_dir=False)
+        fsync_dir(self.output_dir)
+        fsync_dir(self.reactions_dir)
+        logger.debug("committed files for %d", dialog["id"])
+
+
+class CSVMessageReader:
+    """
+    Class for reading the files written by `CSVMessageWriter`.
+    Compression of the files is detected automatically.
+    """
+
+    def __init__(self, input_dir: Path) -> None:
+        self.input_dir = input_dir
+        self.reactions_dir = input_dir / "reactions"
+
+    def read_messages(self, dialog_id: int) -> pd.DataFrame:
+        """
+        Read messages of a dialog, with one row per message.
+        """
+        df = _read_csv(self.input_dir, str(dialog_id))
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def read_reactions(self, dialog_id: int) -> pd.DataFrame:
+        """
+        Read reactions of a dialog, with emoji codes replaced by the emoji themselves.
+        """
+        reactions = _read_csv(self.reactions_dir, str(dialog_id))
+        emojis = _read_csv(self.reactions_dir, f"{dialog_id}_emojis")
+        reactions["emoji"] = reactions["emoji_code"].map(
+            emojis.set_index("emoji_code")["emoji"]
+        )
+        return reactions
+
+    def read_message_ids(self, dialog_id: int, since: datetime) -> list[int]:
+        """
+        Read the ids of the messages of a dialog, that were sent at or after `since`.
+        """
+        df = self.read_messages(dialog_id)
+        return df.loc[df["date"] >= since, "id"].tolist()
+
+    def read_emojis(self, dialog_id: int) -> list[str]:
+        """
+        Read the dictionary of the reaction emoji of a dialog, indexed by their code,
+        empty if the dialog has no reactions.
+        """
+        try:
+            emojis = _read_csv(self.reactions_dir, f"{dialog_id}_emojis")
+        except FileNotFoundError:
+            return []
+        return emojis.sort_values("emoji_code")["emoji"].tolist()
+
+    def read_reaction_columns(self, dialog_id: int) -> ReactionColumns:
+        """
+        Read reactions of a dialog with the emoji codes, see `read_emojis`,
+        empty if the dialog has no reactions.
+        """
+        return _read_columns(self.reactions_dir, str(dialog_id), ReactionColumns)
+
+    def read_reaction_count_columns(self, dialog_id: int) -> ReactionCountColumns:
+        """
+        Read reaction counts of a dialog with the emoji codes, see `read_emojis`,
+        empty if the dialog has no reaction counts.
+        """
+        return _read_columns(
+            self.reactions_dir, f"{dialog_id}_counts", ReactionCountColumns
+        )
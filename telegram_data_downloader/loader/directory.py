@@ -0,0 +1,153 @@
+import json
+import logging
+import threading
+import typing
+from pathlib import Path
+
+from ..dict_types.dialog import ChatData, DialogMemberData, DialogType
+from .atomic import atomic_path
+
+logger = logging.getLogger(__name__)
+
+T = typing.TypeVar("T", DialogMemberData, ChatData)
+
+
+class JSONPeerDirectory:
+    """
+    Class for keeping a single record of every user and chat, that was seen
+    in the downloaded dialogs, so their names can be resolved by the peer ids
+    of the messages.
+
+    Records are appended to `users.jsonl` and `chats.jsonl` only when they are new
+    or have changed, and the later records of a peer replace the earlier ones.
+    The files are compacted once most of their lines are outdated.
+
+    An update is merged into the known record field by field, and a missing (`None`)
+    field keeps the known value, as Telegram often sends incomplete "min" users
+    with the messages.
+
+    Attributes:
+        directory_dir (Path): directory to keep the files in
+    """
+
+    def __init__(self, directory_dir: Path) -> None:
+        self.directory_dir = directory_dir
+        self.directory_dir.mkdir(parents=True, exist_ok=True)
+        self.users_path = directory_dir / "users.jsonl"
+        self.chats_path = directory_dir / "chats.jsonl"
+        self._users: dict[int, DialogMemberData] = self._load(
+            self.users_path, "user_id", DialogMemberData
+        )
+        self._chats: dict[int, ChatData] = self._load(
+            self.chats_path, "chat_id", ChatData
+        )
+        # * updates come from the event loop and from the writer threads
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, typing.Any]:
+        # * the directory is sent to the worker processes, e.g. of the archive replay,
+        # * with its dialog reader, a lock can't be pickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, typing.Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self, path: Path, key: str, record_type: type[T]) -> dict[int, T]:
+        records: dict[int, T] = {}
+        if not path.exists():
+            return records
+        lines_count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record: dict = json.loads(line)
+                    if record_type is ChatData:
+                        record["type"] = DialogType(record["type"])
+                except ValueError:
+                    # * the last line is incomplete, if a write was interrupted
+                    logger.warning("skipping a corrupted line of %s", path.name)
+                    continue
+                records[record[key]] = typing.cast(T, record)
+                lines_count += 1
+        if lines_count > 2 * len(records):
+            self._compact(path, records.values())
+        logger.debug("loaded %d records from %s", len(records), path)
+        return records
+
+    @staticmethod
+    def _dump(record: DialogMemberData | ChatData) -> str:
+        output = dict(record)
+        if isinstance(output.get("type"), DialogType):
+            output["type"] = output["type"].value
+        return json.dumps(output, ensure_ascii=False)
+
+    def _compact(
+        self, path: Path, records: typing.Iterable[DialogMemberData | ChatData]
+    ) -> None:
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(self._dump(record) + "\n")
+        logger.debug("compacted %s", path)
+
+    def _update(
+        self,
+        path: Path,
+        key: str,
+        known: dict[int, T],
+        records: typing.Iterable[T],
+    ) -> int:
+        with self._lock:
+            changed = []
+            for record in records:
+                known_record = known.get(record[key])  # type: ignore
+                if known_record is not None:
+                    record = typing.cast(
+                        T,
+                        known_record
+                        | {
+                            field: value
+                            for field, value in record.items()
+                            if value is not None
+                        },
+                    )
+                if record != known_record:
+                    known[record[key]] = record  # type: ignore
+                    changed.append(record)
+            if changed:
+                # * the directory can be rebuilt, so the appends aren't flushed
+                # * to the disk, a torn last line is skipped on load
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(self._dump(record) + "\n" for record in changed))
+        return len(changed)
+
+    def update_users(self, users: typing.Iterable[DialogMemberData]) -> int:
+        """
+        Save the users, that are new or have changed.
+
+        Returns the number of saved users.
+        """
+        return self._update(self.users_path, "user_id", self._users, users)
+
+    def update_chats(self, chats: typing.Iterable[ChatData]) -> int:
+        """
+        Save the chats, that are new or have changed.
+
+        Returns the number of saved chats.
+        """
+        return self._update(self.chats_path, "chat_id", self._chats, chats)
+
+    def get_users(self, user_ids: typing.Iterable[int]) -> list[DialogMemberData]:
+        """
+        Get the records of the users with `user_ids`, skipping the unknown users.
+        """
+        return [self._users[user_id] for user_id in user_ids if user_id in self._users]
+
+    def read_users(self) -> dict[int, DialogMemberData]:
+        return dict(self._users)
+
+    def read_chats(self) -> dict[int, ChatData]:
+        return dict(self._chats)
@@ -1,21 +1,65 @@
 import json
 import logging
+import typing
+from datetime import datetime
 from pathlib import Path
 
-from ..dict_types.dialog import DialogMetadata, DialogType
+from ..dict_types.dialog import (
+    DialogIndexEntry,
+    DialogMemberData,
+    DialogMetadata,
+    DialogType,
+)
+from .atomic import atomic_path
 
 
 logger = logging.getLogger(__name__)
 
 
+class UserDirectory(typing.Protocol):
+    def update_users(self, users: typing.Iterable[DialogMemberData]) -> int: ...
+
+    def get_users(self, user_ids: typing.Iterable[int]) -> list[DialogMemberData]: ...
+
+
+def _index_entry(dialog: DialogMetadata) -> DialogIndexEntry:
+    return DialogIndexEntry(
+        id=dialog["id"],
+        name=dialog["name"],
+        type=dialog["type"],
+        # * the older metadata only has the members with a username
+        member_count=dialog.get("member_count", len(dialog["users"])),
+        last_message_date=dialog.get("last_message_date"),
+    )
+
+
 class JSONDialogReaderWriter:
     """
     Class for reading and writing dialog metadata to JSON files.
+
+    Besides a file per dialog, a summary of every dialog is appended
+    to the `index.jsonl` file, so dialogs can be selected without loading
+    their member lists, see `read_index`.
+
+    With a user directory, the members are saved in the directory once for all
+    the dialogs, and the dialog files only keep their ids as `user_ids`.
+    The dialogs are read with the members in both formats.
+
+    Attributes:
+        list_dir (Path): directory to keep the files in
+        user_directory (UserDirectory | None): shared records of the users
     """
 
-    def __init__(self, list_dir: Path) -> None:
+    def __init__(
+        self, list_dir: Path, *, user_directory: UserDirectory | None = None
+    ) -> None:
         self.list_dir = list_dir
+        self.user_directory = user_directory
         self.list_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.list_dir / "index.jsonl"
+
+    def _dialog_ids(self) -> set[int]:
+        return {int(path.stem) for path in self.list_dir.glob("*.json")}
 
     def read_dialog(self, dialog_id: int) -> DialogMetadata:
         """
@@ -28,6 +72,17 @@ class JSONDialogReaderWriter:
             dialog: dict = json.load(f)
             # post format data
             dialog["type"] = DialogType(dialog["type"])
+            if dialog.get("last_message_date") is not None:
+                dialog["last_message_date"] = datetime.fromisoformat(
+                    dialog["last_message_date"]
+                )
+            if "user_ids" in dialog:
+                user_ids = dialog.pop("user_ids")
+                if self.user_directory is None:
+                    logger.warning("dialog #%d: no user directory to read", dialog_id)
+                    dialog["users"] = []
+                else:
+                    dialog["users"] = self.user_directory.get_users(user_ids)
         logger.debug("loaded #%d from %s", dialog_id, dialog_path)
         return DialogMetadata(**dialog)
 
@@ -35,20 +90,90 @@ class JSONDialogReaderWriter:
         """
         Using the `list_dir` attribute, read all dialog metadata from JSON files.
         """
-        dialog_ids = [int(path.stem) for path in self.list_dir.glob("*.json")]
-        dialogs = [self.read_dialog(dialog_id) for dialog_id in dialog_ids]
+        dialogs = [self.read_dialog(dialog_id) for dialog_id in self._dialog_ids()]
         logger.debug("loaded %d dialogs", len(dialogs))
         return dialogs
 
     def write_dialog(self, data: DialogMetadata) -> None:
         """
-        Write dialog metadata to a JSON file.
+        Write dialog metadata to a JSON file, and add its summary to the index.
         """
         # preformat data
         output = dict(data)
         output["type"] = data["type"].value
+        if data.get("last_message_date") is not None:
+            output["last_message_date"] = data["last_message_date"].isoformat()
+        if self.user_directory is not None:
+            self.user_directory.update_users(data["users"])
+            output["user_ids"] = [user["user_id"] for user in output.pop("users")]
 
         write_path = self.list_dir / f"{data['id']}.json"
-        with open(write_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=4, ensure_ascii=False)
+        with atomic_path(write_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=4, ensure_ascii=False)
+        # * appending is cheap, the outdated entries are dropped by `read_index`
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(self._dump_index_entry(_index_entry(data)) + "\n")
         logger.debug("saved #%d to %s", data["id"], write_path)
+
+    @staticmethod
+    def _dump_index_entry(entry: DialogIndexEntry) -> str:
+        output = dict(entry)
+        output["type"] = entry["type"].value
+        if entry["last_message_date"] is not None:
+            output["last_message_date"] = entry["last_message_date"].isoformat()
+        return json.dumps(output, ensure_ascii=False)
+
+    @staticmethod
+    def _load_index_entry(line: str) -> DialogIndexEntry:
+        entry: dict = json.loads(line)
+        entry["type"] = DialogType(entry["type"])
+        if entry["last_message_date"] is not None:
+            entry["last_message_date"] = datetime.fromisoformat(
+                entry["last_message_date"]
+            )
+        return DialogIndexEntry(**entry)
+
+    def read_index(self) -> dict[int, DialogIndexEntry]:
+        """
+        Read the summaries of all the dialogs, keyed by the dialog id.
+
+        The index is reconciled with the dialog files by their names: the dialogs,
+        that are missing from the index (e.g. saved by an older version), are read
+        and indexed once, and the entries of the removed dialogs are dropped.
+        """
+        index: dict[int, DialogIndexEntry] = {}
+        lines_count = 0
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = self._load_index_entry(line)
+                    except ValueError:
+                        # * the last line is incomplete, if a write was interrupted
+                        logger.warning("skipping a corrupted line of the dialog index")
+                        continue
+                    # * the later entries of a dialog replace the earlier ones
+                    index[entry["id"]] = entry
+                    lines_count += 1
+
+        dialog_ids = self._dialog_ids()
+        stale_ids = index.keys() - dialog_ids
+        missing_ids = dialog_ids - index.keys()
+        for dialog_id in stale_ids:
+            del index[dialog_id]
+        for dialog_id in missing_ids:
+            index[dialog_id] = _index_entry(self.read_dialog(dialog_id))
+
+        if missing_ids or stale_ids or lines_count != len(index):
+            self._write_index(index)
+        logger.debug(
+            "loaded index of %d dialogs (%d reindexed)", len(index), len(missing_ids)
+        )
+        return index
+
+    def _write_index(self, index: dict[int, DialogIndexEntry]) -> None:
+        with atomic_path(self.index_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in index.values():
+                    f.write(self._dump_index_entry(entry) + "\n")
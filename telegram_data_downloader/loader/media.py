@@ -0,0 +1,68 @@
+import logging
+import os
+import typing
+from pathlib import Path
+
+from .atomic import fsync_dir, fsync_file
+
+logger = logging.getLogger(__name__)
+
+_TMP_SUFFIX = ".tmp"
+
+
+class FileMediaStore:
+    """
+    Class for storing downloaded media files, addressed by the `media_ref` column
+    of their messages, so a media, that is shared across dialogs, is stored once.
+
+    A file is written to a temporary path and renamed once it is complete, so
+    the stored files are never partial.
+
+    Attributes:
+        media_dir (Path): directory to store the media files in
+    """
+
+    def __init__(self, media_dir: Path) -> None:
+        self.media_dir = media_dir
+        self.media_dir.mkdir(parents=True, exist_ok=True)
+        # * leftovers of the downloads, that were interrupted by a crash
+        for tmp_path in self.media_dir.glob(f".*{_TMP_SUFFIX}"):
+            tmp_path.unlink(missing_ok=True)
+        self._stored = {
+            entry.name
+            for entry in os.scandir(self.media_dir)
+            if not entry.name.startswith(".")
+        }
+        logger.debug("%d media files found in %s", len(self._stored), media_dir)
+
+    def path(self, media_ref: str) -> Path:
+        return self.media_dir / media_ref
+
+    def exists(self, media_ref: str) -> bool:
+        return media_ref in self._stored
+
+    def temp_path(self, media_ref: str) -> Path:
+        """
+        Path to write the media file to, before it is committed with `commit`.
+        """
+        return self.media_dir / f".{media_ref}{_TMP_SUFFIX}"
+
+    def commit(self, media_ref: str) -> None:
+        """
+        Flush the file written to `temp_path` to the disk and give it its final name.
+        """
+        tmp_path = self.temp_path(media_ref)
+        fsync_file(tmp_path)
+        os.replace(tmp_path, self.path(media_ref))
+        fsync_dir(self.media_dir)
+        self._stored.add(media_ref)
+
+    def discard(self, media_ref: str) -> None:
+        """
+        Remove the partially written file of a failed download.
+        """
+        self.temp_path(media_ref).unlink(missing_ok=True)
+
+    def open_temp(self, media_ref: str) -> typing.BinaryIO:
+        # pylint: disable-next=consider-using-with
+        return open(self.temp_path(media_ref), "wb")
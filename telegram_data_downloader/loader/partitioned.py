@@ -0,0 +1,733 @@
+import json
+import logging
+import os
+import shutil
+import typing
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+
+import pandas as pd
+
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.message import (
+    MessageAttributes,
+    MessageColumns,
+    ReactionColumns,
+    ReactionCountColumns,
+)
+from .atomic import atomic_path, fsync_dir, fsync_file
+from .compression import (
+    Compression,
+    detect_compression,
+    open_compressed_text,
+    open_text,
+)
+from .csv import df_to_columns, messages_to_df
+
+logger = logging.getLogger(__name__)
+
+
+class OutputLayout(Enum):
+    # a file per dialog, written by `CSVMessageWriter`
+    DIALOG = "dialog"
+    # partitions by dialog and month, written by `PartitionedMessageWriter`
+    PARTITIONED = "partitioned"
+
+
+MESSAGES = "messages"
+REACTIONS = "reactions"
+REACTION_COUNTS = "reaction_counts"
+EMOJIS = "emojis"
+_TABLES = (MESSAGES, REACTIONS, REACTION_COUNTS, EMOJIS)
+# * the reaction tables have their own `dialog_id` column
+_TABLES_WITHOUT_DIALOG_ID = (MESSAGES, EMOJIS)
+
+# Partition of the messages without a date, which Spark and Hive read as null.
+_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Directories and files, which names start with "_", are skipped by Spark and DuckDB.
+_STAGING_DIR = "_staging"
+_PACKED_DIR = "packed"
+_MANIFEST_NAME = "_manifest.json"
+
+
+def _dialog_dir(root: Path, table: str, dialog_id: int) -> Path:
+    return root / table / f"dialog_id={dialog_id}"
+
+
+def _part_files(directory: Path) -> list[Path]:
+    """
+    Paths of the part files under `directory`, including its partitions.
+    """
+    if not directory.exists():
+        return []
+    return sorted(directory.rglob("part-*.csv*"))
+
+
+def _next_part_index(partition_dir: Path) -> int:
+    indexes = [
+        int(path.name.split(".")[0].removeprefix("part-"))
+        for path in partition_dir.glob("part-*.csv*")
+    ]
+    return max(indexes, default=-1) + 1
+
+
+def _remove_empty_dirs(directory: Path) -> None:
+    """
+    Remove the empty partitions under `directory`, keeping `directory` itself.
+    """
+    for path, _, _ in os.walk(directory, topdown=False):
+        # * the listed subdirectories could be removed by the previous steps
+        if Path(path) != directory and not any(Path(path).iterdir()):
+            Path(path).rmdir()
+
+
+def _month_partitions(df: pd.DataFrame) -> typing.Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Split messages by the month of their date, keeping the order of the rows.
+    """
+    dates = pd.to_datetime(df["date"], utc=True, errors="coerce")
+    keys = pd.Series(
+        [
+            f"year={_DEFAULT_PARTITION}/month={_DEFAULT_PARTITION}"
+            if pd.isna(date)
+            else f"year={date.year}/month={date.month:02}"
+            for date in dates
+        ],
+        index=df.index,
+    )
+    for key, rows in df.groupby(keys, sort=False):
+        yield typing.cast(str, key), rows
+
+
+def _partition_month(path: Path) -> tuple[int, int] | None:
+    """
+    Get the year and the month of the partition of a message part file,
+    `None` for the messages without a date.
+    """
+    values = dict(part.split("=", 1) for part in path.parent.parts[-2:] if "=" in part)
+    if values.get("year", _DEFAULT_PARTITION) == _DEFAULT_PARTITION:
+        return None
+    return int(values["year"]), int(values["month"])
+
+
+def _in_window(path: Path, since: datetime | None, until: datetime | None) -> bool:
+    month = _partition_month(path)
+    if month is None:
+        # * dateless messages are never within a window
+        return since is None and until is None
+    if since is not None and month < (since.year, since.month):
+        return False
+    if until is not None and month > (until.year, until.month):
+        return False
+    return True
+
+
+def _read_manifest(root: Path) -> dict[str, dict[str, list[str]]]:
+    """
+    Read the packed files of each packed dialog, by its id and table.
+    """
+    path = root / _PACKED_DIR / _MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _dialog_files(root: Path, table: str, dialog_id: int) -> list[Path]:
+    """
+    Paths of the part files with the rows of a dialog, either of its partition,
+    or the packed files shared with other dialogs.
+    """
+    # * after an interrupted compaction, the partition is still complete
+    if paths := _part_files(_dialog_dir(root, table, dialog_id)):
+        return paths
+    packed = _read_manifest(root).get(str(dialog_id), {}).get(table, [])
+    return [root / path for path in packed if (root / path).exists()]
+
+
+def _read_files(paths: list[Path]) -> pd.DataFrame | None:
+    frames = []
+    for path in paths:
+        with open_text(path) as f:
+            frames.append(pd.read_csv(f))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_dialog_rows(
+    paths: list[Path], table: str, dialog_id: int
+) -> pd.DataFrame | None:
+    """
+    Read the rows of a dialog from its part files, dropping the rows
+    of the other dialogs from the packed files.
+    """
+    df = _read_files(paths)
+    if df is None or "dialog_id" not in df.columns:
+        return df
+    df = df[df["dialog_id"] == dialog_id].reset_index(drop=True)
+    if table in _TABLES_WITHOUT_DIALOG_ID:
+        df = df.drop(columns="dialog_id")
+    return df
+
+
+class _PartState:
+    """
+    Last part of a partition, that the rows are appended to.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.rows = 0
+
+
+class PartitionedMessageWriter:
+    """
+    Class for writing the data of the dialogs to Hive-style partitions, that can be read
+    in parallel and pruned by the dialog and the date, e.g. by Spark or DuckDB:
+
+        messages/dialog_id=<id>/year=<year>/month=<month>/part-<n>.csv
+        reactions/dialog_id=<id>/part-<n>.csv
+        reaction_counts/dialog_id=<id>/part-<n>.csv
+        emojis/dialog_id=<id>/part-<n>.csv
+
+    The columns are the same as in the files of `CSVMessageWriter`. Rows are appended
+    to the last part of a partition, until it has `max_part_rows` rows or
+    `max_part_bytes` bytes, then the next part is started.
+
+    A dialog is written to the `_staging` directory first, and its partitions replace
+    the old ones on `commit`. Tiny dialogs can be packed by `compact` to the shared
+    files in `packed/<table>`, that have a `dialog_id` column instead of the partition.
+
+    Attributes:
+        output_dir (Path): directory to write the tables to
+        compression (Compression): compression of the written files
+        compression_level (int): compression level, its range depends on `compression`
+        max_part_rows (int): maximum number of rows in a part file
+        max_part_bytes (int): size of a part file in bytes, after which the next part
+            is started
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        *,
+        compression: Compression = Compression.NONE,
+        compression_level: int = 3,
+        max_part_rows: int = 1_000_000,
+        max_part_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.output_dir = output_dir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.staging_dir = output_dir / _STAGING_DIR
+        self.packed_dir = output_dir / _PACKED_DIR
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_part_rows = max_part_rows
+        self.max_part_bytes = max_part_bytes
+        self._parts: dict[Path, _PartState] = {}
+
+    def _forget_parts(self, directory: Path) -> None:
+        """
+        Forget the last parts of the partitions under `directory`, so the next rows
+        are appended to new parts.
+        """
+        # * the parts of other dialogs are added by the writer threads
+        for partition_dir in list(self._parts):
+            if partition_dir.is_relative_to(directory):
+                self._parts.pop(partition_dir, None)
+
+    def _append_partition(self, df: pd.DataFrame, partition_dir: Path) -> list[Path]:
+        """
+        Append `df` to a partition, rolling the parts over.
+
+        Returns the paths of the parts, that the rows were appended to.
+        """
+        state = self._parts.get(partition_dir)
+        if state is None:
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            # * the rows of the existing parts are unknown, e.g. after a resume,
+            # * so a new part is started
+            state = self._parts[partition_dir] = _PartState(
+                _next_part_index(partition_dir)
+            )
+        written = []
+        start = 0
+        while start < len(df):
+            path = partition_dir / f"part-{state.index:05}.csv{self.compression.suffix}"
+            if state.rows >= self.max_part_rows or (
+                path.exists() and path.stat().st_size >= self.max_part_bytes
+            ):
+                state.index += 1
+                state.rows = 0
+                continue
+            rows = df.iloc[start : start + self.max_part_rows - state.rows]
+            is_new = not path.exists()
+            with open_compressed_text(
+                path, self.compression, self.compression_level, append=True
+            ) as f:
+                rows.to_csv(f, index=False, header=is_new)
+            state.rows += len(rows)
+            start += len(rows)
+            written.append(path)
+        return written
+
+    def _append_table(
+        self, df: pd.DataFrame, table_dir: Path, table: str
+    ) -> list[Path]:
+        """
+        Append `df` to the partitions of a table under `table_dir`, splitting
+        the messages by month.
+        """
+        if table != MESSAGES:
+            return self._append_partition(df, table_dir)
+        written = []
+        for partition, rows in _month_partitions(df):
+            written += self._append_partition(rows, table_dir / partition)
+        return written
+
+    def _staged_dir(self, table: str, dialog_id: int) -> Path:
+        return _dialog_dir(self.staging_dir, table, dialog_id)
+
+    def _stage_table(self, dialog_id: int, table: str, df: pd.DataFrame) -> None:
+        """
+        Replace the staged data of a table of a dialog with `df`.
+        """
+        staged_dir = self._staged_dir(table, dialog_id)
+        self._forget_parts(staged_dir)
+        shutil.rmtree(staged_dir, ignore_errors=True)
+        self._append_table(df, staged_dir, table)
+
+    def _rewrite(self, path: Path, df: pd.DataFrame) -> None:
+        with atomic_path(path, sync_dir=False) as tmp_path:
+            with open_compressed_text(
+                tmp_path, detect_compression(path), self.compression_level
+            ) as f:
+                df.to_csv(f, index=False)
+
+    def _write_manifest(self, manifest: dict[str, dict[str, list[str]]]) -> None:
+        self.packed_dir.mkdir(exist_ok=True)
+        with atomic_path(self.packed_dir / _MANIFEST_NAME) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+
+    def _unpack(self, dialog_id: int) -> None:
+        """
+        Move the rows of a packed dialog back to its partitions, before they are
+        replaced.
+        """
+        manifest = _read_manifest(self.output_dir)
+        entry = manifest.get(str(dialog_id))
+        if entry is None:
+            return
+        for table, packed in entry.items():
+            final_dir = _dialog_dir(self.output_dir, table, dialog_id)
+            if _part_files(final_dir):
+                continue
+            paths = [self.output_dir / path for path in packed]
+            df = _read_dialog_rows(
+                [path for path in paths if path.exists()], table, dialog_id
+            )
+            if df is None:
+                continue
+            # * the partition appears at once, so it's either complete or missing
+            unpacked_dir = _dialog_dir(self.staging_dir / "_unpacked", table, dialog_id)
+            shutil.rmtree(unpacked_dir, ignore_errors=True)
+            for path in self._append_table(df, unpacked_dir, table):
+                fsync_file(path)
+            self._forget_parts(unpacked_dir)
+            shutil.rmtree(final_dir, ignore_errors=True)
+            final_dir.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(unpacked_dir, final_dir)
+
+        # * the rows are dropped from the packed files once they are unpacked
+        for path in {
+            self.output_dir / path for paths in entry.values() for path in paths
+        }:
+            if not path.exists():
+                continue
+            with open_text(path) as f:
+                df = pd.read_csv(f)
+            kept = df[df["dialog_id"] != dialog_id]
+            if kept.empty:
+                path.unlink()
+            else:
+                self._rewrite(path, kept)
+        _remove_empty_dirs(self.packed_dir)
+        del manifest[str(dialog_id)]
+        self._write_manifest(manifest)
+        logger.debug("unpacked dialog %d", dialog_id)
+
+    def _commit_tables(self, dialog_id: int, tables: list[str]) -> None:
+        """
+        Replace the partitions of the tables of a dialog with the staged ones.
+        Tables, that have nothing staged, are removed.
+        """
+        for table in tables:
+            for path in _part_files(self._staged_dir(table, dialog_id)):
+                fsync_file(path)
+        self._unpack(dialog_id)
+        for table in tables:
+            staged_dir = self._staged_dir(table, dialog_id)
+            final_dir = _dialog_dir(self.output_dir, table, dialog_id)
+            replaced_dir = _dialog_dir(self.staging_dir / "_replaced", table, dialog_id)
+            self._forget_parts(staged_dir)
+            self._forget_parts(final_dir)
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+            if final_dir.exists():
+                replaced_dir.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(final_dir, replaced_dir)
+            if _part_files(staged_dir):
+                final_dir.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staged_dir, final_dir)
+                fsync_dir(final_dir.parent)
+            else:
+                shutil.rmtree(staged_dir, ignore_errors=True)
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+
+    def write_messages(
+        self,
+        dialog: DialogMetadata,
+        messages: list[MessageAttributes] | MessageColumns,
+    ) -> None:
+        """
+        Replace the messages of a dialog.
+
+        Messages can be provided either as a list of rows or as columns.
+        """
+        self._stage_table(dialog["id"], MESSAGES, messages_to_df(messages))
+        self._commit_tables(dialog["id"], [MESSAGES])
+        logger.debug("saved messages for %d", dialog["id"])
+
+    def _write_emojis(self, dialog: DialogMetadata, emojis: list[str]) -> None:
+        self._stage_table(
+            dialog["id"],
+            EMOJIS,
+            pd.DataFrame({"emoji_code": range(len(emojis)), "emoji": emojis}),
+        )
+
+    def write_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns, emojis: list[str]
+    ) -> None:
+        """
+        Replace the reactions of a dialog and the dictionary of their `emojis`.
+        """
+        self._stage_table(dialog["id"], REACTIONS, pd.DataFrame(reactions))
+        self._write_emojis(dialog, emojis)
+        self._commit_tables(dialog["id"], [REACTIONS, EMOJIS])
+        logger.debug("saved reactions for %d", dialog["id"])
+
+    def write_reaction_counts(
+        self,
+        dialog: DialogMetadata,
+        reaction_counts: ReactionCountColumns,
+        emojis: list[str],
+    ) -> None:
+        """
+        Replace the reaction counts of a dialog and the dictionary of their `emojis`.
+        """
+        self._stage_table(dialog["id"], REACTION_COUNTS, pd.DataFrame(reaction_counts))
+        self._write_emojis(dialog, emojis)
+        self._commit_tables(dialog["id"], [REACTION_COUNTS, EMOJIS])
+        logger.debug("saved reaction counts for %d", dialog["id"])
+
+    def patch_reactions(
+        self,
+        dialog: DialogMetadata,
+        message_ids: list[int],
+        emojis: list[str],
+        *,
+        reactions: ReactionColumns | None = None,
+        reaction_counts: ReactionCountColumns | None = None,
+    ) -> None:
+        """
+        Replace the reactions and the reaction counts of the messages with `message_ids`,
+        and write the dictionary of reaction `emojis`, that extends the written one.
+        Tables, that are `None`, are left as is.
+        """
+        tables = [EMOJIS]
+        self._write_emojis(dialog, emojis)
+        for table, columns in (
+            (REACTIONS, reactions),
+            (REACTION_COUNTS, reaction_counts),
+        ):
+            if columns is None:
+                continue
+            df = pd.DataFrame(columns)
+            written = _read_dialog_rows(
+                _dialog_files(self.output_dir, table, dialog["id"]), table, dialog["id"]
+            )
+            if written is not None:
+                df = pd.concat([written[~written["message_id"].isin(message_ids)], df])
+                # * the newest messages first, like in the downloaded tables
+                df = df.sort_values("message_id", ascending=False, kind="stable")
+            self._stage_table(dialog["id"], table, df)
+            tables.append(table)
+        self._commit_tables(dialog["id"], tables)
+        logger.debug("patched reactions for %d", dialog["id"])
+
+    def append_messages(self, dialog: DialogMetadata, messages: MessageColumns) -> None:
+        """
+        Append messages of a dialog to its staged partitions, which replace
+        the written ones on `commit`. Appended data isn't flushed to the disk until
+        `sync_parts` is called, so a number of appends share a single fsync.
+        """
+        self._append_table(
+            messages_to_df(messages), self._staged_dir(MESSAGES, dialog["id"]), MESSAGES
+        )
+
+    def append_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns
+    ) -> None:
+        """
+        Append reactions of a dialog to its staged partition, see `append_messages`.
+        """
+        self._append_table(
+            pd.DataFrame(reactions),
+            self._staged_dir(REACTIONS, dialog["id"]),
+            REACTIONS,
+        )
+
+    def append_reaction_counts(
+        self, dialog: DialogMetadata, reaction_counts: ReactionCountColumns
+    ) -> None:
+        """
+        Append reaction counts of a dialog to its staged partition,
+        see `append_messages`.
+        """
+        self._append_table(
+            pd.DataFrame(reaction_counts),
+            self._staged_dir(REACTION_COUNTS, dialog["id"]),
+            REACTION_COUNTS,
+        )
+
+    def sync_parts(self, dialog: DialogMetadata) -> dict[str, int]:
+        """
+        Flush the staged parts of a dialog to the disk.
+
+        Returns:
+            dict[str, int]: size of each staged part, by its path relative
+                to the output directory
+        """
+        part_sizes = {}
+        for table in _TABLES:
+            for path in _part_files(self._staged_dir(table, dialog["id"])):
+                fsync_file(path)
+                part_key = path.relative_to(self.output_dir).as_posix()
+                part_sizes[part_key] = path.stat().st_size
+        return part_sizes
+
+    def truncate_parts(
+        self, dialog: DialogMetadata, part_sizes: dict[str, int]
+    ) -> None:
+        """
+        Cut the staged parts of a dialog to the sizes, that were returned
+        by `sync_parts`, dropping the data appended after it. Parts missing from
+        `part_sizes` are removed. The next rows are appended to new parts.
+        """
+        for table in _TABLES:
+            staged_dir = self._staged_dir(table, dialog["id"])
+            self._forget_parts(staged_dir)
+            for path in _part_files(staged_dir):
+                part_key = path.relative_to(self.output_dir).as_posix()
+                if part_key in part_sizes:
+                    os.truncate(path, part_sizes[part_key])
+                else:
+                    path.unlink()
+
+    def commit(self, dialog: DialogMetadata, emojis: list[str]) -> None:
+        """
+        Replace the partitions of a dialog with its staged partitions,
+        and write the dictionary of reaction `emojis`.
+        """
+        tables = [
+            table
+            for table in (MESSAGES, REACTIONS, REACTION_COUNTS)
+            if _part_files(self._staged_dir(table, dialog["id"]))
+        ]
+        if REACTIONS in tables or REACTION_COUNTS in tables:
+            self._write_emojis(dialog, emojis)
+            tables.append(EMOJIS)
+        self._commit_tables(dialog["id"], tables)
+        logger.debug("committed partitions for %d", dialog["id"])
+
+    def compact(self, max_dialog_bytes: int) -> int:
+        """
+        Pack the dialogs, which files take up to `max_dialog_bytes` bytes, to the shared
+        files of the `packed` directory, so the tiny dialogs don't produce thousands
+        of tiny files. Messages are packed to partitions by month.
+
+        The packed files of a dialog are listed in `packed/_manifest.json`.
+        A packed dialog is moved back to its partitions, once it's written again.
+        Must not run together with a download to the same directory.
+
+        Returns the number of packed dialogs.
+        """
+        manifest = _read_manifest(self.output_dir)
+        # * new parts are started, so the packed files of the earlier runs
+        # * never get partially written rows
+        self._forget_parts(self.packed_dir)
+        packed_ids = []
+        written: set[Path] = set()
+        for messages_dir in sorted((self.output_dir / MESSAGES).glob("dialog_id=*")):
+            dialog_id = int(messages_dir.name.removeprefix("dialog_id="))
+            if str(dialog_id) in manifest:
+                # * the partitions were left by an interrupted compaction
+                packed_ids.append(dialog_id)
+                continue
+            dialog_files = {
+                table: _part_files(_dialog_dir(self.output_dir, table, dialog_id))
+                for table in _TABLES
+            }
+            size = sum(
+                path.stat().st_size for paths in dialog_files.values() for path in paths
+            )
+            if size > max_dialog_bytes:
+                continue
+            entry = {}
+            for table, paths in dialog_files.items():
+                df = _read_files(paths)
+                if df is None:
+                    continue
+                if table in _TABLES_WITHOUT_DIALOG_ID:
+                    df.insert(0, "dialog_id", dialog_id)
+                table_files = self._append_table(df, self.packed_dir / table, table)
+                written.update(table_files)
+                entry[table] = sorted(
+                    {
+                        path.relative_to(self.output_dir).as_posix()
+                        for path in table_files
+                    }
+                )
+            manifest[str(dialog_id)] = entry
+            packed_ids.append(dialog_id)
+        self._forget_parts(self.packed_dir)
+        if not packed_ids:
+            return 0
+
+        for path in written:
+            fsync_file(path)
+        self._write_manifest(manifest)
+        for dialog_id in packed_ids:
+            for table in _TABLES:
+                shutil.rmtree(
+                    _dialog_dir(self.output_dir, table, dialog_id), ignore_errors=True
+                )
+        for table in _TABLES:
+            fsync_dir(self.output_dir / table)
+        logger.info("packed %d dialogs", len(packed_ids))
+        return len(packed_ids)
+
+
+class PartitionedMessageReader:
+    """
+    Class for reading the partitions written by `PartitionedMessageWriter`,
+    with the same interface as `CSVMessageReader`. The rows of the packed dialogs
+    are read from the shared files. Compression of the files is detected automatically.
+
+    Attributes:
+        input_dir (Path): directory of the tables
+    """
+
+    def __init__(self, input_dir: Path) -> None:
+        self.input_dir = input_dir
+
+    def message_files(
+        self,
+        dialog_id: int | None = None,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> list[Path]:
+        """
+        Get the paths of the message parts of a dialog, or of all the dialogs
+        including the packed ones, that can be read in parallel. Months outside
+        the window from `since` to `until` are pruned.
+
+        The packed files have a `dialog_id` column, and contain the messages of
+        other dialogs as well.
+        """
+        if dialog_id is None:
+            paths = _part_files(self.input_dir / MESSAGES) + _part_files(
+                self.input_dir / _PACKED_DIR / MESSAGES
+            )
+        else:
+            paths = _dialog_files(self.input_dir, MESSAGES, dialog_id)
+        return [path for path in paths if _in_window(path, since, until)]
+
+    def read_messages(
+        self,
+        dialog_id: int,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> pd.DataFrame:
+        """
+        Read messages of a dialog, with one row per message, the newest first.
+        Only the months of the window from `since` to `until` are read.
+        """
+        df = _read_dialog_rows(
+            self.message_files(dialog_id, since=since, until=until), MESSAGES, dialog_id
+        )
+        if df is None:
+            raise FileNotFoundError(f"messages of {dialog_id} not found")
+        df["date"] = pd.to_datetime(df["date"])
+        if since is not None:
+            df = df[df["date"] >= since]
+        if until is not None:
+            df = df[df["date"] < until]
+        return df.sort_values("id", ascending=False, kind="stable").reset_index(
+            drop=True
+        )
+
+    def _read_table(self, table: str, dialog_id: int) -> pd.DataFrame | None:
+        return _read_dialog_rows(
+            _dialog_files(self.input_dir, table, dialog_id), table, dialog_id
+        )
+
+    def read_reactions(self, dialog_id: int) -> pd.DataFrame:
+        """
+        Read reactions of a dialog, with emoji codes replaced by the emoji themselves.
+        """
+        reactions = self._read_table(REACTIONS, dialog_id)
+        emojis = self._read_table(EMOJIS, dialog_id)
+        if reactions is None or emojis is None:
+            raise FileNotFoundError(f"reactions of {dialog_id} not found")
+        reactions["emoji"] = reactions["emoji_code"].map(
+            emojis.set_index("emoji_code")["emoji"]
+        )
+        return reactions
+
+    def read_message_ids(self, dialog_id: int, since: datetime) -> list[int]:
+        """
+        Read the ids of the messages of a dialog, that were sent at or after `since`.
+        """
+        return self.read_messages(dialog_id, since=since)["id"].tolist()
+
+    def read_emojis(self, dialog_id: int) -> list[str]:
+        """
+        Read the dictionary of the reaction emoji of a dialog, indexed by their code,
+        empty if the dialog has no reactions.
+        """
+        emojis = self._read_table(EMOJIS, dialog_id)
+        if emojis is None:
+            return []
+        return emojis.sort_values("emoji_code")["emoji"].tolist()
+
+    def read_reaction_columns(self, dialog_id: int) -> ReactionColumns:
+        """
+        Read reactions of a dialog with the emoji codes, see `read_emojis`,
+        empty if the dialog has no reactions.
+        """
+        return df_to_columns(self._read_table(REACTIONS, dialog_id), ReactionColumns)
+
+    def read_reaction_count_columns(self, dialog_id: int) -> ReactionCountColumns:
+        """
+        Read reaction counts of a dialog with the emoji codes, see `read_emojis`,
+        empty if the dialog has no reaction counts.
+        """
+        return df_to_columns(
+            self._read_table(REACTION_COUNTS, dialog_id), ReactionCountColumns
+        )
@@ -0,0 +1,221 @@
+import contextlib
+import logging
+import sqlite3
+import time
+import typing
+from pathlib import Path
+
+from ..dict_types.queue import WorkState, WorkUnit
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_units (
+    dialog_id INTEGER PRIMARY KEY,
+    msg_limit INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+)
+"""
+
+
+class SQLiteWorkQueue:
+    """
+    Class for sharing the dialog downloads between the workers on several machines,
+    through a SQLite file on a shared storage.
+
+    A worker leases a unit for `lease_duration` seconds and extends the lease with
+    heartbeats while it downloads the dialog. The lease of a crashed worker expires,
+    and the unit is leased by another worker, which resumes the dialog from its
+    checkpoint. Every change is a single transaction, that is serialized by the lock
+    of the database file, so the storage has to support file locks (e.g. NFSv4).
+
+    Attributes:
+        db_path (Path): path of the database file
+        lease_duration (float): time a lease is valid without a heartbeat, in seconds
+        max_attempts (int): number of the failed leases, after which a unit
+            is not leased again
+        clock (Callable[[], float]): source of the wall time, shared by the machines
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        lease_duration: float = 300.0,
+        max_attempts: int = 5,
+        clock: typing.Callable[[], float] = time.time,
+    ) -> None:
+        self.db_path = db_path
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as db:
+            db.execute(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> typing.Iterator[sqlite3.Connection]:
+        # * a connection per transaction, as the workers call the queue from threads
+        db = sqlite3.connect(self.db_path, timeout=60.0, isolation_level=None)
+        try:
+            # * the write lock is taken at once, so two workers never lease the same unit
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def publish(self, dialog_ids: typing.Iterable[int], msg_limit: int) -> int:
+        """
+        Add the downloads of the dialogs, that aren't in the queue yet.
+
+        Returns the number of added units.
+        """
+        with self._transaction() as db:
+            added = db.executemany(
+                "INSERT OR IGNORE INTO work_units (dialog_id, msg_limit, state) "
+                "VALUES (?, ?, ?)",
+                [
+                    (dialog_id, msg_limit, WorkState.PENDING.value)
+                    for dialog_id in dialog_ids
+                ],
+            ).rowcount
+        logger.info("published %d dialogs", added)
+        return added
+
+    def lease(self, worker_id: str) -> WorkUnit | None:
+        """
+        Lease a pending unit, or a unit, whose lease has expired.
+        Returns `None` if there is no such unit.
+
+        A unit, whose lease expired `max_attempts` times, e.g. as the dialog crashes
+        its workers, is marked as failed instead.
+        """
+        now = self.clock()
+        with self._transaction() as db:
+            expired = "state = ? AND lease_expires_at < ? AND attempts >= ?"
+            expired_args = (WorkState.LEASED.value, now, self.max_attempts)
+            failed_ids = [
+                failed_id
+                for (failed_id,) in db.execute(
+                    f"SELECT dialog_id FROM work_units WHERE {expired}", expired_args
+                )
+            ]
+            if failed_ids:
+                db.execute(
+                    "UPDATE work_units SET state = ?, lease_expires_at = NULL, "
+                    f"error = ? WHERE {expired}",
+                    (WorkState.FAILED.value, "lease expired", *expired_args),
+                )
+                for failed_id in failed_ids:
+                    logger.error(
+                        "dialog #%d: failed, its lease expired %d times",
+                        failed_id,
+                        self.max_attempts,
+                    )
+            row = db.execute(
+                "SELECT dialog_id, msg_limit, attempts, worker_id FROM work_units "
+                "WHERE state = ? OR (state = ? AND lease_expires_at < ?) "
+                "ORDER BY attempts, dialog_id LIMIT 1",
+                (WorkState.PENDING.value, WorkState.LEASED.value, now),
+            ).fetchone()
+            if row is None:
+                return None
+            dialog_id, msg_limit, attempts, previous_worker_id = row
+            db.execute(
+                "UPDATE work_units SET state = ?, worker_id = ?, lease_expires_at = ?, "
+                "attempts = ? WHERE dialog_id = ?",
+                (
+                    WorkState.LEASED.value,
+                    worker_id,
+                    now + self.lease_duration,
+                    attempts + 1,
+                    dialog_id,
+                ),
+            )
+        if previous_worker_id is not None and previous_worker_id != worker_id:
+            logger.info("dialog #%d: taken over from %s", dialog_id, previous_worker_id)
+        return WorkUnit(dialog_id=dialog_id, msg_limit=msg_limit, attempts=attempts + 1)
+
+    def _update_lease(
+        self, dialog_id: int, worker_id: str, assignments: str, *args: typing.Any
+    ) -> bool:
+        with self._transaction() as db:
+            updated = db.execute(
+                f"UPDATE work_units SET {assignments} "
+                "WHERE dialog_id = ? AND state = ? AND worker_id = ?",
+                (*args, dialog_id, WorkState.LEASED.value, worker_id),
+            ).rowcount
+        if not updated:
+            logger.warning("dialog #%d: lease of %s was lost", dialog_id, worker_id)
+        return bool(updated)
+
+    def heartbeat(self, dialog_id: int, worker_id: str) -> bool:
+        """
+        Extend the lease of a unit.
+        Returns `False` if the worker no longer holds the lease.
+        """
+        return self._update_lease(
+            dialog_id,
+            worker_id,
+            "lease_expires_at = ?",
+            self.clock() + self.lease_duration,
+        )
+
+    def complete(self, dialog_id: int, worker_id: str) -> bool:
+        """
+        Mark a leased unit as done.
+        Returns `False` if the worker no longer holds the lease.
+        """
+        return self._update_lease(
+            dialog_id,
+            worker_id,
+            "state = ?, lease_expires_at = NULL, error = NULL",
+            WorkState.DONE.value,
+        )
+
+    def release(self, dialog_id: int, worker_id: str, error: str | None = None) -> bool:
+        """
+        Return a leased unit to the queue, so another worker can lease it. A unit,
+        that failed with an `error` by `max_attempts` leases, isn't leased again.
+        Returns `False` if the worker no longer holds the lease.
+        """
+        return self._update_lease(
+            dialog_id,
+            worker_id,
+            "state = CASE WHEN ? IS NOT NULL AND attempts >= ? THEN ? ELSE ? END, "
+            "lease_expires_at = NULL, error = ?",
+            error,
+            self.max_attempts,
+            WorkState.FAILED.value,
+            WorkState.PENDING.value,
+            error,
+        )
+
+    def has_unfinished(self) -> bool:
+        """
+        Check if some units are pending or leased.
+        """
+        counts = self.count_states()
+        return bool(counts[WorkState.PENDING] or counts[WorkState.LEASED])
+
+    def count_states(self) -> dict[WorkState, int]:
+        """
+        Get the number of units in each state.
+        """
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT state, COUNT(*) FROM work_units GROUP BY state"
+            ).fetchall()
+        counts = {state: 0 for state in WorkState}
+        counts.update({WorkState(state): count for state, count in rows})
+        return counts
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Number of the source lines, that are listed in a tracemalloc report.
+TRACEMALLOC_REPORT_LINES = 10
+
+
+class MemoryBudget:
+    """
+    Class for limiting the total memory of the data, that is buffered by the dialogs,
+    which are downloaded concurrently.
+
+    Dialogs report the approximate size of their buffers. Once the total exceeds
+    `max_bytes`, the largest buffers have to be flushed, and the other dialogs wait
+    before fetching more messages, until the flushes free enough memory.
+
+    Attributes:
+        max_bytes (int | None): maximum total size of the buffers, in bytes,
+            `None` for no limit
+        tracemalloc_report (bool): log the source lines, that allocated the most memory
+            since the start of a dialog, every time its buffer is flushed. Allocations
+            are traced for the whole process, so the reports of the concurrent dialogs
+            overlap, and tracing slows the download down.
+        peak_bytes (int): largest total size of the buffers, that was reported
+    """
+
+    def __init__(
+        self, max_bytes: int | None, *, tracemalloc_report: bool = False
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.tracemalloc_report = tracemalloc_report
+        self.peak_bytes = 0
+        self._buffered: dict[int, int] = {}
+        self._changed = asyncio.Event()
+        self._snapshots: dict[int, tracemalloc.Snapshot] = {}
+        if tracemalloc_report and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._buffered.values())
+
+    def start_dialog(self, dialog_id: int) -> None:
+        self._buffered[dialog_id] = 0
+        if self.tracemalloc_report:
+            self._snapshots[dialog_id] = tracemalloc.take_snapshot()
+
+    def update(self, dialog_id: int, buffered_bytes: int) -> None:
+        """
+        Set the size of the buffer of a dialog, waking the dialogs, that wait for memory.
+        """
+        self._buffered[dialog_id] = buffered_bytes
+        self.peak_bytes = max(self.peak_bytes, self.total_bytes)
+        self._changed.set()
+
+    def release(self, dialog_id: int) -> None:
+        """
+        Forget a dialog, once its download is over.
+        """
+        self._buffered.pop(dialog_id, None)
+        self._snapshots.pop(dialog_id, None)
+        self._changed.set()
+
+    def should_flush(self, dialog_id: int) -> bool:
+        """
+        Check if the buffer of a dialog is among the largest ones, that have to be
+        flushed to fit the budget.
+        """
+        if self.max_bytes is None:
+            return False
+        excess = self.total_bytes - self.max_bytes
+        for other_id, buffered_bytes in sorted(
+            self._buffered.items(), key=lambda item: item[1], reverse=True
+        ):
+            if excess <= 0:
+                break
+            if other_id == dialog_id:
+                return buffered_bytes > 0
+            excess -= buffered_bytes
+        return False
+
+    async def wait_for_room(self, dialog_id: int) -> bool:
+        """
+        Wait until the buffers fit the budget, before the dialog buffers more data.
+
+        Returns `True` at once, if the buffer of the dialog has to be flushed instead.
+        """
+        waited = False
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            if self.should_flush(dialog_id):
+                logger.debug(
+                    "dialog #%d: flushing %d bytes to fit the memory budget",
+                    dialog_id,
+                    self._buffered[dialog_id],
+                )
+                return True
+            if not waited:
+                logger.debug(
+                    "dialog #%d: paused, %d bytes are buffered",
+                    dialog_id,
+                    self.total_bytes,
+                )
+                waited = True
+            # * every dialog, that waits, was woken by `set` before it runs again
+            self._changed.clear()
+            await self._changed.wait()
+        return False
+
+    def report(self, dialog_id: int) -> None:
+        """
+        Log the source lines, that allocated the most memory since the start
+        of the dialog, if `tracemalloc_report` is set.
+        """
+        if not self.tracemalloc_report:
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        start = self._snapshots.get(dialog_id)
+        statistics = (
+            snapshot.compare_to(start, "lineno")
+            if start is not None
+            else snapshot.statistics("lineno")
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        logger.info(
+            "dialog #%d: %d bytes buffered, %.1f MiB traced (peak %.1f MiB), "
+            "top allocations:\n%s",
+            dialog_id,
+            self._buffered.get(dialog_id, 0),
+            current / 2**20,
+            peak / 2**20,
+            "\n".join(str(stat) for stat in statistics[:TRACEMALLOC_REPORT_LINES]),
+        )
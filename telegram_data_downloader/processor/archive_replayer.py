@@ -0,0 +1,140 @@
+import logging
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+from telethon.tl import types as tl_types
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.dialog import DialogMetadata, DialogType
+from ..dict_types.message import ReactionsMode
+from .media_downloader import MediaStore, clear_missing_media_refs
+from .message_downloader import MESSAGE_PAGE_SIZE, DialogReader, MessageWriter
+from .message_reformatter import (
+    MessageReformatter,
+    new_message_columns,
+    new_reaction_columns,
+    new_reaction_count_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RawMessageArchiveReader(typing.Protocol):
+    def dialog_ids(self) -> list[int]: ...
+
+    def iter_dialog(
+        self, dialog_id: int
+    ) -> typing.Iterator[
+        tuple[TLMessage, tl_types.messages.MessageReactionsList | None]
+    ]: ...
+
+
+class ArchiveReplayer:
+    """
+    Class for re-exporting messages from the raw archive without the network.
+
+    Runs the same reformatting, that is used during the download, over the archived
+    messages and saves them with the message writer. Dialogs are processed in parallel
+    worker processes, so the replay is bound by CPU rather than by Telegram.
+
+    Attributes:
+        raw_archive (RawMessageArchiveReader): archive to read the raw messages from
+        dialog_reader (DialogReader): Dialog reader for reading the dialogs
+        message_writer (MessageWriter): Message writer for saving the messages
+        reactions_mode (ReactionsMode): which reaction data to export
+        media_store (MediaStore | None): store of the downloaded media, the messages
+            reference only the stored media, none without a store
+    """
+
+    def __init__(
+        self,
+        raw_archive: RawMessageArchiveReader,
+        dialog_reader: DialogReader,
+        message_writer: MessageWriter,
+        *,
+        reactions_mode: ReactionsMode = ReactionsMode.FULL,
+        media_store: MediaStore | None = None,
+    ) -> None:
+        self.raw_archive = raw_archive
+        self.dialog_reader = dialog_reader
+        self.message_writer = message_writer
+        self.reactions_mode = reactions_mode
+        self.media_store = media_store
+
+    def _read_dialog(self, dialog_id: int) -> DialogMetadata:
+        try:
+            return self.dialog_reader.read_dialog(dialog_id)
+        except FileNotFoundError:
+            logger.warning("dialog #%d: metadata not found", dialog_id)
+            return DialogMetadata(
+                id=dialog_id, name="", type=DialogType.UNKNOWN, users=[]
+            )
+
+    def replay_dialog(self, dialog_id: int) -> int:
+        """
+        Reformat and save all archived messages of a single dialog.
+
+        Returns:
+            int: number of replayed messages
+        """
+        logger.info("dialog #%d: replaying archived messages...", dialog_id)
+        dialog = self._read_dialog(dialog_id)
+
+        messages = new_message_columns()
+        reactions = new_reaction_columns()
+        reaction_counts = new_reaction_count_columns()
+        reformatter = MessageReformatter()
+        page: list[TLMessage] = []
+
+        def process_page() -> None:
+            reformatter.reformat_page(page, messages)
+            if self.reactions_mode is ReactionsMode.SUMMARY:
+                reformatter.reformat_reaction_counts(dialog_id, page, reaction_counts)
+            page.clear()
+
+        # * a download, that was resumed from a checkpoint, can archive
+        # * the messages after the checkpoint twice
+        seen_ids: set[int] = set()
+        for message, reactions_list in self.raw_archive.iter_dialog(dialog_id):
+            if message.id in seen_ids:
+                continue
+            seen_ids.add(message.id)
+            page.append(message)
+            if self.reactions_mode is ReactionsMode.FULL:
+                reformatter.reformat_reactions(
+                    dialog_id, message.id, reactions_list, reactions
+                )
+            if len(page) >= MESSAGE_PAGE_SIZE:
+                process_page()
+        process_page()
+        clear_missing_media_refs(messages["media_ref"], self.media_store)
+
+        self.message_writer.write_messages(dialog, messages)
+        if self.reactions_mode is ReactionsMode.FULL:
+            self.message_writer.write_reactions(dialog, reactions, reformatter.emojis)
+        elif self.reactions_mode is ReactionsMode.SUMMARY:
+            self.message_writer.write_reaction_counts(
+                dialog, reaction_counts, reformatter.emojis
+            )
+        logger.info("dialog #%d: %d messages replayed", dialog_id, len(messages["id"]))
+        return len(messages["id"])
+
+    def replay_dialogs(
+        self, dialog_ids: list[int] | None, workers: int | None = None
+    ) -> int:
+        """
+        Replay the dialogs with `dialog_ids`, or all archived dialogs if `None`,
+        using `workers` processes (by default, one per CPU core).
+
+        Returns:
+            int: total number of replayed messages
+        """
+        if dialog_ids is None:
+            dialog_ids = self.raw_archive.dialog_ids()
+        logger.info("replaying %d dialogs...", len(dialog_ids))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            total = sum(executor.map(self.replay_dialog, dialog_ids))
+
+        logger.info("all dialogs replayed: %d messages", total)
+        return total
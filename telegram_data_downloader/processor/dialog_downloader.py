@@ -7,6 +7,9 @@ from telethon.tl import custom as tl_custom
 from telethon.tl import types as tl_types
 
 from ..dict_types.dialog import DialogMemberData, DialogMetadata, DialogType
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+from .peer_collector import user_record
 
 logger = logging.getLogger(__name__)
 
@@ -22,15 +25,21 @@ class DialogDownloader:
     Attributes:
         telegram_client (telethon.TelegramClient): Telegram client for fetching the dialogs
         dialog_writer (DialogWriter): Dialog writer for saving the dialogs
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests.
+            The dialogs and the participants are fetched by paginated calls, that take
+            long for the large lists, so the calls shouldn't be limited by a timeout.
     """
 
     def __init__(
         self,
         telegram_client: telethon.TelegramClient,
         dialog_writer: DialogWriter,
+        *,
+        retry_policy: RetryPolicy | None = None,
     ):
         self.dialog_writer = dialog_writer
         self.client = telegram_client
+        self.retry_policy = retry_policy or RetryPolicy()
 
     async def save_dialogs(self, dialogs_limit: int | None) -> bool:
         """
@@ -41,15 +50,17 @@ class DialogDownloader:
             bool: if the save was successful
         """
         logger.debug("retrieving dialog list...")
-        dialogs: list[tl_custom.Dialog] = await self.client.get_dialogs(
-            limit=dialogs_limit
+        dialogs: list[tl_custom.Dialog] = await self.retry_policy.call(
+            "messages.getDialogs", self.client.get_dialogs, limit=dialogs_limit
         )
         logger.info("found %d dialogs", len(dialogs))
 
         tasks = []
         # * process each dialog asynchronously, therefore increasing throughput
         for dialog in typing.cast(list[tl_custom.Dialog], dialogs):
-            task = asyncio.create_task(self._save_dialog(dialog))
+            task = asyncio.create_task(
+                self._save_dialog(dialog), name=f"dialog #{dialog.id}"
+            )
             tasks.append(task)
 
         logger.debug("gathering dialog saving tasks...")
@@ -61,6 +72,8 @@ class DialogDownloader:
         dialog_id = dialog.id
         dialog_name = dialog.name
         dialog_members: list[DialogMemberData] = []
+        # * counted by Telegram, as the participants may be unavailable
+        member_count: int = getattr(dialog.entity, "participants_count", None) or 0
 
         logger.info("dialog #%d: starting processing...", dialog_id)
 
@@ -73,7 +86,10 @@ class DialogDownloader:
 
         logger.debug("dialog #%d: getting participants...", dialog_id)
         try:
-            users: list[tl_types.User] = await self.client.get_participants(dialog)
+            with TRACER.span("get_participants", "network", dialog_id=dialog_id):
+                users: list[tl_types.User] = await self.retry_policy.call(
+                    "channels.getParticipants", self.client.get_participants, dialog
+                )
         except telethon.errors.ChatAdminRequiredError as e:
             logger.error(
                 "dialog #%d: getting participants: admin required: %s", dialog_id, e
@@ -90,27 +106,27 @@ class DialogDownloader:
             logger.error(
                 "dialog #%d: getting participants: unknown error: %s", dialog_id, e
             )
+        except TimeoutError as e:
+            logger.error(
+                "dialog #%d: getting participants: timed out: %r", dialog_id, e
+            )
         else:
             logger.debug("dialog #%d: processing participants...", dialog_id)
+            member_count = getattr(users, "total", None) or len(users)
             dialog_members = [
-                DialogMemberData(
-                    user_id=user.id,
-                    first_name=user.first_name,
-                    last_name=user.last_name,
-                    username=user.username,
-                    phone=user.phone,
-                )
-                for user in users
-                if user.username is not None
+                user_record(user) for user in users if user.username is not None
             ]  # * list comprehension is generally faster than for loop
 
-        self.dialog_writer.write_dialog(
-            DialogMetadata(
-                id=dialog_id,
-                name=dialog_name,
-                type=dialog_type,
-                users=dialog_members,
+        with TRACER.span("write_dialog", "io", dialog_id=dialog_id):
+            self.dialog_writer.write_dialog(
+                DialogMetadata(
+                    id=dialog_id,
+                    name=dialog_name,
+                    type=dialog_type,
+                    users=dialog_members,
+                    member_count=member_count,
+                    last_message_date=dialog.date,
+                )
             )
-        )
 
         logger.info("dialog #%d: successfully saved", dialog_id)
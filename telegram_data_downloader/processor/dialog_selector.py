@@ -0,0 +1,93 @@
+import logging
+import re
+import typing
+
+from ..dict_types.dialog import DialogIndexEntry, DialogMetadata, DialogQuery
+
+logger = logging.getLogger(__name__)
+
+
+class DialogIndexReader(typing.Protocol):
+    def read_index(self) -> dict[int, DialogIndexEntry]: ...
+
+
+def _compile_query(
+    query: DialogQuery,
+) -> list[typing.Callable[[DialogIndexEntry], bool]]:
+    # * one predicate per condition of the query, the cheapest conditions first
+    predicates: list[typing.Callable[[DialogIndexEntry], bool]] = []
+    if (types := query.get("types")) is not None:
+        predicates.append(lambda entry: entry["type"] in types)
+    if (min_members := query.get("min_members")) is not None:
+        predicates.append(lambda entry: entry["member_count"] >= min_members)
+    if (active_since := query.get("active_since")) is not None:
+        predicates.append(
+            lambda entry: (
+                entry["last_message_date"] is not None
+                and entry["last_message_date"] >= active_since
+            )
+        )
+    if (name_pattern := query.get("name_pattern")) is not None:
+        search = re.compile(name_pattern).search
+        predicates.append(lambda entry: search(entry["name"]) is not None)
+    return predicates
+
+
+class DialogSelector:
+    """
+    Class for selecting the dialogs to download by a `DialogQuery`, e.g. "groups
+    with more than 500 members" or "dialogs active since a date".
+
+    The query is answered from the dialog index, so the member lists of the dialogs
+    are not loaded.
+
+    Attributes:
+        dialog_index (DialogIndexReader): reader of the dialog index
+    """
+
+    def __init__(self, dialog_index: DialogIndexReader) -> None:
+        self.dialog_index = dialog_index
+
+    def select(self, query: DialogQuery) -> list[DialogIndexEntry]:
+        """
+        Get the index entries of the dialogs, that match all the conditions
+        of the `query`, in the order of the index.
+        """
+        index = self.dialog_index.read_index()
+        ids = query.get("ids")
+        if ids is None:
+            entries: typing.Iterable[DialogIndexEntry] = index.values()
+        else:
+            entries = [entry for dialog_id, entry in index.items() if dialog_id in ids]
+            if missing_ids := ids - index.keys():
+                logger.warning("dialogs not found in the index: %s", missing_ids)
+
+        predicates = _compile_query(query)
+        if predicates:
+            selected = [
+                entry
+                for entry in entries
+                if all(predicate(entry) for predicate in predicates)
+            ]
+        else:
+            selected = list(entries)
+        logger.debug("selected %d of %d dialogs", len(selected), len(index))
+        return selected
+
+    def select_dialogs(self, query: DialogQuery) -> list[DialogMetadata]:
+        """
+        Same as `select`, but returns the dialogs in the form, that is accepted
+        by the message downloader. Member lists are left empty: the downloader reads
+        them from the metadata files only for the dialogs, that need them.
+        """
+        return [
+            DialogMetadata(
+                id=entry["id"],
+                name=entry["name"],
+                type=entry["type"],
+                users=[],
+                member_count=entry["member_count"],
+                last_message_date=entry["last_message_date"],
+            )
+            for entry in self.select(query)
+        ]
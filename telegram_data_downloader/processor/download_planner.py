@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import math
+import statistics
+import time
+import typing
+
+import telethon
+from telethon.tl import types as tl_types
+
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.message import MessageFilter, ReactionsMode
+from ..dict_types.plan import DialogPlan, DownloadPlan
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+from .message_downloader import (
+    MESSAGE_PAGE_SIZE,
+    MESSAGE_PAGE_WAIT_TIME,
+    CheckpointStore,
+    count_messages,
+    serialize_message_filter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Latency of a request, when none of the dialogs could be counted, in seconds.
+DEFAULT_SECONDS_PER_REQUEST = 0.5
+
+
+def _is_channel(dialog: DialogMetadata) -> bool:
+    # * both the broadcast channels and the supergroups have channel peers
+    return isinstance(telethon.utils.get_peer(dialog["id"]), tl_types.PeerChannel)
+
+
+class DownloadPlanner:
+    """
+    Class for estimating the number of requests, the time and the disk space,
+    that a download of the messages of the dialogs takes, before it starts.
+
+    The messages of every dialog are counted with a single request, and the latency
+    of these requests is the measured request rate, that the time is estimated with.
+    Pages of messages are requested no faster than `MESSAGE_PAGE_WAIT_TIME`, and
+    with the "full" reactions mode, a request per message is made, except for
+    the broadcast channels. The channels are resolved to tell the broadcast channels
+    from the supergroups, as the type of a dialog doesn't. Flood waits can't be
+    foreseen, so the time is a lower bound, especially with the "full" reactions mode.
+
+    Attributes:
+        client (telethon.TelegramClient): Telegram client for counting the messages
+        reactions_mode (ReactionsMode): which reaction data will be collected
+        concurrency (int): number of dialogs, that will be downloaded concurrently
+        message_filter (MessageFilter): conditions for the messages to download
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests
+        bytes_per_message (int): average size of the saved data of a message, in bytes
+        checkpoint_store (CheckpointStore | None): store of the download progress,
+            the messages of the interrupted downloads, that were saved, are left out
+        seconds_per_request (float | None): latency of a request, in seconds,
+            measured when counting the messages if `None`
+        clock (Callable[[], float]): source of the monotonic time, in seconds
+    """
+
+    def __init__(
+        self,
+        client: telethon.TelegramClient,
+        *,
+        reactions_mode: ReactionsMode = ReactionsMode.FULL,
+        concurrency: int = 5,
+        message_filter: MessageFilter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        bytes_per_message: int = 300,
+        checkpoint_store: CheckpointStore | None = None,
+        seconds_per_request: float | None = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.client = client
+        self.reactions_mode = reactions_mode
+        self.concurrency = concurrency
+        self.message_filter = message_filter or MessageFilter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.bytes_per_message = bytes_per_message
+        self.checkpoint_store = checkpoint_store
+        self.seconds_per_request = seconds_per_request
+        self.clock = clock
+
+    async def _count_messages(
+        self, dialog: DialogMetadata, semaphore: asyncio.Semaphore
+    ) -> tuple[int | None, float | None, bool]:
+        """
+        Count the messages of a dialog, and check if it's a broadcast channel.
+
+        Returns the number of messages and the latency of the counting request,
+        `None` for both if the dialog can't be counted.
+        """
+        async with semaphore:
+            try:
+                is_broadcast = False
+                if _is_channel(dialog):
+                    # * supergroups are channels too, and have reactions to request
+                    entity = await self.retry_policy.call(
+                        "getEntity", self.client.get_entity, dialog["id"]
+                    )
+                    is_broadcast = bool(getattr(entity, "broadcast", False))
+                started_at = self.clock()
+                total = await count_messages(
+                    self.client, dialog["id"], self.message_filter, self.retry_policy
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("dialog #%d: counting messages: %s", dialog["id"], e)
+                return None, None, False
+            return total, self.clock() - started_at, is_broadcast
+
+    def _count_requests(
+        self, dialog: DialogMetadata, messages: int, is_broadcast: bool
+    ) -> tuple[int, int]:
+        """
+        Get the number of the page requests and of the other requests,
+        that download `messages` of a dialog.
+        """
+        pages = math.ceil(messages / MESSAGE_PAGE_SIZE)
+        # * the entity of the dialog is resolved before the pages
+        other = 1
+        if self.message_filter.get("since") is not None:
+            other += 1
+        if self.reactions_mode is ReactionsMode.FULL and messages:
+            if _is_channel(dialog):
+                # * a channel is checked for being a broadcast once
+                other += 1
+            if not is_broadcast:
+                other += messages
+        return pages, other
+
+    def _plan_dialog(
+        self,
+        dialog: DialogMetadata,
+        total: int | None,
+        is_broadcast: bool,
+        msg_limit: int,
+        seconds_per_request: float,
+    ) -> DialogPlan:
+        messages = None
+        if total is not None:
+            messages = min(total, msg_limit)
+            if self.checkpoint_store is not None:
+                checkpoint = self.checkpoint_store.read(dialog["id"])
+                # * a checkpoint of other conditions is discarded by the download
+                if checkpoint is not None and checkpoint["message_filter"] == (
+                    serialize_message_filter(self.message_filter)
+                ):
+                    messages = max(messages - checkpoint["msg_count"], 0)
+        pages, other = self._count_requests(dialog, messages or 0, is_broadcast)
+        # * the requests of a dialog are made one after another
+        seconds = (
+            pages * max(MESSAGE_PAGE_WAIT_TIME, seconds_per_request)
+            + other * seconds_per_request
+        )
+        return DialogPlan(
+            dialog_id=dialog["id"],
+            name=dialog["name"],
+            type=dialog["type"],
+            member_count=dialog.get("member_count"),
+            messages=messages,
+            requests=pages + other,
+            seconds=seconds,
+            bytes=(messages or 0) * self.bytes_per_message,
+        )
+
+    async def plan(self, dialogs: list[DialogMetadata], msg_limit: int) -> DownloadPlan:
+        """
+        Estimate the cost of downloading up to `msg_limit` messages from each dialog.
+        """
+        logger.info("counting messages of %d dialogs...", len(dialogs))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with TRACER.span("count_messages", "network"):
+            counts = await asyncio.gather(
+                *(self._count_messages(dialog, semaphore) for dialog in dialogs)
+            )
+
+        seconds_per_request = self.seconds_per_request
+        if seconds_per_request is None:
+            latencies = [latency for _, latency, _ in counts if latency is not None]
+            seconds_per_request = (
+                statistics.median(latencies)
+                if latencies
+                else DEFAULT_SECONDS_PER_REQUEST
+            )
+            logger.info("measured %.3fs per request", seconds_per_request)
+
+        dialog_plans = [
+            self._plan_dialog(
+                dialog, total, is_broadcast, msg_limit, seconds_per_request
+            )
+            for dialog, (total, _, is_broadcast) in zip(dialogs, counts)
+        ]
+        seconds = [dialog_plan["seconds"] for dialog_plan in dialog_plans]
+        return DownloadPlan(
+            dialogs=dialog_plans,
+            messages=sum(dialog_plan["messages"] or 0 for dialog_plan in dialog_plans),
+            requests=sum(dialog_plan["requests"] for dialog_plan in dialog_plans),
+            # * the concurrency can't make the download faster than its longest dialog
+            seconds=max(sum(seconds) / self.concurrency, max(seconds, default=0.0)),
+            bytes=sum(dialog_plan["bytes"] for dialog_plan in dialog_plans),
+            uncounted_dialogs=sum(
+                dialog_plan["messages"] is None for dialog_plan in dialog_plans
+            ),
+            seconds_per_request=seconds_per_request,
+            concurrency=self.concurrency,
+        )
+
+
+def check_plan_limits(
+    plan: DownloadPlan,
+    *,
+    max_seconds: float | None = None,
+    max_bytes: int | None = None,
+) -> list[str]:
+    """
+    Check a plan against the limits of a job.
+
+    Returns the descriptions of the exceeded limits, empty if the plan fits.
+    """
+    exceeded = []
+    if max_seconds is not None and plan["seconds"] > max_seconds:
+        exceeded.append(
+            f"estimated time {plan['seconds'] / 3600:.1f}h "
+            f"exceeds {max_seconds / 3600:.1f}h"
+        )
+    if max_bytes is not None and plan["bytes"] > max_bytes:
+        exceeded.append(
+            f"estimated size {plan['bytes'] / 2**30:.2f} GiB "
+            f"exceeds {max_bytes / 2**30:.2f} GiB"
+        )
+    return exceeded
+
+
+def format_plan(plan: DownloadPlan) -> str:
+    """
+    Describe a plan as a table of the dialogs, followed by the totals.
+    """
+    lines = [
+        f"{'dialog':>15} {'name':30} {'members':>8} {'messages':>10} "
+        f"{'requests':>10} {'hours':>8} {'MiB':>10}"
+    ]
+    for dialog_plan in plan["dialogs"]:
+        messages = dialog_plan["messages"]
+        members = dialog_plan["member_count"]
+        lines.append(
+            f"{dialog_plan['dialog_id']:>15} {dialog_plan['name'][:30]:30} "
+            f"{'?' if members is None else members:>8} "
+            f"{'?' if messages is None else messages:>10} "
+            f"{dialog_plan['requests']:>10} {dialog_plan['seconds'] / 3600:>8.2f} "
+            f"{dialog_plan['bytes'] / 2**20:>10.1f}"
+        )
+    lines.append(
+        f"total: {len(plan['dialogs'])} dialogs, {plan['messages']} messages, "
+        f"{plan['requests']} requests, {plan['seconds'] / 3600:.2f} hours "
+        f"with {plan['concurrency']} concurrent dialogs, "
+        f"{plan['bytes'] / 2**30:.2f} GiB, "
+        f"{plan['seconds_per_request']:.3f}s per request"
+    )
+    if plan["uncounted_dialogs"]:
+        lines.append(
+            f"{plan['uncounted_dialogs']} dialogs couldn't be counted "
+            "and are left out of the totals"
+        )
+    return "\n".join(lines)
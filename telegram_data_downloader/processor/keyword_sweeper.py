@@ -0,0 +1,153 @@
+import logging
+import typing
+
+import telethon
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.message import MessageColumns, MessageFilter
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+from .media_downloader import MediaStore, clear_missing_media_refs
+from .message_downloader import (
+    MESSAGE_PAGE_WAIT_TIME,
+    DialogReader,
+    MessageWriter,
+    get_messages_filter,
+    iter_recovering_messages,
+)
+from .message_reformatter import MessageReformatter, new_message_columns
+from .peer_collector import get_dialog_type
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordSweeper:
+    """
+    Class for finding the messages, that contain a text, in all dialogs at once,
+    with the global search of Telegram, instead of downloading every dialog.
+
+    The found messages are grouped by dialog and saved with the message writer,
+    one file per dialog, like downloaded messages.
+
+    Attributes:
+        client (telethon.TelegramClient): Telegram client for searching the messages
+        dialog_reader (DialogReader): Dialog reader for the metadata of the dialogs,
+            dialogs, that weren't downloaded, are described by the search results
+        message_writer (MessageWriter): Message writer for saving the found messages
+        message_filter (MessageFilter): conditions for the found messages, the global
+            search can't filter by the sender
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests
+        media_store (MediaStore | None): store of the downloaded media, the messages
+            reference only the stored media, none without a store
+    """
+
+    def __init__(
+        self,
+        client: telethon.TelegramClient,
+        dialog_reader: DialogReader,
+        message_writer: MessageWriter,
+        *,
+        message_filter: MessageFilter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        media_store: MediaStore | None = None,
+    ) -> None:
+        self.client = client
+        self.dialog_reader = dialog_reader
+        self.message_writer = message_writer
+        self.message_filter = message_filter or MessageFilter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.media_store = media_store
+        if "from_user" in self.message_filter:
+            raise ValueError("the global search can't filter messages by the sender")
+        # * fails before anything is searched
+        get_messages_filter(self.message_filter.get("types"))
+
+    async def sweep(self, search: str, msg_limit: int) -> dict[int, int]:
+        """
+        Find at most `msg_limit` messages, that contain `search`, and save them.
+
+        Returns the number of found messages per dialog id.
+        """
+        reformatter = MessageReformatter()
+        columns_by_dialog: dict[int, MessageColumns] = {}
+        chats: dict[int, typing.Any] = {}
+        with TRACER.span("sweep", "dialog"):
+            async for message in self._search(search, msg_limit):
+                dialog_id = message.chat_id
+                columns = columns_by_dialog.get(dialog_id)
+                if columns is None:
+                    columns = columns_by_dialog[dialog_id] = new_message_columns()
+                    chats[dialog_id] = message.chat
+                reformatter.reformat_page([message], columns)
+
+            for dialog_id, columns in columns_by_dialog.items():
+                dialog = self._get_dialog(dialog_id, chats[dialog_id])
+                clear_missing_media_refs(columns["media_ref"], self.media_store)
+                with TRACER.span("write_messages", "io", dialog_id=dialog_id):
+                    self.message_writer.write_messages(dialog, columns)
+
+        found = {
+            dialog_id: len(columns["id"])
+            for dialog_id, columns in columns_by_dialog.items()
+        }
+        logger.info("found %d messages in %d dialogs", sum(found.values()), len(found))
+        return found
+
+    async def _search(
+        self, search: str, msg_limit: int
+    ) -> typing.AsyncIterator[TLMessage]:
+        """
+        Iterate the found messages from the newest to the oldest.
+
+        The global search is paginated by the date, rate and peer of the last message,
+        so a failed page continues from the date of the last received message,
+        skipping the messages, that were already received.
+        """
+        messages_filter = get_messages_filter(self.message_filter.get("types"))
+        since = self.message_filter.get("since")
+        offset_date = self.message_filter.get("until")
+        received: set[tuple[int, int]] = set()
+        if msg_limit <= 0:
+            return
+
+        def open_messages() -> typing.AsyncIterator[TLMessage]:
+            # * continues from the date of the last received message
+            return self.client.iter_messages(
+                None,
+                limit=msg_limit,
+                offset_date=offset_date,
+                filter=messages_filter,
+                search=search,
+                wait_time=MESSAGE_PAGE_WAIT_TIME,
+            )
+
+        async for message in iter_recovering_messages(
+            open_messages, self.retry_policy, "messages.searchGlobal"
+        ):
+            # * the global search has no lower date bound, results are the newest first
+            if since is not None and message.date < since:
+                break
+            key = (message.chat_id, message.id)
+            if key in received:
+                continue
+            received.add(key)
+            offset_date = message.date
+            msg_limit -= 1
+            yield message
+            if msg_limit <= 0:
+                break
+
+    def _get_dialog(self, dialog_id: int, chat: typing.Any) -> DialogMetadata:
+        try:
+            return self.dialog_reader.read_dialog(dialog_id)
+        except FileNotFoundError:
+            logger.debug(
+                "dialog #%d: not downloaded, described by the search", dialog_id
+            )
+        return DialogMetadata(
+            id=dialog_id,
+            name=telethon.utils.get_display_name(chat) if chat else "",
+            type=get_dialog_type(chat),
+            users=[],
+        )
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import typing
+
+import telethon
+from telethon import events
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.checkpoint import LiveCheckpoint
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.message import MessageColumns
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+from .media_downloader import MediaDownloader, clear_missing_media_refs
+from .message_downloader import iter_recovering_messages
+from .message_reformatter import MessageReformatter, new_message_columns
+
+logger = logging.getLogger(__name__)
+
+
+class LiveMessageWriter(typing.Protocol):
+    def extend_messages(
+        self, dialog: DialogMetadata, messages: MessageColumns
+    ) -> int: ...
+
+    def truncate_messages(self, dialog: DialogMetadata, size: int) -> None: ...
+
+
+class LiveCheckpointStore(typing.Protocol):
+    def read(self) -> LiveCheckpoint: ...
+
+    def write(self, checkpoint: LiveCheckpoint) -> None: ...
+
+
+class LiveIngester:
+    """
+    Class for saving new and edited messages of dialogs as they arrive, over a single
+    connected client, instead of downloading the dialogs again.
+
+    Received messages are buffered, and written once `flush_interval` seconds pass
+    or a dialog buffers `flush_size` messages. Edited messages are written again,
+    so the last row of a message is its latest version.
+
+    Messages, that arrive while the client is disconnected, are fetched after
+    it reconnects (and after a restart), starting from the newest saved message
+    of each dialog.
+
+    Attributes:
+        client (telethon.TelegramClient): Telegram client for receiving the messages
+        message_writer (LiveMessageWriter): Message writer for saving the messages
+        checkpoint_store (LiveCheckpointStore): store of the saved progress
+        flush_interval (float): maximum time, for which messages are buffered, in seconds
+        flush_size (int): number of buffered messages of a dialog, that are written
+            without waiting for `flush_interval`
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests
+        media_downloader (MediaDownloader | None): downloader of the message media,
+            media are not downloaded if `None`
+    """
+
+    def __init__(
+        self,
+        client: telethon.TelegramClient,
+        message_writer: LiveMessageWriter,
+        checkpoint_store: LiveCheckpointStore,
+        *,
+        flush_interval: float = 5.0,
+        flush_size: int = 1000,
+        retry_policy: RetryPolicy | None = None,
+        media_downloader: MediaDownloader | None = None,
+    ) -> None:
+        self.client = client
+        self.message_writer = message_writer
+        self.checkpoint_store = checkpoint_store
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.media_downloader = media_downloader
+        self._reformatter = MessageReformatter()
+        self._dialogs: dict[int, DialogMetadata] = {}
+        self._checkpoint = LiveCheckpoint(last_message_ids={}, file_sizes={})
+        self._last_ids: dict[int, int] = {}
+        self._buffers: dict[int, MessageColumns] = {}
+        # ids of the new messages received during a catch-up, see `_catch_up`
+        self._received_ids: dict[int, set[int]] | None = None
+        # messages to catch up from, of the dialogs, that haven't caught up yet
+        self._pending_since_ids: dict[int, int] = {}
+        self._media_tasks: list[asyncio.Task[bool]] = []
+        self._flush_lock = asyncio.Lock()
+
+    async def run(self, dialogs: list[DialogMetadata]) -> None:
+        """
+        Receive the messages of `dialogs` until cancelled. The buffered messages
+        are written before returning.
+        """
+        if not dialogs:
+            logger.warning("no dialogs to watch")
+            return
+        self._dialogs = {dialog["id"]: dialog for dialog in dialogs}
+        self._restore()
+        # * taken before any message can be received, see `_catch_up`
+        since_ids = self._start_catch_up()
+
+        handlers = [
+            (self._on_new_message, events.NewMessage(chats=list(self._dialogs))),
+            (self._on_edited_message, events.MessageEdited(chats=list(self._dialogs))),
+        ]
+        for callback, event in handlers:
+            self.client.add_event_handler(callback, event)
+        flusher = asyncio.create_task(self._flush_periodically(), name="live flush")
+        logger.info("watching %d dialogs...", len(self._dialogs))
+        try:
+            while True:
+                await self._catch_up(since_ids)
+                await self.client.disconnected
+                since_ids = self._start_catch_up()
+                logger.warning("disconnected, reconnecting...")
+                await self.retry_policy.call("connect", self.client.connect)
+        finally:
+            flusher.cancel()
+            for callback, event in handlers:
+                self.client.remove_event_handler(callback, event)
+            await self.flush()
+            logger.info("stopped watching")
+
+    def _restore(self) -> None:
+        """
+        Continue from the checkpoint, dropping the messages, that were written after it.
+        """
+        self._checkpoint = self.checkpoint_store.read()
+        for dialog_id, size in self._checkpoint["file_sizes"].items():
+            if dialog_id in self._dialogs:
+                self.message_writer.truncate_messages(self._dialogs[dialog_id], size)
+        self._last_ids = {
+            dialog_id: message_id
+            for dialog_id, message_id in self._checkpoint["last_message_ids"].items()
+            if dialog_id in self._dialogs
+        }
+
+    def _start_catch_up(self) -> dict[int, int]:
+        """
+        Remember the newest received message of each dialog, to catch up from it,
+        and start recording the ids of the messages received in the meantime.
+        Dialogs, that failed to catch up before, catch up from the same message again.
+        """
+        self._received_ids = {}
+        self._pending_since_ids = self._last_ids | self._pending_since_ids
+        return dict(self._pending_since_ids)
+
+    async def _catch_up(self, since_ids: dict[int, int]) -> None:
+        """
+        Receive the messages, that were sent after the messages with `since_ids`,
+        while the client wasn't connected.
+
+        Events keep arriving during the catch-up, so the fetched messages, that were
+        already received by the events, are skipped by their ids.
+        """
+        for dialog_id in self._dialogs:
+            try:
+                with TRACER.span("catch_up", "network", dialog_id=dialog_id):
+                    messages = await self._get_missed_messages(
+                        dialog_id, since_ids.get(dialog_id)
+                    )
+            except (telethon.errors.RPCError, ConnectionError, TimeoutError) as e:
+                # * the dialog stays pending and catches up on the next reconnect
+                logger.error("dialog #%d: catching up: %r", dialog_id, e)
+                continue
+            assert self._received_ids is not None
+            received_ids = self._received_ids.get(dialog_id, set())
+            missed = [message for message in messages if message.id not in received_ids]
+            for message in missed:
+                self._receive(dialog_id, message, edited=False)
+            self._pending_since_ids.pop(dialog_id, None)
+            if missed:
+                logger.info("dialog #%d: caught up %d messages", dialog_id, len(missed))
+        self._received_ids = None
+        await self._flush_full_buffers()
+
+    async def _get_missed_messages(
+        self, dialog_id: int, since_id: int | None
+    ) -> list[TLMessage]:
+        if since_id is None:
+            # * a new dialog is watched from its newest message on
+            newest = await self.retry_policy.call(
+                "messages.getHistory", self.client.get_messages, dialog_id, limit=1
+            )
+            if newest:
+                self._last_ids[dialog_id] = max(
+                    self._last_ids.get(dialog_id, 0), newest[0].id
+                )
+            return []
+
+        last_id = since_id
+
+        def open_messages() -> typing.AsyncIterator[TLMessage]:
+            # * oldest first, like the messages would have arrived, so a failed page
+            # * continues after the last received message
+            return self.client.iter_messages(dialog_id, min_id=last_id, reverse=True)
+
+        messages = []
+        async for message in iter_recovering_messages(
+            open_messages, self.retry_policy, "messages.getHistory", dialog_id=dialog_id
+        ):
+            messages.append(message)
+            last_id = message.id
+        return messages
+
+    def _receive(self, dialog_id: int, message: TLMessage, *, edited: bool) -> None:
+        if not edited:
+            if message.id > self._last_ids.get(dialog_id, 0):
+                self._last_ids[dialog_id] = message.id
+            if self._received_ids is not None:
+                self._received_ids.setdefault(dialog_id, set()).add(message.id)
+
+        columns = self._buffers.get(dialog_id)
+        if columns is None:
+            columns = self._buffers[dialog_id] = new_message_columns()
+        self._reformatter.reformat_page([message], columns)
+        media_ref = columns["media_ref"][-1]
+        if self.media_downloader is not None and media_ref is not None:
+            task = self.media_downloader.submit(message, media_ref, columns["type"][-1])
+            if task is not None:
+                self._media_tasks.append(task)
+
+    async def _on_new_message(self, event: events.NewMessage.Event) -> None:
+        self._receive(event.chat_id, event.message, edited=False)
+        await self._flush_full_buffers()
+
+    async def _on_edited_message(self, event: events.MessageEdited.Event) -> None:
+        self._receive(event.chat_id, event.message, edited=True)
+        await self._flush_full_buffers()
+
+    async def _flush_full_buffers(self) -> None:
+        if any(
+            len(columns["id"]) >= self.flush_size for columns in self._buffers.values()
+        ):
+            await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write the buffered messages and save the checkpoint.
+        """
+        # * once the buffers are taken, the write has to complete to not lose them
+        await asyncio.shield(self._flush())
+
+    async def _flush(self) -> None:
+        async with self._flush_lock:
+            # * the buffers are swapped, so messages keep arriving during the write
+            buffers, self._buffers = self._buffers, {}
+            media_tasks, self._media_tasks = self._media_tasks, []
+            # * the checkpoint doesn't move past the messages, that aren't caught up
+            last_ids = self._last_ids | self._pending_since_ids
+            if last_ids == self._checkpoint["last_message_ids"] and not buffers:
+                return
+
+            if media_tasks:
+                # * the saved messages must not reference media, that is still downloading
+                with TRACER.span("wait_media", "network"):
+                    await asyncio.gather(*media_tasks)
+            media_store = (
+                self.media_downloader.media_store if self.media_downloader else None
+            )
+            for columns in buffers.values():
+                clear_missing_media_refs(columns["media_ref"], media_store)
+            file_sizes = dict(self._checkpoint["file_sizes"])
+            with TRACER.span("write_messages", "io", dialogs=len(buffers)):
+                for dialog_id, columns in buffers.items():
+                    file_sizes[dialog_id] = await asyncio.to_thread(
+                        self.message_writer.extend_messages,
+                        self._dialogs[dialog_id],
+                        columns,
+                    )
+            self._checkpoint = LiveCheckpoint(
+                last_message_ids=last_ids, file_sizes=file_sizes
+            )
+            self.checkpoint_store.write(self._checkpoint)
+        logger.debug(
+            "saved %d messages of %d dialogs",
+            sum(len(columns["id"]) for columns in buffers.values()),
+            len(buffers),
+        )
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+import typing
+
+import telethon
+from telethon.tl import types as tl_types
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.message import MessageType
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+class MediaStore(typing.Protocol):
+    def exists(self, media_ref: str) -> bool: ...
+
+    def open_temp(self, media_ref: str) -> typing.BinaryIO: ...
+
+    def commit(self, media_ref: str) -> None: ...
+
+    def discard(self, media_ref: str) -> None: ...
+
+
+def clear_missing_media_refs(
+    media_refs: list[str | None], media_store: MediaStore | None
+) -> None:
+    """
+    Replace the references to the media, that aren't in the `media_store`, with `None`,
+    so the saved messages reference only the stored files. Media, that were skipped
+    or failed to download, aren't stored, and no media are stored without a store.
+
+    The downloads of the media must be over.
+    """
+    for i, media_ref in enumerate(media_refs):
+        if media_ref is not None and (
+            media_store is None or not media_store.exists(media_ref)
+        ):
+            media_refs[i] = None
+
+
+def _photo_size_bytes(size: tl_types.TypePhotoSize) -> int:
+    if size.__class__ is tl_types.PhotoSizeProgressive:
+        return max(size.sizes, default=0)
+    if size.__class__ in (tl_types.PhotoCachedSize, tl_types.PhotoStrippedSize):
+        return len(size.bytes)
+    return getattr(size, "size", 0)
+
+
+def media_size(media: tl_types.TypeMessageMedia) -> int:
+    """
+    Size of the file of a media in bytes, as it is downloaded by Telethon:
+    the document itself, or the largest size of a photo.
+    """
+    if media.__class__ is tl_types.MessageMediaDocument:
+        return media.document.size
+    if media.__class__ is tl_types.MessageMediaPhoto and media.photo.sizes:
+        return _photo_size_bytes(media.photo.sizes[-1])
+    return 0
+
+
+class TokenBucket:
+    """
+    Rate limiter, that lets through `rate` units (e.g. bytes) per second on average,
+    with bursts of up to `capacity` units.
+
+    Consumers wait in the order of their calls, so a large consumer is not starved
+    by the smaller ones.
+
+    Attributes:
+        rate (float): units per second
+        capacity (float): maximum burst, one second of the rate by default
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def consume(self, amount: float) -> None:
+        """
+        Take `amount` units, waiting until they are available. Amounts larger than
+        the capacity are let through, once the bucket is full.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= amount
+            if self._tokens < 0:
+                # * the debt is paid off by the waiting, before the next consumer
+                await asyncio.sleep(-self._tokens / self.rate)
+
+
+class MediaDownloader:
+    """
+    Class for downloading the media of messages in the background, while the messages
+    are being downloaded.
+
+    Media are stored by their media reference, so a media, that is forwarded
+    to several dialogs, is downloaded once. Media larger than the limit of their type
+    are skipped.
+
+    Attributes:
+        client (telethon.TelegramClient): Telegram client for downloading the media
+        media_store (MediaStore): store to save the media files to
+        max_sizes (dict[MessageType, int]): maximum file size in bytes per message type,
+            types missing from the dict are not downloaded
+        concurrency (int): maximum number of files downloaded at once
+        bandwidth_limit (float): maximum download speed of all the files together,
+            in bytes per second, 0 for no limit
+        retry_policy (RetryPolicy): policy for repeating the failed downloads
+    """
+
+    def __init__(
+        self,
+        client: telethon.TelegramClient,
+        media_store: MediaStore,
+        *,
+        max_sizes: dict[MessageType, int],
+        concurrency: int = 4,
+        bandwidth_limit: float = 0,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self.client = client
+        self.media_store = media_store
+        self.max_sizes = max_sizes
+        self.concurrency = concurrency
+        self.bandwidth_limit = bandwidth_limit
+        self.retry_policy = retry_policy or RetryPolicy(call_timeout=None)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bandwidth = TokenBucket(bandwidth_limit) if bandwidth_limit else None
+        self._tasks: dict[str, asyncio.Task[bool]] = {}
+
+    def submit(
+        self, message: TLMessage, media_ref: str, msg_type: MessageType
+    ) -> asyncio.Task[bool] | None:
+        """
+        Schedule the download of the media of a message.
+
+        Returns:
+            asyncio.Task[bool] | None: task, that results in whether the media
+                was stored, or `None` if there is nothing to download
+        """
+        task = self._tasks.get(media_ref)
+        if task is not None:
+            return task
+
+        max_size = self.max_sizes.get(msg_type)
+        if not max_size or self.media_store.exists(media_ref):
+            return None
+        if (size := media_size(message.media)) > max_size:
+            logger.debug("media %s: skipped, %d bytes is too large", media_ref, size)
+            return None
+
+        task = asyncio.create_task(
+            self._download(message, media_ref), name=f"media {media_ref}"
+        )
+        self._tasks[media_ref] = task
+        # * once done, the stored file is found by the store, and a failed download
+        # * can be tried again by the next message with the same media
+        task.add_done_callback(lambda _: self._tasks.pop(media_ref, None))
+        return task
+
+    async def _download(self, message: TLMessage, media_ref: str) -> bool:
+        async with self._semaphore:
+            try:
+                with TRACER.span("download_media", "network", media_ref=media_ref):
+                    await self.retry_policy.call(
+                        "upload.getFile", self._download_file, message, media_ref
+                    )
+            except Exception as e:  # pylint: disable=broad-except
+                # * a missing media should not stop the download of messages
+                logger.error("media %s: download failed: %r", media_ref, e)
+                self.media_store.discard(media_ref)
+                return False
+        logger.debug("media %s: stored", media_ref)
+        return True
+
+    async def _download_file(self, message: TLMessage, media_ref: str) -> None:
+        with self.media_store.open_temp(media_ref) as f:
+            async for chunk in self.client.iter_download(message.media):
+                if self._bandwidth is not None:
+                    await self._bandwidth.consume(len(chunk))
+                f.write(chunk)
+        await asyncio.to_thread(self.media_store.commit, media_ref)
@@ -1,19 +1,196 @@
 import asyncio
+import contextlib
+import json
 import logging
+import sys
 import typing
+from datetime import datetime
 
 import telethon
 from telethon.tl import types as tl_types
 from telethon.tl.custom.message import Message as TLMessage
 
-from .. import settings
+from ..dict_types.checkpoint import DialogCheckpoint
 from ..dict_types.dialog import DialogMetadata
-from ..dict_types.message import MessageAttributes, MessageType, PeerID
-from ..utils import async_retry
+from ..dict_types.message import (
+    MessageAttributes,
+    MessageColumns,
+    MessageFilter,
+    MessageType,
+    ReactionColumns,
+    ReactionCountColumns,
+    ReactionsMode,
+)
+from ..memory import MemoryBudget
+from ..progress import ProgressTracker
+from ..retry import (
+    DeadlineExceededError,
+    RetryPolicy,
+    check_deadline,
+    dialog_deadline,
+    retry_sleep_context,
+)
+from ..tracing import TRACER
+from ..watchdog import StallWatchdog
+from .media_downloader import MediaDownloader, clear_missing_media_refs
+from .message_reformatter import (
+    MessageReformatter,
+    new_message_columns,
+    new_reaction_columns,
+    new_reaction_count_columns,
+)
+from .peer_collector import PeerDirectory, collect_peers
 
 
 logger = logging.getLogger(__name__)
 
+# Messages are served by Telegram in pages, so most iterator steps are answered from the
+# buffer. Only the steps slower than this threshold are traced as page fetches.
+PAGE_FETCH_MIN_DURATION_US = 1000.0
+
+# Number of messages reformatted at once, matching the page size of `iter_messages`.
+MESSAGE_PAGE_SIZE = 100
+
+# Minimum time between the page requests of a dialog, in seconds, which keeps
+# long downloads below the flood limits of Telegram.
+MESSAGE_PAGE_WAIT_TIME = 5.0
+
+# Approximate sizes of the buffered data in bytes, that are counted by the memory budget.
+# The text of a message is counted separately, as it can be much larger than its row.
+_MESSAGE_ROW_BYTES = 256
+_REACTION_ROW_BYTES = 96
+_RAW_MESSAGE_BYTES = 2048
+
+
+class DialogStalledError(Exception):
+    """
+    Exception raised when the download of a dialog stalled more times, than
+    the watchdog restarts it.
+    """
+
+
+# Telegram applies a single media filter per request, so only the sets of message types,
+# that one filter matches, can be requested.
+_MESSAGES_FILTERS: dict[frozenset[MessageType], type[tl_types.TypeMessagesFilter]] = {
+    frozenset({MessageType.PHOTO}): tl_types.InputMessagesFilterPhotos,
+    frozenset({MessageType.VIDEO}): tl_types.InputMessagesFilterVideo,
+    frozenset({MessageType.VOICE}): tl_types.InputMessagesFilterVoice,
+    frozenset(
+        {MessageType.PHOTO, MessageType.VIDEO}
+    ): tl_types.InputMessagesFilterPhotoVideo,
+}
+
+
+def get_messages_filter(
+    types: set[MessageType] | None,
+) -> type[tl_types.TypeMessagesFilter] | None:
+    """
+    Get the Telegram filter, that matches the messages of `types`,
+    `None` if the types are not restricted.
+
+    Raises:
+        ValueError: if no single filter matches the types
+    """
+    if not types:
+        return None
+    messages_filter = _MESSAGES_FILTERS.get(frozenset(types))
+    if messages_filter is None:
+        supported = [
+            "+".join(sorted(msg_type.value for msg_type in key))
+            for key in _MESSAGES_FILTERS
+        ]
+        raise ValueError(
+            f"message types {sorted(t.value for t in types)} can't be filtered "
+            f"by Telegram, supported: {', '.join(supported)}"
+        )
+    return messages_filter
+
+
+def serialize_message_filter(message_filter: MessageFilter) -> str:
+    """
+    Get a string, that is equal for the equal conditions of `message_filter`,
+    to save them with the checkpoints.
+    """
+    data: dict[str, typing.Any] = {}
+    for key, value in message_filter.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, set):
+            value = sorted(msg_type.value for msg_type in value)
+        data[key] = value
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+async def iter_recovering_messages(
+    open_messages: typing.Callable[[], typing.AsyncIterator[TLMessage]],
+    retry_policy: RetryPolicy,
+    method: str,
+    **trace_args: typing.Any,
+) -> typing.AsyncIterator[TLMessage]:
+    """
+    Iterate the messages of an iterator, that is made by `open_messages`, repeating
+    the failed pages according to `retry_policy`.
+
+    A failed page breaks the iterator, so a new one is made, that must continue
+    after the last received message. Most of the steps are answered from the buffer
+    of the iterator, so the policy is only involved, once a page fails.
+    """
+    messages: typing.AsyncIterator[TLMessage] | None = None
+
+    async def next_message() -> TLMessage:
+        nonlocal messages
+        if messages is None:
+            messages = open_messages()
+        try:
+            return await anext(messages)
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            messages = None
+            raise
+
+    while True:
+        check_deadline()
+        with TRACER.span(
+            "page_fetch",
+            "network",
+            min_duration_us=PAGE_FETCH_MIN_DURATION_US,
+            **trace_args,
+        ):
+            try:
+                try:
+                    message = await next_message()
+                except Exception as e:  # pylint: disable=broad-except
+                    message = await retry_policy.recover(method, e, next_message)
+            except StopAsyncIteration:
+                return
+        yield message
+
+
+async def count_messages(
+    client: telethon.TelegramClient,
+    entity: typing.Any,
+    message_filter: MessageFilter,
+    retry_policy: RetryPolicy,
+) -> int:
+    """
+    Get the number of messages of a dialog, that match the conditions of `message_filter`.
+
+    Telegram sends the number of the matching messages with every page,
+    so a single request is made. The date window isn't counted, so the number
+    is an upper bound for a download within a window.
+    """
+    messages = await retry_policy.call(
+        "messages.getHistory",
+        client.get_messages,
+        entity,
+        limit=0,
+        filter=get_messages_filter(message_filter.get("types")),
+        search=message_filter.get("search"),
+        from_user=message_filter.get("from_user"),
+    )
+    return messages.total
+
 
 class DialogReader(typing.Protocol):
     def read_dialog(self, dialog_id: int) -> DialogMetadata: ...
@@ -21,7 +198,61 @@ class DialogReader(typing.Protocol):
 
 class MessageWriter(typing.Protocol):
     def write_messages(
-        self, dialog: DialogMetadata, messages: list[MessageAttributes]
+        self,
+        dialog: DialogMetadata,
+        messages: list[MessageAttributes] | MessageColumns,
+    ) -> None: ...
+
+    def write_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns, emojis: list[str]
+    ) -> None: ...
+
+    def write_reaction_counts(
+        self,
+        dialog: DialogMetadata,
+        reaction_counts: ReactionCountColumns,
+        emojis: list[str],
+    ) -> None: ...
+
+
+class PartialMessageWriter(MessageWriter, typing.Protocol):
+    def append_messages(
+        self, dialog: DialogMetadata, messages: MessageColumns
+    ) -> None: ...
+
+    def append_reactions(
+        self, dialog: DialogMetadata, reactions: ReactionColumns
+    ) -> None: ...
+
+    def append_reaction_counts(
+        self, dialog: DialogMetadata, reaction_counts: ReactionCountColumns
+    ) -> None: ...
+
+    def sync_parts(self, dialog: DialogMetadata) -> dict[str, int]: ...
+
+    def truncate_parts(
+        self, dialog: DialogMetadata, part_sizes: dict[str, int]
+    ) -> None: ...
+
+    def commit(self, dialog: DialogMetadata, emojis: list[str]) -> None: ...
+
+
+class CheckpointStore(typing.Protocol):
+    def read(self, dialog_id: int) -> DialogCheckpoint | None: ...
+
+    def write(self, checkpoint: DialogCheckpoint) -> None: ...
+
+    def remove(self, dialog_id: int) -> None: ...
+
+
+class RawMessageArchiver(typing.Protocol):
+    def start_dialog(self, dialog_id: int) -> None: ...
+
+    def append(
+        self,
+        dialog_id: int,
+        messages: list[TLMessage],
+        reactions: dict[int, tl_types.messages.MessageReactionsList],
     ) -> None: ...
 
 
@@ -34,23 +265,77 @@ class MessageDownloader:
     Attributes:
         client (telethon.TelegramClient): Telegram client for fetching the messages
         dialog_reader (DialogReader): Dialog reader for reading the dialogs
-        message_writer (MessageWriter): Message writer for saving the messages
+        message_writer (PartialMessageWriter): Message writer for saving the messages
         reactions_limit_per_message (int): maximum amount of reactions to fetch per message
+        raw_archive (RawMessageArchiver | None): archive for raw messages and reactions,
+            which allows to re-export them later without the network
+        reactions_mode (ReactionsMode): which reaction data to collect
+        checkpoint_store (CheckpointStore | None): store of the download progress,
+            which allows to resume interrupted dialog downloads
+        checkpoint_interval (int): number of messages, after which the downloaded data
+            is saved and the progress is checkpointed
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests
+        dialog_timeout (float | None): maximum time to download a single dialog,
+            in seconds. The download of a dialog, that runs out of time, is stopped
+            and can be resumed from its checkpoint.
+        media_downloader (MediaDownloader | None): downloader of the message media,
+            media are not downloaded if `None`
+        message_filter (MessageFilter): conditions for the messages to download,
+            that are passed to Telegram, so the skipped messages are never fetched.
+            A checkpoint of a download with other conditions is discarded.
+        peer_directory (PeerDirectory | None): directory of the users and chats,
+            that is updated with the senders, dialogs and forward sources
+            of the downloaded messages
+        memory_budget (MemoryBudget | None): limit of the data buffered by all
+            the dialogs. The largest buffers are saved before their checkpoint
+            interval, when the limit is reached.
+        progress (ProgressTracker | None): tracker of the downloaded messages,
+            the number of messages of every dialog is requested up front
+        watchdog (StallWatchdog | None): watchdog of the dialog downloads. A download,
+            that made no progress for a while, is cancelled, saving its progress,
+            and is restarted from its checkpoint after the other waiting dialogs.
     """
 
     def __init__(
         self,
         client: telethon.TelegramClient,
         dialog_reader: DialogReader,
-        message_writer: MessageWriter,
+        message_writer: PartialMessageWriter,
         *,
         reactions_limit_per_message: int,
+        raw_archive: RawMessageArchiver | None = None,
+        reactions_mode: ReactionsMode = ReactionsMode.FULL,
+        checkpoint_store: CheckpointStore | None = None,
+        checkpoint_interval: int = 10_000,
+        retry_policy: RetryPolicy | None = None,
+        dialog_timeout: float | None = None,
+        media_downloader: MediaDownloader | None = None,
+        message_filter: MessageFilter | None = None,
+        peer_directory: PeerDirectory | None = None,
+        memory_budget: MemoryBudget | None = None,
+        progress: ProgressTracker | None = None,
+        watchdog: StallWatchdog | None = None,
     ) -> None:
         self.client = client
         self.dialog_reader = dialog_reader
         self.message_writer = message_writer
         self.reactions_limit_per_message = reactions_limit_per_message
+        self.raw_archive = raw_archive
+        self.reactions_mode = reactions_mode
+        self.checkpoint_store = checkpoint_store
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dialog_timeout = dialog_timeout
+        self.media_downloader = media_downloader
+        self.message_filter = message_filter or MessageFilter()
+        self.peer_directory = peer_directory
+        self.memory_budget = memory_budget
+        self.progress = progress
+        self.watchdog = watchdog
+        # * fails before any dialog is downloaded
+        get_messages_filter(self.message_filter.get("types"))
         self._semaphore = asyncio.Semaphore(5)
+        self._busy_slots: set[int] = set()
 
     @property
     def concurrent_dialog_downloads(self) -> int:
@@ -63,71 +348,29 @@ class MessageDownloader:
     def concurrent_dialog_downloads(self, value: int) -> None:
         self._semaphore = asyncio.Semaphore(value)
 
-    def _reformat_message(self, message: TLMessage) -> MessageAttributes:
+    def _touch(self, dialog_id: int, activity: str) -> None:
+        if self.watchdog is not None:
+            self.watchdog.touch(dialog_id, activity)
+
+    def _unwatched(self, dialog_id: int, activity: str) -> typing.ContextManager[None]:
+        if self.watchdog is None:
+            return contextlib.nullcontext()
+        return self.watchdog.paused(dialog_id, activity)
+
+    @staticmethod
+    def _reformat_message(message: TLMessage) -> MessageAttributes:
         """
         Reformat a single message to a more convenient data structure.
+
+        Prefer `MessageReformatter.reformat_page` for processing many messages.
         """
-        fwd_from = (
-            telethon.utils.get_peer_id(message.fwd_from.from_id)
-            if message.fwd_from and message.fwd_from.from_id
-            else None
-        )
-        from_id = (
-            telethon.utils.get_peer_id(message.from_id) if message.from_id else None
-        )
+        return MessageReformatter().reformat_message(message)
 
-        msg_attributes: MessageAttributes = {
-            "id": message.id,
-            "date": message.date,
-            "from_id": PeerID(from_id) if from_id else None,
-            "fwd_from": PeerID(fwd_from) if fwd_from else None,
-            "message": message.message or "",
-            "type": MessageType.TEXT,
-            "duration": None,
-            "to_id": PeerID(telethon.utils.get_peer_id(message.to_id)),
-            "reactions": {},
-        }
-
-        if media := message.media:
-            # For stickers, videos, and voice messages
-            if (
-                isinstance(media, tl_types.MessageMediaDocument)
-                and media.document
-                and not isinstance(media.document, tl_types.DocumentEmpty)
-            ):
-                for attribute in media.document.attributes:
-                    if isinstance(attribute, tl_types.DocumentAttributeSticker):
-                        msg_attributes["message"] = attribute.alt
-                        msg_attributes["type"] = MessageType.STICKER
-                        break
-
-                    if isinstance(attribute, tl_types.DocumentAttributeVideo):
-                        msg_attributes["duration"] = attribute.duration
-                        msg_attributes["type"] = MessageType.VIDEO
-                        break
-
-                    if (
-                        isinstance(attribute, tl_types.DocumentAttributeAudio)
-                        and attribute.voice
-                    ):
-                        msg_attributes["duration"] = attribute.duration
-                        msg_attributes["type"] = MessageType.VOICE
-                        break
-            elif isinstance(message.media, tl_types.MessageMediaPhoto):
-                msg_attributes["type"] = MessageType.PHOTO
-
-        return msg_attributes
-
-    @async_retry(
-        telethon.errors.common.InvalidBufferError,
-        base_sleep_time=settings.MESSAGE_REACTION_EXPONENTIAL_BACKOFF_SLEEP_TIME,
-        max_tries=settings.MESSAGE_REACTION_EXPONENTIAL_BACKOFF_MAX_TRIES,
-    )
-    async def _get_message_reactions(
+    async def _get_message_reactions_list(
         self, message: TLMessage, dialog_peer: tl_types.TypeInputPeer
-    ) -> dict[PeerID, tl_types.ReactionEmoji]:
+    ) -> tl_types.messages.MessageReactionsList | None:
         """
-        Get reactions for a single message.
+        Get reactions for a single message, as they were returned by Telegram.
 
         Args:
             message (TLMessage): message to get reactions for
@@ -135,45 +378,63 @@ class MessageDownloader:
                 This is required because message id is relative to the dialog.
 
         Returns:
-            dict[PeerID, tl_types.ReactionEmoji]
+            tl_types.messages.MessageReactionsList | None: `None` if reactions
+                of the message can't be retrieved
         """
         try:
-            result: tl_types.messages.MessageReactionsList = await self.client(
-                telethon.functions.messages.GetMessageReactionsListRequest(
-                    peer=dialog_peer,
-                    id=message.id,
-                    limit=self.reactions_limit_per_message,
-                )
-            )  # type: ignore
+            with TRACER.span("get_reactions", "network", message_id=message.id):
+                result: tl_types.messages.MessageReactionsList = (
+                    await self.retry_policy.call(
+                        "messages.getMessageReactionsList",
+                        self.client,
+                        telethon.functions.messages.GetMessageReactionsListRequest(
+                            peer=dialog_peer,
+                            id=message.id,
+                            limit=self.reactions_limit_per_message,
+                        ),
+                    )
+                )  # type: ignore
         except telethon.errors.BroadcastForbiddenError:
             logger.debug("channel is broadcast: cannot retrieve reactions from message")
-            reactions = {}
+            return None
         except telethon.errors.MsgIdInvalidError:
             # logger.debug("message %d not found", message.id)
-            reactions = {}
-        else:
-            reaction_objects = result.reactions
-            reactions = {
-                PeerID(
-                    telethon.utils.get_peer_id(reaction_object.peer_id)
-                ): reaction_object.reaction
-                for reaction_object in reaction_objects
-                if isinstance(reaction_object.reaction, tl_types.ReactionEmoji)
-            }
+            return None
+        return result
 
-        return reactions
+    async def _get_window_min_id(self, tg_entity: typing.Any, since: datetime) -> int:
+        """
+        Get the id of the newest message sent before `since`, so that only
+        the newer messages are requested, 0 if there is no such message.
+        """
+        older: list[TLMessage] = await self.retry_policy.call(
+            "messages.getHistory",
+            self.client.get_messages,
+            tg_entity,
+            limit=1,
+            offset_date=since,
+        )
+        return older[0].id if older else 0
 
     async def _get_message_iterator(
-        self, dialog: DialogMetadata, msg_limit: int
+        self, dialog: DialogMetadata, msg_limit: int, *, offset_id: int = 0
     ) -> typing.AsyncIterator[TLMessage]:
         """
         Utility function to get an async iterator of messages from a dialog.
         We can't use plain `TelegramClient.iter_messages` method, because there can be caveats.
+
+        Messages are iterated from the newest to the oldest. Provide `offset_id`
+        to start from the message, that precedes the message with this id.
+        The date window of `message_filter` is turned into the bounds of the requests,
+        and the other conditions are applied by Telegram, so only the pages
+        of the matching messages are fetched.
         """
 
         logger.debug("dialog #%d: creating message iterator", dialog["id"])
         try:
-            tg_entity = await self.client.get_entity(dialog["id"])
+            tg_entity = await self.retry_policy.call(
+                "getEntity", self.client.get_entity, dialog["id"]
+            )
         except ValueError as e:
             logger.error("dialog #%d: %s", dialog["id"], e)
             logger.info("init dialog %d through member username", dialog["id"])
@@ -202,66 +463,441 @@ class MessageDownloader:
                 )
                 raise ValueError("username is empty") from e
 
-            tg_entity = await self.client.get_input_entity(username)
+            tg_entity = await self.retry_policy.call(
+                "getInputEntity", self.client.get_input_entity, username
+            )
+        except DeadlineExceededError:
+            raise
         except Exception as e:  # pylint: disable=broad-except
             logger.error("dialog #%d: %s", dialog["id"], e)
             return
 
         if isinstance(tg_entity, list):
             tg_entity = tg_entity[0]
-        async for message in self.client.iter_messages(
-            tg_entity, limit=msg_limit, wait_time=5
+
+        messages_filter = get_messages_filter(self.message_filter.get("types"))
+        until = self.message_filter.get("until")
+        min_id = 0
+        if (since := self.message_filter.get("since")) is not None:
+            min_id = await self._get_window_min_id(tg_entity, since)
+        if msg_limit <= 0:
+            return
+
+        def open_messages() -> typing.AsyncIterator[TLMessage]:
+            # * continues after the last received message
+            return self.client.iter_messages(
+                tg_entity,
+                limit=msg_limit,
+                offset_id=offset_id,
+                # * a resumed iterator starts inside the window
+                offset_date=None if offset_id else until,
+                min_id=min_id,
+                filter=messages_filter,
+                search=self.message_filter.get("search"),
+                from_user=self.message_filter.get("from_user"),
+                wait_time=MESSAGE_PAGE_WAIT_TIME,
+            )
+
+        async for message in iter_recovering_messages(
+            open_messages,
+            self.retry_policy,
+            "messages.getHistory",
+            dialog_id=dialog["id"],
         ):
+            offset_id = message.id
+            msg_limit -= 1
+            self._touch(dialog["id"], "page_fetch")
             yield message
+            if msg_limit <= 0:
+                break
 
-    async def _download_dialog(self, dialog: DialogMetadata, msg_limit: int) -> None:
+    async def _download_dialog(self, dialog: DialogMetadata, msg_limit: int) -> bool:
         """
         Download messages from a single dialog and save them.
+
+        Returns `False` if the download ran out of time and has to be resumed.
         """
-        logger.info("dialog #%d: downloading messages...", dialog["id"])
-        dialog_messages: list[MessageAttributes] = []
+        with TRACER.span("download_dialog", "dialog", dialog_id=dialog["id"]):
+            try:
+                with (
+                    dialog_deadline(self.dialog_timeout),
+                    # * the retries wait out Telegram, which isn't a stall
+                    retry_sleep_context(
+                        lambda: self._unwatched(dialog["id"], "retry_sleep")
+                    ),
+                ):
+                    await self._download_dialog_messages(dialog, msg_limit)
+                return True
+            except DeadlineExceededError as e:
+                # * other dialogs go on, this one is resumed on the next run
+                logger.error("dialog #%d: stopped: %s", dialog["id"], e)
+                return False
+            finally:
+                if self.memory_budget is not None:
+                    self.memory_budget.release(dialog["id"])
+
+    def _start_dialog(self, dialog: DialogMetadata) -> DialogCheckpoint | None:
+        """
+        Prepare the download of a dialog. If the dialog has a checkpoint of
+        an unfinished download, the data saved after it is dropped and the checkpoint
+        is returned. Otherwise, leftovers of the previous downloads are removed.
+        """
+        checkpoint = None
+        if self.checkpoint_store is not None:
+            checkpoint = self.checkpoint_store.read(dialog["id"])
+        message_filter = serialize_message_filter(self.message_filter)
+        if checkpoint is not None and checkpoint["message_filter"] != message_filter:
+            # * resuming would mix the messages of two different downloads
+            logger.warning(
+                "dialog #%d: checkpoint of a download with other conditions %s, "
+                "starting over",
+                dialog["id"],
+                checkpoint["message_filter"],
+            )
+            assert self.checkpoint_store is not None
+            self.checkpoint_store.remove(dialog["id"])
+            checkpoint = None
+
+        if checkpoint is not None:
+            logger.info(
+                "dialog #%d: resuming after %d messages from checkpoint",
+                dialog["id"],
+                checkpoint["msg_count"],
+            )
+            self.message_writer.truncate_parts(dialog, checkpoint["part_sizes"])
+        else:
+            self.message_writer.truncate_parts(dialog, {})
+            if self.raw_archive is not None:
+                self.raw_archive.start_dialog(dialog["id"])
+        return checkpoint
 
+    async def _download_dialog_messages(
+        self, dialog: DialogMetadata, msg_limit: int
+    ) -> None:
+        logger.info("dialog #%d: downloading messages...", dialog["id"])
+        progress = _DialogProgress(self._start_dialog(dialog))
+        if self.memory_budget is not None:
+            self.memory_budget.start_dialog(dialog["id"])
+        if self.progress is not None:
+            self.progress.start_dialog(dialog["id"], progress.msg_count)
+
+        # * cast because dialog is tl_types.TypeInputPeer
+        peer = typing.cast(
+            tl_types.TypeInputPeer, telethon.utils.get_peer(dialog["id"])
+        )
         is_broadcast_channel: bool | None = None
-        msg_count = 0
+        page: list[TLMessage] = []
+
+        async def process_page() -> None:
+            nonlocal is_broadcast_channel
+            reformatter = progress.reformatter
+            # * reactions are buffered per page, so an interrupted page leaves no trace
+            page_reactions = new_reaction_columns()
+            page_raw_reactions: dict[int, tl_types.messages.MessageReactionsList] = {}
+            if self.reactions_mode is ReactionsMode.FULL:
+                for m in page:
+                    if is_broadcast_channel is None and isinstance(
+                        m.peer_id, tl_types.PeerChannel
+                    ):
+                        channel = await self.retry_policy.call(
+                            "getEntity", self.client.get_entity, m.peer_id
+                        )
+                        assert isinstance(channel, tl_types.Channel)
+                        is_broadcast_channel = channel.broadcast
+                    if is_broadcast_channel:
+                        # * avoid getting reactions for broadcast channels
+                        continue
+                    reactions_list = await self._get_message_reactions_list(m, peer)
+                    self._touch(dialog["id"], "get_reactions")
+                    reformatter.reformat_reactions(
+                        dialog["id"], m.id, reactions_list, page_reactions
+                    )
+                    if reactions_list is not None:
+                        page_raw_reactions[m.id] = reactions_list
+            elif self.reactions_mode is ReactionsMode.SUMMARY:
+                # * counts are sent with the messages, so no requests are needed
+                reformatter.reformat_reaction_counts(
+                    dialog["id"], page, progress.reaction_counts
+                )
+
+            reformatter.reformat_page(page, progress.messages)
+            if self.peer_directory is not None:
+                # * only the new and changed peers are written, which are rare
+                # * after the first pages, so the directory is updated in place
+                users, chats = collect_peers(page)
+                self.peer_directory.update_users(users)
+                self.peer_directory.update_chats(chats)
+            if self.media_downloader is not None:
+                self._submit_media(page, progress)
+            for key, values in page_reactions.items():
+                progress.reactions[key].extend(values)  # type: ignore
+            if self.raw_archive is not None:
+                progress.raw_messages.extend(page)
+                progress.raw_reactions.update(page_raw_reactions)
+            progress.offset_id = page[-1].id
+            progress.msg_count += len(page)
+            if self.progress is not None:
+                self.progress.advance(dialog["id"], len(page))
+            page.clear()
+
+        messages = self._get_message_iterator(
+            dialog, msg_limit - progress.msg_count, offset_id=progress.offset_id
+        )
+        saving = False
+        try:
+            async for m in messages:
+                page.append(m)
+                if len(page) < MESSAGE_PAGE_SIZE:
+                    continue
+                await process_page()
+                if progress.msg_count % 1000 == 0:
+                    logger.debug(
+                        "dialog #%d: processing message number %d",
+                        dialog["id"],
+                        progress.msg_count,
+                    )
+                if (
+                    progress.unsaved_count >= self.checkpoint_interval
+                    or await self._must_free_memory(dialog, progress)
+                ):
+                    saving = True
+                    await self._save_progress(dialog, progress)
+                    saving = False
+            if page:
+                await process_page()
+        except (asyncio.CancelledError, DeadlineExceededError):
+            logger.warning(
+                "dialog #%d: interrupted after %d messages, saving progress",
+                dialog["id"],
+                progress.msg_count,
+            )
+            # * an interrupted save is dropped on resume, by truncating to the checkpoint
+            if not saving:
+                try:
+                    # * e.g. the media of a stalled download may never arrive
+                    await self._save_progress(
+                        dialog,
+                        progress,
+                        media_timeout=(
+                            self.watchdog.stall_timeout if self.watchdog else None
+                        ),
+                    )
+                except TimeoutError:
+                    logger.error(
+                        "dialog #%d: media isn't downloaded in time, "
+                        "resuming from the previous checkpoint",
+                        dialog["id"],
+                    )
+            raise
+
+        await self._save_progress(dialog, progress)
+        with TRACER.span("commit_messages", "io", dialog_id=dialog["id"]):
+            await asyncio.to_thread(
+                self.message_writer.commit, dialog, progress.reformatter.emojis
+            )
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.remove(dialog["id"])
+        if self.progress is not None:
+            self.progress.finish_dialog(dialog["id"])
+        logger.info("dialog #%d: messages downloaded", dialog["id"])
+
+    async def _must_free_memory(
+        self, dialog: DialogMetadata, progress: "_DialogProgress"
+    ) -> bool:
+        """
+        Count the data buffered by a dialog in the memory budget, and wait until
+        the buffers of all the dialogs fit it, unless this one has to be saved.
+        """
+        if self.memory_budget is None:
+            return False
+        self.memory_budget.update(dialog["id"], progress.count_buffered_bytes())
+        with TRACER.span(
+            "wait_memory",
+            "io",
+            min_duration_us=PAGE_FETCH_MIN_DURATION_US,
+            dialog_id=dialog["id"],
+        ):
+            # * the other dialogs have to save their buffers, which isn't a stall
+            with self._unwatched(dialog["id"], "wait_memory"):
+                return await self.memory_budget.wait_for_room(dialog["id"])
+
+    def _submit_media(self, page: list[TLMessage], progress: "_DialogProgress") -> None:
+        """
+        Schedule the download of the media of a reformatted page.
+        """
+        assert self.media_downloader is not None
+        start = len(progress.messages["id"]) - len(page)
+        media_refs = progress.messages["media_ref"][start:]
+        msg_types = progress.messages["type"][start:]
+        for message, media_ref, msg_type in zip(page, media_refs, msg_types):
+            if media_ref is None:
+                continue
+            task = self.media_downloader.submit(message, media_ref, msg_type)
+            if task is not None:
+                progress.media_tasks.append(task)
+
+    async def _save_progress(
+        self,
+        dialog: DialogMetadata,
+        progress: "_DialogProgress",
+        *,
+        media_timeout: float | None = None,
+    ) -> None:
+        """
+        Append the buffered data of a dialog to its partially written files, flush them
+        to the disk, and save the checkpoint to resume the download from.
+
+        Raises:
+            TimeoutError: if the media isn't downloaded within `media_timeout` seconds,
+                nothing is saved then
+        """
+        if self.memory_budget is not None:
+            self.memory_budget.report(dialog["id"])
+        if progress.media_tasks:
+            # * the saved messages must not reference media, that is still downloading
+            with TRACER.span("wait_media", "network", dialog_id=dialog["id"]):
+                # * the media may be shared with other dialogs, which keep waiting
+                # * for it, if this dialog is cancelled
+                async with asyncio.timeout(media_timeout):
+                    await asyncio.gather(*map(asyncio.shield, progress.media_tasks))
+            self._touch(dialog["id"], "wait_media")
+        clear_missing_media_refs(
+            progress.messages["media_ref"],
+            self.media_downloader.media_store if self.media_downloader else None,
+        )
+        with TRACER.span("write_messages", "io", dialog_id=dialog["id"]):
+            # * writing and compression run in a thread to not block other dialogs
+            await asyncio.to_thread(
+                self.message_writer.append_messages, dialog, progress.messages
+            )
+            if self.reactions_mode is ReactionsMode.FULL:
+                await asyncio.to_thread(
+                    self.message_writer.append_reactions, dialog, progress.reactions
+                )
+            elif self.reactions_mode is ReactionsMode.SUMMARY:
+                await asyncio.to_thread(
+                    self.message_writer.append_reaction_counts,
+                    dialog,
+                    progress.reaction_counts,
+                )
+            if self.raw_archive is not None:
+                with TRACER.span("archive_messages", "io", dialog_id=dialog["id"]):
+                    self.raw_archive.append(
+                        dialog["id"], progress.raw_messages, progress.raw_reactions
+                    )
+            part_sizes = await asyncio.to_thread(self.message_writer.sync_parts, dialog)
+        progress.clear()
+        self._touch(dialog["id"], "write_messages")
+        if self.memory_budget is not None:
+            self.memory_budget.update(dialog["id"], 0)
+
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.write(
+                DialogCheckpoint(
+                    dialog_id=dialog["id"],
+                    offset_id=progress.offset_id,
+                    msg_count=progress.msg_count,
+                    part_sizes=part_sizes,
+                    emojis=progress.reformatter.emojis,
+                    message_filter=serialize_message_filter(self.message_filter),
+                )
+            )
 
-        async for m in self._get_message_iterator(dialog, msg_limit):
-            msg_count += 1
-            if msg_count % 1000 == 0:
-                logger.debug(
-                    "dialog #%d: processing message number %d", dialog["id"], msg_count
+    async def _count_messages(
+        self, dialog: DialogMetadata, msg_limit: int
+    ) -> int | None:
+        """
+        Get the number of messages, that will be downloaded from a dialog,
+        `None` if it can't be counted.
+        """
+        async with self._semaphore:
+            try:
+                total = await count_messages(
+                    self.client, dialog["id"], self.message_filter, self.retry_policy
                 )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("dialog #%d: counting messages: %s", dialog["id"], e)
+                return None
+        return min(total, msg_limit)
 
-            msg_attrs = self._reformat_message(m)
+    async def _download_watched(
+        self, dialog: DialogMetadata, msg_limit: int
+    ) -> bool | None:
+        """
+        Download a dialog in a separate task, that the watchdog can cancel.
 
-            if is_broadcast_channel is None and isinstance(
-                m.peer_id, tl_types.PeerChannel
-            ):
-                channel = await self.client.get_entity(m.peer_id)
-                assert isinstance(channel, tl_types.Channel)
-                is_broadcast_channel = channel.broadcast
-            if not is_broadcast_channel:
-                # * avoid getting reactions for broadcast channels
-                peer = typing.cast(
-                    tl_types.TypeInputPeer, telethon.utils.get_peer(dialog["id"])
-                )  # * cast because dialog is tl_types.TypeInputPeer
-                msg_attrs["reactions"] = {
-                    k: v.emoticon
-                    for k, v in (await self._get_message_reactions(m, peer)).items()
-                }
-
-            dialog_messages.append(msg_attrs)
-
-        self.message_writer.write_messages(dialog, dialog_messages)
-        logger.info("dialog #%d: messages downloaded", dialog["id"])
+        Returns `None` if the download was cancelled, as it stalled.
+        """
+        assert self.watchdog is not None
+        download = asyncio.create_task(self._download_dialog(dialog, msg_limit))
+        self.watchdog.watch(dialog["id"], download)
+        try:
+            # * a cancelled caller cancels the download as well
+            return await download
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            stall_reason = self.watchdog.unwatch(dialog["id"])
+            if stall_reason is None or (current_task and current_task.cancelling()):
+                raise
+            logger.warning("dialog #%d: stopped: %s", dialog["id"], stall_reason)
+            return None
+        finally:
+            self.watchdog.unwatch(dialog["id"])
 
-    async def _semaphored_download_dialog(self, *args, **kwargs):
+    async def _semaphored_download_dialog(
+        self, dialog: DialogMetadata, msg_limit: int
+    ) -> bool | None:
         """
         A utility function to restrict throughput of `_download_dialog` method.
         It is necessary due to Telegram's request rate limits, which produces
         "429 Too Many Requests" errors.
+
+        A stalled download gives up its slot to the waiting dialogs, and is restarted
+        up to `max_restarts` times of the watchdog. Returns `None` if it kept stalling.
         """
-        async with self._semaphore:
-            await self._download_dialog(*args, **kwargs)
+        restarts = 0
+        while True:
+            async with self._semaphore:
+                # * slots are only used to lay out the trace timeline
+                slot = min(set(range(len(self._busy_slots) + 1)) - self._busy_slots)
+                self._busy_slots.add(slot)
+                try:
+                    with TRACER.lane(f"download slot #{slot + 1}"):
+                        if self.watchdog is None:
+                            return await self._download_dialog(dialog, msg_limit)
+                        completed = await self._download_watched(dialog, msg_limit)
+                finally:
+                    self._busy_slots.discard(slot)
+            if completed is not None:
+                return completed
+            if restarts >= self.watchdog.max_restarts:
+                logger.error(
+                    "dialog #%d: stalled %d times, left for the next run",
+                    dialog["id"],
+                    restarts + 1,
+                )
+                return None
+            restarts += 1
+            logger.info(
+                "dialog #%d: requeued from its checkpoint, restart %d",
+                dialog["id"],
+                restarts,
+            )
+
+    async def download_dialog(self, dialog: DialogMetadata, msg_limit: int) -> bool:
+        """
+        Download messages from a single dialog and save them, sharing the limit
+        of the concurrent downloads with `download_dialogs`.
+
+        Returns `False` if the download ran out of time, and has to be resumed.
+
+        Raises:
+            DialogStalledError: if the download kept stalling
+        """
+        completed = await self._semaphored_download_dialog(dialog, msg_limit)
+        if completed is None:
+            raise DialogStalledError(dialog["id"])
+        return completed
 
     async def download_dialogs(
         self, dialogs: list[DialogMetadata], msg_limit: int
@@ -272,6 +908,13 @@ class MessageDownloader:
         Specify the maximum number of messages to download per dialog with `msg_limit`.
         """
         logger.info("downloading messages from %d dialogs...", len(dialogs))
+        if self.progress is not None:
+            with TRACER.span("count_messages", "network"):
+                totals = await asyncio.gather(
+                    *(self._count_messages(dialog, msg_limit) for dialog in dialogs)
+                )
+            for dialog, total in zip(dialogs, totals):
+                self.progress.add_dialog(dialog["id"], dialog["name"], total)
         tasks = []
         for dialog in dialogs:
             # TODO: up for debate: move semaphored download to a decorator
@@ -279,3 +922,60 @@ class MessageDownloader:
         await asyncio.gather(*tasks)
         logger.info("all dialogs downloaded")
         return
+
+
+class _DialogProgress:
+    """
+    Data of a dialog, that was downloaded since the last checkpoint.
+    """
+
+    def __init__(self, checkpoint: DialogCheckpoint | None) -> None:
+        self.offset_id = checkpoint["offset_id"] if checkpoint else 0
+        self.msg_count = checkpoint["msg_count"] if checkpoint else 0
+        self.reformatter = MessageReformatter(
+            checkpoint["emojis"] if checkpoint else None
+        )
+        self.clear()
+
+    @property
+    def unsaved_count(self) -> int:
+        return len(self.messages["id"])
+
+    def count_buffered_bytes(self) -> int:
+        """
+        Get the approximate size of the buffered data, counting only the rows,
+        that were added since the last call.
+        """
+        texts = self.messages["message"]
+        self.buffered_bytes += sum(
+            _MESSAGE_ROW_BYTES + sys.getsizeof(text)
+            for text in texts[self._counted_messages :]
+        )
+        reaction_rows = len(self.reactions["message_id"]) + len(
+            self.reaction_counts["message_id"]
+        )
+        self.buffered_bytes += (
+            reaction_rows - self._counted_reactions
+        ) * _REACTION_ROW_BYTES
+        self.buffered_bytes += (
+            len(self.raw_messages) - self._counted_raw_messages
+        ) * _RAW_MESSAGE_BYTES
+        self._counted_messages = len(texts)
+        self._counted_reactions = reaction_rows
+        self._counted_raw_messages = len(self.raw_messages)
+        return self.buffered_bytes
+
+    def clear(self) -> None:
+        """
+        Start new buffers, once the data was saved.
+        """
+        self.messages = new_message_columns()
+        self.reactions = new_reaction_columns()
+        self.reaction_counts = new_reaction_count_columns()
+        self.raw_messages: list[TLMessage] = []
+        self.raw_reactions: dict[int, tl_types.messages.MessageReactionsList] = {}
+        self.media_tasks: list[asyncio.Task[bool]] = []
+        self.buffered_bytes = 0
+        self._counted_messages = 0
+        self._counted_reactions = 0
+        self._counted_raw_messages = 0
@@ -0,0 +1,288 @@
+import functools
+import mimetypes
+import typing
+
+import telethon
+from telethon.tl import types as tl_types
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.message import (
+    MessageAttributes,
+    MessageColumns,
+    MessageType,
+    PeerID,
+    ReactionColumns,
+    ReactionCountColumns,
+)
+
+# (type, duration, text replacing the message) of a document attribute,
+# `None` if it is not supported
+AttributeInfo = tuple[MessageType, float | None, str | None] | None
+
+# (type, duration, text replacing the message, media reference) of a media,
+# `None` if it is not supported. Media reference is the name of the stored media file:
+# photos and documents are addressed by their Telegram id, which stays the same
+# when the media is forwarded to other dialogs.
+MediaInfo = tuple[MessageType, float | None, str | None, str | None] | None
+
+
+def _sticker_info(attribute: tl_types.DocumentAttributeSticker) -> AttributeInfo:
+    return MessageType.STICKER, None, attribute.alt
+
+
+def _video_info(attribute: tl_types.DocumentAttributeVideo) -> AttributeInfo:
+    return MessageType.VIDEO, attribute.duration, None
+
+
+def _audio_info(attribute: tl_types.DocumentAttributeAudio) -> AttributeInfo:
+    # * only voice messages are collected, not music
+    return (MessageType.VOICE, attribute.duration, None) if attribute.voice else None
+
+
+_DOCUMENT_ATTRIBUTE_HANDLERS: dict[
+    type, typing.Callable[[typing.Any], AttributeInfo]
+] = {
+    tl_types.DocumentAttributeSticker: _sticker_info,
+    tl_types.DocumentAttributeVideo: _video_info,
+    tl_types.DocumentAttributeAudio: _audio_info,
+}
+
+
+@functools.cache
+def _mime_extension(mime_type: str) -> str:
+    # * same as `telethon.utils.get_extension`, but cached, as there are few mime types
+    if mime_type == "application/octet-stream":
+        return ""
+    return mimetypes.guess_extension(mime_type) or ""
+
+
+def _document_info(media: tl_types.MessageMediaDocument) -> MediaInfo:
+    document = media.document
+    if not document or document.__class__ is tl_types.DocumentEmpty:
+        return None
+    for attribute in document.attributes:
+        handler = _DOCUMENT_ATTRIBUTE_HANDLERS.get(attribute.__class__)
+        if handler is not None and (info := handler(attribute)) is not None:
+            msg_type, duration, alt_text = info
+            # * stickers are already represented by their emoji
+            if msg_type is MessageType.STICKER:
+                return msg_type, duration, alt_text, None
+            extension = _mime_extension(document.mime_type)
+            return msg_type, duration, alt_text, f"document-{document.id}{extension}"
+    return None
+
+
+def _photo_info(media: tl_types.MessageMediaPhoto) -> MediaInfo:
+    photo = media.photo
+    if not photo or photo.__class__ is tl_types.PhotoEmpty:
+        return MessageType.PHOTO, None, None, None
+    # * photos are always stored as JPEG by Telegram
+    return MessageType.PHOTO, None, None, f"photo-{photo.id}.jpg"
+
+
+# * `__class__` is used instead of `type()` for the lookups,
+# * so the objects that spoof their class (e.g. mocks) are dispatched as well
+_MEDIA_HANDLERS: dict[type, typing.Callable[[typing.Any], MediaInfo]] = {
+    tl_types.MessageMediaDocument: _document_info,
+    tl_types.MessageMediaPhoto: _photo_info,
+}
+
+# * marked ids, as returned by `telethon.utils.get_peer_id`
+_PEER_ID_CONVERTERS: dict[type, typing.Callable[[typing.Any], int]] = {
+    tl_types.PeerUser: lambda peer: peer.user_id,
+    tl_types.PeerChat: lambda peer: -peer.chat_id,
+    tl_types.PeerChannel: lambda peer: -(1_000_000_000_000 + peer.channel_id),
+}
+
+
+def _get_peer_id(peer: typing.Any) -> PeerID:
+    converter = _PEER_ID_CONVERTERS.get(peer.__class__)
+    if converter is None:
+        # * e.g. already converted ids, or input peers
+        return PeerID(telethon.utils.get_peer_id(peer))
+    return converter(peer)
+
+
+def new_message_columns() -> MessageColumns:
+    """
+    Create an empty columnar message buffer.
+    """
+    return MessageColumns(
+        id=[],
+        date=[],
+        from_id=[],
+        fwd_from=[],
+        message=[],
+        type=[],
+        duration=[],
+        to_id=[],
+        media_ref=[],
+    )
+
+
+def new_reaction_columns() -> ReactionColumns:
+    """
+    Create an empty columnar reaction buffer.
+    """
+    return ReactionColumns(dialog_id=[], message_id=[], peer_id=[], emoji_code=[])
+
+
+def new_reaction_count_columns() -> ReactionCountColumns:
+    """
+    Create an empty columnar reaction count buffer.
+    """
+    return ReactionCountColumns(dialog_id=[], message_id=[], emoji_code=[], count=[])
+
+
+class MessageReformatter:
+    """
+    Class for reformatting pages of Telegram messages into columnar buffers.
+
+    Media and peer types are dispatched through precomputed lookup tables instead of
+    `isinstance` chains, and the output is appended to one list per column, instead of
+    building a dict per message.
+
+    Attributes:
+        emojis (list[str]): dictionary of the reaction emoji, indexed by their code
+    """
+
+    def __init__(self, emojis: list[str] | None = None) -> None:
+        # * emoji can be restored to continue encoding the reactions of a dialog
+        self.emojis: list[str] = list(emojis or [])
+        self._emoji_codes = {emoji: code for code, emoji in enumerate(self.emojis)}
+
+    def reformat_page(
+        self,
+        messages: typing.Sequence[TLMessage],
+        columns: MessageColumns,
+    ) -> None:
+        """
+        Reformat a page of `messages` and append them to the `columns` buffer.
+        """
+        get_peer_id = _get_peer_id
+        media_handlers = _MEDIA_HANDLERS
+        peer_user = tl_types.PeerUser
+        peer_channel = tl_types.PeerChannel
+        text_type = MessageType.TEXT
+        ids = columns["id"]
+        dates = columns["date"]
+        from_ids = columns["from_id"]
+        fwd_from_ids = columns["fwd_from"]
+        texts = columns["message"]
+        types = columns["type"]
+        durations = columns["duration"]
+        to_ids = columns["to_id"]
+        media_refs = columns["media_ref"]
+
+        for message in messages:
+            msg_type = text_type
+            duration = None
+            media_ref = None
+            text = message.message or ""
+            if media := message.media:
+                handler = media_handlers.get(media.__class__)
+                if handler is not None and (info := handler(media)) is not None:
+                    msg_type, duration, alt_text, media_ref = info
+                    if alt_text is not None:
+                        text = alt_text
+
+            # * most senders are users, whose peer id doesn't need a conversion
+            from_id = message.from_id
+            if not from_id:
+                from_ids.append(None)
+            elif from_id.__class__ is peer_user:
+                from_ids.append(from_id.user_id)
+            else:
+                from_ids.append(get_peer_id(from_id))
+
+            fwd_from = message.fwd_from
+            fwd_from_id = fwd_from.from_id if fwd_from else None
+            fwd_from_ids.append(get_peer_id(fwd_from_id) if fwd_from_id else None)
+
+            to_id = message.to_id
+            if to_id.__class__ is peer_channel:
+                to_ids.append(-(1_000_000_000_000 + to_id.channel_id))
+            else:
+                to_ids.append(get_peer_id(to_id))
+
+            ids.append(message.id)
+            dates.append(message.date)
+            texts.append(text)
+            types.append(msg_type)
+            durations.append(duration)
+            media_refs.append(media_ref)
+
+    def reformat_reactions(
+        self,
+        dialog_id: int,
+        message_id: int,
+        result: tl_types.messages.MessageReactionsList | None,
+        reactions: ReactionColumns,
+    ) -> None:
+        """
+        Append emoji reactions of a message from the raw reactions list
+        to the `reactions` buffer, registering new emoji in `emojis`.
+        """
+        if result is None:
+            return
+        for reaction_object in result.reactions:
+            reaction = reaction_object.reaction
+            if reaction.__class__ is not tl_types.ReactionEmoji:
+                continue
+            reactions["dialog_id"].append(dialog_id)
+            reactions["message_id"].append(message_id)
+            reactions["peer_id"].append(_get_peer_id(reaction_object.peer_id))
+            reactions["emoji_code"].append(self._encode_emoji(reaction.emoticon))
+
+    def reformat_reaction_counts(
+        self,
+        dialog_id: int,
+        messages: typing.Sequence[TLMessage],
+        reaction_counts: ReactionCountColumns,
+    ) -> None:
+        """
+        Append emoji reaction counts, that Telegram sends together with the `messages`,
+        to the `reaction_counts` buffer, registering new emoji in `emojis`.
+        """
+        for message in messages:
+            if message.reactions:
+                self.reformat_message_reaction_counts(
+                    dialog_id, message.id, message.reactions, reaction_counts
+                )
+
+    def reformat_message_reaction_counts(
+        self,
+        dialog_id: int,
+        message_id: int,
+        reactions: tl_types.MessageReactions,
+        reaction_counts: ReactionCountColumns,
+    ) -> None:
+        """
+        Append emoji reaction counts of a message to the `reaction_counts` buffer,
+        registering new emoji in `emojis`.
+        """
+        for result in reactions.results:
+            reaction = result.reaction
+            if reaction.__class__ is not tl_types.ReactionEmoji:
+                continue
+            reaction_counts["dialog_id"].append(dialog_id)
+            reaction_counts["message_id"].append(message_id)
+            reaction_counts["emoji_code"].append(self._encode_emoji(reaction.emoticon))
+            reaction_counts["count"].append(result.count)
+
+    def _encode_emoji(self, emoji: str) -> int:
+        emoji_code = self._emoji_codes.get(emoji)
+        if emoji_code is None:
+            emoji_code = self._emoji_codes[emoji] = len(self.emojis)
+            self.emojis.append(emoji)
+        return emoji_code
+
+    def reformat_message(self, message: TLMessage) -> MessageAttributes:
+        """
+        Reformat a single message to a more convenient data structure.
+        """
+        columns = new_message_columns()
+        self.reformat_page([message], columns)
+        return typing.cast(
+            MessageAttributes, {key: values[0] for key, values in columns.items()}
+        )
@@ -0,0 +1,86 @@
+import typing
+
+import telethon
+from telethon.tl import types as tl_types
+from telethon.tl.custom.message import Message as TLMessage
+
+from ..dict_types.dialog import ChatData, DialogMemberData, DialogType
+
+# Chats and channels, that have a title, the empty chats are skipped.
+_TITLED_CHAT_TYPES = (
+    tl_types.Chat,
+    tl_types.ChatForbidden,
+    tl_types.Channel,
+    tl_types.ChannelForbidden,
+)
+
+
+class PeerDirectory(typing.Protocol):
+    def update_users(self, users: typing.Iterable[DialogMemberData]) -> int: ...
+
+    def update_chats(self, chats: typing.Iterable[ChatData]) -> int: ...
+
+
+def get_dialog_type(entity: typing.Any) -> DialogType:
+    """
+    Get the type of the dialog with a user, chat or channel `entity`.
+    """
+    if isinstance(entity, tl_types.User):
+        return DialogType.PRIVATE
+    if isinstance(entity, (tl_types.Chat, tl_types.ChatForbidden)) or getattr(
+        entity, "megagroup", False
+    ):
+        return DialogType.GROUP
+    if isinstance(entity, (tl_types.Channel, tl_types.ChannelForbidden)):
+        return DialogType.CHANNEL
+    return DialogType.UNKNOWN
+
+
+def user_record(user: tl_types.User) -> DialogMemberData:
+    return DialogMemberData(
+        user_id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        username=user.username,
+        phone=user.phone,
+    )
+
+
+def chat_record(
+    chat: tl_types.Chat
+    | tl_types.ChatForbidden
+    | tl_types.Channel
+    | tl_types.ChannelForbidden,
+) -> ChatData:
+    return ChatData(
+        chat_id=telethon.utils.get_peer_id(chat),
+        title=chat.title,
+        username=getattr(chat, "username", None),
+        type=get_dialog_type(chat),
+    )
+
+
+def collect_peers(
+    messages: typing.Iterable[TLMessage],
+) -> tuple[list[DialogMemberData], list[ChatData]]:
+    """
+    Collect the records of the senders, dialogs and forward sources of `messages`.
+
+    Telegram sends these entities with every page of messages, so no requests are made.
+    Each peer is collected once.
+    """
+    users: dict[int, DialogMemberData] = {}
+    chats: dict[int, ChatData] = {}
+    for message in messages:
+        entities = [message.sender, message.chat]
+        if message.forward is not None:
+            entities += [message.forward.sender, message.forward.chat]
+        for entity in entities:
+            if isinstance(entity, tl_types.User):
+                if entity.id not in users:
+                    users[entity.id] = user_record(entity)
+            elif isinstance(entity, _TITLED_CHAT_TYPES):
+                chat_id = telethon.utils.get_peer_id(entity)
+                if chat_id not in chats:
+                    chats[chat_id] = chat_record(entity)
+    return list(users.values()), list(chats.values())
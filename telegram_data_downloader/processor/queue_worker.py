@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import typing
+
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.queue import WorkUnit
+from ..tracing import TRACER
+from .message_downloader import DialogReader
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue(typing.Protocol):
+    def lease(self, worker_id: str) -> WorkUnit | None: ...
+
+    def heartbeat(self, dialog_id: int, worker_id: str) -> bool: ...
+
+    def complete(self, dialog_id: int, worker_id: str) -> bool: ...
+
+    def release(
+        self, dialog_id: int, worker_id: str, error: str | None = None
+    ) -> bool: ...
+
+    def has_unfinished(self) -> bool: ...
+
+
+class SingleDialogDownloader(typing.Protocol):
+    async def download_dialog(self, dialog: DialogMetadata, msg_limit: int) -> bool: ...
+
+
+class _LeaseLostError(Exception):
+    """
+    Raised in a download, once its lease was taken by another worker.
+    """
+
+
+class QueueWorker:
+    """
+    Class for downloading the dialogs, that are leased from a shared work queue,
+    until every dialog of the queue is done.
+
+    The lease of a dialog is extended by heartbeats while it downloads. If the lease
+    is lost, e.g. after the worker was paused for longer than the lease, the download
+    is cancelled, as another worker took it over. Until then both workers write
+    the dialog, so `heartbeat_interval` should be a small part of the lease duration.
+    A failed download is released to the queue, and is resumed from its checkpoint
+    by the next lease. A download, that ran out of time, is released without
+    an error, so large dialogs aren't failed by `max_attempts` of the queue.
+
+    Attributes:
+        queue (WorkQueue): queue of the dialog downloads
+        dialog_reader (DialogReader): Dialog reader for the metadata of the dialogs
+        message_downloader (SingleDialogDownloader): downloader of the leased dialogs
+        worker_id (str): name of the worker, unique across the machines
+        concurrency (int): number of dialogs, that are leased at once
+        heartbeat_interval (float): time between the heartbeats, in seconds
+        poll_interval (float): time between the leases, while other workers hold
+            all the remaining dialogs, in seconds
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        dialog_reader: DialogReader,
+        message_downloader: SingleDialogDownloader,
+        *,
+        worker_id: str,
+        concurrency: int = 5,
+        heartbeat_interval: float = 60.0,
+        poll_interval: float = 60.0,
+    ) -> None:
+        self.queue = queue
+        self.dialog_reader = dialog_reader
+        self.message_downloader = message_downloader
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+
+    async def run(self) -> int:
+        """
+        Download the dialogs of the queue, until none is left to lease.
+
+        Returns the number of dialogs, that were completed by this worker.
+        """
+        logger.info("worker %s: started", self.worker_id)
+        completed = sum(
+            await asyncio.gather(*(self._work() for _ in range(self.concurrency)))
+        )
+        logger.info("worker %s: completed %d dialogs", self.worker_id, completed)
+        return completed
+
+    async def _work(self) -> int:
+        completed = 0
+        while True:
+            unit = await asyncio.to_thread(self.queue.lease, self.worker_id)
+            if unit is None:
+                # * the leases of the other workers can still expire
+                if not await asyncio.to_thread(self.queue.has_unfinished):
+                    return completed
+                await asyncio.sleep(self.poll_interval)
+                continue
+            completed += await self._process(unit)
+
+    async def _process(self, unit: WorkUnit) -> bool:
+        dialog_id = unit["dialog_id"]
+        logger.info("dialog #%d: leased, attempt %d", dialog_id, unit["attempts"])
+        try:
+            dialog = self.dialog_reader.read_dialog(dialog_id)
+            with TRACER.span("queue_unit", "dialog", dialog_id=dialog_id):
+                completed = await self._download_leased(dialog, unit["msg_limit"])
+        except _LeaseLostError:
+            return False
+        except asyncio.CancelledError:
+            # * the worker is stopped, the dialog is resumed by the next lease
+            await asyncio.to_thread(self.queue.release, dialog_id, self.worker_id)
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("dialog #%d: failed: %r", dialog_id, e)
+            await asyncio.to_thread(
+                self.queue.release, dialog_id, self.worker_id, repr(e)
+            )
+            return False
+
+        if not completed:
+            # * the dialog made progress until its deadline, so it isn't an error
+            await asyncio.to_thread(self.queue.release, dialog_id, self.worker_id)
+            return False
+        return await asyncio.to_thread(self.queue.complete, dialog_id, self.worker_id)
+
+    async def _download_leased(self, dialog: DialogMetadata, msg_limit: int) -> bool:
+        """
+        Download a dialog, while extending its lease.
+
+        Raises:
+            _LeaseLostError: if the lease was taken by another worker
+        """
+        download = asyncio.create_task(
+            self.message_downloader.download_dialog(dialog, msg_limit)
+        )
+        try:
+            while not download.done():
+                await asyncio.wait([download], timeout=self.heartbeat_interval)
+                if download.done():
+                    break
+                if not await asyncio.to_thread(
+                    self.queue.heartbeat, dialog["id"], self.worker_id
+                ):
+                    raise _LeaseLostError(dialog["id"])
+        except BaseException:
+            # * a cancelled download saves its progress before it stops
+            download.cancel()
+            await asyncio.wait([download])
+            raise
+        return download.result()
@@ -0,0 +1,258 @@
+import asyncio
+import collections
+import logging
+import typing
+from datetime import datetime
+
+import telethon
+from telethon.tl import functions as tl_functions
+from telethon.tl import types as tl_types
+
+from ..dict_types.dialog import DialogMetadata
+from ..dict_types.message import ReactionColumns, ReactionCountColumns, ReactionsMode
+from ..retry import RetryPolicy
+from ..tracing import TRACER
+from .message_reformatter import (
+    MessageReformatter,
+    new_reaction_columns,
+    new_reaction_count_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of messages, whose reaction counts are requested at once.
+REACTIONS_BATCH_SIZE = 100
+
+# Reaction counts of the messages, as {message id: {emoji code: count}}.
+_MessageCounts = dict[int, dict[int, int]]
+
+
+class StoredReactionReader(typing.Protocol):
+    def read_message_ids(self, dialog_id: int, since: datetime) -> list[int]: ...
+
+    def read_emojis(self, dialog_id: int) -> list[str]: ...
+
+    def read_reaction_columns(self, dialog_id: int) -> ReactionColumns: ...
+
+    def read_reaction_count_columns(self, dialog_id: int) -> ReactionCountColumns: ...
+
+
+class ReactionPatcher(typing.Protocol):
+    def patch_reactions(
+        self,
+        dialog: DialogMetadata,
+        message_ids: list[int],
+        emojis: list[str],
+        *,
+        reactions: ReactionColumns | None = None,
+        reaction_counts: ReactionCountColumns | None = None,
+    ) -> None: ...
+
+
+def _counts_of_reactions(reactions: ReactionColumns) -> _MessageCounts:
+    counts: _MessageCounts = collections.defaultdict(dict)
+    for message_id, emoji_code in zip(reactions["message_id"], reactions["emoji_code"]):
+        message_counts = counts[message_id]
+        message_counts[emoji_code] = message_counts.get(emoji_code, 0) + 1
+    return counts
+
+
+def _counts_of_reaction_counts(reaction_counts: ReactionCountColumns) -> _MessageCounts:
+    counts: _MessageCounts = collections.defaultdict(dict)
+    for message_id, emoji_code, count in zip(
+        reaction_counts["message_id"],
+        reaction_counts["emoji_code"],
+        reaction_counts["count"],
+    ):
+        counts[message_id][emoji_code] = count
+    return counts
+
+
+class ReactionRefresher:
+    """
+    Class for updating the reactions of the downloaded messages, which keep changing
+    after the download, without downloading the messages again.
+
+    Current reaction counts are requested in batches of `REACTIONS_BATCH_SIZE` messages.
+    In the summary mode, they replace the saved counts. In the full mode, the lists
+    of reactions are only requested for the messages, whose counts don't match
+    the saved reactions.
+
+    Attributes:
+        client (telethon.TelegramClient): Telegram client for fetching the reactions
+        message_reader (StoredReactionReader): reader of the downloaded messages
+        message_writer (ReactionPatcher): writer, that replaces the saved reactions
+        reactions_mode (ReactionsMode): which reaction data was downloaded
+        reactions_limit_per_message (int): maximum amount of reactions to fetch per message
+        retry_policy (RetryPolicy): policy for repeating the failed Telegram requests
+        concurrency (int): number of dialogs, that are refreshed concurrently
+    """
+
+    def __init__(
+        self,
+        client: telethon.TelegramClient,
+        message_reader: StoredReactionReader,
+        message_writer: ReactionPatcher,
+        *,
+        reactions_mode: ReactionsMode = ReactionsMode.SUMMARY,
+        reactions_limit_per_message: int = 100,
+        retry_policy: RetryPolicy | None = None,
+        concurrency: int = 5,
+    ) -> None:
+        self.client = client
+        self.message_reader = message_reader
+        self.message_writer = message_writer
+        self.reactions_mode = reactions_mode
+        self.reactions_limit_per_message = reactions_limit_per_message
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.concurrency = concurrency
+
+    async def refresh_dialogs(
+        self, dialogs: list[DialogMetadata], since: datetime
+    ) -> dict[int, int]:
+        """
+        Refresh the reactions of the messages of `dialogs`, that were sent
+        at or after `since`.
+
+        Returns the number of messages with changed reactions per dialog id.
+        """
+        if self.reactions_mode is ReactionsMode.NONE:
+            logger.warning("reactions are not collected, nothing to refresh")
+            return {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(dialog: DialogMetadata) -> tuple[int, int]:
+            async with semaphore:
+                with TRACER.span("refresh_reactions", "dialog", dialog_id=dialog["id"]):
+                    return dialog["id"], await self._refresh_dialog(dialog, since)
+
+        changed = dict(await asyncio.gather(*(refresh(dialog) for dialog in dialogs)))
+        logger.info(
+            "reactions of %d messages in %d dialogs changed",
+            sum(changed.values()),
+            sum(1 for count in changed.values() if count),
+        )
+        return changed
+
+    async def _refresh_dialog(self, dialog: DialogMetadata, since: datetime) -> int:
+        dialog_id = dialog["id"]
+        try:
+            message_ids = await asyncio.to_thread(
+                self.message_reader.read_message_ids, dialog_id, since
+            )
+        except FileNotFoundError:
+            logger.warning("dialog #%d: messages not downloaded, skipping", dialog_id)
+            return 0
+        if not message_ids:
+            return 0
+
+        # * new emoji get the codes after the saved ones, so the saved codes stay valid
+        reformatter = MessageReformatter(self.message_reader.read_emojis(dialog_id))
+        # * cast because dialog is tl_types.TypeInputPeer
+        peer = typing.cast(tl_types.TypeInputPeer, telethon.utils.get_peer(dialog_id))
+        reaction_counts = new_reaction_count_columns()
+        try:
+            for start in range(0, len(message_ids), REACTIONS_BATCH_SIZE):
+                batch = message_ids[start : start + REACTIONS_BATCH_SIZE]
+                for message_id, reactions in (
+                    await self._get_reaction_counts(peer, batch)
+                ).items():
+                    reformatter.reformat_message_reaction_counts(
+                        dialog_id, message_id, reactions, reaction_counts
+                    )
+        except telethon.errors.RPCError as e:
+            logger.error("dialog #%d: getting reactions: %s", dialog_id, e)
+            return 0
+
+        current = _counts_of_reaction_counts(reaction_counts)
+        if self.reactions_mode is ReactionsMode.SUMMARY:
+            saved = _counts_of_reaction_counts(
+                self.message_reader.read_reaction_count_columns(dialog_id)
+            )
+        else:
+            saved = _counts_of_reactions(
+                self.message_reader.read_reaction_columns(dialog_id)
+            )
+        changed = [
+            message_id
+            for message_id in message_ids
+            if current.get(message_id, {}) != saved.get(message_id, {})
+        ]
+        if not changed:
+            logger.debug("dialog #%d: reactions didn't change", dialog_id)
+            return 0
+
+        if self.reactions_mode is ReactionsMode.SUMMARY:
+            await asyncio.to_thread(
+                self.message_writer.patch_reactions,
+                dialog,
+                message_ids,
+                reformatter.emojis,
+                reaction_counts=reaction_counts,
+            )
+        else:
+            reactions = new_reaction_columns()
+            try:
+                for message_id in changed:
+                    reformatter.reformat_reactions(
+                        dialog_id,
+                        message_id,
+                        await self._get_reactions_list(peer, message_id),
+                        reactions,
+                    )
+            except telethon.errors.BroadcastForbiddenError:
+                logger.debug(
+                    "dialog #%d: channel is broadcast, no reactions", dialog_id
+                )
+                return 0
+            await asyncio.to_thread(
+                self.message_writer.patch_reactions,
+                dialog,
+                changed,
+                reformatter.emojis,
+                reactions=reactions,
+            )
+        logger.info(
+            "dialog #%d: reactions of %d messages changed", dialog_id, len(changed)
+        )
+        return len(changed)
+
+    async def _get_reaction_counts(
+        self, peer: tl_types.TypeInputPeer, message_ids: list[int]
+    ) -> dict[int, tl_types.MessageReactions]:
+        """
+        Get the current reaction counts of the messages, by message id.
+        Messages without reactions can be missing.
+        """
+        with TRACER.span("get_reaction_counts", "network", messages=len(message_ids)):
+            updates: tl_types.TypeUpdates = await self.retry_policy.call(
+                "messages.getMessagesReactions",
+                self.client,
+                tl_functions.messages.GetMessagesReactionsRequest(
+                    peer=peer, id=message_ids
+                ),
+            )
+        return {
+            update.msg_id: update.reactions
+            for update in getattr(updates, "updates", [])
+            if isinstance(update, tl_types.UpdateMessageReactions)
+        }
+
+    async def _get_reactions_list(
+        self, peer: tl_types.TypeInputPeer, message_id: int
+    ) -> tl_types.messages.MessageReactionsList | None:
+        """
+        Get the reactions of a message with the reacting peers, `None` if the message
+        no longer exists.
+        """
+        try:
+            with TRACER.span("get_reactions", "network", message_id=message_id):
+                return await self.retry_policy.call(
+                    "messages.getMessageReactionsList",
+                    self.client,
+                    tl_functions.messages.GetMessageReactionsListRequest(
+                        peer=peer, id=message_id, limit=self.reactions_limit_per_message
+                    ),
+                )
+        except telethon.errors.MsgIdInvalidError:
+            return None
@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+import logging
+import sys
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+# Number of the downloading dialogs, that are listed in the live view.
+LIVE_VIEW_DIALOGS = 10
+
+
+def _format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+class _DialogStatus:
+    def __init__(self, name: str, total: int | None) -> None:
+        self.name = name
+        self.total = total
+        # * the messages downloaded by the earlier runs don't count to the rate
+        self.initial = 0
+        self.done = 0
+        self.started_at: float | None = None
+        self.finished = False
+
+    @property
+    def remaining(self) -> int:
+        if self.finished or self.total is None:
+            return 0
+        return max(self.total - self.done, 0)
+
+
+class ProgressTracker:
+    """
+    Class for tracking how many messages of the dialogs are downloaded, and estimating
+    when the download finishes.
+
+    The totals of the dialogs are known up front, the rates are measured over the wall
+    time, so the time lost to flood waits and retries is included in the estimates.
+
+    Attributes:
+        clock (Callable[[], float]): source of the monotonic time, in seconds
+    """
+
+    def __init__(self, *, clock: typing.Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self._dialogs: dict[int, _DialogStatus] = {}
+        self._started_at = clock()
+
+    def add_dialog(self, dialog_id: int, name: str, total: int | None) -> None:
+        """
+        Add a dialog to download, with its total number of messages,
+        `None` if it's unknown.
+        """
+        self._dialogs[dialog_id] = _DialogStatus(name, total)
+
+    def start_dialog(self, dialog_id: int, done: int = 0) -> None:
+        """
+        Start measuring a dialog, `done` messages of which were downloaded before.
+        A dialog, that is restarted (e.g. after a stall), keeps the messages
+        downloaded by this run in its rate.
+        """
+        dialog = self._dialogs.setdefault(
+            dialog_id, _DialogStatus(str(dialog_id), None)
+        )
+        if dialog.started_at is None:
+            dialog.initial = done
+            dialog.started_at = self.clock()
+        else:
+            dialog.initial = min(dialog.initial, done)
+        dialog.done = done
+
+    def advance(self, dialog_id: int, count: int) -> None:
+        self._dialogs[dialog_id].done += count
+
+    def finish_dialog(self, dialog_id: int) -> None:
+        self._dialogs[dialog_id].finished = True
+
+    @property
+    def done(self) -> int:
+        return sum(dialog.done for dialog in self._dialogs.values())
+
+    @property
+    def total(self) -> int | None:
+        """
+        Total number of the messages to download, `None` if some totals are unknown.
+        """
+        totals = [dialog.total for dialog in self._dialogs.values()]
+        if None in totals:
+            return None
+        return sum(typing.cast(list[int], totals))
+
+    @property
+    def rate(self) -> float:
+        """
+        Number of the messages downloaded per second since the start.
+        """
+        elapsed = self.clock() - self._started_at
+        downloaded = sum(
+            dialog.done - dialog.initial for dialog in self._dialogs.values()
+        )
+        return downloaded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """
+        Estimated number of seconds to download the rest of the dialogs, with unknown
+        totals left out, `None` until the rate is measured.
+        """
+        rate = self.rate
+        if not rate:
+            return None
+        return sum(dialog.remaining for dialog in self._dialogs.values()) / rate
+
+    def dialog_lines(self, limit: int = LIVE_VIEW_DIALOGS) -> list[str]:
+        """
+        Describe the progress of the dialogs, that are being downloaded.
+        """
+        now = self.clock()
+        lines = []
+        active = [
+            dialog
+            for dialog in self._dialogs.values()
+            if dialog.started_at is not None and not dialog.finished
+        ]
+        for dialog in active[:limit]:
+            elapsed = now - typing.cast(float, dialog.started_at)
+            rate = (dialog.done - dialog.initial) / elapsed if elapsed > 0 else 0.0
+            total = "?" if dialog.total is None else str(dialog.total)
+            eta = dialog.remaining / rate if rate and dialog.total is not None else None
+            lines.append(
+                f"  {dialog.name[:30]:30} {dialog.done:>9}/{total:<9} "
+                f"{rate:>7.1f} msg/s  ETA {_format_duration(eta)}"
+            )
+        if len(active) > limit:
+            lines.append(f"  ... and {len(active) - limit} more dialogs")
+        return lines
+
+    def summary_line(self) -> str:
+        finished = sum(dialog.finished for dialog in self._dialogs.values())
+        total = self.total
+        if total:
+            messages = f"{self.done}/{total} messages ({self.done / total:.0%})"
+        else:
+            messages = f"{self.done}/? messages"
+        return (
+            f"{finished}/{len(self._dialogs)} dialogs, {messages}, "
+            f"{self.rate:.1f} msg/s, ETA {_format_duration(self.eta)}"
+        )
+
+
+class ProgressView:
+    """
+    Class for showing the progress of a download, while it runs.
+
+    On a terminal, the summary and the downloading dialogs are redrawn in place below
+    the log lines. Otherwise, e.g. when the output is redirected to a file,
+    the summary is logged periodically.
+
+    Attributes:
+        tracker (ProgressTracker): progress of the download
+        interval (float): time between the redraws on a terminal, in seconds
+        log_interval (float): time between the logged summaries, in seconds
+        stream (TextIO): terminal to draw the live view on
+    """
+
+    def __init__(
+        self,
+        tracker: ProgressTracker,
+        *,
+        interval: float = 1.0,
+        log_interval: float = 60.0,
+        stream: typing.TextIO = sys.stderr,
+    ) -> None:
+        self.tracker = tracker
+        self.interval = interval
+        self.log_interval = log_interval
+        self.stream = stream
+        self._drawn_lines = 0
+        # * log records are also written by the worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def is_live(self) -> bool:
+        return self.stream.isatty()
+
+    def draw(self) -> None:
+        lines = [self.tracker.summary_line(), *self.tracker.dialog_lines()]
+        with self._lock:
+            self._clear()
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self._drawn_lines = len(lines)
+
+    def clear(self) -> None:
+        """
+        Erase the drawn view, so the next output starts in its place.
+        """
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        if self._drawn_lines:
+            # * move to the first line of the view and erase to the end of the screen
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self.stream.flush()
+            self._drawn_lines = 0
+
+    def filter(self, _record: logging.LogRecord) -> bool:
+        """
+        Erase the view before a log record is written, so the records aren't mixed
+        with the view. Used as a filter of the log handlers.
+        """
+        self.clear()
+        return True
+
+    async def run(self) -> None:
+        """
+        Show the progress until cancelled.
+        """
+        if self.is_live:
+            await self._run_live()
+            return
+        try:
+            while True:
+                await asyncio.sleep(self.log_interval)
+                logger.info("progress: %s", self.tracker.summary_line())
+        finally:
+            logger.info("progress: %s", self.tracker.summary_line())
+
+    async def _run_live(self) -> None:
+        handlers = logging.getLogger("telegram_data_downloader").handlers
+        for handler in handlers:
+            handler.addFilter(self.filter)
+        try:
+            while True:
+                self.draw()
+                await asyncio.sleep(self.interval)
+        finally:
+            for handler in handlers:
+                handler.removeFilter(self.filter)
+            # * the last state is left on the screen
+            self.draw()
+
+    @contextlib.asynccontextmanager
+    async def running(self) -> typing.AsyncIterator["ProgressView"]:
+        """
+        Show the progress while the body of the `with` block runs.
+        """
+        task = asyncio.create_task(self.run(), name="progress view")
+        try:
+            yield self
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
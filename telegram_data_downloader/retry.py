@@ -0,0 +1,346 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import time
+import typing
+
+import telethon
+
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+# Errors, that are caused by Telegram or the connection rather than by the request,
+# so the same request can succeed when it is repeated.
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = (
+    telethon.errors.FloodWaitError,
+    telethon.errors.common.InvalidBufferError,
+    telethon.errors.ServerError,
+    telethon.errors.RpcCallFailError,
+    telethon.errors.TimedOutError,
+    ConnectionError,
+    TimeoutError,
+)
+
+# monotonic time, until which the current dialog has to be processed
+_dialog_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "retry_dialog_deadline", default=None
+)
+
+# makes the context, that the retry sleeps of the current dialog are made in
+_sleep_context: contextvars.ContextVar[
+    typing.Callable[[], typing.ContextManager[None]] | None
+] = contextvars.ContextVar("retry_sleep_context", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """
+    Exception raised when a request can't be completed before the deadline
+    of the current dialog.
+    """
+
+
+@contextlib.contextmanager
+def dialog_deadline(seconds: float | None) -> typing.Iterator[None]:
+    """
+    Limit the time of all the requests, that are made by the current task inside
+    the `with` block, including the retries. `None` means no limit.
+
+    Nested deadlines can only make the limit shorter.
+    """
+    if seconds is None:
+        yield
+        return
+
+    deadline = time.monotonic() + seconds
+    outer_deadline = _dialog_deadline.get()
+    if outer_deadline is not None:
+        deadline = min(deadline, outer_deadline)
+    token = _dialog_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _dialog_deadline.reset(token)
+
+
+@contextlib.contextmanager
+def retry_sleep_context(
+    make_context: typing.Callable[[], typing.ContextManager[None]],
+) -> typing.Iterator[None]:
+    """
+    Make the retry, flood and circuit breaker sleeps of the current task inside
+    the `with` block within the contexts, that are made by `make_context`, e.g. to
+    pause a stall watchdog, that would take a long flood wait for a stall.
+    """
+    token = _sleep_context.set(make_context)
+    try:
+        yield
+    finally:
+        _sleep_context.reset(token)
+
+
+def _time_left() -> float | None:
+    deadline = _dialog_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single Telegram method.
+
+    After `failure_threshold` consecutive failures, the breaker opens for `reset_time`
+    seconds, and the calls wait instead of sending requests, that are likely to fail.
+    Then a call is let through: its success closes the breaker, and its failure
+    opens the breaker again.
+
+    Attributes:
+        failure_threshold (int): number of consecutive failures, that open the breaker
+        reset_time (float): seconds, for which the breaker stays open
+    """
+
+    def __init__(self, failure_threshold: int, reset_time: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_time = reset_time
+        self._failures = 0
+        self._open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.time_until_closed() > 0
+
+    def time_until_closed(self) -> float:
+        """
+        Seconds until the next call is let through, 0 if the breaker is closed.
+        """
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self.open_for(self.reset_time)
+
+    def open_for(self, seconds: float) -> None:
+        """
+        Keep the breaker open for at least `seconds`, e.g. for a flood wait,
+        that Telegram applies to all the calls of the method.
+        """
+        self._open_until = max(self._open_until, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """
+    Policy for repeating Telegram requests, that failed with a transient error.
+
+    - `FloodWaitError` is waited out for the number of seconds Telegram asked for.
+      Other calls of the same method wait as well, instead of hitting the same limit.
+    - Other transient errors are retried with decorrelated jitter, so concurrent dialogs
+      don't retry in lockstep.
+    - Each attempt is limited by `call_timeout`, and all the attempts together are
+      limited by the deadline of the current dialog, see `dialog_deadline`.
+    - Each method has a `CircuitBreaker`, that pauses its calls after
+      repeated failures.
+
+    Attributes:
+        base_sleep_time (float): minimum sleep between the attempts, in seconds
+        max_sleep_time (float): maximum sleep between the attempts, in seconds
+        max_tries (int): maximum number of attempts of a single call
+        call_timeout (float | None): maximum duration of a single attempt, in seconds
+        flood_wait_max (float): longest flood wait, that is waited out, in seconds.
+            Longer flood waits are raised immediately.
+        breaker_failure_threshold (int): consecutive failures, that open the breaker
+        breaker_reset_time (float): seconds, for which the breaker stays open
+        retry_exceptions (tuple[type[BaseException], ...]): errors, that are retried
+    """
+
+    def __init__(
+        self,
+        *,
+        base_sleep_time: float = 1.0,
+        max_sleep_time: float = 60.0,
+        max_tries: int = 5,
+        call_timeout: float | None = 120.0,
+        flood_wait_max: float = 300.0,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_time: float = 30.0,
+        retry_exceptions: tuple[type[BaseException], ...] = TRANSIENT_ERRORS,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.base_sleep_time = base_sleep_time
+        self.max_sleep_time = max_sleep_time
+        self.max_tries = max_tries
+        self.call_timeout = call_timeout
+        self.flood_wait_max = flood_wait_max
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_time = breaker_reset_time
+        self.retry_exceptions = retry_exceptions
+        self._rng = rng or random.Random()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, method: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of a method, creating it on the first use.
+        """
+        breaker = self._breakers.get(method)
+        if breaker is None:
+            breaker = self._breakers[method] = CircuitBreaker(
+                self.breaker_failure_threshold, self.breaker_reset_time
+            )
+        return breaker
+
+    def _next_sleep_time(self, previous: float) -> float:
+        # * "decorrelated jitter": the next sleep is random, but grows with the previous
+        upper = max(self.base_sleep_time, previous * 3)
+        return min(self.max_sleep_time, self._rng.uniform(self.base_sleep_time, upper))
+
+    async def _sleep(
+        self, method: str, seconds: float, error: BaseException | None
+    ) -> None:
+        time_left = _time_left()
+        if time_left is not None and seconds >= time_left:
+            raise DeadlineExceededError(
+                f"{method}: deadline is reached in {time_left:.2f}s, "
+                f"can't wait {seconds:.2f}s more"
+            ) from error
+        make_context = _sleep_context.get()
+        with (
+            make_context() if make_context else contextlib.nullcontext(),
+            TRACER.span(
+                "retry_sleep",
+                "retry",
+                function=method,
+                error=error.__class__.__name__ if error else "CircuitOpen",
+            ),
+        ):
+            await asyncio.sleep(seconds)
+
+    def _attempt_timeout(self) -> float | None:
+        time_left = _time_left()
+        if time_left is None:
+            return self.call_timeout
+        if time_left <= 0:
+            raise DeadlineExceededError("deadline of the dialog is reached")
+        if self.call_timeout is None:
+            return time_left
+        return min(self.call_timeout, time_left)
+
+    async def call(
+        self,
+        method: str,
+        func: typing.Callable[..., typing.Awaitable[T]],
+        *args: typing.Any,
+        **kwargs: typing.Any,
+    ) -> T:
+        """
+        Await `func(*args, **kwargs)`, retrying it on transient errors.
+
+        Args:
+            method (str): name of the Telegram method, that is called by `func`.
+                Calls with the same name share a circuit breaker.
+
+        Raises:
+            DeadlineExceededError: if the deadline of the dialog is reached
+        """
+        return await self._call(method, None, func, args, kwargs)
+
+    async def recover(
+        self,
+        method: str,
+        error: BaseException,
+        func: typing.Callable[..., typing.Awaitable[T]],
+        *args: typing.Any,
+        **kwargs: typing.Any,
+    ) -> T:
+        """
+        Continue like `call`, after the first attempt of `func` was made without
+        the policy and failed with `error`. This is meant for the calls, that are
+        too frequent for `call`, e.g. the steps of a message iterator, that are
+        answered from its buffer most of the time.
+
+        Raises:
+            error: if it is not a transient error
+            DeadlineExceededError: if the deadline of the dialog is reached
+        """
+        if not isinstance(error, self.retry_exceptions):
+            raise error
+        return await self._call(method, error, func, args, kwargs)
+
+    async def _call(
+        self,
+        method: str,
+        error: BaseException | None,
+        func: typing.Callable[..., typing.Awaitable[T]],
+        args: tuple[typing.Any, ...],
+        kwargs: dict[str, typing.Any],
+    ) -> T:
+        breaker = self.breaker(method)
+        sleep_time = self.base_sleep_time
+        for try_number in range(1, self.max_tries + 1):
+            if error is None:
+                if wait_time := breaker.time_until_closed():
+                    # * a little jitter, so the waiting calls are not released at once
+                    wait_time += self._rng.uniform(0, self.base_sleep_time)
+                    logger.debug("%s: circuit open, waiting %.2fs", method, wait_time)
+                    await self._sleep(method, wait_time, None)
+
+                timeout = self._attempt_timeout()
+                try:
+                    async with asyncio.timeout(timeout):
+                        result = await func(*args, **kwargs)
+                except self.retry_exceptions as e:
+                    error = e
+                else:
+                    breaker.record_success()
+                    return result
+
+            time_left = _time_left()
+            if time_left is not None and time_left <= 0:
+                raise DeadlineExceededError(
+                    f"{method}: deadline of the dialog is reached"
+                ) from error
+            if try_number == self.max_tries:
+                breaker.record_failure()
+                raise error
+
+            if isinstance(error, telethon.errors.FloodWaitError):
+                if error.seconds > self.flood_wait_max:
+                    raise error
+                TRACER.instant(
+                    "flood_wait", "retry", function=method, seconds=error.seconds
+                )
+                breaker.open_for(error.seconds)
+                wait_time = error.seconds + self._rng.uniform(0, self.base_sleep_time)
+            else:
+                breaker.record_failure()
+                sleep_time = self._next_sleep_time(sleep_time)
+                wait_time = sleep_time
+
+            logger.warning(
+                "%s: attempt %d/%d failed with %s, retrying in %.2f seconds...",
+                method,
+                try_number,
+                self.max_tries,
+                error.__class__.__name__,
+                wait_time,
+            )
+            await self._sleep(method, wait_time, error)
+            error = None
+
+        # This should never be reached due to the raise in the last iteration
+        raise RuntimeError("Unexpected error in retry logic")
+
+
+def check_deadline() -> None:
+    """
+    Raise `DeadlineExceededError` if the deadline of the current dialog is reached.
+    Cheap enough to be called for every message.
+    """
+    deadline = _dialog_deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceededError("deadline of the dialog is reached")
@@ -23,26 +23,181 @@ CONCURRENT_DIALOG_DOWNLOADS = int(
     config("CONCURRENT_DIALOG_DOWNLOADS", cast=int, default=5)
 )
 
-# Number of reactions to download per message.
+# Which reaction data to collect:
+# - "none" to skip reactions;
+# - "summary" for the number of reactions per emoji under each message. These are sent
+#   together with the messages, so no extra requests are made, and broadcast channels
+#   are covered as well;
+# - "full" for every reaction with the reacting peer. This makes a request per message
+#   and is not available for broadcast channels.
+REACTIONS_MODE = str(config("REACTIONS_MODE", default="full"))
+
+# Number of reactions to download per message, when `REACTIONS_MODE` is "full".
 REACTIONS_LIMIT_PER_MESSAGE: int = int(
     config("REACTIONS_LIMIT_PER_MESSAGE", cast=int, default=100)
 )
 
-# Reaction fetching can sometimes fail due to Telegram API limitations.
+# Telegram requests can fail due to flood limits, server errors or connection resets.
+# Such requests are retried with a random, growing sleep between the attempts.
 # If download script still says about timeout, try to increase these values.
-MESSAGE_REACTION_EXPONENTIAL_BACKOFF_SLEEP_TIME = float(
-    config("MESSAGE_REACTION_EXPONENTIAL_BACKOFF_SLEEP_TIME", cast=float, default=5.0)
+# `MESSAGE_REACTION_EXPONENTIAL_BACKOFF_*` names of the first two settings are still
+# supported for the older configs.
+RETRY_BASE_SLEEP_TIME = float(
+    config(
+        "RETRY_BASE_SLEEP_TIME",
+        cast=float,
+        default=config(
+            "MESSAGE_REACTION_EXPONENTIAL_BACKOFF_SLEEP_TIME", cast=float, default=5.0
+        ),
+    )
+)
+
+RETRY_MAX_TRIES = int(
+    config(
+        "RETRY_MAX_TRIES",
+        cast=int,
+        default=config(
+            "MESSAGE_REACTION_EXPONENTIAL_BACKOFF_MAX_TRIES", cast=int, default=5
+        ),
+    )
+)
+
+RETRY_MAX_SLEEP_TIME = float(config("RETRY_MAX_SLEEP_TIME", cast=float, default=60.0))
+
+# Maximum duration of a single request, in seconds.
+RETRY_CALL_TIMEOUT = float(config("RETRY_CALL_TIMEOUT", cast=float, default=120.0))
+
+# Telegram asks to wait before repeating a request with "FLOOD_WAIT_X" errors.
+# Shorter waits are handled by Telethon itself, and waits up to this number of seconds
+# are waited out, pausing other requests of the same method. Longer waits fail
+# the request.
+FLOOD_WAIT_MAX_SECONDS = float(
+    config("FLOOD_WAIT_MAX_SECONDS", cast=float, default=300.0)
+)
+
+# After this number of consecutive failures of a Telegram method, its requests
+# are paused for `CIRCUIT_BREAKER_RESET_TIME` seconds.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    config("CIRCUIT_BREAKER_FAILURE_THRESHOLD", cast=int, default=5)
+)
+
+CIRCUIT_BREAKER_RESET_TIME = float(
+    config("CIRCUIT_BREAKER_RESET_TIME", cast=float, default=30.0)
+)
+
+# Maximum time to download a single dialog, in seconds, 0 for no limit. A dialog, that
+# runs out of time, is stopped and resumed from its checkpoint on the next run.
+DIALOG_TIMEOUT = float(config("DIALOG_TIMEOUT", cast=float, default=0))
+
+# A dialog download, that made no progress (no message page, reaction request or write)
+# for this many seconds, is cancelled and restarted from its checkpoint, 0 to disable.
+# Keep it above `FLOOD_WAIT_MAX_SECONDS` and the time to download the largest media.
+# After `STALL_MAX_RESTARTS` restarts, the dialog is left for the next run.
+STALL_TIMEOUT = float(config("STALL_TIMEOUT", cast=float, default=600))
+STALL_MAX_RESTARTS = int(config("STALL_MAX_RESTARTS", cast=int, default=3))
+
+# Store raw messages and reactions, as they were received from Telegram, in compressed
+# append-only segments. Archived dialogs can be re-exported with
+# `2_replay_dialogs_archive.py` without downloading them again.
+RAW_ARCHIVE_ENABLED: bool = bool(
+    config("RAW_ARCHIVE_ENABLED", cast=bool, default=False)
+)
+
+RAW_ARCHIVE_SEGMENT_MAX_BYTES = int(
+    config("RAW_ARCHIVE_SEGMENT_MAX_BYTES", cast=int, default=64 * 1024 * 1024)
+)
+
+RAW_ARCHIVE_COMPRESSION_LEVEL = int(
+    config("RAW_ARCHIVE_COMPRESSION_LEVEL", cast=int, default=6)
+)
+
+# Download the media of photo, voice and video messages to `MEDIA_FOLDER`. Each file is
+# named by the `media_ref` column of its messages, and a media forwarded to several
+# dialogs is downloaded once.
+MEDIA_DOWNLOAD_ENABLED: bool = bool(
+    config("MEDIA_DOWNLOAD_ENABLED", cast=bool, default=False)
+)
+
+# Number of media files downloaded at once, separately from `CONCURRENT_DIALOG_DOWNLOADS`.
+MEDIA_CONCURRENT_DOWNLOADS = int(
+    config("MEDIA_CONCURRENT_DOWNLOADS", cast=int, default=4)
+)
+
+# Total media download speed in bytes per second, 0 for no limit.
+MEDIA_BANDWIDTH_LIMIT = int(config("MEDIA_BANDWIDTH_LIMIT", cast=int, default=0))
+
+# Maximum file size in bytes per media type, 0 to skip the type.
+MEDIA_MAX_SIZE_PHOTO = int(
+    config("MEDIA_MAX_SIZE_PHOTO", cast=int, default=10 * 1024 * 1024)
+)
+
+MEDIA_MAX_SIZE_VOICE = int(
+    config("MEDIA_MAX_SIZE_VOICE", cast=int, default=20 * 1024 * 1024)
+)
+
+MEDIA_MAX_SIZE_VIDEO = int(
+    config("MEDIA_MAX_SIZE_VIDEO", cast=int, default=50 * 1024 * 1024)
+)
+
+# Downloaded messages are flushed to the disk and the progress of a dialog is saved
+# every this many messages. An interrupted download resumes from the last checkpoint,
+# instead of starting the dialog over. Lower values lose less work on a crash,
+# but make more disk syncs.
+CHECKPOINT_INTERVAL_MESSAGES = int(
+    config("CHECKPOINT_INTERVAL_MESSAGES", cast=int, default=10000)
+)
+
+# Approximate memory for the data, that is buffered by all the downloaded dialogs
+# between their checkpoints, in bytes, 0 for no limit. Once it's reached, the largest
+# buffers are saved before their checkpoint interval, and the other dialogs wait
+# for the writes, instead of fetching more messages.
+MEMORY_BUDGET_BYTES = int(
+    config("MEMORY_BUDGET_BYTES", cast=int, default=1024 * 1024 * 1024)
+)
+
+# Log the source lines, that allocated the most memory during a dialog download, every
+# time its data is saved. For diagnosis only, as tracing slows the download down.
+MEMORY_TRACEMALLOC_REPORT: bool = bool(
+    config("MEMORY_TRACEMALLOC_REPORT", cast=bool, default=False)
 )
 
-MESSAGE_REACTION_EXPONENTIAL_BACKOFF_MAX_TRIES = int(
-    config("MESSAGE_REACTION_EXPONENTIAL_BACKOFF_MAX_TRIES", cast=int, default=5)
+# Dialogs can be downloaded by several machines, from a queue in a SQLite file
+# (`WORK_QUEUE_FILE`) on a shared storage, see `--publish-queue` and `--from-queue`
+# of `1_download_dialogs_data.py`. A worker holds a dialog for this many seconds
+# without a heartbeat, then the dialog is taken over by another worker.
+WORK_QUEUE_LEASE_SECONDS = float(
+    config("WORK_QUEUE_LEASE_SECONDS", cast=float, default=300.0)
 )
 
+# Number of the failed attempts to download a dialog, after which it's left out.
+WORK_QUEUE_MAX_ATTEMPTS = int(config("WORK_QUEUE_MAX_ATTEMPTS", cast=int, default=5))
+
+# Estimates of `--plan` of `1_download_dialogs_data.py`. The average size of the saved
+# data of a message, in bytes, can be measured as the size of the files of a downloaded
+# dialog, divided by its number of messages. The latency of a request, in seconds,
+# is measured while the messages are counted, if it's 0.
+PLAN_BYTES_PER_MESSAGE = int(config("PLAN_BYTES_PER_MESSAGE", cast=int, default=300))
+
+PLAN_SECONDS_PER_REQUEST = float(
+    config("PLAN_SECONDS_PER_REQUEST", cast=float, default=0)
+)
+
+# Messages received by `3_watch_dialogs.py` are written at least every this many
+# seconds, or once a dialog has this many messages buffered.
+LIVE_FLUSH_INTERVAL = float(config("LIVE_FLUSH_INTERVAL", cast=float, default=5.0))
+
+LIVE_FLUSH_MESSAGES = int(config("LIVE_FLUSH_MESSAGES", cast=int, default=1000))
+
 
 # https://core.telegram.org/api/takeout
 # Options for the takeout method.
 # For basic usage, should be left as is.
-CLIENT_TAKEOUT_FINALIZE: bool = True
+
+# The takeout session is kept in the Telethon session between the runs, and finished
+# once a download completes. Disable to keep it open for a series of downloads.
+CLIENT_TAKEOUT_FINALIZE: bool = bool(
+    config("CLIENT_TAKEOUT_FINALIZE", cast=bool, default=True)
+)
 
 CLIENT_TAKEOUT_FETCH_CONTACTS: bool = False
 
@@ -54,7 +209,8 @@ CLIENT_TAKEOUT_FETCH_MEGAGROUPS: bool = True
 
 CLIENT_TAKEOUT_FETCH_CHANNELS: bool = True
 
-CLIENT_TAKEOUT_FETCH_FILES: bool = False
+# * files are fetched, when the media are downloaded
+CLIENT_TAKEOUT_FETCH_FILES: bool = MEDIA_DOWNLOAD_ENABLED
 
 
 # File export paths
@@ -69,9 +225,75 @@ DIALOGS_LIST_FOLDER = Path(
     or BASE_PATH / "data" / "dialogs_meta"
 ).resolve()
 
+# Compression of the exported message files: "none", "gzip" or "zstd". Compressed files
+# get ".gz" or ".zst" suffix and are decompressed transparently by the readers.
+# zstd requires the optional dependency, install it with `poetry install --extras zstd`.
+OUTPUT_COMPRESSION = str(config("OUTPUT_COMPRESSION", default="none"))
+
+# From 1 to 9 for gzip, and from 1 to 22 for zstd. Higher levels are slower.
+OUTPUT_COMPRESSION_LEVEL = int(config("OUTPUT_COMPRESSION_LEVEL", cast=int, default=3))
+
+# Layout of the files in `DIALOGS_DATA_FOLDER`:
+# - "dialog" for a CSV file per dialog;
+# - "partitioned" for Hive-style partitions in the `partitioned` subfolder, by dialog
+#   and by the month of the messages, that Spark or DuckDB read in parallel and prune
+#   by date. Files of the tiny dialogs can be packed together with
+#   `5_compact_dialogs_data.py`.
+OUTPUT_LAYOUT = str(config("OUTPUT_LAYOUT", default="dialog"))
+
+# With the "partitioned" layout, a file is rolled over to the next one, once it has
+# this many rows or bytes.
+OUTPUT_PART_MAX_ROWS = int(config("OUTPUT_PART_MAX_ROWS", cast=int, default=1_000_000))
+
+OUTPUT_PART_MAX_BYTES = int(
+    config("OUTPUT_PART_MAX_BYTES", cast=int, default=256 * 1024 * 1024)
+)
+
+# Users and chats, that were seen in the dialogs and the downloaded messages, one record
+# per peer, so the peer ids of the messages can be resolved to names. The dialog
+# metadata references the users by id.
+PEER_DIRECTORY_FOLDER = Path(
+    str(config("PEER_DIRECTORY_FOLDER", default="")) or BASE_PATH / "data" / "peers"
+).resolve()
+
+RAW_ARCHIVE_FOLDER = Path(
+    str(config("RAW_ARCHIVE_FOLDER", default="")) or BASE_PATH / "data" / "raw_archive"
+).resolve()
+
+MEDIA_FOLDER = Path(
+    str(config("MEDIA_FOLDER", default="")) or BASE_PATH / "data" / "media"
+).resolve()
+
+# Messages received by `3_watch_dialogs.py`, in the same format as `DIALOGS_DATA_FOLDER`.
+LIVE_DATA_FOLDER = Path(
+    str(config("LIVE_DATA_FOLDER", default="")) or BASE_PATH / "data" / "live"
+).resolve()
+
+# Messages found by `4_sweep_keyword.py`, in a subfolder per searched text.
+SWEEP_DATA_FOLDER = Path(
+    str(config("SWEEP_DATA_FOLDER", default="")) or BASE_PATH / "data" / "sweeps"
+).resolve()
+
+CHECKPOINTS_FOLDER = Path(
+    str(config("CHECKPOINTS_FOLDER", default="")) or BASE_PATH / "data" / "checkpoints"
+).resolve()
+
+WORK_QUEUE_FILE = Path(
+    str(config("WORK_QUEUE_FILE", default="")) or BASE_PATH / "data" / "queue.sqlite3"
+).resolve()
+
 
 # General running settings
 
+# Set to a file path (e.g. "./data/trace.json") to record a timeline of the concurrent
+# dialog tasks in Chrome trace-event format. Open it in `chrome://tracing` or
+# https://ui.perfetto.dev to spot stalls. Leave empty to disable tracing.
+TRACE_OUTPUT_FILE = str(config("TRACE_OUTPUT_FILE", default=""))
+
+# On a terminal, the progress of the download is redrawn below the logs every second.
+# Otherwise, it's logged every this many seconds.
+PROGRESS_LOG_INTERVAL = float(config("PROGRESS_LOG_INTERVAL", cast=float, default=60.0))
+
 # Set to "DEBUG" in config file for detailed info on per-chat download progress.
 LOG_LEVEL = config("LOG_LEVEL", default="INFO")
 
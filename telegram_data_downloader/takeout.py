@@ -0,0 +1,79 @@
+import contextlib
+import logging
+import typing
+
+import telethon
+from telethon.tl import functions as tl_functions
+from telethon.tl import types as tl_types
+
+logger = logging.getLogger(__name__)
+
+
+async def _drop_invalid_takeout(client: telethon.TelegramClient) -> None:
+    """
+    Forget the takeout session saved by an earlier run, if Telegram no longer accepts it,
+    e.g. when it was finished from another device or has expired.
+    """
+    takeout_id = client.session.takeout_id
+    if takeout_id is None:
+        return
+    try:
+        await client(
+            tl_functions.InvokeWithTakeoutRequest(
+                takeout_id,
+                tl_functions.users.GetUsersRequest([tl_types.InputUserSelf()]),
+            )
+        )
+    except telethon.errors.TakeoutInvalidError:
+        logger.warning("saved takeout session #%d is no longer valid", takeout_id)
+        client.session.takeout_id = None
+        client.session.save()
+    else:
+        logger.info("reusing saved takeout session #%d", takeout_id)
+
+
+@contextlib.asynccontextmanager
+async def reusable_takeout(
+    client: telethon.TelegramClient,
+    *,
+    finalize: bool,
+    **scopes: bool,
+) -> typing.AsyncIterator[telethon.TelegramClient]:
+    """
+    Open a takeout session, that outlives the process, so a restarted or a later run
+    continues it instead of waiting for the cooling period of a new takeout.
+
+    The takeout id is saved in the Telethon session, so it is shared by the runs
+    with the same session name. A new takeout is requested with `scopes`
+    (see `TelegramClient.takeout`) only if there is no valid saved one,
+    so the scopes of a saved takeout can't be changed without finishing it.
+
+    The takeout is finished only if `finalize` is set and the body of the `with`
+    block completes, an interrupted run keeps it for the next one.
+
+    Raises:
+        telethon.errors.TakeoutInitDelayError: if a new takeout can't be started yet
+    """
+    await _drop_invalid_takeout(client)
+    if client.session.takeout_id is None:
+        takeout = client.takeout(finalize=False, **scopes)
+    else:
+        # * without the scopes, Telethon doesn't request a new takeout
+        takeout = client.takeout(finalize=False)
+
+    # * with `finalize=False`, Telethon never finishes the takeout on exit
+    async with takeout:
+        # * saved at once, so the takeout is reused even after a hard crash
+        client.session.save()
+        logger.debug("takeout session #%d started", client.session.takeout_id)
+        yield takeout
+
+        if finalize:
+            logger.info("finishing takeout session #%d", client.session.takeout_id)
+            # * the `success` property of the takeout client can't be set,
+            # * as the proxy forwards the attribute to the client
+            await takeout(
+                tl_functions.account.FinishTakeoutSessionRequest(success=True)
+            )
+            client.session.takeout_id = None
+            client.session.save()
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 
+from telegram_data_downloader import settings
 from telegram_data_downloader.factory import (
     create_telegram_client,
     create_json_dialog_reader_writer,
@@ -8,6 +9,7 @@ from telegram_data_downloader.factory import (
     create_dialog_downloader,
     create_message_downloader,
 )
+from telegram_data_downloader.loader.compression import Compression
 from telegram_data_downloader.processor.dialog_downloader import DialogDownloader
 from telegram_data_downloader.processor.message_downloader import MessageDownloader
 
@@ -26,12 +28,25 @@ def mock_settings(monkeypatch):
     monkeypatch.setattr(
         "telegram_data_downloader.settings.DIALOGS_DATA_FOLDER", "dialogs_data"
     )
+    monkeypatch.setattr(
+        "telegram_data_downloader.settings.OUTPUT_COMPRESSION", "gzip"
+    )
+    monkeypatch.setattr(
+        "telegram_data_downloader.settings.OUTPUT_COMPRESSION_LEVEL", 5
+    )
     monkeypatch.setattr(
         "telegram_data_downloader.settings.REACTIONS_LIMIT_PER_MESSAGE", 10
     )
     monkeypatch.setattr(
         "telegram_data_downloader.settings.CONCURRENT_DIALOG_DOWNLOADS", 5
     )
+    monkeypatch.setattr(
+        "telegram_data_downloader.settings.CHECKPOINT_INTERVAL_MESSAGES", 500
+    )
+    monkeypatch.setattr("telegram_data_downloader.settings.RETRY_MAX_TRIES", 3)
+    monkeypatch.setattr(
+        "telegram_data_downloader.settings.MEDIA_DOWNLOAD_ENABLED", False
+    )
 
 
 def test_create_telegram_client_fixture(mock_settings):
@@ -53,13 +68,20 @@ def test_create_json_dialog_reader_writer_fixture(mock_settings):
     """
     Test creating a JSON dialog reader/writer.
     """
-    with patch(
-        "telegram_data_downloader.factory.JSONDialogReaderWriter"
-    ) as mock_reader_writer:
+    with (
+        patch(
+            "telegram_data_downloader.factory.JSONDialogReaderWriter"
+        ) as mock_reader_writer,
+        patch(
+            "telegram_data_downloader.factory.create_peer_directory"
+        ) as mock_peer_directory,
+    ):
         reader_writer_instance = MagicMock()
         mock_reader_writer.return_value = reader_writer_instance
         reader_writer = create_json_dialog_reader_writer()
-        mock_reader_writer.assert_called_once_with("dialogs_meta")
+        mock_reader_writer.assert_called_once_with(
+            "dialogs_meta", user_directory=mock_peer_directory.return_value
+        )
         assert reader_writer == mock_reader_writer.return_value
 
 
@@ -71,10 +93,32 @@ def test_create_csv_message_saver_fixture(mock_settings):
         csv_writer_instance = MagicMock()
         mock_csv_writer.return_value = csv_writer_instance
         csv_writer = create_csv_message_saver()
-        mock_csv_writer.assert_called_once_with("dialogs_data")
+        mock_csv_writer.assert_called_once_with(
+            "dialogs_data", compression=Compression.GZIP, compression_level=5
+        )
         assert csv_writer == mock_csv_writer.return_value
 
 
+def test_create_partitioned_message_saver(mock_settings, monkeypatch, tmp_path):
+    """
+    Test creating a message saver for the partitioned layout.
+    """
+    monkeypatch.setattr("telegram_data_downloader.settings.OUTPUT_LAYOUT", "partitioned")
+    monkeypatch.setattr("telegram_data_downloader.settings.DIALOGS_DATA_FOLDER", tmp_path)
+    with patch(
+        "telegram_data_downloader.factory.PartitionedMessageWriter"
+    ) as mock_writer:
+        writer = create_csv_message_saver()
+        mock_writer.assert_called_once_with(
+            tmp_path / "partitioned",
+            compression=Compression.GZIP,
+            compression_level=5,
+            max_part_rows=settings.OUTPUT_PART_MAX_ROWS,
+            max_part_bytes=settings.OUTPUT_PART_MAX_BYTES,
+        )
+        assert writer == mock_writer.return_value
+
+
 def test_create_dialog_downloader_fixture(mock_settings):
     """
     Test creating a dialog downloader.
@@ -102,9 +146,16 @@ def test_create_message_downloader_fixture(mock_settings):
         patch(
             "telegram_data_downloader.factory.create_csv_message_saver"
         ) as mock_message_saver,
+        patch(
+            "telegram_data_downloader.factory.create_checkpoint_store"
+        ) as mock_checkpoint_store,
+        patch(
+            "telegram_data_downloader.factory.create_peer_directory"
+        ) as mock_peer_directory,
     ):
         mock_reader_writer.return_value = MagicMock()
         mock_message_saver.return_value = MagicMock()
+        mock_checkpoint_store.return_value = MagicMock()
         downloader = create_message_downloader(mock_client)
         assert isinstance(downloader, MessageDownloader)
         assert downloader.client == mock_client
@@ -112,3 +163,8 @@ def test_create_message_downloader_fixture(mock_settings):
         assert downloader.message_writer == mock_message_saver.return_value
         assert downloader.reactions_limit_per_message == 10
         assert downloader.concurrent_dialog_downloads == 5
+        assert downloader.checkpoint_store == mock_checkpoint_store.return_value
+        assert downloader.checkpoint_interval == 500
+        assert downloader.retry_policy.max_tries == 3
+        assert downloader.media_downloader is None
+        assert downloader.peer_directory == mock_peer_directory.return_value
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.loader.archive import RawMessageArchive
+
+
+def make_message(message_id: int) -> tl_types.Message:
+    return tl_types.Message(
+        id=message_id,
+        peer_id=tl_types.PeerChannel(channel_id=1),
+        date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        message=f"message {message_id}",
+        from_id=tl_types.PeerUser(user_id=2),
+    )
+
+
+def make_reactions_list() -> tl_types.messages.MessageReactionsList:
+    return tl_types.messages.MessageReactionsList(
+        count=1,
+        reactions=[
+            tl_types.MessagePeerReaction(
+                peer_id=tl_types.PeerUser(user_id=3),
+                date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                reaction=tl_types.ReactionEmoji(emoticon="👍"),
+            )
+        ],
+        chats=[],
+        users=[],
+    )
+
+
+def test_append_and_iter_dialog(tmp_path):
+    # Arrange
+    archive = RawMessageArchive(tmp_path)
+    archive.start_dialog(-1001)
+    # Act
+    archive.append(
+        -1001, [make_message(2), make_message(1)], {1: make_reactions_list()}
+    )
+    archive.append(-1001, [make_message(0)], {})
+    records = list(archive.iter_dialog(-1001))
+    # Assert
+    assert [message.id for message, _ in records] == [2, 1, 0]
+    assert [message.message for message, _ in records] == [
+        "message 2",
+        "message 1",
+        "message 0",
+    ]
+    assert records[0][1] is None
+    assert bytes(records[1][1]) == bytes(make_reactions_list())
+    assert records[2][1] is None
+    assert archive.dialog_ids() == [-1001]
+
+
+def test_segment_rollover(tmp_path):
+    # Arrange
+    archive = RawMessageArchive(tmp_path, segment_max_bytes=1)
+    # Act
+    archive.append(1, [make_message(2)], {})
+    archive.append(1, [make_message(1)], {})
+    # Assert
+    assert len(list((tmp_path / "1").glob("segment-*.tl.gz"))) == 2
+    assert [message.id for message, _ in archive.iter_dialog(1)] == [2, 1]
+
+
+def test_start_dialog_removes_previous_data(tmp_path):
+    # Arrange
+    archive = RawMessageArchive(tmp_path)
+    archive.append(1, [make_message(1)], {})
+    # Act
+    archive.start_dialog(1)
+    # Assert
+    assert not list(archive.iter_dialog(1))
+    assert archive.dialog_ids() == []
+
+
+def test_truncated_segment_keeps_complete_batches(tmp_path):
+    # Arrange
+    archive = RawMessageArchive(tmp_path)
+    archive.append(1, [make_message(2)], {})
+    archive.append(1, [make_message(1)], {})
+    segment_path = next((tmp_path / "1").glob("segment-*.tl.gz"))
+    data = segment_path.read_bytes()
+    # Act
+    segment_path.write_bytes(data[:-10])
+    # Assert
+    assert [message.id for message, _ in archive.iter_dialog(1)] == [2]
@@ -0,0 +1,30 @@
+import pytest
+
+from telegram_data_downloader.loader.atomic import atomic_path
+
+
+def test_atomic_path_replaces_file(tmp_path):
+    # Arrange
+    path = tmp_path / "data.json"
+    path.write_text("old", encoding="utf-8")
+    # Act
+    with atomic_path(path) as tmp_file:
+        tmp_file.write_text("new", encoding="utf-8")
+        assert path.read_text(encoding="utf-8") == "old"
+    # Assert
+    assert path.read_text(encoding="utf-8") == "new"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_path_keeps_file_on_error(tmp_path):
+    # Arrange
+    path = tmp_path / "data.json"
+    path.write_text("old", encoding="utf-8")
+    # Act
+    with pytest.raises(ValueError):
+        with atomic_path(path) as tmp_file:
+            tmp_file.write_text("partial", encoding="utf-8")
+            raise ValueError
+    # Assert
+    assert path.read_text(encoding="utf-8") == "old"
+    assert list(tmp_path.iterdir()) == [path]
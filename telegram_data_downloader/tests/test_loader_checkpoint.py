@@ -0,0 +1,37 @@
+from telegram_data_downloader.dict_types.checkpoint import DialogCheckpoint, LiveCheckpoint
+from telegram_data_downloader.loader.checkpoint import (
+    JSONCheckpointStore,
+    JSONLiveCheckpointStore,
+)
+
+
+def test_write_read_remove_checkpoint(tmp_path):
+    # Arrange
+    store = JSONCheckpointStore(tmp_path / "checkpoints")
+    checkpoint = DialogCheckpoint(
+        dialog_id=-5,
+        offset_id=100,
+        msg_count=900,
+        part_sizes={"messages": 1024},
+        emojis=["👍"],
+        message_filter='{"search": "hello"}',
+    )
+    # Act
+    store.write(checkpoint)
+    restored = store.read(-5)
+    store.remove(-5)
+    # Assert
+    assert restored == checkpoint
+    assert store.read(-5) is None
+
+
+def test_write_read_live_checkpoint(tmp_path):
+    # Arrange
+    store = JSONLiveCheckpointStore(tmp_path / "checkpoints" / "live.json")
+    checkpoint = LiveCheckpoint(last_message_ids={-5: 100}, file_sizes={-5: 2048})
+    # Act
+    empty = store.read()
+    store.write(checkpoint)
+    # Assert
+    assert empty == LiveCheckpoint(last_message_ids={}, file_sizes={})
+    assert store.read() == checkpoint
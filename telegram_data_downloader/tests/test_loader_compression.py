@@ -0,0 +1,38 @@
+import pytest
+
+from telegram_data_downloader.loader.compression import (
+    Compression,
+    detect_compression,
+    open_compressed_text,
+    open_text,
+)
+
+
+@pytest.mark.parametrize("compression", list(Compression))
+def test_compressed_text_round_trip(tmp_path, compression):
+    # Arrange
+    if compression is Compression.ZSTD:
+        pytest.importorskip("zstandard")
+    path = tmp_path / f"data.csv{compression.suffix}"
+    text = "id,message\n1,привіт\n" * 1000
+    # Act
+    with open_compressed_text(path, compression, level=3) as f:
+        f.write(text)
+    # Assert
+    assert detect_compression(path) is compression
+    with open_text(path) as f:
+        assert f.read() == text
+    if compression is not Compression.NONE:
+        assert path.stat().st_size < len(text.encode())
+
+
+def test_detect_compression_ignores_suffix(tmp_path):
+    # Arrange
+    path = tmp_path / "data.csv"
+    with open_compressed_text(path, Compression.GZIP, level=1) as f:
+        f.write("id\n1\n")
+    # Act
+    with open_text(path) as f:
+        text = f.read()
+    # Assert
+    assert text == "id\n1\n"
@@ -2,8 +2,9 @@ import csv
 from typing import Any
 from datetime import datetime
 
-from telegram_data_downloader.loader.csv import CSVMessageWriter
-from telegram_data_downloader.dict_types.message import MessageType, PeerID, MessageAttributes
+from telegram_data_downloader.loader.compression import Compression
+from telegram_data_downloader.loader.csv import CSVMessageReader, CSVMessageWriter
+from telegram_data_downloader.dict_types.message import MessageType, PeerID, MessageAttributes, MessageColumns, ReactionColumns, ReactionCountColumns
 from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
 
 
@@ -14,8 +15,6 @@ def assert_message_json_equal(msg1: dict[str, Any], msg2: dict[str, Any]):
             assert datetime.fromisoformat(msg1[key]) == datetime.fromisoformat(
                 msg2[key]
             )
-        elif key == "reactions":
-            assert eval(msg1[key]) == eval(msg2[key])  # pylint: disable=eval-used
         else:
             assert msg1[key] == msg2[key]
 
@@ -32,7 +31,6 @@ def test_write_message(tmp_path):
         type=MessageType.PHOTO,
         duration=1,
         to_id=PeerID(2),
-        reactions={PeerID(1): "smth"},
     )
     dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
     writer = CSVMessageWriter(tmp_path)
@@ -53,7 +51,6 @@ def test_write_message(tmp_path):
             "type": "photo",
             "duration": "1",
             "to_id": "2",
-            "reactions": str(msg["reactions"]),
         },
     )
 
@@ -68,3 +65,207 @@ def test_message_list_empty(tmp_path):
     with open(tmp_path / f"{dialog['id']}.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         assert not list(reader)
+
+
+def test_write_message_columns(tmp_path):
+    # Arrange
+    now = datetime.now()
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    writer = CSVMessageWriter(tmp_path)
+    columns = MessageColumns(
+        id=[1, 2],
+        date=[now, now],
+        from_id=[PeerID(1), None],
+        fwd_from=[None, PeerID(3)],
+        message=["str", ""],
+        type=[MessageType.TEXT, MessageType.VOICE],
+        duration=[None, 2.5],
+        to_id=[PeerID(2), PeerID(2)],
+    )
+    # Act
+    writer.write_messages(dialog, columns)
+    # Assert
+    with open(tmp_path / f"{dialog['id']}.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        data = list(reader)
+    assert [row["id"] for row in data] == ["1", "2"]
+    assert [row["type"] for row in data] == ["text", "voice"]
+    assert [row["message"] for row in data] == ["str", ""]
+
+
+
+def test_write_reactions(tmp_path):
+    # Arrange
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    writer = CSVMessageWriter(tmp_path)
+    reactions = ReactionColumns(
+        dialog_id=[1, 1, 1],
+        message_id=[10, 10, 11],
+        peer_id=[PeerID(2), PeerID(3), PeerID(2)],
+        emoji_code=[0, 1, 0],
+    )
+    # Act
+    writer.write_reactions(dialog, reactions, ["👍", "🔥"])
+    # Assert
+    with open(tmp_path / "reactions" / "1.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[1] == {"dialog_id": "1", "message_id": "10", "peer_id": "3", "emoji_code": "1"}
+    with open(tmp_path / "reactions" / "1_emojis.csv", encoding="utf-8") as f:
+        emojis = list(csv.DictReader(f))
+    assert emojis == [{"emoji_code": "0", "emoji": "👍"}, {"emoji_code": "1", "emoji": "🔥"}]
+
+
+def test_write_reaction_counts(tmp_path):
+    # Arrange
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.CHANNEL, users=[])
+    writer = CSVMessageWriter(tmp_path)
+    reaction_counts = ReactionCountColumns(
+        dialog_id=[1, 1], message_id=[10, 11], emoji_code=[0, 0], count=[5, 2]
+    )
+    # Act
+    writer.write_reaction_counts(dialog, reaction_counts, ["👍"])
+    # Assert
+    with open(tmp_path / "reactions" / "1_counts.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows == [
+        {"dialog_id": "1", "message_id": "10", "emoji_code": "0", "count": "5"},
+        {"dialog_id": "1", "message_id": "11", "emoji_code": "0", "count": "2"},
+    ]
+    assert (tmp_path / "reactions" / "1_emojis.csv").exists()
+
+
+def test_read_compressed_messages(tmp_path):
+    # Arrange
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    columns = MessageColumns(
+        id=[1, 2],
+        date=[now, now],
+        from_id=[PeerID(1), PeerID(2)],
+        fwd_from=[None, None],
+        message=["str", "привіт"],
+        type=[MessageType.TEXT, MessageType.TEXT],
+        duration=[None, None],
+        to_id=[PeerID(2), PeerID(2)],
+    )
+    CSVMessageWriter(tmp_path).write_messages(dialog, columns)
+    writer = CSVMessageWriter(tmp_path, compression=Compression.GZIP, compression_level=9)
+    # Act
+    writer.write_messages(dialog, columns)
+    writer.write_reactions(
+        dialog,
+        ReactionColumns(dialog_id=[1], message_id=[2], peer_id=[PeerID(1)], emoji_code=[0]),
+        ["👍"],
+    )
+    messages = CSVMessageReader(tmp_path).read_messages(1)
+    reactions = CSVMessageReader(tmp_path).read_reactions(1)
+    # Assert
+    assert not (tmp_path / "1.csv").exists()
+    assert (tmp_path / "1.csv.gz").exists()
+    assert messages["message"].tolist() == ["str", "привіт"]
+    assert messages["date"].tolist() == [now, now]
+    assert reactions["emoji"].tolist() == ["👍"]
+
+
+def test_append_truncate_and_commit_parts(tmp_path):
+    # Arrange
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    writer = CSVMessageWriter(tmp_path, compression=Compression.GZIP)
+
+    def columns(message_id: int) -> MessageColumns:
+        return MessageColumns(
+            id=[message_id],
+            date=[now],
+            from_id=[PeerID(1)],
+            fwd_from=[None],
+            message=[f"msg {message_id}"],
+            type=[MessageType.TEXT],
+            duration=[None],
+            to_id=[PeerID(2)],
+        )
+
+    reactions = ReactionColumns(dialog_id=[1], message_id=[3], peer_id=[PeerID(1)], emoji_code=[0])
+    # Act
+    writer.truncate_parts(dialog, {})
+    writer.append_messages(dialog, columns(3))
+    writer.append_reactions(dialog, reactions)
+    part_sizes = writer.sync_parts(dialog)
+    # * data, that was written after the checkpoint, is dropped on resume
+    writer.append_messages(dialog, columns(2))
+    writer.truncate_parts(dialog, part_sizes)
+    writer.append_messages(dialog, columns(1))
+    assert not (tmp_path / "1.csv.gz").exists()
+    writer.commit(dialog, ["👍"])
+    messages = CSVMessageReader(tmp_path).read_messages(1)
+    reactions_df = CSVMessageReader(tmp_path).read_reactions(1)
+    # Assert
+    assert messages["id"].tolist() == [3, 1]
+    assert reactions_df["emoji"].tolist() == ["👍"]
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_extend_and_truncate_messages(tmp_path):
+    # Arrange
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    writer = CSVMessageWriter(tmp_path, compression=Compression.GZIP)
+
+    def columns(message_id: int) -> MessageColumns:
+        return MessageColumns(
+            id=[message_id],
+            date=[now],
+            from_id=[PeerID(1)],
+            fwd_from=[None],
+            message=[f"msg {message_id}"],
+            type=[MessageType.TEXT],
+            duration=[None],
+            to_id=[PeerID(2)],
+            media_ref=[None],
+        )
+
+    # Act
+    writer.extend_messages(dialog, columns(1))
+    size = writer.extend_messages(dialog, columns(2))
+    # * messages, that were written after the checkpoint, are dropped on restart
+    writer.extend_messages(dialog, columns(3))
+    writer.truncate_messages(dialog, size)
+    writer.extend_messages(dialog, columns(4))
+    messages = CSVMessageReader(tmp_path).read_messages(1)
+    # Assert
+    assert messages["id"].tolist() == [1, 2, 4]
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_patch_reactions(tmp_path):
+    # Arrange
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.PRIVATE, users=[])
+    writer = CSVMessageWriter(tmp_path)
+    writer.write_reaction_counts(
+        dialog,
+        ReactionCountColumns(
+            dialog_id=[1, 1, 1], message_id=[3, 2, 1], emoji_code=[0, 0, 0], count=[5, 2, 1]
+        ),
+        ["👍"],
+    )
+
+    # Act
+    writer.patch_reactions(
+        dialog,
+        [3, 2],
+        ["👍", "🔥"],
+        reaction_counts=ReactionCountColumns(
+            dialog_id=[1, 1], message_id=[2, 3], emoji_code=[1, 0], count=[4, 6]
+        ),
+    )
+    reader = CSVMessageReader(tmp_path)
+    counts = reader.read_reaction_count_columns(1)
+
+    # Assert
+    assert list(zip(counts["message_id"], counts["emoji_code"], counts["count"])) == [
+        (3, 0, 6),
+        (2, 1, 4),
+        (1, 0, 1),
+    ]
+    assert reader.read_emojis(1) == ["👍", "🔥"]
+    assert reader.read_reaction_columns(1)["message_id"] == []
@@ -0,0 +1,78 @@
+from telegram_data_downloader.dict_types.dialog import (
+    ChatData,
+    DialogMemberData,
+    DialogType,
+)
+from telegram_data_downloader.loader.directory import JSONPeerDirectory
+
+
+def make_user(user_id: int, username: str | None) -> DialogMemberData:
+    return DialogMemberData(
+        user_id=user_id,
+        first_name="First",
+        last_name=None,
+        username=username,
+        phone=None,
+    )
+
+
+def test_only_changed_peers_are_appended(tmp_path):
+    """
+    Test that the records, that didn't change, aren't written again,
+    and the latest record of a peer is loaded.
+    """
+    directory = JSONPeerDirectory(tmp_path)
+    chat = ChatData(
+        chat_id=-1001, title="Channel", username=None, type=DialogType.CHANNEL
+    )
+
+    assert directory.update_users([make_user(1, "old"), make_user(2, None)]) == 2
+    assert directory.update_users([make_user(1, "old"), make_user(2, None)]) == 0
+    assert directory.update_users([make_user(1, "new")]) == 1
+    assert directory.update_chats([chat, chat]) == 1
+
+    with open(directory.users_path, "a", encoding="utf-8") as f:
+        f.write('{"user_id": 3, "fi')  # interrupted write
+    reloaded = JSONPeerDirectory(tmp_path)
+    assert reloaded.read_users() == {1: make_user(1, "new"), 2: make_user(2, None)}
+    assert reloaded.read_chats() == {-1001: chat}
+    assert reloaded.get_users([2, 3, 1]) == [make_user(2, None), make_user(1, "new")]
+
+
+def test_incomplete_records_keep_the_known_fields(tmp_path):
+    """
+    Test that the missing fields of an update, e.g. of a "min" user, don't replace
+    the known values, and that a merged record, that didn't change, isn't written.
+    """
+    directory = JSONPeerDirectory(tmp_path)
+    full = DialogMemberData(
+        user_id=1, first_name="First", last_name="Last", username="user", phone="123"
+    )
+    directory.update_users([full])
+
+    min_user = DialogMemberData(
+        user_id=1, first_name="First", last_name=None, username=None, phone=None
+    )
+    assert directory.update_users([min_user]) == 0
+    assert directory.update_users([min_user | {"first_name": "Renamed"}]) == 1
+
+    reloaded = JSONPeerDirectory(tmp_path)
+    assert reloaded.read_users() == {1: full | {"first_name": "Renamed"}}
+    with open(reloaded.users_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_outdated_records_are_compacted(tmp_path):
+    """
+    Test that the file is rewritten with the latest records, once most of its lines
+    are outdated.
+    """
+    directory = JSONPeerDirectory(tmp_path)
+    for index in range(5):
+        directory.update_users([make_user(1, f"name{index}")])
+
+    reloaded = JSONPeerDirectory(tmp_path)
+
+    with open(reloaded.users_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+    assert reloaded.read_users() == {1: make_user(1, "name4")}
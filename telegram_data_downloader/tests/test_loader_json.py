@@ -1,7 +1,15 @@
 import json
+from datetime import datetime, timezone
+
 import pytest
 
-from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType, DialogMemberData
+from telegram_data_downloader.dict_types.dialog import (
+    DialogIndexEntry,
+    DialogMetadata,
+    DialogType,
+    DialogMemberData,
+)
+from telegram_data_downloader.loader.directory import JSONPeerDirectory
 from telegram_data_downloader.loader.json import JSONDialogReaderWriter
 
 
@@ -245,3 +253,117 @@ class TestReadAllDialogs:
         # Act & Assert
         with pytest.raises(ValueError):
             reader.read_all_dialogs()
+
+
+class TestDialogIndex:
+    def test_write_dialog_indexes_the_dialog(self, tmp_path):
+        # Arrange
+        last_message_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        reader = JSONDialogReaderWriter(tmp_path)
+        reader.write_dialog(
+            DialogMetadata(
+                id=1,
+                name="Dialog1",
+                type=DialogType.GROUP,
+                users=[],
+                member_count=700,
+                last_message_date=last_message_date,
+            )
+        )
+        # * rewritten dialogs replace their entries
+        reader.write_dialog(
+            DialogMetadata(
+                id=1,
+                name="Renamed",
+                type=DialogType.GROUP,
+                users=[],
+                member_count=800,
+                last_message_date=last_message_date,
+            )
+        )
+        # Act
+        index = reader.read_index()
+        # Assert
+        assert index == {
+            1: DialogIndexEntry(
+                id=1,
+                name="Renamed",
+                type=DialogType.GROUP,
+                member_count=800,
+                last_message_date=last_message_date,
+            )
+        }
+        assert reader.read_dialog(1)["last_message_date"] == last_message_date
+        assert len(reader.index_path.read_text(encoding="utf-8").splitlines()) == 1
+
+    def test_read_index_reconciles_with_dialog_files(self, tmp_path):
+        # Arrange
+        reader = JSONDialogReaderWriter(tmp_path)
+        reader.write_dialog(
+            DialogMetadata(id=1, name="Removed", type=DialogType.GROUP, users=[])
+        )
+        (tmp_path / "1.json").unlink()
+        # * saved by an older version, without the index
+        with open(tmp_path / "2.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "id": 2,
+                    "name": "Old",
+                    "type": "channel",
+                    "users": [
+                        {
+                            "user_id": 10,
+                            "first_name": None,
+                            "last_name": None,
+                            "username": "user",
+                            "phone": None,
+                        }
+                    ],
+                },
+                f,
+            )
+        with open(reader.index_path, "a", encoding="utf-8") as f:
+            f.write('{"id": 3, "na')  # interrupted write
+        # Act
+        index = reader.read_index()
+        # Assert
+        assert index == {
+            2: DialogIndexEntry(
+                id=2,
+                name="Old",
+                type=DialogType.CHANNEL,
+                member_count=1,
+                last_message_date=None,
+            )
+        }
+        assert JSONDialogReaderWriter(tmp_path).read_index() == index
+
+
+class TestUserDirectory:
+    def test_users_are_referenced_by_id(self, tmp_path):
+        # Arrange
+        user = DialogMemberData(
+            user_id=10,
+            first_name="First",
+            last_name=None,
+            username="user",
+            phone=None,
+        )
+        dialog = DialogMetadata(id=1, name="Group", type=DialogType.GROUP, users=[user])
+        directory = JSONPeerDirectory(tmp_path / "peers")
+        writer = JSONDialogReaderWriter(tmp_path / "dialogs", user_directory=directory)
+        # Act
+        writer.write_dialog(dialog)
+        writer.write_dialog(DialogMetadata(dialog, id=2))
+        # Assert
+        with open(tmp_path / "dialogs" / "1.json", encoding="utf-8") as f:
+            data = json.load(f)
+        assert "users" not in data
+        assert data["user_ids"] == [10]
+        with open(directory.users_path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 1
+        reader = JSONDialogReaderWriter(
+            tmp_path / "dialogs",
+            user_directory=JSONPeerDirectory(tmp_path / "peers"),
+        )
+        assert reader.read_dialog(1) == dialog
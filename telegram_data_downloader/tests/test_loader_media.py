@@ -0,0 +1,21 @@
+from telegram_data_downloader.loader.media import FileMediaStore
+
+
+def test_commit_and_reload_media(tmp_path):
+    # Arrange
+    store = FileMediaStore(tmp_path)
+    # Act
+    with store.open_temp("photo-1.jpg") as f:
+        f.write(b"data")
+    assert not store.exists("photo-1.jpg")
+    store.commit("photo-1.jpg")
+    with store.open_temp("document-2.mp4") as f:
+        f.write(b"partial")
+    reloaded_store = FileMediaStore(tmp_path)
+    # Assert
+    assert store.exists("photo-1.jpg")
+    assert store.path("photo-1.jpg").read_bytes() == b"data"
+    assert reloaded_store.exists("photo-1.jpg")
+    # * interrupted downloads are cleaned up
+    assert not reloaded_store.exists("document-2.mp4")
+    assert [path.name for path in tmp_path.iterdir()] == ["photo-1.jpg"]
@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.dict_types.message import (
+    MessageColumns,
+    MessageType,
+    PeerID,
+    ReactionColumns,
+)
+from telegram_data_downloader.loader.compression import Compression
+from telegram_data_downloader.loader.partitioned import (
+    PartitionedMessageReader,
+    PartitionedMessageWriter,
+)
+
+
+def make_columns(message_ids: list[int], dates: list[datetime]) -> MessageColumns:
+    return MessageColumns(
+        id=message_ids,
+        date=dates,
+        from_id=[PeerID(1)] * len(message_ids),
+        fwd_from=[None] * len(message_ids),
+        message=[f"msg {message_id}" for message_id in message_ids],
+        type=[MessageType.TEXT] * len(message_ids),
+        duration=[None] * len(message_ids),
+        to_id=[PeerID(2)] * len(message_ids),
+        media_ref=[None] * len(message_ids),
+    )
+
+
+def test_partitions_roll_over_and_resume(tmp_path):
+    """
+    Test that the messages are split by month to parts of limited size, the data written
+    after a checkpoint is dropped on resume, and the partitions appear on commit.
+    """
+    march = datetime(2024, 3, 10, tzinfo=timezone.utc)
+    february = datetime(2024, 2, 10, tzinfo=timezone.utc)
+    dialog = DialogMetadata(id=1, name="test_dialog", type=DialogType.GROUP, users=[])
+    writer = PartitionedMessageWriter(
+        tmp_path, compression=Compression.GZIP, max_part_rows=2
+    )
+
+    writer.truncate_parts(dialog, {})
+    writer.append_messages(dialog, make_columns([5, 4, 3], [march] * 3))
+    writer.append_reactions(
+        dialog,
+        ReactionColumns(
+            dialog_id=[1], message_id=[5], peer_id=[PeerID(2)], emoji_code=[0]
+        ),
+    )
+    part_sizes = writer.sync_parts(dialog)
+    writer.append_messages(dialog, make_columns([2], [february]))
+    # * a new writer, as after a crash
+    writer = PartitionedMessageWriter(
+        tmp_path, compression=Compression.GZIP, max_part_rows=2
+    )
+    writer.truncate_parts(dialog, part_sizes)
+    writer.append_messages(dialog, make_columns([2, 1], [march, february]))
+    assert not (tmp_path / "messages").exists()
+    writer.commit(dialog, ["👍"])
+
+    march_dir = tmp_path / "messages" / "dialog_id=1" / "year=2024" / "month=03"
+    assert sorted(path.name for path in march_dir.iterdir()) == [
+        "part-00000.csv.gz",
+        "part-00001.csv.gz",
+        "part-00002.csv.gz",
+    ]
+    assert not list((tmp_path / "_staging").rglob("part-*"))
+    reader = PartitionedMessageReader(tmp_path)
+    assert reader.read_messages(1)["id"].tolist() == [5, 4, 3, 2, 1]
+    assert reader.read_message_ids(1, datetime(2024, 3, 1, tzinfo=timezone.utc)) == [
+        5,
+        4,
+        3,
+        2,
+    ]
+    assert reader.message_files(since=march) == sorted(march_dir.iterdir())
+    assert reader.read_reactions(1)["emoji"].tolist() == ["👍"]
+
+
+def test_compact_packs_tiny_dialogs(tmp_path):
+    """
+    Test that the tiny dialogs are packed to shared files, that are still read
+    per dialog, and that a packed dialog is unpacked, once it's written again.
+    """
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    writer = PartitionedMessageWriter(tmp_path)
+    tiny = DialogMetadata(id=1, name="tiny", type=DialogType.PRIVATE, users=[])
+    other = DialogMetadata(id=2, name="other", type=DialogType.PRIVATE, users=[])
+    large = DialogMetadata(id=3, name="large", type=DialogType.GROUP, users=[])
+    writer.write_messages(tiny, make_columns([2, 1], [date, date]))
+    writer.write_reactions(
+        tiny,
+        ReactionColumns(
+            dialog_id=[1], message_id=[2], peer_id=[PeerID(2)], emoji_code=[0]
+        ),
+        ["👍"],
+    )
+    writer.write_messages(other, make_columns([7], [date]))
+    writer.write_messages(large, make_columns(list(range(100, 0, -1)), [date] * 100))
+
+    assert writer.compact(max_dialog_bytes=1000) == 2
+
+    assert not (tmp_path / "messages" / "dialog_id=1").exists()
+    assert (tmp_path / "messages" / "dialog_id=3").exists()
+    packed_files = list((tmp_path / "packed" / "messages").rglob("part-*"))
+    assert len(packed_files) == 1
+    reader = PartitionedMessageReader(tmp_path)
+    assert reader.read_messages(1)["id"].tolist() == [2, 1]
+    assert "dialog_id" not in reader.read_messages(1).columns
+    assert reader.read_messages(2)["id"].tolist() == [7]
+    assert reader.read_emojis(1) == ["👍"]
+    assert len(reader.message_files()) == 2
+
+    writer.patch_reactions(
+        tiny,
+        [2],
+        ["👍", "🔥"],
+        reactions=ReactionColumns(
+            dialog_id=[1], message_id=[2], peer_id=[PeerID(3)], emoji_code=[1]
+        ),
+    )
+
+    assert (tmp_path / "messages" / "dialog_id=1").exists()
+    assert reader.read_messages(1)["id"].tolist() == [2, 1]
+    assert reader.read_reactions(1)["emoji"].tolist() == ["🔥"]
+    assert reader.read_messages(2)["id"].tolist() == [7]
+    assert not list((tmp_path / "packed" / "reactions").rglob("part-*"))
@@ -0,0 +1,79 @@
+from telegram_data_downloader.dict_types.queue import WorkState, WorkUnit
+from telegram_data_downloader.loader.queue import SQLiteWorkQueue
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    """
+    Test that a unit is leased by one worker at a time, the lease is extended
+    by heartbeats, and the unit of a worker, that stopped sending them,
+    is leased by another worker.
+    """
+    clock = FakeClock()
+    queue = SQLiteWorkQueue(tmp_path / "queue.sqlite3", lease_duration=60, clock=clock)
+    assert queue.publish([1], 100) == 1
+    assert queue.publish([1, 2], 100) == 1
+
+    assert queue.lease("a") == WorkUnit(dialog_id=1, msg_limit=100, attempts=1)
+    assert queue.lease("b") == WorkUnit(dialog_id=2, msg_limit=100, attempts=1)
+    assert queue.lease("b") is None
+
+    clock.now += 50
+    assert queue.heartbeat(1, "a")
+    clock.now += 50
+    assert queue.complete(2, "b")
+    # * the lease of "a" is extended past the initial 60 seconds
+    assert queue.lease("b") is None
+
+    clock.now += 61
+    assert queue.lease("b") == WorkUnit(dialog_id=1, msg_limit=100, attempts=2)
+    assert not queue.heartbeat(1, "a")
+    assert not queue.complete(1, "a")
+    assert queue.complete(1, "b")
+    assert not queue.has_unfinished()
+    assert queue.count_states()[WorkState.DONE] == 2
+
+
+def test_failed_unit_is_retried_until_max_attempts(tmp_path):
+    """
+    Test that a released or expired unit is leased again, unless it failed
+    with every allowed attempt.
+    """
+    clock = FakeClock()
+    queue = SQLiteWorkQueue(
+        tmp_path / "queue.sqlite3", lease_duration=60, max_attempts=2, clock=clock
+    )
+    queue.publish([1, 2], 100)
+
+    # * a dialog, that crashes its workers, expires every lease
+    assert queue.lease("a") == WorkUnit(dialog_id=1, msg_limit=100, attempts=1)
+    clock.now += 61
+    assert queue.lease("b") == WorkUnit(dialog_id=2, msg_limit=100, attempts=1)
+    assert queue.lease("c") == WorkUnit(dialog_id=1, msg_limit=100, attempts=2)
+    assert queue.complete(2, "b")
+    clock.now += 61
+    assert queue.lease("d") is None
+    assert queue.count_states()[WorkState.FAILED] == 1
+    assert not queue.has_unfinished()
+
+    queue.publish([3], 100)
+
+    queue.lease("a")
+    assert queue.release(3, "a", "ConnectionError()")
+    assert queue.lease("a") == WorkUnit(dialog_id=3, msg_limit=100, attempts=2)
+    assert queue.release(3, "a", "ConnectionError()")
+
+    assert queue.lease("a") is None
+    assert queue.count_states() == {
+        WorkState.PENDING: 0,
+        WorkState.LEASED: 0,
+        WorkState.DONE: 1,
+        WorkState.FAILED: 2,
+    }
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from telegram_data_downloader.memory import MemoryBudget
+
+
+def test_largest_buffers_are_flushed():
+    """
+    Test that only the largest buffers, that are enough to fit the budget,
+    have to be flushed.
+    """
+    budget = MemoryBudget(100)
+    for dialog_id, buffered_bytes in [(1, 60), (2, 30), (3, 20)]:
+        budget.start_dialog(dialog_id)
+        budget.update(dialog_id, buffered_bytes)
+
+    assert [budget.should_flush(dialog_id) for dialog_id in [1, 2, 3]] == [
+        True,
+        False,
+        False,
+    ]
+    budget.update(3, 80)
+    assert [budget.should_flush(dialog_id) for dialog_id in [1, 2, 3]] == [
+        False,
+        False,
+        True,
+    ]
+    budget.update(1, 90)
+    assert [budget.should_flush(dialog_id) for dialog_id in [1, 2, 3]] == [
+        True,
+        False,
+        True,
+    ]
+    assert not MemoryBudget(None).should_flush(1)
+
+
+@pytest.mark.asyncio
+async def test_dialogs_wait_for_the_flush():
+    """
+    Test that a dialog pauses, while the budget is exceeded by the buffer of another
+    dialog, and goes on once that buffer is flushed.
+    """
+    budget = MemoryBudget(100)
+    budget.start_dialog(1)
+    budget.start_dialog(2)
+    budget.update(1, 150)
+    budget.update(2, 10)
+
+    waiting = asyncio.create_task(budget.wait_for_room(2))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    assert await budget.wait_for_room(1)
+
+    budget.update(1, 0)
+    assert await asyncio.wait_for(waiting, 1) is False
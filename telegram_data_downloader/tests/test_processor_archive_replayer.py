@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.dict_types.message import MessageType, PeerID
+from telegram_data_downloader.loader.archive import RawMessageArchive
+from telegram_data_downloader.loader.csv import CSVMessageReader, CSVMessageWriter
+from telegram_data_downloader.loader.directory import JSONPeerDirectory
+from telegram_data_downloader.loader.json import JSONDialogReaderWriter
+from telegram_data_downloader.processor.archive_replayer import ArchiveReplayer
+
+
+def test_replay_dialog():
+    # Arrange
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    message = tl_types.Message(
+        id=10,
+        peer_id=tl_types.PeerUser(user_id=1),
+        date=date,
+        message="hello",
+        from_id=tl_types.PeerUser(user_id=2),
+    )
+    reactions_list = tl_types.messages.MessageReactionsList(
+        count=1,
+        reactions=[
+            tl_types.MessagePeerReaction(
+                peer_id=tl_types.PeerUser(user_id=3),
+                date=date,
+                reaction=tl_types.ReactionEmoji(emoticon="👍"),
+            )
+        ],
+        chats=[],
+        users=[],
+    )
+    dialog = DialogMetadata(id=1, name="Dialog", type=DialogType.PRIVATE, users=[])
+    raw_archive = MagicMock()
+    raw_archive.iter_dialog.return_value = iter([(message, reactions_list)])
+    dialog_reader = MagicMock()
+    dialog_reader.read_dialog.return_value = dialog
+    message_writer = MagicMock()
+    replayer = ArchiveReplayer(raw_archive, dialog_reader, message_writer)
+    # Act
+    count = replayer.replay_dialog(1)
+    # Assert
+    assert count == 1
+    message_writer.write_messages.assert_called_once_with(
+        dialog,
+        {
+            "id": [10],
+            "date": [date],
+            "from_id": [PeerID(2)],
+            "fwd_from": [None],
+            "message": ["hello"],
+            "type": [MessageType.TEXT],
+            "duration": [None],
+            "to_id": [PeerID(1)],
+            "media_ref": [None],
+        },
+    )
+    message_writer.write_reactions.assert_called_once_with(
+        dialog,
+        {
+            "dialog_id": [1],
+            "message_id": [10],
+            "peer_id": [PeerID(3)],
+            "emoji_code": [0],
+        },
+        ["👍"],
+    )
+
+
+def test_replay_dialog_without_metadata():
+    # Arrange
+    raw_archive = MagicMock()
+    raw_archive.iter_dialog.return_value = iter([])
+    dialog_reader = MagicMock()
+    dialog_reader.read_dialog.side_effect = FileNotFoundError("dialog 5 not found")
+    message_writer = MagicMock()
+    replayer = ArchiveReplayer(raw_archive, dialog_reader, message_writer)
+    # Act
+    count = replayer.replay_dialog(5)
+    # Assert
+    assert count == 0
+    written_dialog, written_messages = message_writer.write_messages.call_args[0]
+    assert written_dialog["id"] == 5
+    assert written_dialog["type"] == DialogType.UNKNOWN
+    assert written_messages["id"] == []
+
+
+def test_replay_dialogs_in_worker_processes(tmp_path):
+    # Arrange
+    raw_archive = RawMessageArchive(tmp_path / "archive")
+    dialog_reader = JSONDialogReaderWriter(
+        tmp_path / "dialogs",
+        user_directory=JSONPeerDirectory(tmp_path / "directory"),
+    )
+    for dialog_id in (5, 6):
+        dialog_reader.write_dialog(
+            DialogMetadata(
+                id=dialog_id, name="Dialog", type=DialogType.PRIVATE, users=[]
+            )
+        )
+        raw_archive.append(
+            dialog_id,
+            [
+                tl_types.Message(
+                    id=message_id,
+                    peer_id=tl_types.PeerUser(user_id=dialog_id),
+                    date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    message="hello",
+                )
+                for message_id in (2, 1)
+            ],
+            {},
+        )
+    replayer = ArchiveReplayer(
+        raw_archive, dialog_reader, CSVMessageWriter(tmp_path / "data")
+    )
+    # Act
+    count = replayer.replay_dialogs(None, workers=2)
+    # Assert
+    assert count == 4
+    reader = CSVMessageReader(tmp_path / "data")
+    assert reader.read_messages(5)["id"].tolist() == [2, 1]
+    assert reader.read_messages(6)["id"].tolist() == [2, 1]
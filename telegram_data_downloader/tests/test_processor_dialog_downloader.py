@@ -1,9 +1,12 @@
+import asyncio
+
 import pytest
 import telethon.errors
 
 from unittest.mock import AsyncMock, MagicMock
 from telegram_data_downloader.processor.dialog_downloader import DialogDownloader
 from telegram_data_downloader.dict_types.dialog import DialogType, DialogMemberData
+from telegram_data_downloader.retry import RetryPolicy
 
 
 class MockRPCError(telethon.errors.RPCError):
@@ -359,6 +362,51 @@ async def test_save_dialog_participants_unknown_rpc_error():
     assert dialog_metadata["users"] == []
 
 
+@pytest.mark.asyncio
+async def test_save_dialog_participants_timeout():
+    """
+    Test the _save_dialog method when getting the participants times out.
+    Ensures that the dialog is saved without users, and the other dialogs are saved.
+    """
+    # Arrange
+    mock_client = MagicMock()
+    slow_dialog = MagicMock()
+    slow_dialog.id = 6
+    slow_dialog.name = "LargeGroup"
+    slow_dialog.is_user = False
+    slow_dialog.is_group = True
+    slow_dialog.is_channel = False
+    other_dialog = MagicMock()
+    other_dialog.id = 7
+    other_dialog.name = "SmallGroup"
+    other_dialog.is_user = False
+    other_dialog.is_group = True
+    other_dialog.is_channel = False
+
+    async def get_participants(dialog):
+        if dialog is slow_dialog:
+            await asyncio.sleep(1)
+        return []
+
+    mock_client.get_dialogs = AsyncMock(return_value=[slow_dialog, other_dialog])
+    mock_client.get_participants = AsyncMock(side_effect=get_participants)
+    mock_writer = MagicMock()
+    downloader = DialogDownloader(
+        mock_client,
+        mock_writer,
+        retry_policy=RetryPolicy(max_tries=1, call_timeout=0.01),
+    )
+
+    # Act
+    result = await downloader.save_dialogs(None)
+
+    # Assert
+    assert result is True
+    assert mock_writer.write_dialog.call_count == 2
+    saved = [c.args[0] for c in mock_writer.write_dialog.call_args_list]
+    assert {dialog["id"]: dialog["users"] for dialog in saved} == {6: [], 7: []}
+
+
 @pytest.mark.asyncio
 async def test_save_dialogs_no_dialogs():
     """
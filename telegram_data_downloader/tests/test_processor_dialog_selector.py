@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from telegram_data_downloader.dict_types.dialog import (
+    DialogIndexEntry,
+    DialogMetadata,
+    DialogQuery,
+    DialogType,
+)
+from telegram_data_downloader.processor.dialog_selector import DialogSelector
+
+
+def make_entry(dialog_id, name, dialog_type, member_count, last_message_date):
+    return DialogIndexEntry(
+        id=dialog_id,
+        name=name,
+        type=dialog_type,
+        member_count=member_count,
+        last_message_date=last_message_date,
+    )
+
+
+@pytest.fixture
+def selector():
+    index = MagicMock()
+    index.read_index.return_value = {
+        entry["id"]: entry
+        for entry in [
+            make_entry(
+                1,
+                "Alice",
+                DialogType.PRIVATE,
+                2,
+                datetime(2024, 5, 1, tzinfo=timezone.utc),
+            ),
+            make_entry(
+                -2,
+                "Python devs",
+                DialogType.GROUP,
+                900,
+                datetime(2024, 3, 1, tzinfo=timezone.utc),
+            ),
+            make_entry(
+                -3,
+                "Rust devs",
+                DialogType.GROUP,
+                300,
+                datetime(2024, 6, 1, tzinfo=timezone.utc),
+            ),
+            make_entry(-4, "News", DialogType.CHANNEL, 5000, None),
+        ]
+    }
+    return DialogSelector(index)
+
+
+@pytest.mark.parametrize(
+    "query, expected_ids",
+    [
+        (DialogQuery(), [1, -2, -3, -4]),
+        (DialogQuery(ids={-4, 1, 999}), [1, -4]),
+        (DialogQuery(types={DialogType.GROUP}, min_members=500), [-2]),
+        (DialogQuery(name_pattern=r"(?i)DEVS$"), [-2, -3]),
+        (
+            DialogQuery(active_since=datetime(2024, 4, 1, tzinfo=timezone.utc)),
+            [1, -3],
+        ),
+        (
+            DialogQuery(
+                ids={-2, -3, -4},
+                types={DialogType.GROUP, DialogType.CHANNEL},
+                min_members=100,
+                name_pattern="devs",
+                active_since=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            ),
+            [-2, -3],
+        ),
+    ],
+)
+def test_select(selector, query, expected_ids):
+    """
+    Test selecting dialogs by the conditions of the query.
+    """
+    # Act
+    result = selector.select(query)
+
+    # Assert
+    assert [entry["id"] for entry in result] == expected_ids
+
+
+def test_select_dialogs(selector):
+    """
+    Test selecting dialogs in the form accepted by the message downloader.
+    """
+    # Act
+    result = selector.select_dialogs(DialogQuery(ids={-4}))
+
+    # Assert
+    assert result == [
+        DialogMetadata(
+            id=-4,
+            name="News",
+            type=DialogType.CHANNEL,
+            users=[],
+            member_count=5000,
+            last_message_date=None,
+        )
+    ]
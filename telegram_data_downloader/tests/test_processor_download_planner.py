@@ -0,0 +1,137 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telethon.helpers import TotalList
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.checkpoint import DialogCheckpoint
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.dict_types.message import ReactionsMode
+from telegram_data_downloader.processor.download_planner import (
+    DownloadPlanner,
+    check_plan_limits,
+    format_plan,
+)
+from telegram_data_downloader.retry import RetryPolicy
+
+
+NEWS_ID = -1000000000002
+SUPERGROUP_ID = -1000000000005
+
+
+def make_client(totals):
+    async def get_messages(entity, **kwargs):
+        if entity not in totals:
+            raise ValueError("Could not find the input entity")
+        messages = TotalList()
+        messages.total = totals[entity]
+        return messages
+
+    async def get_entity(entity):
+        return tl_types.Channel(
+            id=-entity - 1000000000000,
+            title="Channel",
+            photo=tl_types.ChatPhotoEmpty(),
+            date=None,
+            broadcast=entity == NEWS_ID,
+            megagroup=entity == SUPERGROUP_ID,
+        )
+
+    client = MagicMock()
+    client.get_messages = AsyncMock(side_effect=get_messages)
+    client.get_entity = AsyncMock(side_effect=get_entity)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_plan_estimates_requests_time_and_size():
+    """
+    Test that the requests of the pages and of the reactions are counted per dialog,
+    and the time of the dialogs is spread over the concurrent downloads.
+    """
+    checkpoint_store = MagicMock()
+    checkpoint_store.read.side_effect = lambda dialog_id: (
+        DialogCheckpoint(
+            dialog_id=3,
+            offset_id=10,
+            msg_count=100,
+            part_sizes={},
+            emojis=[],
+            message_filter="{}",
+        )
+        if dialog_id == 3
+        else None
+    )
+    planner = DownloadPlanner(
+        make_client({1: 250, NEWS_ID: 1000, 3: 300, SUPERGROUP_ID: 400}),
+        reactions_mode=ReactionsMode.FULL,
+        concurrency=2,
+        retry_policy=RetryPolicy(max_tries=1),
+        bytes_per_message=10,
+        checkpoint_store=checkpoint_store,
+        seconds_per_request=0.1,
+    )
+    dialogs = [
+        DialogMetadata(
+            id=1, name="Friend", type=DialogType.PRIVATE, users=[], member_count=2
+        ),
+        DialogMetadata(id=NEWS_ID, name="News", type=DialogType.CHANNEL, users=[]),
+        DialogMetadata(id=3, name="Group", type=DialogType.GROUP, users=[]),
+        DialogMetadata(id=4, name="Gone", type=DialogType.GROUP, users=[]),
+        # * supergroups are saved as channels to the dialog list
+        DialogMetadata(
+            id=SUPERGROUP_ID, name="Supergroup", type=DialogType.CHANNEL, users=[]
+        ),
+    ]
+
+    plan = await planner.plan(dialogs, msg_limit=500)
+
+    friend, news, group, gone, supergroup = plan["dialogs"]
+    # * 3 pages, the entity and a request per message
+    assert friend["member_count"] == 2
+    assert friend["requests"] == 3 + 1 + 250
+    assert friend["seconds"] == pytest.approx(3 * 5.0 + 251 * 0.1)
+    # * broadcast channels have no reactions to request
+    assert news["messages"] == 500
+    assert news["requests"] == 5 + 2
+    # * the messages saved before the checkpoint are left out
+    assert group["messages"] == 200
+    assert group["requests"] == 2 + 1 + 200
+    assert group["bytes"] == 2000
+    assert gone["messages"] is None
+    # * messages of supergroups have reactions to request
+    assert supergroup["requests"] == 4 + 2 + 400
+
+    assert plan["messages"] == 1350
+    assert plan["requests"] == sum(d["requests"] for d in plan["dialogs"])
+    assert plan["uncounted_dialogs"] == 1
+    assert plan["seconds"] == pytest.approx(
+        sum(d["seconds"] for d in plan["dialogs"]) / 2
+    )
+    assert "1 dialogs couldn't be counted" in format_plan(plan)
+
+
+@pytest.mark.asyncio
+async def test_plan_measures_the_requests_and_checks_the_limits():
+    """
+    Test that the latency of the counting requests is used, when it isn't configured,
+    and that the plans over the limits of a job are reported.
+    """
+    ticks = iter(range(100))
+    planner = DownloadPlanner(
+        make_client({1: 10_000}),
+        reactions_mode=ReactionsMode.NONE,
+        concurrency=5,
+        retry_policy=RetryPolicy(max_tries=1),
+        bytes_per_message=1000,
+        clock=lambda: float(next(ticks)),
+    )
+    dialog = DialogMetadata(id=1, name="Big", type=DialogType.GROUP, users=[])
+
+    plan = await planner.plan([dialog], msg_limit=10_000)
+
+    assert plan["seconds_per_request"] == 1.0
+    # * a single dialog can't be sped up by the concurrency
+    assert plan["seconds"] == pytest.approx(100 * 5.0 + 1.0)
+    assert check_plan_limits(plan, max_seconds=3600, max_bytes=2**30) == []
+    assert len(check_plan_limits(plan, max_seconds=60, max_bytes=2**20)) == 2
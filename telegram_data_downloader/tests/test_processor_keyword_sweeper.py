@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.processor.keyword_sweeper import KeywordSweeper
+from telegram_data_downloader.retry import RetryPolicy
+
+BASE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_message(chat_id, message_id, chat=None):
+    return MagicMock(
+        chat_id=chat_id,
+        chat=chat,
+        id=message_id,
+        date=BASE_DATE + timedelta(seconds=message_id),
+        from_id=None,
+        fwd_from=None,
+        message="keyword",
+        media=None,
+        to_id=tl_types.PeerUser(1),
+    )
+
+
+def make_dialog_reader(dialogs):
+    reader = MagicMock()
+
+    def read_dialog(dialog_id):
+        if dialog_id not in dialogs:
+            raise FileNotFoundError(f"dialog {dialog_id} not found")
+        return dialogs[dialog_id]
+
+    reader.read_dialog.side_effect = read_dialog
+    return reader
+
+
+@pytest.mark.asyncio
+async def test_sweep_groups_messages_by_dialog():
+    """
+    Test that the found messages are saved per dialog, and dialogs, that weren't
+    downloaded, are described by the search results.
+    """
+    known = DialogMetadata(id=1, name="Alice", type=DialogType.PRIVATE, users=[])
+    channel = tl_types.Channel(
+        id=2,
+        title="News",
+        photo=tl_types.ChatPhotoEmpty(),
+        date=BASE_DATE,
+        broadcast=True,
+    )
+    found = [
+        make_message(1, 30),
+        make_message(-1000000000002, 20, chat=channel),
+        make_message(1, 10),
+    ]
+    client = MagicMock()
+    iterator_kwargs = []
+
+    async def iter_messages(entity, **kwargs):
+        iterator_kwargs.append((entity, kwargs))
+        for message in found:
+            yield message
+
+    client.iter_messages = iter_messages
+    writer = MagicMock()
+    sweeper = KeywordSweeper(client, make_dialog_reader({1: known}), writer)
+
+    result = await sweeper.sweep("keyword", 100)
+
+    assert result == {1: 2, -1000000000002: 1}
+    assert iterator_kwargs[0][0] is None
+    assert iterator_kwargs[0][1]["search"] == "keyword"
+    written = {
+        call.args[0]["id"]: (call.args[0], call.args[1]["id"])
+        for call in writer.write_messages.call_args_list
+    }
+    assert written[1] == (known, [30, 10])
+    assert written[-1000000000002] == (
+        DialogMetadata(
+            id=-1000000000002, name="News", type=DialogType.CHANNEL, users=[]
+        ),
+        [20],
+    )
+
+
+@pytest.mark.asyncio
+async def test_sweep_resumes_after_connection_error():
+    """
+    Test that a failed page continues from the date of the last found message
+    without duplicates, and the messages older than `since` are not saved.
+    """
+    found = [make_message(1, message_id) for message_id in (50, 40, 40, 30, 20, 10)]
+    client = MagicMock()
+    iterator_kwargs = []
+
+    async def iter_messages(entity, **kwargs):
+        iterator_kwargs.append(kwargs)
+        for message in found:
+            if kwargs["offset_date"] and message.date > kwargs["offset_date"]:
+                continue
+            if len(iterator_kwargs) == 1 and message.id == 30:
+                raise ConnectionResetError
+            yield message
+
+    client.iter_messages = iter_messages
+    writer = MagicMock()
+    sweeper = KeywordSweeper(
+        client,
+        make_dialog_reader({}),
+        writer,
+        message_filter={"since": BASE_DATE + timedelta(seconds=15)},
+        retry_policy=RetryPolicy(base_sleep_time=0.001, max_sleep_time=0.001),
+    )
+
+    result = await sweeper.sweep("keyword", 100)
+
+    assert result == {1: 4}
+    assert writer.write_messages.call_args.args[1]["id"] == [50, 40, 30, 20]
+    assert iterator_kwargs[1]["offset_date"] == BASE_DATE + timedelta(seconds=40)
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.checkpoint import LiveCheckpoint
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.processor.live_ingester import LiveIngester
+from telegram_data_downloader.retry import RetryPolicy
+
+
+def make_message(message_id, text="text"):
+    return MagicMock(
+        id=message_id,
+        date=datetime(2024, 1, 1),
+        from_id=None,
+        fwd_from=None,
+        message=text,
+        media=None,
+        to_id=tl_types.PeerUser(1),
+    )
+
+
+def make_client(missed_messages):
+    client = MagicMock()
+    # * never disconnects
+    client.disconnected = asyncio.get_running_loop().create_future()
+
+    async def iter_messages(entity, **kwargs):
+        for message in missed_messages:
+            if message.id > kwargs["min_id"]:
+                yield message
+
+    client.iter_messages = MagicMock(side_effect=iter_messages)
+    client.get_messages = AsyncMock(return_value=[])
+    return client
+
+
+def make_writer():
+    writer = MagicMock()
+    writer.written = []
+
+    def extend_messages(dialog, messages):
+        writer.written.append(
+            (dialog["id"], list(messages["id"]), list(messages["message"]))
+        )
+        return 100 * len(writer.written)
+
+    writer.extend_messages.side_effect = extend_messages
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_run_catches_up_and_saves_events():
+    """
+    Test that missed messages are fetched from the checkpoint, and new and edited
+    messages are saved from the events, with the checkpoint following them.
+    """
+    # Arrange
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+    client = make_client([make_message(10), make_message(11), make_message(12)])
+    writer = make_writer()
+    store = MagicMock()
+    store.read.return_value = LiveCheckpoint(
+        last_message_ids={1: 10, 99: 5}, file_sizes={1: 50, 99: 60}
+    )
+    ingester = LiveIngester(client, writer, store, flush_interval=60, flush_size=2)
+
+    # Act
+    task = asyncio.create_task(ingester.run([dialog]))
+    await asyncio.sleep(0.01)
+    handlers = {
+        event.__class__.__name__: callback
+        for (callback, event), _ in client.add_event_handler.call_args_list
+    }
+    await handlers["NewMessage"](MagicMock(chat_id=1, message=make_message(13)))
+    await handlers["MessageEdited"](
+        MagicMock(chat_id=1, message=make_message(12, "edited"))
+    )
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # Assert
+    writer.truncate_messages.assert_called_once_with(dialog, 50)
+    assert writer.written == [
+        (1, [11, 12], ["text", "text"]),  # caught up and flushed by size
+        (1, [13, 12], ["text", "edited"]),  # flushed on stop
+    ]
+    assert store.write.call_args_list[-1].args[0] == LiveCheckpoint(
+        last_message_ids={1: 13}, file_sizes={1: 200, 99: 60}
+    )
+    assert client.remove_event_handler.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_catch_up_keeps_messages_received_meanwhile():
+    """
+    Test that messages, received by events during a catch-up, are neither lost nor
+    duplicated, and the checkpoint doesn't move past the messages being caught up.
+    """
+    # Arrange
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+    client = make_client([make_message(11), make_message(12)])
+    writer = make_writer()
+    store = MagicMock()
+    ingester = LiveIngester(client, writer, store)
+    ingester._dialogs = {1: dialog}
+    ingester._last_ids = {1: 10}
+
+    # Act
+    since_ids = ingester._start_catch_up()
+    ingester._receive(1, make_message(12), edited=False)
+    await ingester.flush()
+    checkpoint_during_catch_up = store.write.call_args.args[0]
+    await ingester._catch_up(since_ids)
+    await ingester.flush()
+
+    # Assert
+    assert checkpoint_during_catch_up["last_message_ids"] == {1: 10}
+    assert writer.written == [(1, [12], ["text"]), (1, [11], ["text"])]
+    assert store.write.call_args.args[0]["last_message_ids"] == {1: 12}
+
+
+@pytest.mark.asyncio
+async def test_catch_up_resumes_failed_pages_and_keeps_timed_out_dialogs_pending():
+    """
+    Test that a failed page of a catch-up continues after the last received message,
+    and a dialog, whose catch-up times out, stays pending without stopping the others.
+    """
+    # Arrange
+    dialogs = {
+        dialog_id: DialogMetadata(
+            id=dialog_id, name="User", type=DialogType.PRIVATE, users=[]
+        )
+        for dialog_id in (1, 2)
+    }
+    client = MagicMock()
+    failed = set()
+
+    async def iter_messages(entity, **kwargs):
+        if entity == 2:
+            raise TimeoutError()
+        for message_id in (11, 12):
+            if message_id > kwargs["min_id"]:
+                if message_id == 12 and not failed:
+                    failed.add(message_id)
+                    raise TimeoutError()
+                yield make_message(message_id)
+
+    client.iter_messages = MagicMock(side_effect=iter_messages)
+    writer = make_writer()
+    retry_policy = RetryPolicy(max_tries=2, base_sleep_time=0, max_sleep_time=0)
+    ingester = LiveIngester(client, writer, MagicMock(), retry_policy=retry_policy)
+    ingester._dialogs = dialogs
+    ingester._last_ids = {1: 10, 2: 20}
+
+    # Act
+    since_ids = ingester._start_catch_up()
+    await ingester._catch_up(since_ids)
+    await ingester.flush()
+
+    # Assert
+    calls = client.iter_messages.call_args_list
+    assert [c.kwargs["min_id"] for c in calls if c.args[0] == 1] == [10, 11]
+    assert writer.written == [(1, [11, 12], ["text", "text"])]
+    assert ingester._pending_since_ids == {2: 20}
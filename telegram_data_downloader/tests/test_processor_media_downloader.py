@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from unittest.mock import MagicMock
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.message import MessageType
+from telegram_data_downloader.loader.media import FileMediaStore
+from telegram_data_downloader.processor.media_downloader import (
+    MediaDownloader,
+    TokenBucket,
+)
+from telegram_data_downloader.retry import RetryPolicy
+
+
+def make_video_message(document_id: int, size: int) -> MagicMock:
+    message = MagicMock()
+    message.media = tl_types.MessageMediaDocument(
+        document=tl_types.Document(
+            id=document_id,
+            access_hash=1,
+            file_reference=b"",
+            date=None,
+            mime_type="video/mp4",
+            size=size,
+            dc_id=1,
+            attributes=[],
+        )
+    )
+    return message
+
+
+def make_client(fail_times: int = 0) -> MagicMock:
+    client = MagicMock()
+    client.downloads = []
+
+    def iter_download(media):
+        client.downloads.append(media.document.id)
+
+        async def chunks():
+            if len(client.downloads) <= fail_times:
+                raise ConnectionResetError
+            yield b"ab"
+            yield b"cd"
+
+        return chunks()
+
+    client.iter_download = iter_download
+    return client
+
+
+@pytest.mark.asyncio
+async def test_media_shared_across_dialogs_is_downloaded_once(tmp_path):
+    client = make_client()
+    downloader = MediaDownloader(
+        client, FileMediaStore(tmp_path), max_sizes={MessageType.VIDEO: 100}
+    )
+
+    # * the same video, forwarded to two dialogs
+    first = downloader.submit(make_video_message(7, 4), "document-7.mp4", MessageType.VIDEO)
+    second = downloader.submit(make_video_message(7, 4), "document-7.mp4", MessageType.VIDEO)
+    assert first is second
+    assert await first is True
+    third = downloader.submit(make_video_message(7, 4), "document-7.mp4", MessageType.VIDEO)
+
+    assert third is None
+    assert client.downloads == [7]
+    assert (tmp_path / "document-7.mp4").read_bytes() == b"abcd"
+
+
+@pytest.mark.asyncio
+async def test_media_size_filter(tmp_path):
+    client = make_client()
+    downloader = MediaDownloader(
+        client, FileMediaStore(tmp_path), max_sizes={MessageType.VIDEO: 100}
+    )
+
+    too_large = downloader.submit(make_video_message(1, 101), "document-1.mp4", MessageType.VIDEO)
+    not_enabled = downloader.submit(make_video_message(2, 1), "document-2.oga", MessageType.VOICE)
+
+    assert too_large is None
+    assert not_enabled is None
+    assert client.downloads == []
+
+
+@pytest.mark.asyncio
+async def test_media_download_failure(tmp_path):
+    client = make_client(fail_times=2)
+    downloader = MediaDownloader(
+        client,
+        FileMediaStore(tmp_path),
+        max_sizes={MessageType.VIDEO: 100},
+        retry_policy=RetryPolicy(base_sleep_time=0.001, max_sleep_time=0.001, max_tries=2),
+    )
+
+    task = downloader.submit(make_video_message(3, 4), "document-3.mp4", MessageType.VIDEO)
+
+    assert await task is False
+    assert list(tmp_path.iterdir()) == []
+    # * a later message with the same media tries again
+    retry_task = downloader.submit(make_video_message(3, 4), "document-3.mp4", MessageType.VIDEO)
+    assert await retry_task is True
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=1000, capacity=100)
+
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.consume(100) for _ in range(3)))
+    elapsed = time.monotonic() - start
+
+    # * the first 100 units are the burst, the other 200 take 0.2s
+    assert 0.18 <= elapsed < 0.5
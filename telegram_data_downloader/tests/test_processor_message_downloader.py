@@ -1,13 +1,30 @@
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch, call
 from datetime import datetime
 
 import telethon.errors
+from telethon.helpers import TotalList
 from telethon.tl import types as tl_types
 
-from telegram_data_downloader.processor.message_downloader import MessageDownloader
+from telegram_data_downloader.processor.message_downloader import (
+    DialogStalledError,
+    MessageDownloader,
+    serialize_message_filter,
+)
+from telegram_data_downloader.dict_types.checkpoint import DialogCheckpoint
+from telegram_data_downloader.memory import MemoryBudget
+from telegram_data_downloader.progress import ProgressTracker
+from telegram_data_downloader.retry import RetryPolicy
+from telegram_data_downloader.watchdog import StallWatchdog
 from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
-from telegram_data_downloader.dict_types.message import MessageType, PeerID
+from telegram_data_downloader.dict_types.message import (
+    MessageFilter,
+    MessageType,
+    PeerID,
+    ReactionsMode,
+)
 
 
 class MockRPCError(telethon.errors.RPCError):
@@ -27,11 +44,11 @@ def mock_settings(monkeypatch):
         "telegram_data_downloader.settings.CONCURRENT_DIALOG_DOWNLOADS", 5
     )
     monkeypatch.setattr(
-        "telegram_data_downloader.settings.MESSAGE_REACTION_EXPONENTIAL_BACKOFF_SLEEP_TIME",
+        "telegram_data_downloader.settings.RETRY_BASE_SLEEP_TIME",
         0.1,
     )
     monkeypatch.setattr(
-        "telegram_data_downloader.settings.MESSAGE_REACTION_EXPONENTIAL_BACKOFF_MAX_TRIES",
+        "telegram_data_downloader.settings.RETRY_MAX_TRIES",
         3,
     )
 
@@ -54,6 +71,7 @@ async def test_reformat_message_photo():
 
     photo_media = MagicMock()
     photo_media.__class__ = tl_types.MessageMediaPhoto
+    photo_media.photo.id = 55
 
     message = MagicMock()
     message.id = 105
@@ -75,7 +93,7 @@ async def test_reformat_message_photo():
         "type": MessageType.PHOTO,
         "duration": None,
         "to_id": PeerID(6),
-        "reactions": {},
+        "media_ref": "photo-55.jpg",
     }
 
 
@@ -99,6 +117,8 @@ async def test_reformat_message_voice():
     media_document = MagicMock()
     media_document.attributes = [audio_attr]
     media_document.__class__ = tl_types.Document
+    media_document.id = 56
+    media_document.mime_type = "audio/ogg"
 
     media = MagicMock()
     media.document = media_document
@@ -124,7 +144,7 @@ async def test_reformat_message_voice():
         "type": MessageType.VOICE,
         "duration": 30,
         "to_id": PeerID(12),
-        "reactions": {},
+        "media_ref": "document-56.oga",
     }
 
 
@@ -177,7 +197,7 @@ async def test_reformat_message_sticker():
         "type": MessageType.STICKER,
         "duration": None,
         "to_id": PeerID(14),
-        "reactions": {},
+        "media_ref": None,
     }
 
 
@@ -202,6 +222,8 @@ async def test_reformat_message_video():
     media_document = MagicMock()
     media_document.attributes = [video_attr]
     media_document.__class__ = tl_types.Document
+    media_document.id = 57
+    media_document.mime_type = "video/mp4"
 
     media = MagicMock()
     media.document = media_document
@@ -227,7 +249,7 @@ async def test_reformat_message_video():
         "type": MessageType.VIDEO,
         "duration": 120,
         "to_id": PeerID(16),
-        "reactions": {},
+        "media_ref": "document-57.mp4",
     }
 
 
@@ -263,6 +285,123 @@ async def test_get_message_iterator_entity_not_found(mock_settings):
     assert len(messages) == 0
     
 
+@pytest.mark.asyncio
+async def test_get_message_iterator_resumes_after_connection_error(mock_settings):
+    """
+    Test that a connection reset during paging continues after the last message,
+    instead of failing the dialog.
+    """
+    mock_client = MagicMock()
+    mock_client.get_entity = AsyncMock(return_value="entity")
+    iterator_kwargs = []
+
+    def mock_iter_messages(entity, **kwargs):
+        iterator_kwargs.append(kwargs)
+
+        async def messages():
+            # * only messages older than `offset_id` are returned
+            newest_id = (kwargs["offset_id"] or 6) - 1
+            for message_id in range(newest_id, 0, -1)[: kwargs["limit"]]:
+                if len(iterator_kwargs) == 1 and message_id == 3:
+                    raise ConnectionResetError
+                yield MagicMock(id=message_id)
+
+        return messages()
+
+    mock_client.iter_messages = mock_iter_messages
+    downloader = MessageDownloader(
+        client=mock_client,
+        dialog_reader=MagicMock(),
+        message_writer=MagicMock(),
+        reactions_limit_per_message=10,
+        retry_policy=RetryPolicy(base_sleep_time=0.001, max_sleep_time=0.001),
+    )
+    dialog = DialogMetadata(id=2, name="Dialog", type=DialogType.GROUP, users=[])
+
+    messages = [m.id async for m in downloader._get_message_iterator(dialog, 4)]
+
+    assert messages == [5, 4, 3, 2]
+    assert [(kw["offset_id"], kw["limit"]) for kw in iterator_kwargs] == [(0, 4), (4, 2)]
+
+
+@pytest.mark.asyncio
+async def test_get_message_iterator_date_window(mock_settings):
+    """
+    Test that the date window of the message filter bounds the requests,
+    and a resumed iterator continues inside the window.
+    """
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    mock_client = MagicMock()
+    mock_client.get_entity = AsyncMock(return_value="entity")
+    mock_client.get_messages = AsyncMock(return_value=[MagicMock(id=7)])
+    iterator_kwargs = []
+
+    async def mock_iter_messages(entity, **kwargs):
+        iterator_kwargs.append(kwargs)
+        yield MagicMock(id=8)
+
+    mock_client.iter_messages = mock_iter_messages
+    downloader = MessageDownloader(
+        client=mock_client,
+        dialog_reader=MagicMock(),
+        message_writer=MagicMock(),
+        reactions_limit_per_message=10,
+        message_filter={"since": since, "until": until},
+    )
+    dialog = DialogMetadata(id=2, name="Dialog", type=DialogType.GROUP, users=[])
+
+    [m.id async for m in downloader._get_message_iterator(dialog, 4)]
+    [m.id async for m in downloader._get_message_iterator(dialog, 4, offset_id=9)]
+
+    mock_client.get_messages.assert_called_with("entity", limit=1, offset_date=since)
+    assert [
+        (kw["offset_id"], kw["offset_date"], kw["min_id"]) for kw in iterator_kwargs
+    ] == [(0, until, 7), (9, None, 7)]
+
+
+@pytest.mark.asyncio
+async def test_get_message_iterator_server_side_filter(mock_settings):
+    """
+    Test that the message types, search and sender of the message filter
+    are passed to Telegram, and unsupported types are rejected upfront.
+    """
+    mock_client = MagicMock()
+    mock_client.get_entity = AsyncMock(return_value="entity")
+    iterator_kwargs = []
+
+    async def mock_iter_messages(entity, **kwargs):
+        iterator_kwargs.append(kwargs)
+        yield MagicMock(id=1)
+
+    mock_client.iter_messages = mock_iter_messages
+    downloader = MessageDownloader(
+        client=mock_client,
+        dialog_reader=MagicMock(),
+        message_writer=MagicMock(),
+        reactions_limit_per_message=10,
+        message_filter={
+            "types": {MessageType.PHOTO, MessageType.VIDEO},
+            "search": "report",
+            "from_user": "username",
+        },
+    )
+    dialog = DialogMetadata(id=2, name="Dialog", type=DialogType.GROUP, users=[])
+
+    [m.id async for m in downloader._get_message_iterator(dialog, 4)]
+
+    assert iterator_kwargs[0]["filter"] is tl_types.InputMessagesFilterPhotoVideo
+    assert iterator_kwargs[0]["search"] == "report"
+    assert iterator_kwargs[0]["from_user"] == "username"
+    with pytest.raises(ValueError, match="can't be filtered"):
+        MessageDownloader(
+            client=mock_client,
+            dialog_reader=MagicMock(),
+            message_writer=MagicMock(),
+            reactions_limit_per_message=10,
+            message_filter={"types": {MessageType.TEXT}},
+        )
+
+
 @pytest.mark.asyncio
 async def test_get_message_iterator_private_dialog_without_username(mock_settings):
     """
@@ -337,4 +476,532 @@ async def test_download_dialog_successful(mock_settings):
             call(dialog1, 100),
             call(dialog2, 100),
         ]
-    )
\ No newline at end of file
+    )
+
+@pytest.mark.asyncio
+async def test_download_dialog_reaction_summary(mock_settings):
+    """
+    Test that reaction counts are taken from the messages without extra requests.
+    """
+    mock_client = MagicMock()
+    mock_message_writer = MagicMock()
+
+    downloader = MessageDownloader(
+        client=mock_client,
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.SUMMARY,
+    )
+
+    message = tl_types.Message(
+        id=7,
+        peer_id=tl_types.PeerChannel(channel_id=3),
+        date=datetime(2024, 1, 1),
+        message="hello",
+        reactions=tl_types.MessageReactions(
+            results=[
+                tl_types.ReactionCount(
+                    reaction=tl_types.ReactionEmoji(emoticon="👍"), count=4
+                ),
+                tl_types.ReactionCount(
+                    reaction=tl_types.ReactionCustomEmoji(document_id=1), count=2
+                ),
+            ]
+        ),
+    )
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        yield message
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(
+        id=-1000000000003, name="Channel", type=DialogType.CHANNEL, users=[]
+    )
+
+    await downloader._download_dialog(dialog, 100)
+
+    mock_client.assert_not_called()
+    mock_client.get_entity.assert_not_called()
+    mock_message_writer.append_reactions.assert_not_called()
+    reaction_counts = mock_message_writer.append_reaction_counts.call_args[0][1]
+    assert reaction_counts == {
+        "dialog_id": [-1000000000003],
+        "message_id": [7],
+        "emoji_code": [0],
+        "count": [4],
+    }
+    mock_message_writer.commit.assert_called_once_with(dialog, ["👍"])
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_resume_from_checkpoint(mock_settings):
+    """
+    Test that an interrupted download continues after the checkpointed message.
+    """
+    mock_message_writer = MagicMock()
+    mock_message_writer.sync_parts.return_value = {"messages": 80}
+    mock_checkpoint_store = MagicMock()
+    mock_checkpoint_store.read.return_value = DialogCheckpoint(
+        dialog_id=-1000000000003,
+        offset_id=10,
+        msg_count=5,
+        part_sizes={"messages": 50},
+        emojis=["🔥"],
+        message_filter="{}",
+    )
+
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.SUMMARY,
+        checkpoint_store=mock_checkpoint_store,
+    )
+
+    iterator_calls = []
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        iterator_calls.append((msg_limit, offset_id))
+        yield tl_types.Message(
+            id=9,
+            peer_id=tl_types.PeerChannel(channel_id=3),
+            date=datetime(2024, 1, 1),
+            message="hello",
+            reactions=tl_types.MessageReactions(
+                results=[
+                    tl_types.ReactionCount(
+                        reaction=tl_types.ReactionEmoji(emoticon="👍"), count=1
+                    )
+                ]
+            ),
+        )
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(
+        id=-1000000000003, name="Channel", type=DialogType.CHANNEL, users=[]
+    )
+
+    await downloader._download_dialog(dialog, 100)
+
+    mock_message_writer.truncate_parts.assert_called_once_with(dialog, {"messages": 50})
+    assert iterator_calls == [(95, 10)]
+    mock_checkpoint_store.write.assert_called_once_with(
+        DialogCheckpoint(
+            dialog_id=-1000000000003,
+            offset_id=9,
+            msg_count=6,
+            part_sizes={"messages": 80},
+            emojis=["🔥", "👍"],
+            message_filter="{}",
+        )
+    )
+    mock_message_writer.commit.assert_called_once_with(dialog, ["🔥", "👍"])
+    mock_checkpoint_store.remove.assert_called_once_with(-1000000000003)
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_discards_checkpoint_of_other_filter(mock_settings):
+    """
+    Test that a checkpoint of a download with other conditions is discarded
+    with its saved data, instead of being resumed.
+    """
+    mock_message_writer = MagicMock()
+    mock_message_writer.sync_parts.return_value = {"messages": 80}
+    mock_checkpoint_store = MagicMock()
+    mock_checkpoint_store.read.return_value = DialogCheckpoint(
+        dialog_id=1,
+        offset_id=10,
+        msg_count=5,
+        part_sizes={"messages": 50},
+        emojis=[],
+        message_filter=serialize_message_filter(
+            MessageFilter(since=datetime(2024, 1, 1))
+        ),
+    )
+    message_filter = MessageFilter(
+        since=datetime(2023, 1, 1), types={MessageType.PHOTO}
+    )
+
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        checkpoint_store=mock_checkpoint_store,
+        message_filter=message_filter,
+    )
+
+    iterator_calls = []
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        iterator_calls.append((msg_limit, offset_id))
+        yield tl_types.Message(
+            id=9,
+            peer_id=tl_types.PeerUser(user_id=1),
+            date=datetime(2024, 1, 1),
+            message="hello",
+        )
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    await downloader._download_dialog(dialog, 100)
+
+    mock_message_writer.truncate_parts.assert_called_once_with(dialog, {})
+    assert iterator_calls == [(100, 0)]
+    checkpoint = mock_checkpoint_store.write.call_args[0][0]
+    assert checkpoint["message_filter"] == serialize_message_filter(
+        MessageFilter(types={MessageType.PHOTO}, since=datetime(2023, 1, 1))
+    )
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_cancelled_saves_progress(mock_settings):
+    """
+    Test that a cancelled download checkpoints the processed messages without
+    committing the dialog.
+    """
+    mock_message_writer = MagicMock()
+    mock_checkpoint_store = MagicMock()
+    mock_checkpoint_store.read.return_value = None
+
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        checkpoint_store=mock_checkpoint_store,
+    )
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        for message_id in range(250, 0, -1):
+            yield tl_types.Message(
+                id=message_id,
+                peer_id=tl_types.PeerUser(user_id=1),
+                date=datetime(2024, 1, 1),
+                message="hello",
+            )
+            if message_id == 101:
+                raise asyncio.CancelledError
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    with pytest.raises(asyncio.CancelledError):
+        await downloader._download_dialog(dialog, 1000)
+
+    mock_message_writer.truncate_parts.assert_called_once_with(dialog, {})
+    checkpoint = mock_checkpoint_store.write.call_args[0][0]
+    # * the incomplete page is downloaded again on resume
+    assert checkpoint["offset_id"] == 151
+    assert checkpoint["msg_count"] == 100
+    mock_message_writer.commit.assert_not_called()
+    mock_checkpoint_store.remove.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_waits_for_media(mock_settings):
+    """
+    Test that the messages are saved only after their media is downloaded,
+    and reference only the media, that was stored.
+    """
+    events = []
+    stored = set()
+
+    async def download_media(media_ref):
+        await asyncio.sleep(0)
+        if media_ref == "photo-6.jpg":
+            events.append("media failed")
+            return False
+        stored.add(media_ref)
+        events.append("media stored")
+        return True
+
+    mock_media_downloader = MagicMock()
+    mock_media_downloader.submit.side_effect = lambda message, media_ref, msg_type: (
+        asyncio.ensure_future(download_media(media_ref))
+    )
+    mock_media_downloader.media_store.exists.side_effect = stored.__contains__
+    mock_message_writer = MagicMock()
+    mock_message_writer.append_messages.side_effect = lambda *args: events.append(
+        "messages saved"
+    )
+
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        media_downloader=mock_media_downloader,
+    )
+
+    def make_photo(photo_id):
+        return tl_types.MessageMediaPhoto(
+            photo=tl_types.Photo(
+                id=photo_id,
+                access_hash=1,
+                file_reference=b"",
+                date=None,
+                sizes=[],
+                dc_id=1,
+            )
+        )
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        for message_id, photo_id in [(1, 5), (2, 6)]:
+            yield tl_types.Message(
+                id=message_id,
+                peer_id=tl_types.PeerUser(user_id=1),
+                date=datetime(2024, 1, 1),
+                message="",
+                media=make_photo(photo_id),
+            )
+        yield tl_types.Message(
+            id=3, peer_id=tl_types.PeerUser(user_id=1), date=None, message="text"
+        )
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    await downloader._download_dialog(dialog, 100)
+
+    submitted = mock_media_downloader.submit.call_args_list
+    assert [c.args[1:] for c in submitted] == [
+        ("photo-5.jpg", MessageType.PHOTO),
+        ("photo-6.jpg", MessageType.PHOTO),
+    ]
+    assert events == ["media stored", "media failed", "messages saved"]
+    saved = mock_message_writer.append_messages.call_args[0][1]
+    # * the failed media isn't referenced
+    assert saved["media_ref"] == ["photo-5.jpg", None, None]
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_saves_early_over_memory_budget(mock_settings):
+    """
+    Test that the buffered messages are saved before the checkpoint interval,
+    once they exceed the memory budget.
+    """
+    mock_message_writer = MagicMock()
+    budget = MemoryBudget(10_000)
+
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        memory_budget=budget,
+    )
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        for message_id in range(250, 0, -1):
+            yield tl_types.Message(
+                id=message_id,
+                peer_id=tl_types.PeerUser(user_id=1),
+                date=datetime(2024, 1, 1),
+                message="hello",
+            )
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    await downloader._download_dialog(dialog, 1000)
+
+    saved = [
+        len(call_args[0][1]["id"])
+        for call_args in mock_message_writer.append_messages.call_args_list
+    ]
+    assert saved == [100, 100, 50]
+    assert budget.total_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_download_dialogs_counts_messages_up_front(mock_settings):
+    """
+    Test that the totals of the dialogs are requested before the download,
+    bounded by the message limit, and unknown for the dialogs, that can't be counted.
+    """
+    counted = TotalList()
+    counted.total = 500
+
+    async def get_messages(entity, **kwargs):
+        if entity == 2:
+            raise ValueError("Could not find the input entity")
+        return counted
+
+    mock_client = MagicMock()
+    mock_client.get_messages = AsyncMock(side_effect=get_messages)
+    progress = ProgressTracker()
+    downloader = MessageDownloader(
+        client=mock_client,
+        dialog_reader=MagicMock(),
+        message_writer=MagicMock(),
+        reactions_limit_per_message=10,
+        retry_policy=RetryPolicy(max_tries=1),
+        progress=progress,
+    )
+    downloader._download_dialog = AsyncMock()
+    dialogs = [
+        DialogMetadata(id=1, name="Big", type=DialogType.GROUP, users=[]),
+        DialogMetadata(id=2, name="Unknown", type=DialogType.GROUP, users=[]),
+    ]
+
+    await downloader.download_dialogs(dialogs, msg_limit=100)
+
+    mock_client.get_messages.assert_any_await(
+        1, limit=0, filter=None, search=None, from_user=None
+    )
+    assert progress.total is None
+    assert progress.summary_line().startswith("0/2 dialogs, 0/? messages")
+    progress.add_dialog(2, "Unknown", 0)
+    assert progress.total == 100
+
+
+@pytest.mark.asyncio
+async def test_download_dialogs_restarts_stalled_download(mock_settings):
+    """
+    Test that a download, that stalls, is cancelled by the watchdog and restarted
+    from the checkpoint, it saved on cancellation.
+    """
+    checkpoints = {}
+    mock_checkpoint_store = MagicMock()
+    mock_checkpoint_store.read.side_effect = checkpoints.get
+    mock_checkpoint_store.write.side_effect = lambda checkpoint: checkpoints.update(
+        {checkpoint["dialog_id"]: checkpoint}
+    )
+    mock_message_writer = MagicMock()
+    mock_message_writer.sync_parts.return_value = {}
+    watchdog = StallWatchdog(0.05, check_interval=0.01)
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        checkpoint_store=mock_checkpoint_store,
+        watchdog=watchdog,
+    )
+    offsets = []
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        offsets.append(offset_id)
+        for message_id in range(offset_id - 1 if offset_id else 150, 0, -1):
+            yield tl_types.Message(
+                id=message_id,
+                peer_id=tl_types.PeerUser(user_id=1),
+                date=datetime(2024, 1, 1),
+                message="hello",
+            )
+            if len(offsets) == 1 and message_id == 51:
+                # * a network stall, that no timeout covers
+                await asyncio.Event().wait()
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    await asyncio.wait_for(downloader.download_dialogs([dialog], 1000), timeout=5)
+
+    assert offsets == [0, 51]
+    assert [dialog_id for dialog_id, _ in watchdog.stalls] == [1]
+    mock_message_writer.commit.assert_called_once()
+    mock_checkpoint_store.remove.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_flood_wait_longer_than_stall_timeout_isnt_a_stall(mock_settings):
+    """
+    Test that the watchdog doesn't cancel a download, while it waits out a flood wait,
+    that is longer than the stall timeout.
+    """
+    mock_message_writer = MagicMock()
+    mock_message_writer.sync_parts.return_value = {}
+    watchdog = StallWatchdog(0.05, check_interval=0.01)
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        retry_policy=RetryPolicy(base_sleep_time=0.001),
+        watchdog=watchdog,
+    )
+    flood_wait = telethon.errors.FloodWaitError(None, capture=0)
+    flood_wait.seconds = 0.3
+    get_history = AsyncMock(side_effect=[flood_wait, None])
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        await downloader.retry_policy.call("messages.getHistory", get_history)
+        yield tl_types.Message(
+            id=1,
+            peer_id=tl_types.PeerUser(user_id=1),
+            date=datetime(2024, 1, 1),
+            message="hello",
+        )
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    assert await asyncio.wait_for(downloader.download_dialog(dialog, 1000), 5)
+
+    assert get_history.await_count == 2
+    assert watchdog.stalls == []
+    mock_message_writer.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_download_dialog_gives_up_on_media_that_never_arrives(mock_settings):
+    """
+    Test that a download, that stalls on its media, isn't held by the save
+    on cancellation, and is left for the next run after its restarts.
+    """
+    media_download = asyncio.get_running_loop().create_future()
+    mock_media_downloader = MagicMock()
+    mock_media_downloader.submit.return_value = media_download
+    mock_message_writer = MagicMock()
+    watchdog = StallWatchdog(0.05, max_restarts=1, check_interval=0.01)
+    downloader = MessageDownloader(
+        client=MagicMock(),
+        dialog_reader=MagicMock(),
+        message_writer=mock_message_writer,
+        reactions_limit_per_message=10,
+        reactions_mode=ReactionsMode.NONE,
+        media_downloader=mock_media_downloader,
+        watchdog=watchdog,
+    )
+    photo = tl_types.MessageMediaPhoto(
+        photo=tl_types.Photo(
+            id=5, access_hash=1, file_reference=b"", date=None, sizes=[], dc_id=1
+        )
+    )
+
+    async def mock_message_iterator(dialog, msg_limit, *, offset_id=0):
+        for message_id in range(200, 0, -1):
+            yield tl_types.Message(
+                id=message_id,
+                peer_id=tl_types.PeerUser(user_id=1),
+                date=datetime(2024, 1, 1),
+                message="",
+                media=photo,
+            )
+            if message_id == 51:
+                # * the media of the first page is still downloading
+                await asyncio.Event().wait()
+
+    downloader._get_message_iterator = mock_message_iterator
+    dialog = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+
+    with pytest.raises(DialogStalledError):
+        await asyncio.wait_for(downloader.download_dialog(dialog, 1000), 5)
+
+    assert len(watchdog.stalls) == 2
+    mock_message_writer.append_messages.assert_not_called()
+    mock_message_writer.commit.assert_not_called()
+    # * the media, that may be shared with other dialogs, isn't cancelled
+    assert not media_download.done()
+    media_download.cancel()
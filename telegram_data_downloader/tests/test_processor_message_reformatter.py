@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.message import MessageType, PeerID
+from telegram_data_downloader.processor.message_reformatter import (
+    MessageReformatter,
+    new_message_columns,
+    new_reaction_columns,
+    new_reaction_count_columns,
+)
+
+
+def make_message(message_id: int, **kwargs) -> tl_types.Message:
+    return tl_types.Message(
+        id=message_id,
+        peer_id=tl_types.PeerChannel(channel_id=7),
+        date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        message=kwargs.pop("message", "text"),
+        **kwargs,
+    )
+
+
+def make_document(*attributes) -> tl_types.MessageMediaDocument:
+    return tl_types.MessageMediaDocument(
+        document=tl_types.Document(
+            id=1,
+            access_hash=1,
+            file_reference=b"",
+            date=None,
+            mime_type="",
+            size=0,
+            dc_id=1,
+            attributes=list(attributes),
+        )
+    )
+
+
+def test_reformat_page():
+    # Arrange
+    messages = [
+        make_message(1, from_id=tl_types.PeerUser(user_id=2)),
+        make_message(
+            2,
+            from_id=tl_types.PeerChat(chat_id=3),
+            fwd_from=tl_types.MessageFwdHeader(
+                date=None, from_id=tl_types.PeerUser(user_id=4)
+            ),
+            media=make_document(
+                tl_types.DocumentAttributeAudio(duration=5, voice=False),
+                tl_types.DocumentAttributeAudio(duration=6, voice=True),
+            ),
+        ),
+        make_message(
+            3,
+            media=make_document(
+                tl_types.DocumentAttributeSticker(
+                    alt="😀", stickerset=tl_types.InputStickerSetEmpty()
+                )
+            ),
+        ),
+        make_message(4, media=tl_types.MessageMediaPhoto()),
+    ]
+    columns = new_message_columns()
+    reformatter = MessageReformatter()
+    # Act
+    reformatter.reformat_page(messages[:2], columns)
+    reformatter.reformat_page(messages[2:], columns)
+    # Assert
+    assert columns["id"] == [1, 2, 3, 4]
+    assert columns["from_id"] == [PeerID(2), PeerID(-3), None, None]
+    assert columns["fwd_from"] == [None, PeerID(4), None, None]
+    assert columns["message"] == ["text", "text", "😀", "text"]
+    assert columns["type"] == [
+        MessageType.TEXT,
+        MessageType.VOICE,
+        MessageType.STICKER,
+        MessageType.PHOTO,
+    ]
+    assert columns["duration"] == [None, 6, None, None]
+    assert columns["to_id"] == [PeerID(-1000000000007)] * 4
+    # * the photo is empty, so it has nothing to store
+    assert columns["media_ref"] == [None, "document-1", None, None]
+
+
+def test_reformat_message_matches_page():
+    # Arrange
+    message = make_message(
+        1,
+        from_id=tl_types.PeerUser(user_id=2),
+        media=make_document(tl_types.DocumentAttributeVideo(duration=1.5, w=1, h=1)),
+    )
+    # Act
+    msg_attrs = MessageReformatter().reformat_message(message)
+    # Assert
+    assert msg_attrs == {
+        "id": 1,
+        "date": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "from_id": PeerID(2),
+        "fwd_from": None,
+        "message": "text",
+        "type": MessageType.VIDEO,
+        "duration": 1.5,
+        "to_id": PeerID(-1000000000007),
+        "media_ref": "document-1",
+    }
+
+
+def make_reaction(
+    peer: tl_types.TypePeer, reaction: tl_types.TypeReaction
+) -> tl_types.MessagePeerReaction:
+    return tl_types.MessagePeerReaction(
+        peer_id=peer, date=datetime(2024, 1, 1, tzinfo=timezone.utc), reaction=reaction
+    )
+
+
+def test_reformat_reactions():
+    # Arrange
+    def reactions_list(*reactions):
+        return tl_types.messages.MessageReactionsList(
+            count=len(reactions), reactions=list(reactions), chats=[], users=[]
+        )
+
+    reactions = new_reaction_columns()
+    reformatter = MessageReformatter()
+    # Act
+    reformatter.reformat_reactions(
+        -5,
+        10,
+        reactions_list(
+            make_reaction(
+                tl_types.PeerUser(user_id=1), tl_types.ReactionEmoji(emoticon="👍")
+            ),
+            make_reaction(
+                tl_types.PeerUser(user_id=2),
+                tl_types.ReactionCustomEmoji(document_id=1),
+            ),
+            make_reaction(
+                tl_types.PeerChannel(channel_id=3),
+                tl_types.ReactionEmoji(emoticon="🔥"),
+            ),
+        ),
+        reactions,
+    )
+    reformatter.reformat_reactions(-5, 11, None, reactions)
+    reformatter.reformat_reactions(
+        -5,
+        12,
+        reactions_list(
+            make_reaction(
+                tl_types.PeerUser(user_id=1), tl_types.ReactionEmoji(emoticon="🔥")
+            )
+        ),
+        reactions,
+    )
+    # Assert
+    assert reactions == {
+        "dialog_id": [-5, -5, -5],
+        "message_id": [10, 10, 12],
+        "peer_id": [PeerID(1), PeerID(-1000000000003), PeerID(1)],
+        "emoji_code": [0, 1, 1],
+    }
+    assert reformatter.emojis == ["👍", "🔥"]
+
+
+def test_reformat_reaction_counts():
+    # Arrange
+    def reaction_count(emoticon: str, count: int) -> tl_types.ReactionCount:
+        return tl_types.ReactionCount(
+            reaction=tl_types.ReactionEmoji(emoticon=emoticon), count=count
+        )
+
+    messages = [
+        make_message(
+            1,
+            reactions=tl_types.MessageReactions(
+                results=[reaction_count("🔥", 3), reaction_count("👍", 1)]
+            ),
+        ),
+        make_message(2),
+        make_message(
+            3, reactions=tl_types.MessageReactions(results=[reaction_count("👍", 2)])
+        ),
+    ]
+    reaction_counts = new_reaction_count_columns()
+    reformatter = MessageReformatter()
+    # Act
+    reformatter.reformat_reaction_counts(-5, messages, reaction_counts)
+    # Assert
+    assert reaction_counts == {
+        "dialog_id": [-5, -5, -5],
+        "message_id": [1, 1, 3],
+        "emoji_code": [0, 1, 1],
+        "count": [3, 1, 2],
+    }
+    assert reformatter.emojis == ["🔥", "👍"]
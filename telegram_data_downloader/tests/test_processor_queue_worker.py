@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.dict_types.queue import WorkState
+from telegram_data_downloader.loader.queue import SQLiteWorkQueue
+from telegram_data_downloader.processor.message_downloader import DialogStalledError
+from telegram_data_downloader.processor.queue_worker import QueueWorker
+
+
+def make_dialog(dialog_id):
+    return DialogMetadata(
+        id=dialog_id, name=f"Dialog{dialog_id}", type=DialogType.GROUP, users=[]
+    )
+
+
+@pytest.mark.asyncio
+async def test_worker_downloads_the_queue(tmp_path):
+    """
+    Test that a worker completes the downloaded dialogs, and releases the failed ones,
+    until the queue is finished.
+    """
+    queue = SQLiteWorkQueue(tmp_path / "queue.sqlite3", max_attempts=2)
+    queue.publish([1, 2, 3], 100)
+    dialog_reader = MagicMock()
+    dialog_reader.read_dialog.side_effect = make_dialog
+
+    async def download_dialog(dialog, msg_limit):
+        if dialog["id"] == 2:
+            raise ConnectionError
+        return True
+
+    downloader = MagicMock()
+    downloader.download_dialog = AsyncMock(side_effect=download_dialog)
+    # * a task waits for the dialog, that is leased by the other task, to be released
+    worker = QueueWorker(
+        queue,
+        dialog_reader,
+        downloader,
+        worker_id="a",
+        concurrency=2,
+        poll_interval=0.01,
+    )
+
+    assert await worker.run() == 2
+
+    assert downloader.download_dialog.await_count == 4
+    assert queue.count_states() == {
+        WorkState.PENDING: 0,
+        WorkState.LEASED: 0,
+        WorkState.DONE: 2,
+        WorkState.FAILED: 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_download_is_cancelled_once_the_lease_is_lost(tmp_path):
+    """
+    Test that a download is stopped, when a heartbeat finds, that the dialog
+    was taken over by another worker.
+    """
+    queue = SQLiteWorkQueue(tmp_path / "queue.sqlite3", lease_duration=0)
+    queue.publish([1], 100)
+    dialog_reader = MagicMock()
+    dialog_reader.read_dialog.side_effect = make_dialog
+    cancelled = asyncio.Event()
+
+    async def download_dialog(dialog, msg_limit):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return True
+
+    downloader = MagicMock()
+    downloader.download_dialog = AsyncMock(side_effect=download_dialog)
+    worker = QueueWorker(
+        queue, dialog_reader, downloader, worker_id="a", heartbeat_interval=0.01
+    )
+    unit = queue.lease("a")
+    assert queue.lease("b") == unit | {"attempts": 2}
+
+    assert not await worker._process(unit)
+
+    assert cancelled.is_set()
+    assert queue.count_states()[WorkState.LEASED] == 1
+
+
+@pytest.mark.asyncio
+async def test_timed_out_downloads_dont_count_as_failed_attempts(tmp_path):
+    """
+    Test that a dialog, whose downloads run out of time, is leased until it completes,
+    while a dialog, that keeps stalling, fails after `max_attempts` leases.
+    """
+    queue = SQLiteWorkQueue(tmp_path / "queue.sqlite3", max_attempts=2)
+    queue.publish([1, 2], 100)
+    dialog_reader = MagicMock()
+    dialog_reader.read_dialog.side_effect = make_dialog
+    leases = {1: 0, 2: 0}
+
+    async def download_dialog(dialog, msg_limit):
+        leases[dialog["id"]] += 1
+        if dialog["id"] == 2:
+            raise DialogStalledError(2)
+        # * the large dialog reaches its deadline twice before it completes
+        return leases[1] > 2
+
+    downloader = MagicMock()
+    downloader.download_dialog = AsyncMock(side_effect=download_dialog)
+    worker = QueueWorker(queue, dialog_reader, downloader, worker_id="a", concurrency=1)
+
+    assert await worker.run() == 1
+
+    assert leases == {1: 3, 2: 2}
+    assert queue.count_states() == {
+        WorkState.PENDING: 0,
+        WorkState.LEASED: 0,
+        WorkState.DONE: 1,
+        WorkState.FAILED: 1,
+    }
@@ -0,0 +1,142 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from telethon.tl import functions as tl_functions
+from telethon.tl import types as tl_types
+
+from telegram_data_downloader.dict_types.dialog import DialogMetadata, DialogType
+from telegram_data_downloader.dict_types.message import (
+    ReactionColumns,
+    ReactionCountColumns,
+    ReactionsMode,
+)
+from telegram_data_downloader.processor.reaction_refresher import ReactionRefresher
+
+DIALOG = DialogMetadata(id=1, name="User", type=DialogType.PRIVATE, users=[])
+SINCE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_reactions(counts):
+    return tl_types.MessageReactions(
+        results=[
+            tl_types.ReactionCount(
+                reaction=tl_types.ReactionEmoji(emoticon=emoticon), count=count
+            )
+            for emoticon, count in counts.items()
+        ]
+    )
+
+
+def make_client(current_counts):
+    """
+    Client answering the reaction requests with `current_counts`,
+    as {message id: {emoji: count}}.
+    """
+
+    async def call(request):
+        if isinstance(request, tl_functions.messages.GetMessagesReactionsRequest):
+            return tl_types.Updates(
+                updates=[
+                    tl_types.UpdateMessageReactions(
+                        peer=tl_types.PeerUser(1),
+                        msg_id=message_id,
+                        reactions=make_reactions(current_counts[message_id]),
+                    )
+                    for message_id in request.id
+                    if message_id in current_counts
+                ],
+                users=[],
+                chats=[],
+                date=SINCE,
+                seq=0,
+            )
+        return tl_types.messages.MessageReactionsList(
+            count=1,
+            reactions=[
+                tl_types.MessagePeerReaction(
+                    peer_id=tl_types.PeerUser(7),
+                    date=SINCE,
+                    reaction=tl_types.ReactionEmoji(emoticon=emoticon),
+                )
+                for emoticon, count in current_counts[request.id].items()
+                for _ in range(count)
+            ],
+            chats=[],
+            users=[],
+        )
+
+    return MagicMock(side_effect=call)
+
+
+def make_reader(message_ids, emojis, reactions=None, reaction_counts=None):
+    reader = MagicMock()
+    reader.read_message_ids.return_value = message_ids
+    reader.read_emojis.return_value = emojis
+    reader.read_reaction_columns.return_value = reactions
+    reader.read_reaction_count_columns.return_value = reaction_counts
+    return reader
+
+
+@pytest.mark.asyncio
+async def test_refresh_summary_patches_changed_counts():
+    """
+    Test that the counts of the recent messages are requested in a batch,
+    and replace the saved counts, once any of them has changed.
+    """
+    client = make_client({3: {"👍": 2}, 2: {"🔥": 1}})
+    reader = make_reader(
+        [3, 2],
+        ["👍"],
+        reaction_counts=ReactionCountColumns(
+            dialog_id=[1], message_id=[3], emoji_code=[0], count=[1]
+        ),
+    )
+    writer = MagicMock()
+    refresher = ReactionRefresher(
+        client, reader, writer, reactions_mode=ReactionsMode.SUMMARY
+    )
+
+    changed = await refresher.refresh_dialogs([DIALOG], SINCE)
+
+    assert changed == {1: 2}
+    assert client.call_count == 1
+    reader.read_message_ids.assert_called_once_with(1, SINCE)
+    args, kwargs = writer.patch_reactions.call_args
+    assert args == (DIALOG, [3, 2], ["👍", "🔥"])
+    assert kwargs["reaction_counts"] == ReactionCountColumns(
+        dialog_id=[1, 1], message_id=[3, 2], emoji_code=[0, 1], count=[2, 1]
+    )
+
+
+@pytest.mark.asyncio
+async def test_refresh_full_lists_only_changed_messages():
+    """
+    Test that in the full mode, the reactions lists are only requested
+    for the messages, whose counts don't match the saved reactions.
+    """
+    client = make_client({3: {"👍": 2}, 2: {"👍": 1}})
+    reader = make_reader(
+        [3, 2, 1],
+        ["👍"],
+        reactions=ReactionColumns(
+            dialog_id=[1, 1], message_id=[3, 2], peer_id=[7, 7], emoji_code=[0, 0]
+        ),
+    )
+    writer = MagicMock()
+    refresher = ReactionRefresher(
+        client, reader, writer, reactions_mode=ReactionsMode.FULL
+    )
+
+    changed = await refresher.refresh_dialogs([DIALOG], SINCE)
+
+    assert changed == {1: 1}
+    list_requests = [
+        call.args[0]
+        for call in client.call_args_list
+        if isinstance(call.args[0], tl_functions.messages.GetMessageReactionsListRequest)
+    ]
+    assert [request.id for request in list_requests] == [3]
+    args, kwargs = writer.patch_reactions.call_args
+    assert args == (DIALOG, [3], ["👍"])
+    assert kwargs["reactions"]["message_id"] == [3, 3]
@@ -0,0 +1,81 @@
+import io
+
+from telegram_data_downloader.progress import ProgressTracker, ProgressView
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_eta_is_measured_over_the_wall_time():
+    """
+    Test that the ETA is the remaining messages at the measured rate, that includes
+    the idle time, and the messages of the earlier runs don't count to the rate.
+    """
+    clock = FakeClock()
+    tracker = ProgressTracker(clock=clock)
+    tracker.add_dialog(1, "First", 1000)
+    tracker.add_dialog(2, "Second", 500)
+    tracker.add_dialog(3, "Unknown", None)
+
+    tracker.start_dialog(1, done=400)
+    clock.now = 10.0
+    tracker.advance(1, 100)
+    # * e.g. a flood wait
+    clock.now = 20.0
+    tracker.advance(1, 100)
+
+    assert tracker.done == 600
+    assert tracker.total is None
+    assert tracker.rate == 10.0
+    assert tracker.eta == (400 + 500) / 10.0
+    tracker.finish_dialog(1)
+    assert tracker.eta == 500 / 10.0
+    assert tracker.summary_line() == (
+        "1/3 dialogs, 600/? messages, 10.0 msg/s, ETA 0:00:50"
+    )
+
+    # * a restart from the checkpoint keeps the messages of this run
+    tracker.start_dialog(2, done=100)
+    clock.now = 30.0
+    tracker.advance(2, 100)
+    tracker.start_dialog(2, done=200)
+    assert tracker.done == 800
+    assert tracker.rate == 300 / 30.0
+    assert tracker.dialog_lines() == [
+        "  Second                               200/500          10.0 msg/s  ETA 0:00:30"
+    ]
+
+
+def test_live_view_is_redrawn_in_place():
+    """
+    Test that the live view erases its previous lines, before it's drawn again
+    and before a log record is written.
+    """
+    clock = FakeClock()
+    tracker = ProgressTracker(clock=clock)
+    tracker.add_dialog(1, "First", 100)
+    tracker.start_dialog(1)
+    terminal = FakeTerminal()
+    view = ProgressView(tracker, stream=terminal)
+
+    view.draw()
+    assert terminal.getvalue().count("\n") == 2
+    clock.now = 1.0
+    tracker.advance(1, 50)
+    view.draw()
+
+    assert view.is_live
+    assert terminal.getvalue().count("\x1b[2F\x1b[J") == 1
+    assert "50/100" in terminal.getvalue().split("\x1b[J")[-1]
+    assert view.filter(None)  # type: ignore
+    assert terminal.getvalue().endswith("\x1b[2F\x1b[J")
@@ -0,0 +1,116 @@
+import asyncio
+import random
+
+import pytest
+import telethon.errors
+from unittest.mock import AsyncMock
+
+from telegram_data_downloader.retry import (
+    DeadlineExceededError,
+    RetryPolicy,
+    dialog_deadline,
+)
+
+
+class MockRPCError(telethon.errors.RPCError):
+    def __init__(self, message, request=None):
+        super().__init__(message=message, request=request)
+
+
+@pytest.fixture
+def mock_sleep(monkeypatch):
+    sleep = AsyncMock()
+    monkeypatch.setattr("telegram_data_downloader.retry.asyncio.sleep", sleep)
+    return sleep
+
+
+def slept(mock_sleep) -> list[float]:
+    return [sleep_call.args[0] for sleep_call in mock_sleep.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_retry_honors_flood_wait(mock_sleep):
+    policy = RetryPolicy(base_sleep_time=0.5, rng=random.Random(0))
+    func = AsyncMock(
+        side_effect=[telethon.errors.FloodWaitError(request=None, capture=42), "ok"]
+    )
+
+    result = await policy.call("messages.getHistory", func, 1, key="value")
+
+    assert result == "ok"
+    func.assert_awaited_with(1, key="value")
+    assert 42 <= slept(mock_sleep)[0] <= 42.5
+    # * other calls of the method wait for the flood wait as well
+    assert policy.breaker("messages.getHistory").is_open
+    assert not policy.breaker("getEntity").is_open
+
+
+@pytest.mark.asyncio
+async def test_retry_raises_too_long_flood_wait(mock_sleep):
+    policy = RetryPolicy(flood_wait_max=60)
+    func = AsyncMock(
+        side_effect=telethon.errors.FloodWaitError(request=None, capture=3600)
+    )
+
+    with pytest.raises(telethon.errors.FloodWaitError):
+        await policy.call("messages.getHistory", func)
+
+    assert func.await_count == 1
+    mock_sleep.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_retry_decorrelated_jitter(mock_sleep):
+    policy = RetryPolicy(
+        base_sleep_time=1.0,
+        max_sleep_time=10.0,
+        max_tries=6,
+        breaker_failure_threshold=100,
+        rng=random.Random(0),
+    )
+    func = AsyncMock(side_effect=[ConnectionError()] * 5 + ["ok"])
+
+    assert await policy.call("getEntity", func) == "ok"
+
+    sleeps = slept(mock_sleep)
+    assert len(sleeps) == 5
+    assert all(1.0 <= sleep <= 10.0 for sleep in sleeps)
+    assert len(set(sleeps)) == 5
+
+
+@pytest.mark.asyncio
+async def test_retry_skips_permanent_errors(mock_sleep):
+    policy = RetryPolicy()
+    func = AsyncMock(side_effect=MockRPCError("CHAT_ADMIN_REQUIRED"))
+
+    with pytest.raises(MockRPCError):
+        await policy.call("channels.getParticipants", func)
+
+    assert func.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_circuit_breaker_opens(mock_sleep):
+    policy = RetryPolicy(
+        max_tries=2, breaker_failure_threshold=2, breaker_reset_time=30.0
+    )
+    func = AsyncMock(side_effect=telethon.errors.common.InvalidBufferError(b"\0" * 4))
+
+    with pytest.raises(telethon.errors.common.InvalidBufferError):
+        await policy.call("messages.getMessageReactionsList", func)
+
+    breaker = policy.breaker("messages.getMessageReactionsList")
+    assert breaker.is_open
+    assert 29 < breaker.time_until_closed() <= 30
+
+
+@pytest.mark.asyncio
+async def test_retry_dialog_deadline():
+    policy = RetryPolicy(base_sleep_time=0.01, call_timeout=10.0)
+
+    async def slow_request():
+        await asyncio.sleep(10)
+
+    with pytest.raises(DeadlineExceededError):
+        with dialog_deadline(0.05):
+            await policy.call("messages.getHistory", slow_request)
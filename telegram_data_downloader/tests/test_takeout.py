@@ -0,0 +1,66 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import telethon.errors
+from telethon.tl import functions as tl_functions
+
+from telegram_data_downloader.takeout import reusable_takeout
+
+SCOPES = {"users": True, "channels": True}
+
+
+def make_client(takeout_id, *, valid=True):
+    client = MagicMock()
+    client.session.takeout_id = takeout_id
+
+    async def call(request):
+        if not valid:
+            raise telethon.errors.TakeoutInvalidError(request=None)
+
+    client.side_effect = call
+    takeout = MagicMock(side_effect=AsyncMock())
+
+    async def enter():
+        if client.session.takeout_id is None:
+            client.session.takeout_id = 2
+        return takeout
+
+    takeout.__aenter__.side_effect = enter
+    client.takeout.return_value = takeout
+    return client, takeout
+
+
+@pytest.mark.asyncio
+async def test_saved_takeout_is_reused_and_kept_on_error():
+    """
+    Test that a valid saved takeout is continued without requesting a new one,
+    and is kept for the next run, when the download fails.
+    """
+    client, takeout = make_client(1)
+
+    with pytest.raises(ConnectionError):
+        async with reusable_takeout(client, finalize=True, **SCOPES):
+            raise ConnectionError
+
+    client.takeout.assert_called_once_with(finalize=False)
+    takeout.assert_not_called()
+    assert client.session.takeout_id == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_takeout_is_replaced_and_finished_on_completion():
+    """
+    Test that a saved takeout, that Telegram no longer accepts, is replaced with
+    a new one, which is finished once the download completes.
+    """
+    client, takeout = make_client(1, valid=False)
+
+    async with reusable_takeout(client, finalize=True, **SCOPES) as opened:
+        assert opened is takeout
+        assert client.session.takeout_id == 2
+
+    client.takeout.assert_called_once_with(finalize=False, **SCOPES)
+    (request,), _ = takeout.call_args
+    assert isinstance(request, tl_functions.account.FinishTakeoutSessionRequest)
+    assert client.session.takeout_id is None
+    client.session.save.assert_called()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from telegram_data_downloader.tracing import ChromeTracer
+
+
+def read_trace(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["traceEvents"]
+
+
+def test_disabled_tracer_records_nothing(tmp_path):
+    # Arrange
+    tracer = ChromeTracer()
+    # Act
+    with tracer.span("work", "test"):
+        pass
+    tracer.instant("point", "test")
+    tracer.export(tmp_path / "trace.json")
+    # Assert
+    assert read_trace(tmp_path / "trace.json") == []
+
+
+def test_span_exported_as_complete_event(tmp_path):
+    # Arrange
+    tracer = ChromeTracer()
+    tracer.enable()
+    # Act
+    with tracer.span("work", "test", dialog_id=1):
+        pass
+    tracer.export(tmp_path / "trace.json")
+    # Assert
+    events = [e for e in read_trace(tmp_path / "trace.json") if e["ph"] == "X"]
+    assert len(events) == 1
+    assert events[0]["name"] == "work"
+    assert events[0]["cat"] == "test"
+    assert events[0]["args"] == {"dialog_id": 1}
+    assert events[0]["dur"] >= 0
+
+
+def test_span_shorter_than_min_duration_is_dropped(tmp_path):
+    # Arrange
+    tracer = ChromeTracer()
+    tracer.enable()
+    # Act
+    with tracer.span("work", "test", min_duration_us=10_000_000):
+        pass
+    tracer.export(tmp_path / "trace.json")
+    # Assert
+    assert not [e for e in read_trace(tmp_path / "trace.json") if e["ph"] == "X"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_recorded_to_their_lanes(tmp_path):
+    # Arrange
+    tracer = ChromeTracer()
+    tracer.enable()
+
+    async def work(lane_name: str):
+        with tracer.lane(lane_name):
+            with tracer.span("work", "test"):
+                await asyncio.sleep(0)
+
+    # Act
+    await asyncio.gather(work("slot #1"), work("slot #2"), work("slot #1"))
+    tracer.export(tmp_path / "trace.json")
+    # Assert
+    events = read_trace(tmp_path / "trace.json")
+    lane_names = {e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    spans = [e for e in events if e["ph"] == "X"]
+    assert sorted(lane_names.values()) == ["slot #1", "slot #2"]
+    assert sorted(lane_names[e["tid"]] for e in spans) == [
+        "slot #1",
+        "slot #1",
+        "slot #2",
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from telegram_data_downloader.watchdog import StallWatchdog
+
+
+@pytest.mark.asyncio
+async def test_check_cancels_only_stalled_downloads():
+    """
+    Test that only the downloads without progress within the timeout are cancelled,
+    and the reason is returned, once the download is unwatched.
+    """
+    now = 0.0
+    watchdog = StallWatchdog(10, check_interval=60, clock=lambda: now)
+    stalled = asyncio.create_task(asyncio.Event().wait())
+    active = asyncio.create_task(asyncio.Event().wait())
+    watchdog.watch(1, stalled)
+    watchdog.watch(2, active)
+
+    now = 8.0
+    watchdog.touch(1, "page_fetch")
+    watchdog.touch(2, "page_fetch")
+    now = 16.0
+    watchdog.touch(2, "get_reactions")
+    now = 20.0
+    watchdog.check()
+    await asyncio.sleep(0)
+
+    assert stalled.cancelled()
+    assert not active.done()
+    assert watchdog.stalls == [(1, "no progress for 12s after page_fetch")]
+    assert watchdog.unwatch(1) == "no progress for 12s after page_fetch"
+    assert watchdog.unwatch(2) is None
+    active.cancel()
+
+
+@pytest.mark.asyncio
+async def test_paused_downloads_are_kept_and_hung_downloads_cancelled_again():
+    """
+    Test that a download, that waits for the others, isn't cancelled, and that
+    a cancelled download, that still makes no progress, is cancelled again.
+    """
+    now = 0.0
+    watchdog = StallWatchdog(10, check_interval=60, clock=lambda: now)
+    waiting = asyncio.create_task(asyncio.Event().wait())
+    hung = MagicMock()
+    watchdog.watch(1, waiting)
+    watchdog.watch(2, hung)
+
+    with watchdog.paused(1, "wait_memory"):
+        now = 15.0
+        watchdog.check()
+        # * the cancelled download has time to save its progress
+        now = 30.0
+        watchdog.check()
+        assert hung.cancel.call_count == 1
+        now = 35.0
+        watchdog.check()
+    watchdog.check()
+
+    assert not waiting.done()
+    assert hung.cancel.call_count == 2
+    assert watchdog.stalls == [(2, "no progress for 15s after start")]
+    watchdog.unwatch(1)
+    watchdog.unwatch(2)
+    waiting.cancel()
+
+
+@pytest.mark.asyncio
+async def test_checker_runs_while_downloads_are_watched():
+    """
+    Test that the checks run in the background only while some download is watched.
+    """
+    watchdog = StallWatchdog(0.02, check_interval=0.005)
+    download = asyncio.create_task(asyncio.Event().wait())
+    watchdog.watch(1, download)
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(download, timeout=1)
+
+    assert watchdog.unwatch(1) is not None
+    assert watchdog._checker is None
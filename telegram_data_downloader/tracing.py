@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+
+logger = logging.getLogger(__name__)
+
+
+# lane (row in the trace viewer) that spans of the current task are recorded to
+_current_lane: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "tracing_current_lane", default=None
+)
+
+
+class ChromeTracer:
+    """
+    Opt-in recorder of timed spans, exported as Chrome trace-event JSON.
+
+    The resulting file can be opened in `chrome://tracing` or https://ui.perfetto.dev
+    to see how concurrent dialog tasks interleave, e.g. all download slots waiting on
+    a single flood wait.
+
+    While disabled, every tracing call returns immediately without recording anything.
+
+    Attributes:
+        enabled (bool): whether the spans are being recorded
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: list[dict[str, Any]] = []
+        self._lanes: dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+
+    def enable(self) -> None:
+        """
+        Start recording spans. Previously recorded spans are discarded.
+        """
+        with self._lock:
+            self._events = []
+            self._lanes = {}
+            self._start = time.perf_counter()
+        self.enabled = True
+        logger.debug("tracing enabled")
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._start) * 1_000_000
+
+    def _register_lane(self, key: Any, name: str) -> int:
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = len(self._lanes) + 1
+                self._lanes[key] = lane
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self._pid,
+                        "tid": lane,
+                        "args": {"name": name},
+                    }
+                )
+        return lane
+
+    def _lane(self) -> int:
+        lane = _current_lane.get()
+        if lane is not None:
+            return lane
+
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is not None:
+            return self._register_lane(task, task.get_name())
+        thread = threading.current_thread()
+        return self._register_lane(thread, thread.name)
+
+    @contextlib.contextmanager
+    def lane(self, name: str) -> Iterator[None]:
+        """
+        Record spans of the current task to a named lane, e.g. a download slot.
+        Lanes with the same name share a single row in the trace viewer.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        token = _current_lane.set(self._register_lane(("lane", name), name))
+        try:
+            yield
+        finally:
+            _current_lane.reset(token)
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, category: str, *, min_duration_us: float = 0.0, **args: Any
+    ) -> Iterator[None]:
+        """
+        Record the time spent inside the `with` block as a complete ("X") event.
+
+        Spans shorter than `min_duration_us` are dropped, which is useful to keep only
+        the awaits that actually hit the network.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            duration = self._now_us() - start
+            if duration >= min_duration_us:
+                event = {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": duration,
+                    "pid": self._pid,
+                    "tid": self._lane(),
+                }
+                if args:
+                    event["args"] = args
+                with self._lock:
+                    self._events.append(event)
+
+    def instant(self, name: str, category: str, **args: Any) -> None:
+        """
+        Record a single point in time, e.g. a flood wait being received.
+        """
+        if not self.enabled:
+            return
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": self._now_us(),
+            "pid": self._pid,
+            "tid": self._lane(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+
+    def export(self, path: Path) -> None:
+        """
+        Write the recorded spans to `path` in Chrome trace-event JSON format.
+        """
+        with self._lock:
+            events = list(self._events)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"},
+                f,
+                default=str,
+            )
+        logger.info("saved %d trace events to %s", len(events), path)
+
+
+# Process-wide tracer shared by all the downloaders, see `TRACE_OUTPUT_FILE` setting.
+TRACER = ChromeTracer()
@@ -0,0 +1,143 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing
+
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+class _WatchedDownload:
+    def __init__(self, task: asyncio.Task, now: float) -> None:
+        self.task = task
+        self.last_progress = now
+        self.activity = "start"
+        self.stall_reason: str | None = None
+        # * pauses can overlap, e.g. a retry sleep of a media download with
+        # * the wait for the memory
+        self.pauses = 0
+
+
+class StallWatchdog:
+    """
+    Class for cancelling the dialog downloads, that made no progress for a while,
+    e.g. hung on a network stall, that no request timeout covers.
+
+    Downloads report their progress with `touch`, and pause the watching, while they
+    wait for the other downloads or sleep before a retry. A stalled download
+    is cancelled, so it saves its progress like an interrupted one, and can be
+    restarted from its checkpoint. A download, that still makes no progress,
+    is cancelled again.
+    Checks run only while some download is watched.
+
+    Attributes:
+        stall_timeout (float): time without progress, after which a download
+            is cancelled, in seconds. It must be longer than the slowest single step
+            of a download, e.g. the wait for a large media file.
+        max_restarts (int): number of times a stalled download of a dialog
+            is restarted, before it's left for the next run
+        check_interval (float): time between the checks, in seconds
+        clock (Callable[[], float]): source of the monotonic time, in seconds
+        stalls (list[tuple[int, str]]): ids of the dialogs, which downloads were
+            cancelled, with the reasons
+    """
+
+    def __init__(
+        self,
+        stall_timeout: float,
+        *,
+        max_restarts: int = 3,
+        check_interval: float | None = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stall_timeout = stall_timeout
+        self.max_restarts = max_restarts
+        self.check_interval = (
+            check_interval if check_interval is not None else stall_timeout / 10
+        )
+        self.clock = clock
+        self.stalls: list[tuple[int, str]] = []
+        self._watched: dict[int, _WatchedDownload] = {}
+        self._checker: asyncio.Task | None = None
+
+    def watch(self, dialog_id: int, task: asyncio.Task) -> None:
+        """
+        Start watching the `task`, that downloads a dialog.
+        """
+        self._watched[dialog_id] = _WatchedDownload(task, self.clock())
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._run(), name="stall watchdog")
+
+    def unwatch(self, dialog_id: int) -> str | None:
+        """
+        Stop watching a download, once it's over.
+
+        Returns the reason, if the download was cancelled by the watchdog.
+        """
+        watched = self._watched.pop(dialog_id, None)
+        if not self._watched and self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        return None if watched is None else watched.stall_reason
+
+    def touch(self, dialog_id: int, activity: str) -> None:
+        """
+        Record, that a download made progress by completing the `activity`.
+        """
+        watched = self._watched.get(dialog_id)
+        if watched is not None:
+            watched.last_progress = self.clock()
+            watched.activity = activity
+
+    @contextlib.contextmanager
+    def paused(self, dialog_id: int, activity: str) -> typing.Iterator[None]:
+        """
+        Don't count the time of the block, in which a download waits for the other
+        downloads (e.g. for the memory, that they buffer) or for a retry, as a stall.
+        """
+        watched = self._watched.get(dialog_id)
+        if watched is None:
+            yield
+            return
+        watched.pauses += 1
+        try:
+            yield
+        finally:
+            watched.pauses -= 1
+            self.touch(dialog_id, activity)
+
+    def check(self) -> None:
+        """
+        Cancel the downloads, that made no progress within `stall_timeout`.
+        """
+        now = self.clock()
+        for dialog_id, watched in self._watched.items():
+            idle = now - watched.last_progress
+            if watched.pauses or idle < self.stall_timeout:
+                continue
+            if watched.stall_reason is not None:
+                # * the save on cancellation hangs as well
+                logger.warning("dialog #%d: still stalled, cancelling again", dialog_id)
+                watched.last_progress = now
+                watched.task.cancel(watched.stall_reason)
+                continue
+            # * a cancelled download has another `stall_timeout` to save its progress
+            watched.last_progress = now + self.stall_timeout
+            watched.stall_reason = (
+                f"no progress for {idle:.0f}s after {watched.activity}"
+            )
+            self.stalls.append((dialog_id, watched.stall_reason))
+            logger.warning(
+                "dialog #%d: stalled, cancelling: %s", dialog_id, watched.stall_reason
+            )
+            TRACER.instant(
+                "stall", "dialog", dialog_id=dialog_id, reason=watched.stall_reason
+            )
+            watched.task.cancel(watched.stall_reason)
+
+    async def _run(self) -> None:
+        while self._watched:
+            await asyncio.sleep(self.check_interval)
+            self.check()